@@ -1,26 +1,63 @@
 import subprocess
-from logger import setup_logger
 import os
+import sys
+import threading
+import time
+# common/ (shared by the sensor and the server) is a package at the repository root
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.append(REPO_DIR)
+from common.instrumentation import stage, timed
+from logger import setup_logger
+from prefixtrie import PrefixTrie
+
+# Attack verdicts on consecutive 1-second windows before a source is blacklisted
+MAX_WARNINGS = 3
+
+BLACKLIST_TIME = stage("blacklist")
+NODE_TIME = stage("node")
+LEDGER_TIME = stage("ledger")
+
+# Ledger stand-in (benchmarks/ledger.py) used instead of VeChain when set,
+# e.g. DBDOS_LEDGER_URL=http://127.0.0.1:8545
+LEDGER_URL = os.environ.get("DBDOS_LEDGER_URL")
 
 class BlacklistManager:
     """
     Manages a local in-memory blacklist with IP warning counters,
     and logs confirmed attacks to VeChain via Node.js script.
+
+    Warnings are also aggregated per subnet (see prefixtrie.py), so a flood
+    spread over many hosts of one subnet is blacklisted as a single CIDR entry.
     """
 
-    def __init__(self, logger='blacklist.log', max_warnings=3):
+    def __init__(self, logger='blacklist.log', max_warnings=MAX_WARNINGS, subnet_children=4):
         """
         Initialize the blacklist manager with a logger and warning threshold.
+
+        :param subnet_children: Flagged hosts (or subnets) needed to blacklist the enclosing prefix
         """
         self.blacklist_local = {}  # Dict to store IP warning states
+        self.warning_times = {}  # IP -> time of its last warning (used to expire restored warnings)
         self.max_warnings = max_warnings
+        self.prefixes = PrefixTrie(max_children=subnet_children, max_warnings=max_warnings * subnet_children)
+        self.local_prefixes = set()  # Subnets blacklisted by this detector
+        self.remote = set()  # Entries learned from the server blacklist
+        self.remote_epoch = None
+        self.remote_total = 0
+        self._lock = threading.Lock()  # Guards the trie against the sync thread
+        self._stop_sync = threading.Event()
         self.logger = setup_logger(logger)
 
     def is_blacklisted(self, ip):
         """
-        Check if the given IP is currently blacklisted.
+        Check if the given IP is currently blacklisted, either by itself
+        or through a blacklisted subnet (longest-prefix match).
         """
-        return self.blacklist_local.get(ip, {}).get("blacklisted", False)
+        if self.blacklist_local.get(ip, {}).get("blacklisted", False):
+            return True
+        with self._lock:
+            return self.prefixes.match(ip) is not None
 
     def get_warnings(self, ip):
         """
@@ -28,44 +65,83 @@ class BlacklistManager:
         """
         return self.blacklist_local.get(ip, {}).get("warnings", 0)
 
+    @timed(BLACKLIST_TIME)
     def reset_warnings(self, ip):
         """
         Reset warning count and blacklist status for a specific IP.
         """
         self.blacklist_local[ip] = {"warnings": 0, "blacklisted": False}
-        self.logger.info(f"Warnings reset for {ip}")
+        self.warning_times.pop(ip, None)
+        with self._lock:
+            self.prefixes.reset(ip)
+        self.logger.info("Warnings reset for %s", ip)
 
+    @timed(BLACKLIST_TIME)
     def add_warning(self, ip, attack_type="DoS Attack"):
         """
         Add a warning to the IP and blacklist it if it exceeds the threshold.
-        Logs the attack to VeChain if blacklisted.
+        Logs the attack to VeChain if blacklisted. If the warning makes an
+        enclosing subnet cross its threshold, the subnet is logged instead.
         """
         warnings = self.get_warnings(ip) + 1
         blacklisted = False
 
-        if warnings >= self.max_warnings:
+        with self._lock:
+            blocked = self.prefixes.add_warning(ip)
+            if warnings >= self.max_warnings:
+                blocked += self.prefixes.flag(ip)
+            self.local_prefixes.update(blocked)
+
+        if blocked:
+            # Prefixes are returned narrowest first; the widest one covers the rest
             blacklisted = True
-            self.logger.warning(f"{ip} reached max warnings ({warnings}). Adding to blacklist.")
+            self.logger.warning("%s reached its subnet threshold via %s. Adding subnet to blacklist.",
+                                blocked[-1], ip)
+            self.log_attack(blocked[-1], attack_type)
+        elif warnings >= self.max_warnings:
+            blacklisted = True
+            self.logger.warning("%s reached max warnings (%d). Adding to blacklist.", ip, warnings)
             self.log_attack(ip, attack_type)
 
         self.blacklist_local[ip] = {"warnings": warnings, "blacklisted": blacklisted}
+        self.warning_times[ip] = time.time()
         return warnings, blacklisted
 
     def log_attack(self, ip, attack_type):
         """
         Log a blacklisted IP and attack type using a Node.js script that
-        writes the event to the VeChain blockchain.
+        writes the event to the VeChain blockchain (or to the ledger
+        stand-in when DBDOS_LEDGER_URL is set).
         """
-        self.logger.info(f"Logging attack for {ip}: {attack_type}")
-        
+        self.logger.info("Logging attack for %s: %s", ip, attack_type)
+        if LEDGER_URL:
+            return self._log_to_ledger(ip, attack_type)
+        return self._log_to_vechain(ip, attack_type)
+
+    @timed(LEDGER_TIME)
+    def _log_to_ledger(self, ip, attack_type, timeout=10):
+        import requests  # Imported on first use, off the sensor startup path
+        try:
+            response = requests.post(f"{LEDGER_URL.rstrip('/')}/attacks",
+                                     json={"ip": ip, "attack_type": attack_type}, timeout=timeout)
+            response.raise_for_status()
+            tx_id = response.json()["tx_id"]
+        except (requests.RequestException, ValueError, KeyError) as e:
+            self.logger.error("Failed to log attack for %s on the ledger. Error: %s", ip, e)
+            return None
+        self.logger.info("Attack logged successfully for %s. Tx Id: %s", ip, tx_id)
+        return tx_id
+
+    @timed(NODE_TIME)
+    def _log_to_vechain(self, ip, attack_type):
         # Construct the absolute path to the script directory
         script_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "blacklist"))
         script_path = os.path.join(script_dir, "sendAttackLog.cjs")
 
         try:
             # Debugging logs: show the executed command and working directory
-            self.logger.debug(f"Executing command: node {script_path} {ip} {attack_type}")
-            self.logger.debug(f"Working directory: {script_dir}")
+            self.logger.debug("Executing command: node %s %s %s", script_path, ip, attack_type)
+            self.logger.debug("Working directory: %s", script_dir)
 
             # Execute Node.js script to log attack
             result = subprocess.run(
@@ -75,10 +151,77 @@ class BlacklistManager:
                 check=True
             )
             tx_id = result.stdout.strip()
-            self.logger.info(f"Attack logged successfully for {ip}. Tx Id: {tx_id}")
+            self.logger.info("Attack logged successfully for %s. Tx Id: %s", ip, tx_id)
             return tx_id
 
         except subprocess.CalledProcessError as e:
             error_msg = e.stderr.strip() if e.stderr else "Unknown error"
-            self.logger.error(f"Failed to log attack for {ip}. Error: {error_msg}")
+            self.logger.error("Failed to log attack for %s. Error: %s", ip, error_msg)
             return None
+
+    def sync(self, url, timeout=5):
+        """
+        Fetch the shared blacklist from the server (GET /blacklist) and merge it
+        into the local one. After the first call only the entries added since the
+        last sync are requested; a full reload happens when the server epoch changes.
+
+        :param url: Base URL of the server, e.g. http://192.168.1.1:8080
+        :return: Number of entries added locally, or None if the request failed
+        """
+        import requests  # Imported on first use (sync runs on a background thread)
+        params = {}
+        if self.remote_epoch is not None:
+            params = {"since": self.remote_total, "epoch": self.remote_epoch}
+        try:
+            response = requests.get(f"{url.rstrip('/')}/blacklist", params=params, timeout=timeout)
+            response.raise_for_status()
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            self.logger.error("Blacklist sync with %s failed: %s", url, e)
+            return None
+
+        entries = set(attack['ip'] for attack in data.get("attacks", []) if 'ip' in attack)
+        with self._lock:
+            added = entries - self.remote
+            if data.get("delta"):
+                self.remote |= added
+            else:
+                for entry in self.remote - entries:
+                    if entry not in self.local_prefixes and not self.blacklist_local.get(entry, {}).get("blacklisted", False):
+                        self.prefixes.unblock(entry)
+                self.remote = entries
+            for entry in added:
+                try:
+                    self.prefixes.block(entry, propagate=False)
+                except ValueError:
+                    self.logger.warning("Ignoring invalid blacklist entry from server: %s", entry)
+            # Without an epoch (older servers) every sync is a full reload
+            self.remote_epoch = data.get("epoch")
+            self.remote_total = data.get("total", len(entries))
+
+        if added:
+            self.logger.info("Blacklist sync added %d entries (%d known from server)", len(added), len(self.remote))
+        return len(added)
+
+    def start_sync(self, url, interval=30):
+        """
+        Bootstrap the local blacklist from the server, then keep it fresh from a
+        background thread every `interval` seconds until stop_sync() is called.
+        """
+        added = self.sync(url)
+        if added is not None:
+            print(f"[INFO] Loaded {len(self.remote)} blacklist entries from {url}")
+
+        def sync_loop():
+            while not self._stop_sync.wait(timeout=interval):
+                self.sync(url)
+
+        thread = threading.Thread(target=sync_loop, daemon=True)
+        thread.start()
+        return thread
+
+    def stop_sync(self):
+        """
+        Stop the background synchronization thread.
+        """
+        self._stop_sync.set()
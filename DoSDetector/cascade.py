@@ -0,0 +1,236 @@
+"""
+cascade.py
+
+This module implements the cheap first stage of a two-stage detector: a set of
+rate/flag rules that decide the obvious flows before the ML model is called.
+
+Each rule is a box over a few features (by default 'Flow Packets/s' and
+'SYN Flag Count'): a flow inside the box gets the rule's label directly. Boxes
+are calibrated from the labelled training dataset by taking per-class quantile
+ranges and shrinking them until the flows inside are (almost) all of that class.
+Flows matched by no rule are ambiguous and go to the model.
+
+Main components:
+- RuleCascade: loads the rules and decides single flows or whole matrices
+- calibrate_rules: builds the rules from a labelled feature matrix
+- Command line: calibrates models/cascade.json and writes an
+  accuracy-vs-throughput report comparing the cascade with the model alone
+
+Usage:
+    python cascade.py --dataset ../model/DBDoS2025.csv
+    python cascade.py --purity 0.999 --features "Flow Packets/s" "SYN Flag Count"
+"""
+
+import argparse
+import json
+import time
+import numpy as np
+from detection import FEATURES, LABEL_MAP
+
+DEFAULT_FEATURES = ["Flow Packets/s", "SYN Flag Count"]
+
+DEFAULT_CASCADE_PATH = "models/cascade.json"
+
+# Quantile ranges tried for each class box, widest first
+QUANTILE_STEPS = [(0.005, 0.995), (0.01, 0.99), (0.025, 0.975), (0.05, 0.95), (0.1, 0.9), (0.25, 0.75)]
+
+
+class RuleCascade:
+    """
+    Box rules over a few flow features; the first matching rule decides the label.
+    """
+
+    def __init__(self, features, rules):
+        """
+        :param features: Feature names the rules are defined on
+        :param rules: List of dictionaries with 'label' (code), 'min' and 'max'
+                      (one bound per feature)
+        """
+        self.features = list(features)
+        self.rules = rules
+        self.indices = [FEATURES.index(feature) for feature in self.features]
+        self.lower = np.array([rule["min"] for rule in rules], dtype=np.float64).reshape(len(rules), len(self.features))
+        self.upper = np.array([rule["max"] for rule in rules], dtype=np.float64).reshape(len(rules), len(self.features))
+        self.codes = np.array([rule["label"] for rule in rules], dtype=np.int64)
+        # Plain tuples are faster than NumPy for a single flow
+        self._bounds = [(rule["label"], tuple(zip(rule["min"], rule["max"]))) for rule in rules]
+        self.decided = 0
+        self.total = 0
+
+    @classmethod
+    def load(cls, path=DEFAULT_CASCADE_PATH):
+        with open(path, "r") as f:
+            config = json.load(f)
+        return cls(config["features"], config["rules"])
+
+    def save(self, path=DEFAULT_CASCADE_PATH, **metadata):
+        with open(path, "w") as f:
+            json.dump(dict(metadata, features=self.features, rules=self.rules), f, indent=2)
+
+    def decide_one(self, row):
+        """
+        Decides a single flow.
+
+        :param row: Feature vector in FEATURES order
+        :return: Label code, or -1 if the flow must go to the model
+        """
+        self.total += 1
+        values = [row[i] for i in self.indices]
+        for code, bounds in self._bounds:
+            for value, (low, high) in zip(values, bounds):
+                if not low <= value <= high:
+                    break
+            else:
+                self.decided += 1
+                return code
+        return -1
+
+    def decide(self, X):
+        """
+        Decides many flows at once.
+
+        :param X: 2D array with one row per flow, columns in FEATURES order
+        :return: Array of label codes, -1 where the model must decide
+        """
+        values = X[:, self.indices]
+        inside = np.all((values[:, None, :] >= self.lower) & (values[:, None, :] <= self.upper), axis=2)
+        matched = inside.any(axis=1)
+        codes = np.where(matched, self.codes[inside.argmax(axis=1)] if len(self.rules) else -1, -1)
+        self.total += len(X)
+        self.decided += int(matched.sum())
+        return codes
+
+    def skip_rate(self):
+        """
+        Fraction of the flows seen so far that skipped the model.
+        """
+        return self.decided / self.total if self.total else 0.0
+
+
+def calibrate_rules(X, y, features=DEFAULT_FEATURES, target_purity=0.995, min_support=0.05):
+    """
+    Builds one box per class from a labelled feature matrix.
+
+    For every class the widest quantile box (see QUANTILE_STEPS) whose flows
+    are at least `target_purity` of that class is kept; classes without such a
+    box get no rule.
+
+    :param X: 2D array in FEATURES order
+    :param y: Label codes
+    :param features: Features the boxes are built on
+    :param target_purity: Minimum fraction of flows in a box belonging to its class
+    :param min_support: Minimum fraction of the class a box must cover to be kept
+    :return: RuleCascade with the calibrated rules
+    """
+    indices = [FEATURES.index(feature) for feature in features]
+    values = X[:, indices]
+    rules = []
+    for code in np.unique(y):
+        own = values[y == code]
+        for low_q, high_q in QUANTILE_STEPS:
+            low, high = np.quantile(own, low_q, axis=0), np.quantile(own, high_q, axis=0)
+            inside = np.all((values >= low) & (values <= high), axis=1)
+            purity = float(np.mean(y[inside] == code)) if inside.any() else 0.0
+            support = float(np.mean(inside[y == code]))
+            if purity >= target_purity and support >= min_support:
+                rules.append({"label": int(code), "name": LABEL_MAP.get(int(code), "UNKNOWN"),
+                              "min": low.tolist(), "max": high.tolist(),
+                              "purity": purity, "support": support})
+                break
+    # Purest rules first, so they win where boxes overlap
+    rules.sort(key=lambda rule: -rule["purity"])
+    return RuleCascade(features, rules)
+
+
+def load_labelled(path):
+    """
+    Loads a labelled dataset as a feature matrix and LABEL_MAP codes.
+    """
+    import pandas as pd
+
+    df = pd.read_csv(path)
+    labels = df["label"].str.upper().str.strip().replace({"BENIGNO": "BENIGN"})
+    codes = {label: code for code, label in LABEL_MAP.items()}
+    y = labels.map(codes)
+    if y.isnull().any():
+        raise ValueError("Unrecognized labels found in the dataset.")
+    return df[FEATURES].to_numpy(dtype=np.float64), y.to_numpy(dtype=np.int64)
+
+
+def evaluate(cascade, model, X, y, online_rows=1000):
+    """
+    Scores X with the cascade in front of the model and returns a report row.
+    Without a cascade, the model scores every flow.
+    """
+    import warnings
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        start = time.perf_counter()
+        if cascade is None:
+            codes = model.predict(X)
+            decided = np.zeros(len(X), dtype=bool)
+        else:
+            codes = cascade.decide(X)
+            decided = codes >= 0
+            if (~decided).any():
+                codes[~decided] = model.predict(X[~decided])
+        batch_s = time.perf_counter() - start
+
+        # Online: one flow per call, as the sensor does
+        rows = X[:online_rows]
+        start = time.perf_counter()
+        for row in rows:
+            code = cascade.decide_one(row) if cascade is not None else -1
+            if code < 0:
+                model.predict(row.reshape(1, -1))
+        online_s = time.perf_counter() - start
+
+    return {
+        "Stage": "model only" if cascade is None else "cascade + model",
+        "Rules": 0 if cascade is None else len(cascade.rules),
+        "Skipped model (%)": 100 * float(np.mean(decided)),
+        "Rule accuracy": float(np.mean(codes[decided] == y[decided])) if decided.any() else float("nan"),
+        "Accuracy": float(np.mean(codes == y)),
+        "Batch throughput (rows/s)": len(X) / batch_s,
+        "Online mean (ms)": online_s * 1000 / len(rows)
+    }
+
+
+# Calibrate the cascade and report its effect
+if __name__ == "__main__":
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+    from sharedmodel import load_release
+
+    parser = argparse.ArgumentParser(description="Calibrate the rule cascade and compare it with the model alone.")
+    parser.add_argument("--dataset", default="../model/DBDoS2025.csv", help="Labelled training dataset")
+    parser.add_argument("--features", nargs="+", default=DEFAULT_FEATURES, help="Features the rules use")
+    parser.add_argument("--purity", type=float, default=0.995, help="Target purity of the saved rules (default: 0.995)")
+    parser.add_argument("--model", default="models/ownmodel/model.pkl", help="Model used for ambiguous flows")
+    parser.add_argument("--output", default=DEFAULT_CASCADE_PATH, help="Where to save the calibrated rules")
+    parser.add_argument("--report", default="cascade_report.csv", help="Accuracy-vs-throughput report")
+    args = parser.parse_args()
+
+    X, y = load_labelled(args.dataset)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42, stratify=y)
+    model = load_release(args.model)
+
+    rows = [evaluate(None, model, X_test, y_test)]
+    for purity in sorted({0.99, 0.995, 0.999, 1.0, args.purity}):
+        cascade = calibrate_rules(X_train, y_train, args.features, purity)
+        row = evaluate(cascade, model, X_test, y_test)
+        row["Target purity"] = purity
+        rows.append(row)
+        if purity == args.purity:
+            # Final rules use every labelled flow
+            final = calibrate_rules(X, y, args.features, purity)
+            final.save(args.output, target_purity=purity, dataset=args.dataset)
+            for rule in final.rules:
+                print(f"[INFO] {rule['name']}: {dict(zip(final.features, zip(rule['min'], rule['max'])))} "
+                      f"(purity {rule['purity']:.4f}, covers {rule['support']:.1%})")
+
+    report = pd.DataFrame(rows)
+    print(report.round(4).to_string(index=False))
+    report.to_csv(args.report, index=False)
+    print(f"[INFO] Rules saved to {args.output}, report saved to {args.report}")
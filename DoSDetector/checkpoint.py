@@ -0,0 +1,509 @@
+"""
+checkpoint.py
+
+This module snapshots the sensor's per-source state to disk and restores it
+on startup, so a restart does not give every source a clean slate:
+- open flow windows (MetricsExtractor.flows, or the sliding window rings)
+- warning counters and blacklist flags (BlacklistManager.blacklist_local),
+  the subnets this detector blacklisted and the entries learned from the server
+
+Snapshots are written by a forked child process. The child gets a
+copy-on-write view of the state as it was between two packets, and the
+capture thread only pays for the fork(). The file is a set of uncompressed
+NumPy arrays, one column per field, with the per-flow lists concatenated.
+It is written to a temporary file and renamed, so a crash never leaves a
+half-written snapshot. A snapshot is skipped when no packet has been
+processed since the previous one. Where fork() is not available (Windows)
+the snapshot is written in-process.
+
+On restore, stale entries are pruned:
+- flow windows that started more than one window ago (they can no longer be
+  completed with correct features)
+- warnings older than warning_ttl, unless the source is blacklisted
+The prefix trie is rebuilt by replaying the restored warnings and blocks.
+
+Main components:
+- StateCheckpointer: periodic snapshots and restore for a MetricsExtractor
+- collect_state / write_state / read_state: the file format
+- benchmark: snapshot and restore times and file size for N sources
+
+Usage:
+    python metrics.py --checkpoint state.npz --checkpoint-interval 10
+    python checkpoint.py --sources 1000000        # benchmark
+"""
+
+import argparse
+import os
+import sys
+import time
+import warnings
+from collections import Counter
+from itertools import chain
+import numpy as np
+# common/ (shared by the sensor and the server) is a package at the repository root
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.append(REPO_DIR)
+from common.instrumentation import gauge
+from slidingwindow import INDEX, PACKETS, IAT_COUNT, FIN, URG, PORTS
+
+FORMAT_VERSION = 5
+
+# Integer counters of a flow window (see MetricsExtractor.reset_metrics_for_ip)
+FLOW_COUNTERS = ('fin_flag_count', 'syn_flag_count', 'rst_flag_count', 'psh_flag_count', 'ack_flag_count',
+                 'fwd_psh_flags', 'fwd_urg_flags', 'bwd_psh_flags', 'bwd_urg_flags', 'checkpoint_packets',
+                 'skipped_packets', 'early_decided')
+# Per-packet lists of a flow window and their dtypes (IAT lists are rebuilt from the times)
+FLOW_LISTS = (('dest_ports', np.int32), ('fwd_packet_lengths', np.int32), ('bwd_packet_lengths', np.int32),
+              ('fwd_times', np.float64), ('bwd_times', np.float64))
+
+# Sliding window bins are stored as one float64 row per bin (fields INDEX..URG of
+# slidingwindow.py; None as NaN), their destination port counts as separate columns
+SLIDING_FIELDS = PORTS
+SLIDING_INTEGERS = frozenset((INDEX, PACKETS, IAT_COUNT) + tuple(range(FIN, URG + 1)))
+
+# Length of a tumbling window (process_packet closes windows after one second)
+FLOW_WINDOW = 1.0
+WARNING_TTL = 3600
+
+
+def _strings(values):
+    return np.array(values, dtype="S") if values else np.empty(0, dtype="S1")
+
+
+def collect_state(extractor):
+    """
+    Gathers the extractor's flows and its blacklist manager's warnings as arrays.
+    """
+    state = {"version": np.array(FORMAT_VERSION), "saved_at": np.array(time.time())}
+
+    flows = [(src, flow) for src, flow in list(extractor.flows.items()) if flow['start_time'] is not None]
+    n = len(flows)
+    state["flow_src"] = _strings([src for src, _ in flows])
+    state["flow_start"] = np.fromiter((flow['start_time'] for _, flow in flows), np.float64, n)
+    state["flow_end"] = np.fromiter((flow['end_time'] for _, flow in flows), np.float64, n)
+    state["flow_checkpoint_time"] = np.fromiter(
+        (np.nan if flow['checkpoint_time'] is None else flow['checkpoint_time'] for _, flow in flows), np.float64, n)
+    state["flow_counters"] = np.array([[flow[key] for key in FLOW_COUNTERS] for _, flow in flows],
+                                      dtype=np.int64).reshape(n, len(FLOW_COUNTERS))
+    for key, dtype in FLOW_LISTS:
+        counts = np.fromiter((len(flow[key]) for _, flow in flows), np.int64, n)
+        state[f"flow_{key}_count"] = counts
+        state[f"flow_{key}"] = np.fromiter(chain.from_iterable(flow[key] for _, flow in flows), dtype,
+                                           int(counts.sum()))
+
+    if extractor.sliding is not None:
+        state.update(_sliding_columns(extractor.sliding))
+
+    manager = extractor.blacklist_manager
+    entries = [(ip, entry) for ip, entry in list(manager.blacklist_local.items())
+               if entry["warnings"] or entry["blacklisted"]]
+    m = len(entries)
+    state["warning_ip"] = _strings([ip for ip, _ in entries])
+    state["warning_count"] = np.fromiter((entry["warnings"] for _, entry in entries), np.int32, m)
+    state["warning_blacklisted"] = np.fromiter((entry["blacklisted"] for _, entry in entries), np.bool_, m)
+    state["warning_time"] = np.fromiter((manager.warning_times.get(ip, state["saved_at"]) for ip, _ in entries),
+                                        np.float64, m)
+    state["local_prefixes"] = _strings(sorted(manager.local_prefixes))
+    state["remote"] = _strings(sorted(manager.remote))
+    return state
+
+
+def _sliding_columns(sliding):
+    """
+    Flattens the rings of a SlidingWindowEngine into columns.
+    """
+    sources = list(sliding.sources.items())
+    n = len(sources)
+    slots = [[slot for slot in source['ring'] if slot is not None] for _, source in sources]
+    rows = list(chain.from_iterable(slots))
+    columns = {
+        "sliding_layout": np.array([sliding.bins, sliding.bin_width]),
+        "sliding_src": _strings([src for src, _ in sources]),
+        "sliding_current": np.fromiter((source['current'] for _, source in sources), np.int64, n),
+        "sliding_first": np.fromiter((source['first'] for _, source in sources), np.int64, n),
+        "sliding_last_time": np.fromiter((np.nan if source['last_time'] is None else source['last_time']
+                                          for _, source in sources), np.float64, n),
+        "sliding_bin_count": np.fromiter((len(source_slots) for source_slots in slots), np.int64, n),
+        "sliding_bins": np.array([[np.nan if value is None else value for value in slot[:SLIDING_FIELDS]]
+                                  for slot in rows], np.float64).reshape(len(rows), SLIDING_FIELDS),
+        "sliding_port_count": np.fromiter((len(slot[PORTS]) for slot in rows), np.int64, len(rows)),
+    }
+    ports = [item for slot in rows for item in slot[PORTS].items()]
+    columns["sliding_ports"] = np.fromiter((port for port, _ in ports), np.int32, len(ports))
+    columns["sliding_port_packets"] = np.fromiter((count for _, count in ports), np.int64, len(ports))
+    return columns
+
+
+def _sliding_sources(state, bins, window, now):
+    """
+    Rebuilds the rings of the sources seen within the last window from the columns.
+    """
+    rows = _split(state["sliding_bins"], state["sliding_bin_count"])
+    positions = _split(np.arange(len(state["sliding_bins"])), state["sliding_bin_count"])
+    ports = _split(state["sliding_ports"], state["sliding_port_count"])
+    counts = _split(state["sliding_port_packets"], state["sliding_port_count"])
+    sources = {}
+    for i, src in enumerate(state["sliding_src"].astype(str).tolist()):
+        last_time = float(state["sliding_last_time"][i])
+        if last_time != last_time or now - last_time >= window:
+            continue
+        ring = [None] * bins
+        for row, position in zip(rows[i], positions[i]):
+            slot = [None if value != value else int(value) if field in SLIDING_INTEGERS else value
+                    for field, value in enumerate(row)]
+            slot.append(Counter(dict(zip(ports[position], counts[position]))))
+            ring[slot[INDEX] % bins] = slot
+        sources[src] = {'ring': ring, 'current': int(state["sliding_current"][i]),
+                        'first': int(state["sliding_first"][i]), 'last_time': last_time}
+    return sources
+
+
+def write_state(path, state):
+    """
+    Writes the arrays to `path` atomically (temporary file, fsync, rename).
+
+    :return: File size in bytes
+    """
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "wb") as f:
+        np.savez(f, **state)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return os.path.getsize(path)
+
+
+def read_state(path):
+    with np.load(path, allow_pickle=False) as data:
+        state = {key: data[key] for key in data.files}
+    if int(state["version"]) != FORMAT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version {int(state['version'])}")
+    return state
+
+
+def _split(values, counts):
+    """
+    Splits a concatenated array into Python lists of the given lengths.
+    """
+    values = values.tolist()
+    ends = np.cumsum(counts).tolist()
+    return [values[end - count:end] for end, count in zip(ends, counts.tolist())]
+
+
+def restore_state(extractor, state, now=None, flow_window=FLOW_WINDOW, warning_ttl=WARNING_TTL):
+    """
+    Loads a snapshot into the extractor and its blacklist manager, dropping stale entries.
+
+    :return: dict with the number of flows and warnings restored and pruned
+    """
+    now = time.time() if now is None else now
+    stats = {}
+
+    keep = np.flatnonzero(now - state["flow_start"] < flow_window)
+    lists = {key: _split(state[f"flow_{key}"], state[f"flow_{key}_count"]) for key, _ in FLOW_LISTS}
+    sources = state["flow_src"].astype(str).tolist()
+    starts, ends = state["flow_start"].tolist(), state["flow_end"].tolist()
+    checkpoint_times = state["flow_checkpoint_time"].tolist()
+    counters = state["flow_counters"].tolist()
+    for i in keep.tolist():
+        src = sources[i]
+        extractor.reset_metrics_for_ip(src)
+        flow = extractor.flows[src]
+        flow['start_time'], flow['end_time'] = starts[i], ends[i]
+        flow['checkpoint_time'] = None if checkpoint_times[i] != checkpoint_times[i] else checkpoint_times[i]
+        flow.update(zip(FLOW_COUNTERS, counters[i]))
+        if getattr(extractor, 'shedder', None) is None:
+            flow['skipped_packets'] = 0  # Written with load shedding; this sensor processes every packet
+        for key, _ in FLOW_LISTS:
+            flow[key] = lists[key][i]
+        for direction in ('fwd', 'bwd'):
+            times = flow[f'{direction}_times']
+            flow[f'{direction}_iat_list'] = [t2 - t1 for t1, t2 in zip(times[:-1], times[1:])]
+    stats["flows"] = len(keep)
+    stats["flows_pruned"] = len(state["flow_src"]) - len(keep)
+
+    sliding = extractor.sliding
+    if sliding is not None and "sliding_src" in state:
+        bins, bin_width = state["sliding_layout"].tolist()
+        if (bins, bin_width) == (sliding.bins, sliding.bin_width):
+            sliding.sources = _sliding_sources(state, sliding.bins, sliding.bins * sliding.bin_width, now)
+            stats["sliding_sources"] = len(sliding.sources)
+            stats["flows_pruned"] += len(state["sliding_src"]) - len(sliding.sources)
+
+    manager = extractor.blacklist_manager
+    keep = np.flatnonzero(state["warning_blacklisted"] | (now - state["warning_time"] < warning_ttl))
+    ips = state["warning_ip"].astype(str).tolist()
+    counts = state["warning_count"].tolist()
+    blacklisted = state["warning_blacklisted"].tolist()
+    times = state["warning_time"].tolist()
+    with manager._lock:
+        for i in keep.tolist():
+            ip = ips[i]
+            manager.blacklist_local[ip] = {"warnings": counts[i], "blacklisted": blacklisted[i]}
+            manager.warning_times[ip] = times[i]
+            # Replayed into the trie without logging: these attacks were logged before the restart
+            if counts[i]:
+                manager.prefixes.add_warning(ip, counts[i])
+            if counts[i] >= manager.max_warnings:
+                manager.prefixes.flag(ip)
+        for prefix in state["local_prefixes"].astype(str).tolist():
+            manager.prefixes.block(prefix)
+            manager.local_prefixes.add(prefix)
+        # Server entries cover the time until the first sync, which is always a full
+        # reload (the delta position is not restored) and drops the ones removed since
+        if manager.remote_epoch is None:
+            for entry in state["remote"].astype(str).tolist():
+                manager.prefixes.block(entry, propagate=False)
+                manager.remote.add(entry)
+    stats["warnings"] = len(keep)
+    stats["warnings_pruned"] = len(ips) - len(keep)
+    return stats
+
+
+class StateCheckpointer:
+    """
+    Periodic snapshots of a MetricsExtractor's state from a forked child, and
+    restore on startup.
+    """
+
+    def __init__(self, extractor, path, interval=10, warning_ttl=WARNING_TTL, use_fork=None):
+        """
+        :param extractor: MetricsExtractor whose state is saved
+        :param path: Snapshot file
+        :param interval: Seconds between snapshots
+        :param warning_ttl: Seconds after which a warning is dropped on restore
+                            (blacklisted sources are always kept)
+        :param use_fork: Write snapshots from a forked child (default: where available)
+        """
+        self.extractor = extractor
+        self.path = path
+        self.interval = interval
+        self.warning_ttl = warning_ttl
+        self.use_fork = hasattr(os, "fork") if use_fork is None else use_fork
+        self.next_due = time.time() + interval
+        self.last_packets = None
+        self.child = None  # (pid, read end of the stats pipe)
+        self.restored = False
+        self.stats = {"snapshots": 0, "failed": 0, "skipped": 0, "pause_s": None, "write_s": None,
+                      "bytes": None, "restore_s": None}
+        for key, help_text in (("pause_s", "Capture pause to start the last snapshot (fork)"),
+                               ("write_s", "Time to write the last snapshot"),
+                               ("restore_s", "Time to restore the snapshot at startup")):
+            gauge(f"dbdos_checkpoint_{key[:-2]}_seconds", help_text,
+                  function=lambda key=key: self.stats[key] or 0.0)
+        gauge("dbdos_checkpoint_bytes", "Size of the last snapshot", function=lambda: self.stats["bytes"] or 0)
+
+    def restore(self):
+        """
+        Restores the snapshot file if there is one.
+
+        :return: Restore statistics, or None if there was nothing to restore
+        """
+        self.restored = True
+        if not os.path.exists(self.path):
+            return None
+        start = time.perf_counter()
+        try:
+            state = read_state(self.path)
+            stats = restore_state(self.extractor, state, warning_ttl=self.warning_ttl)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[WARNING] Could not restore {self.path}, starting empty: {e}")
+            return None
+        self.stats["restore_s"] = time.perf_counter() - start
+        stats["age_s"] = time.time() - float(state["saved_at"])
+        stats["restore_s"] = self.stats["restore_s"]
+        print(f"[INFO] Restored {stats['flows']} flows and {stats['warnings']} warning entries from {self.path} "
+              f"in {stats['restore_s']:.3f}s (snapshot {stats['age_s']:.1f}s old, "
+              f"pruned {stats['flows_pruned']} flows and {stats['warnings_pruned']} warnings)")
+        return stats
+
+    def maybe_snapshot(self, now):
+        """
+        Called for every packet on the capture thread: reaps a finished child
+        and starts a snapshot when one is due. Costs one comparison otherwise.
+        """
+        if now >= self.next_due:
+            self.next_due = now + self.interval
+            self.poll()
+            self.snapshot()
+
+    def snapshot(self, block=False):
+        """
+        Starts a snapshot (or writes it in-process without fork, or with block=True).
+
+        :return: False if skipped (nothing changed, or a snapshot is still being written)
+        """
+        if self.child is not None and not self.poll(wait=block):
+            self.stats["skipped"] += 1
+            return False
+        if self.extractor.packets_seen == self.last_packets:
+            self.stats["skipped"] += 1
+            return False
+        self.last_packets = self.extractor.packets_seen
+
+        if block or not self.use_fork:
+            start = time.perf_counter()
+            try:
+                size = write_state(self.path, collect_state(self.extractor))
+            except OSError as e:
+                self.stats["failed"] += 1
+                print(f"[ERROR] Snapshot to {self.path} failed: {e}")
+                return False
+            self.stats.update(snapshots=self.stats["snapshots"] + 1, pause_s=time.perf_counter() - start,
+                              write_s=time.perf_counter() - start, bytes=size)
+            return True
+
+        read_end, write_end = os.pipe()
+        start = time.perf_counter()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)  # fork() with threads: the child only writes a file
+            pid = os.fork()
+        if pid == 0:
+            # Child: no locks, no logging, no atexit handlers
+            status = 1
+            try:
+                os.close(read_end)
+                written = time.perf_counter()
+                size = write_state(self.path, collect_state(self.extractor))
+                os.write(write_end, f"{time.perf_counter() - written} {size}".encode())
+                status = 0
+            finally:
+                os._exit(status)
+        os.close(write_end)
+        self.stats["pause_s"] = time.perf_counter() - start
+        self.child = (pid, read_end)
+        return True
+
+    def poll(self, wait=False):
+        """
+        Reaps the snapshot child if it has finished.
+
+        :return: True if no child is running anymore
+        """
+        if self.child is None:
+            return True
+        pid, read_end = self.child
+        finished, status = os.waitpid(pid, 0 if wait else os.WNOHANG)
+        if not finished:
+            return False
+        result = os.read(read_end, 64).decode().split()
+        os.close(read_end)
+        self.child = None
+        if status == 0 and len(result) == 2:
+            self.stats.update(snapshots=self.stats["snapshots"] + 1, write_s=float(result[0]), bytes=int(result[1]))
+        else:
+            self.stats["failed"] += 1
+            print(f"[ERROR] Snapshot child for {self.path} failed (status {status})")
+        return True
+
+    def close(self):
+        """
+        Waits for a running snapshot and writes a final one in-process.
+        """
+        self.poll(wait=True)
+        self.last_packets = None  # The periodic snapshots ran before their packet was processed
+        self.snapshot(block=True)
+
+
+# ---------- Benchmark ----------
+
+def _bench_extractor():
+    import tempfile
+    from metrics import MetricsExtractor
+    from blacklist import BlacklistManager
+    extractor = MetricsExtractor.__new__(MetricsExtractor)
+    extractor.flows = {}
+    extractor.sliding = None
+    extractor.packets_seen = 0
+    extractor.blacklist_manager = BlacklistManager(logger=os.path.join(tempfile.gettempdir(), "checkpoint_bench.log"))
+    return extractor
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return float("nan")  # Windows
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _bench_snapshot(sources, packets, blacklisted_share, path, now):
+    print(f"[INFO] Building the state of {sources} sources...", flush=True)
+    extractor = _bench_extractor()
+    manager = extractor.blacklist_manager
+    for i in range(sources):
+        src = f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}"
+        extractor.reset_metrics_for_ip(src)
+        flow = extractor.flows[src]
+        times = [now - 0.5 + 0.01 * k for k in range(packets)]
+        flow.update(start_time=times[0], end_time=times[-1], dest_ports=[80] * packets, syn_flag_count=packets,
+                    fwd_packet_lengths=[60] * packets, fwd_times=times,
+                    fwd_iat_list=[t2 - t1 for t1, t2 in zip(times[:-1], times[1:])])
+        blacklisted = i < sources * blacklisted_share
+        manager.blacklist_local[src] = {"warnings": 3 if blacklisted else 1, "blacklisted": blacklisted}
+        manager.warning_times[src] = now
+    extractor.packets_seen = sources * packets
+
+    checkpointer = StateCheckpointer(extractor, path, use_fork=hasattr(os, "fork"))
+    start = time.perf_counter()
+    state = collect_state(extractor)
+    collected = time.perf_counter() - start
+    size = write_state(path, state)
+    written = time.perf_counter() - start
+    print(f"[OK] In-process snapshot: collect {collected:.3f}s, total {written:.3f}s, {size / 1e6:.1f} MB "
+          f"({size / sources:.0f} bytes per source)", flush=True)
+
+    if checkpointer.use_fork:
+        extractor.packets_seen += 1
+        checkpointer.snapshot()
+        checkpointer.poll(wait=True)
+        print(f"[OK] Forked snapshot: capture pause {checkpointer.stats['pause_s'] * 1000:.1f} ms, "
+              f"written by the child in {checkpointer.stats['write_s']:.3f}s", flush=True)
+    print(f"[INFO] Sensor process peak RSS: {_peak_rss_mb():.0f} MB", flush=True)
+
+
+def _bench_restore(path, now):
+    extractor = _bench_extractor()
+    start = time.perf_counter()
+    state = read_state(path)
+    loaded = time.perf_counter() - start
+    # As of the snapshot time, as after an immediate restart: building the
+    # state takes longer than a window, which would drop every flow as stale
+    stats = restore_state(extractor, state, now=now)
+    print(f"[OK] Restore: {time.perf_counter() - start:.3f}s, file read {loaded:.3f}s "
+          f"({stats['flows']} flows, {stats['warnings']} warnings), peak RSS {_peak_rss_mb():.0f} MB", flush=True)
+
+
+def benchmark(sources, packets=8, blacklisted_share=0.01, path="checkpoint_bench.npz"):
+    """
+    Snapshot and restore of `sources` sources, each with an open window of
+    `packets` packets and a warning (some blacklisted).
+
+    The snapshot and the restore run in two fresh processes, like a sensor
+    and its restart: freed objects are not returned to the OS, so restoring
+    next to the original state would measure (and need) both.
+    """
+    import multiprocessing
+    context = multiprocessing.get_context("spawn")
+    now = time.time()
+    try:
+        for target, args in ((_bench_snapshot, (sources, packets, blacklisted_share, path, now)),
+                             (_bench_restore, (path, now))):
+            process = context.Process(target=target, args=args)
+            process.start()
+            process.join()
+            if process.exitcode != 0:
+                print(f"[ERROR] {target.__name__[1:]} failed with exit code {process.exitcode}")
+                return
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the sensor state snapshots.")
+    parser.add_argument("--sources", type=int, default=1_000_000, help="Tracked sources (default: 1000000)")
+    parser.add_argument("--packets", type=int, default=8, help="Packets in every open window (default: 8)")
+    args = parser.parse_args()
+    benchmark(args.sources, args.packets)
@@ -1,28 +1,318 @@
+import hashlib
+import io
+import json
 import joblib
 import numpy as np
-import pandas as pd
 import os
+import sys
+import threading
+import time
 import warnings
+# common/ (shared by the sensor and the server) is a package at the repository root
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.append(REPO_DIR)
+from common.instrumentation import stage, timed
+from sharedmodel import is_shared, check_arrays, load as load_shared
+
+# List of expected features (must match model training input)
+FEATURES = [
+    'Destination Port', 'Flow Duration', 'Total Fwd Packets', 'Total Backward Packets',
+    'Total Length of Fwd Packets', 'Total Length of Bwd Packets',
+    'Fwd Packet Length Max', 'Fwd Packet Length Min', 'Fwd Packet Length Mean', 'Fwd Packet Length Std',
+    'Bwd Packet Length Max', 'Bwd Packet Length Min', 'Bwd Packet Length Mean', 'Bwd Packet Length Std',
+    'Flow Bytes/s', 'Flow Packets/s', 'Fwd Packets/s', 'Bwd Packets/s',
+    'Min Packet Length', 'Max Packet Length', 'Packet Length Mean', 'Packet Length Std', 'Packet Length Variance',
+    'Flow IAT Mean', 'Flow IAT Std', 'Flow IAT Max', 'Flow IAT Min',
+    'Fwd IAT Total', 'Fwd IAT Mean', 'Fwd IAT Std', 'Fwd IAT Max', 'Fwd IAT Min',
+    'Bwd IAT Total', 'Bwd IAT Mean', 'Bwd IAT Std', 'Bwd IAT Max', 'Bwd IAT Min',
+    'FIN Flag Count', 'SYN Flag Count', 'RST Flag Count', 'PSH Flag Count', 'ACK Flag Count',
+    'Fwd PSH Flags', 'Bwd PSH Flags', 'Fwd URG Flags', 'Bwd URG Flags'
+]
+
+PREDICT_TIME = stage("predict")
+
+# Simulated HULK flow with all required features (debugging and benchmarks)
+HULK = {
+    'Destination Port': 8080, 'Flow Duration': 13.58, 'Total Fwd Packets': 2502,
+    'Total Backward Packets': 0, 'Total Length of Fwd Packets': 235897.0,
+    'Total Length of Bwd Packets': 0, 'Fwd Packet Length Max': 512.0,
+    'Fwd Packet Length Min': 66.0, 'Fwd Packet Length Mean': 94.28, 'Fwd Packet Length Std': 97.0,
+    'Bwd Packet Length Max': 0, 'Bwd Packet Length Min': 0, 'Bwd Packet Length Mean': 0,
+    'Bwd Packet Length Std': 0, 'Flow Bytes/s': 17365.47, 'Flow Packets/s': 184.18,
+    'Fwd Packets/s': 184.18, 'Bwd Packets/s': 0.0, 'Min Packet Length': 66.0,
+    'Max Packet Length': 512.0, 'Packet Length Mean': 94.28, 'Packet Length Std': 97.0,
+    'Packet Length Variance': 9409.67, 'Flow IAT Mean': 0.0054, 'Flow IAT Std': 0.2545,
+    'Flow IAT Max': 12.71, 'Flow IAT Min': 0.000001, 'Fwd IAT Total': 13.58,
+    'Fwd IAT Mean': 0.0054, 'Fwd IAT Std': 0.2545, 'Fwd IAT Max': 12.71,
+    'Fwd IAT Min': 0.000001, 'Bwd IAT Total': 0, 'Bwd IAT Mean': 0,
+    'Bwd IAT Std': 0, 'Bwd IAT Max': 0, 'Bwd IAT Min': 0,
+    'FIN Flag Count': 726, 'SYN Flag Count': 628, 'RST Flag Count': 26,
+    'PSH Flag Count': 171, 'ACK Flag Count': 1874, 'Fwd PSH Flags': 171,
+    'Bwd PSH Flags': 0, 'Fwd URG Flags': 0, 'Bwd URG Flags': 0
+}
+
+# Map numerical prediction to a human-readable label
+LABEL_MAP = {
+    0: "BENIGN",
+    1: "HULK",
+    2: "SYNFLOOD",
+    3: "UDPFLOOD",
+    4: "POSTFLOOD"
+}
 
 class AttackDetector:
     """
     This class loads a pre-trained machine learning model (KNN)
     and provides a prediction interface for network flow data.
+
+    The model directory can be watched for new releases: a new model is loaded
+    and validated on a background thread, then swapped in between predictions.
+    Predictions already running keep using the model they started with.
     """
 
-    def __init__(self, model_path: str = None):
+    def __init__(self, model_path: str = None, verbose: bool = True, require_manifest: bool = False,
+                 canary_path: str = None, min_canary_accuracy: float = 0.9, on_reload=None,
+                 cascade_path: str = None, mmap_mode: str = None):
         """
         Initialize the detector by loading the serialized model from disk.
 
+        If the directory holds a manifest.json (written by model/deploy.py), the
+        model file checksum, feature order and label map are verified against it.
+
         :param model_path: Path to the directory containing the saved .pkl model
+        :param verbose: Print a console message after every prediction
+        :param require_manifest: Refuse to load a model without a manifest (and
+                                 checksum every array of a shared-array model)
+        :param canary_path: CSV of labelled flows a reloaded model must classify
+                            (default: canary.csv next to the model directory)
+        :param min_canary_accuracy: Minimum canary accuracy to accept a reloaded model
+        :param on_reload: Called with the reload statistics after every reload attempt
+        :param cascade_path: Rules calibrated by cascade.py; flows they match are
+                             labelled without calling the model
+        :param mmap_mode: Memory-map the arrays of model.pkl instead of reading them
+                          (e.g. 'r'); processes loading the same file share its pages
         """
+        self.verbose = verbose
+        self.mmap_mode = mmap_mode
+        self.require_manifest = require_manifest
+        self.min_canary_accuracy = min_canary_accuracy
+        self.on_reload = on_reload
 
         if model_path is None:
             model_path = os.path.join('.', 'models', 'ownmodel')
-        
+        if canary_path is None:
+            canary_path = os.path.join(os.path.dirname(os.path.abspath(model_path)), 'canary.csv')
+        self.watch_path = model_path
+        self.canary_path = canary_path
+
+        self.cascade = None
+        if cascade_path is not None:
+            from cascade import RuleCascade
+            self.cascade = RuleCascade.load(cascade_path)
+
+        self.signature = self._signature()
+        self.model_path, self.model, self.manifest = self._load()
+        self.previous = None
+        self._rejected = set()
+        self._swap_lock = threading.Lock()
+        self._stop_watch = threading.Event()
+        self.reload_stats = {
+            "reloads": 0,
+            "failed_reloads": 0,
+            "rollbacks": 0,
+            "last_reload_s": None,
+            "last_swap_pause_us": None,
+            "max_swap_pause_us": 0.0,
+            "model_path": self.model_path
+        }
+
+    def _signature(self):
+        """
+        Identifies the model currently published at the watched path.
+        """
+        path = os.path.realpath(self.watch_path)
+        stat = os.stat(os.path.join(path, "model.pkl"))
+        return path, stat.st_mtime_ns, stat.st_size
+
+    def _load(self):
+        # Resolve the release link once so the model and manifest come from the same release
+        model_path = os.path.realpath(self.watch_path)
         file = os.path.join(model_path, "model.pkl")
-        self.model = joblib.load(file)
+        if is_shared(model_path):
+            # Arrays in arrays/*.npy, always memory-mapped and shared between processes
+            manifest = load_manifest(model_path, required=self.require_manifest, model_file=file)
+            if manifest is not None:
+                check_arrays(model_path, manifest.get("arrays", {}), checksums=self.require_manifest)
+            return model_path, load_shared(model_path, self.mmap_mode or "r"), manifest
+        if self.mmap_mode:
+            manifest = load_manifest(model_path, required=self.require_manifest, model_file=file)
+            return model_path, joblib.load(file, mmap_mode=self.mmap_mode), manifest
+        with open(file, "rb") as f:
+            data = f.read()
+        manifest = load_manifest(model_path, data, self.require_manifest)
+        return model_path, joblib.load(io.BytesIO(data)), manifest
+
+    def warm_up(self, rows: int = 64):
+        """
+        Runs the active model on a synthetic batch and on single rows, so the
+        first real prediction does not pay for lazy initialization (input
+        validation, thread pools, page faults of a memory-mapped model).
+        The predict histogram is left untouched.
+
+        :param rows: Rows of the synthetic batch (scaled copies of the HULK sample)
+        :return: Seconds spent
+        """
+        start = time.perf_counter()
+        X = np.array([HULK[feat] for feat in FEATURES], dtype=np.float64) * np.linspace(0, 2, rows)[:, None]
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)  # Suppress warnings from model
+            self.model.predict(X)
+            self.model.predict(X[:1])
+            if hasattr(self.model, "predict_proba"):
+                self.model.predict_proba(X[:1])
+        return time.perf_counter() - start
+
+    def validate(self, model):
+        """
+        Checks a candidate model on the canary set (or on a single zero row if
+        there is no canary file).
+
+        :param model: Fitted model to check
+        :raises ValueError: If the model predicts unknown labels or misses the accuracy threshold
+        """
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)  # Suppress warnings from model
+            if not os.path.exists(self.canary_path):
+                labels = labels_from_codes(model.predict(np.zeros((1, len(FEATURES)))))
+                if labels[0] == "UNKNOWN":
+                    raise ValueError("Model predicts an unknown label code")
+                return None
+            import pandas as pd  # Only needed on reload, kept off the startup path
+            canary = pd.read_csv(self.canary_path)
+            labels = labels_from_codes(model.predict(canary[FEATURES].to_numpy(dtype=np.float64)))
+        accuracy = float(np.mean(labels == canary["label"].to_numpy()))
+        if accuracy < self.min_canary_accuracy:
+            raise ValueError(f"Canary accuracy {accuracy:.3f} below {self.min_canary_accuracy}")
+        return accuracy
+
+    def _swap(self, model_path, model, manifest):
+        """
+        Replaces the active model; the old one is kept for rollback.
+        Returns the pause in microseconds.
+        """
+        start = time.perf_counter()
+        with self._swap_lock:
+            self.previous = (self.model_path, self.model, self.manifest)
+            self.model_path, self.model, self.manifest = model_path, model, manifest
+        pause = (time.perf_counter() - start) * 1e6
+        self.reload_stats["last_swap_pause_us"] = pause
+        self.reload_stats["max_swap_pause_us"] = max(self.reload_stats["max_swap_pause_us"], pause)
+        self.reload_stats["model_path"] = model_path
+        return pause
+
+    def reload(self):
+        """
+        Loads the model currently published at the watched path if it changed,
+        validates it and swaps it in. A model that fails is not retried until
+        it is published again.
+
+        :return: True if a new model was swapped in
+        """
+        try:
+            signature = self._signature()
+        except OSError:
+            return False  # Release being replaced, retry on the next poll
+        if signature == self.signature or signature in self._rejected:
+            return False
+
+        start = time.perf_counter()
+        try:
+            model_path, model, manifest = self._load()
+            accuracy = self.validate(model)
+        except Exception as e:
+            self._rejected.add(signature)
+            self.reload_stats["failed_reloads"] += 1
+            print(f"[ERROR] Model reload from {signature[0]} rejected, keeping {self.model_path}: {e}")
+            self._notify()
+            return False
+
+        pause = self._swap(model_path, model, manifest)
+        self.signature = signature
+        self.reload_stats["reloads"] += 1
+        self.reload_stats["last_reload_s"] = time.perf_counter() - start
+        canary = f", canary accuracy {accuracy:.3f}" if accuracy is not None else ""
+        print(f"[INFO] Model reloaded from {model_path} in {self.reload_stats['last_reload_s']:.3f}s "
+              f"(swap pause {pause:.1f} us{canary})")
+        self._notify()
+        return True
+
+    def rollback(self):
+        """
+        Restores the previous model, e.g. after the new one failed at prediction time.
+        The failed release is not loaded again until it is republished.
+        """
+        with self._swap_lock:
+            if self.previous is None:
+                return False
+            self._rejected.add(self.signature)
+            self.model_path, self.model, self.manifest = self.previous
+            self.previous = None
+        self.reload_stats["rollbacks"] += 1
+        self.reload_stats["model_path"] = self.model_path
+        print(f"[WARNING] Model rolled back to {self.model_path}")
+        self._notify()
+        return True
+
+    def _notify(self):
+        if self.on_reload is not None:
+            self.on_reload(dict(self.reload_stats))
+
+    def start_watching(self, interval=5):
+        """
+        Polls the model directory every `interval` seconds from a background
+        thread and reloads new releases, until stop_watching() is called.
+        """
+        def watch_loop():
+            while not self._stop_watch.wait(timeout=interval):
+                self.reload()
 
+        thread = threading.Thread(target=watch_loop, daemon=True)
+        thread.start()
+        return thread
+
+    def stop_watching(self):
+        """
+        Stop the background model watcher.
+        """
+        self._stop_watch.set()
+
+    def _model_call(self, method, X, model=None):
+        """
+        Runs `method` ('predict' or 'predict_proba') of the given model (the
+        active one by default); if a freshly swapped model fails, rolls back and
+        retries with the previous one.
+
+        :return: (result, model that produced it)
+        """
+        model = self.model if model is None else model
+        try:
+            return getattr(model, method)(X), model
+        except Exception:
+            if model is self.model and self.previous is not None and self.rollback():
+                return getattr(self.model, method)(X), self.model
+            raise
+
+    def _model_predict(self, X):
+        return self._model_call("predict", X)[0]
+
+    def _model_predict_proba(self, X):
+        """
+        :return: (class probabilities, model that produced them, for its classes_)
+        """
+        return self._model_call("predict_proba", X)
+
+    @timed(PREDICT_TIME)
     def predict(self, new_data_df) -> np.ndarray:
         """
         Predicts the label for the given network flow features.
@@ -30,68 +320,139 @@ class AttackDetector:
         :param new_data_df: A dictionary or DataFrame with the expected features
         :return: A string label corresponding to the predicted attack type
         """
-        # List of expected features (must match model training input)
-        selected_features = [
-            'Destination Port', 'Flow Duration', 'Total Fwd Packets', 'Total Backward Packets',
-            'Total Length of Fwd Packets', 'Total Length of Bwd Packets',
-            'Fwd Packet Length Max', 'Fwd Packet Length Min', 'Fwd Packet Length Mean', 'Fwd Packet Length Std',
-            'Bwd Packet Length Max', 'Bwd Packet Length Min', 'Bwd Packet Length Mean', 'Bwd Packet Length Std',
-            'Flow Bytes/s', 'Flow Packets/s', 'Fwd Packets/s', 'Bwd Packets/s',
-            'Min Packet Length', 'Max Packet Length', 'Packet Length Mean', 'Packet Length Std', 'Packet Length Variance',
-            'Flow IAT Mean', 'Flow IAT Std', 'Flow IAT Max', 'Flow IAT Min',
-            'Fwd IAT Total', 'Fwd IAT Mean', 'Fwd IAT Std', 'Fwd IAT Max', 'Fwd IAT Min',
-            'Bwd IAT Total', 'Bwd IAT Mean', 'Bwd IAT Std', 'Bwd IAT Max', 'Bwd IAT Min',
-            'FIN Flag Count', 'SYN Flag Count', 'RST Flag Count', 'PSH Flag Count', 'ACK Flag Count',
-            'Fwd PSH Flags', 'Bwd PSH Flags', 'Fwd URG Flags', 'Bwd URG Flags'
-        ]
-
-        # Convert ordered dictionary into a NumPy array in correct shape
-        ordered_features = list(new_data_df.keys())
-        X_test = np.array([new_data_df[feat] for feat in ordered_features]).reshape(1, -1)
-
-        # Map numerical prediction to a human-readable label
-        label_map = {
-            0: "BENIGN",
-            1: "HULK",
-            2: "SYNFLOOD",
-            3: "UDPFLOOD",
-            4: "POSTFLOOD"
-        }
+        # Convert dictionary into a NumPy array in model feature order
+        X_test = np.array([new_data_df[feat] for feat in FEATURES]).reshape(1, -1)
 
         try:
+            # Obvious flows are decided by the rule stage alone
+            if self.cascade is not None:
+                prediction = self.cascade.decide_one(X_test[0])
+                if prediction >= 0:
+                    return LABEL_MAP[prediction]
             with warnings.catch_warnings():
                 warnings.simplefilter("ignore", UserWarning)  # Suppress warnings from model
-                prediction = self.model.predict(X_test)[0]
-                label = label_map.get(prediction, "UNKNOWN")
+                prediction = self._model_predict(X_test)[0]
+                label = LABEL_MAP.get(prediction, "UNKNOWN")
                 return label
         finally:
-            print("Prediction completed")
+            if self.verbose:
+                print("Prediction completed")
+
+    @timed(PREDICT_TIME)
+    def predict_with_confidence(self, new_data_df):
+        """
+        Predicts the label of a flow together with the model's confidence.
+
+        :param new_data_df: A dictionary or DataFrame with the expected features
+        :return: (label, confidence), confidence being the predicted class
+                 probability (1.0 for rule decisions, None if the model has no
+                 predict_proba)
+        """
+        X_test = np.array([new_data_df[feat] for feat in FEATURES]).reshape(1, -1)
+        if self.cascade is not None:
+            code = self.cascade.decide_one(X_test[0])
+            if code >= 0:
+                return LABEL_MAP[code], 1.0
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)  # Suppress warnings from model
+            if not hasattr(self.model, "predict_proba"):
+                return LABEL_MAP.get(self._model_predict(X_test)[0], "UNKNOWN"), None
+            probabilities, model = self._model_predict_proba(X_test)
+            probabilities = probabilities[0]
+        best = int(np.argmax(probabilities))
+        return LABEL_MAP.get(model.classes_[best], "UNKNOWN"), float(probabilities[best])
+
+    def predict_batch(self, X, chunk_size: int = 4096) -> np.ndarray:
+        """
+        Predicts the labels of many flows with one model call per chunk.
+        The batch is scored by the model active when the call started; if a
+        freshly swapped model fails, it is rolled back and the remaining chunks
+        are scored by the previous one.
+
+        :param X: 2D array with one row per flow (columns in FEATURES order),
+                  or a DataFrame containing the FEATURES columns
+        :param chunk_size: Maximum rows per model call
+        :return: Array of string labels, one per row
+        """
+        if hasattr(X, "columns"):  # DataFrame, checked without importing pandas
+            X = X[FEATURES].to_numpy(dtype=np.float64)
+        X = np.asarray(X, dtype=np.float64)
+
+        if self.cascade is not None:
+            codes = self.cascade.decide(X)
+            pending = np.flatnonzero(codes < 0)
+        else:
+            codes = np.empty(len(X), dtype=np.int64)
+            pending = None
+        remaining = X if pending is None else X[pending]
+
+        predicted = np.empty(len(remaining), dtype=np.int64)
+        model = self.model
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)  # Suppress warnings from model
+            for start in range(0, len(remaining), chunk_size):
+                predicted[start:start + chunk_size], model = self._model_call(
+                    "predict", remaining[start:start + chunk_size], model)
+        if pending is None:
+            codes = predicted
+        else:
+            codes[pending] = predicted
+        return labels_from_codes(codes)
+
+
+def load_manifest(model_path: str, model_bytes: bytes = None, required: bool = False, model_file: str = None):
+    """
+    Reads and verifies the manifest of a model release.
+
+    :param model_path: Directory containing model.pkl and manifest.json
+    :param model_bytes: Contents of model.pkl, checked against the manifest checksum
+    :param required: Raise if the manifest is missing instead of warning
+    :param model_file: Path of model.pkl, hashed in chunks when model_bytes is not given
+    :return: The manifest dictionary, or None for a model without manifest
+    :raises ValueError: If the manifest does not match the model or this detector
+    """
+    manifest_file = os.path.join(model_path, "manifest.json")
+    if not os.path.exists(manifest_file):
+        if required:
+            raise ValueError(f"No manifest.json found in {model_path}")
+        print(f"[WARNING] No manifest.json in {model_path}; loading model.pkl unverified")
+        return None
+
+    with open(manifest_file, "r") as f:
+        manifest = json.load(f)
+
+    if model_bytes is not None:
+        checksum = hashlib.sha256(model_bytes).hexdigest()
+    else:
+        digest = hashlib.sha256()
+        with open(model_file, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        checksum = digest.hexdigest()
+    if checksum != manifest.get("model_sha256"):
+        raise ValueError(f"model.pkl in {model_path} does not match the manifest checksum")
+    if manifest.get("features") != FEATURES:
+        raise ValueError("Model feature order in the manifest does not match FEATURES")
+    label_map = {int(code): label for code, label in manifest.get("label_map", {}).items()}
+    if label_map != LABEL_MAP:
+        raise ValueError(f"Model label map {label_map} does not match LABEL_MAP")
+    return manifest
+
+
+def labels_from_codes(codes) -> np.ndarray:
+    """
+    Vectorized LABEL_MAP lookup; unknown codes map to "UNKNOWN".
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    lookup = np.array([LABEL_MAP.get(code, "UNKNOWN") for code in range(max(LABEL_MAP) + 1)] + ["UNKNOWN"])
+    return lookup[np.where((codes >= 0) & (codes <= max(LABEL_MAP)), codes, len(lookup) - 1)]
 
 
 # Example use case for debugging
 if __name__ == "__main__":
     detector = AttackDetector()
 
-    # Simulated input flow with all required features
-    HULK = {
-        'Destination Port': 8080, 'Flow Duration': 13.58, 'Total Fwd Packets': 2502,
-        'Total Backward Packets': 0, 'Total Length of Fwd Packets': 235897.0,
-        'Total Length of Bwd Packets': 0, 'Fwd Packet Length Max': 512.0,
-        'Fwd Packet Length Min': 66.0, 'Fwd Packet Length Mean': 94.28, 'Fwd Packet Length Std': 97.0,
-        'Bwd Packet Length Max': 0, 'Bwd Packet Length Min': 0, 'Bwd Packet Length Mean': 0,
-        'Bwd Packet Length Std': 0, 'Flow Bytes/s': 17365.47, 'Flow Packets/s': 184.18,
-        'Fwd Packets/s': 184.18, 'Bwd Packets/s': 0.0, 'Min Packet Length': 66.0,
-        'Max Packet Length': 512.0, 'Packet Length Mean': 94.28, 'Packet Length Std': 97.0,
-        'Packet Length Variance': 9409.67, 'Flow IAT Mean': 0.0054, 'Flow IAT Std': 0.2545,
-        'Flow IAT Max': 12.71, 'Flow IAT Min': 0.000001, 'Fwd IAT Total': 13.58,
-        'Fwd IAT Mean': 0.0054, 'Fwd IAT Std': 0.2545, 'Fwd IAT Max': 12.71,
-        'Fwd IAT Min': 0.000001, 'Bwd IAT Total': 0, 'Bwd IAT Mean': 0,
-        'Bwd IAT Std': 0, 'Bwd IAT Max': 0, 'Bwd IAT Min': 0,
-        'FIN Flag Count': 726, 'SYN Flag Count': 628, 'RST Flag Count': 26,
-        'PSH Flag Count': 171, 'ACK Flag Count': 1874, 'Fwd PSH Flags': 171,
-        'Bwd PSH Flags': 0, 'Fwd URG Flags': 0, 'Bwd URG Flags': 0
-    }
-
     # Run the prediction and print result
     prediction = detector.predict(HULK)
     print(f"Prediction: {prediction}")
@@ -0,0 +1,97 @@
+"""
+fastknn.py
+
+This module provides a low-latency K-Nearest Neighbours classifier for the detector.
+
+The standardization and PCA projection learned at training time are folded into
+a single float32 affine map, and the projected training set is indexed with a
+KD-tree (scipy.spatial.cKDTree). A query is one small matrix product plus a
+tree search in a few dimensions, instead of a brute-force search over the full
+SMOTE-expanded training set in 46 float64 dimensions, and avoids most of the
+per-call validation overhead of scikit-learn pipelines.
+
+The class follows the scikit-learn estimator API, so model/train.py can train,
+cross-validate and export it like any other model, and AttackDetector loads it
+from model.pkl without changes (this module must be importable, which it is
+from the DoSDetector directory).
+
+Usage:
+    model = ProjectedKNNClassifier(n_components=8).fit(X_train, y_train)
+    model.predict(X_test)
+"""
+
+import numpy as np
+from scipy.spatial import cKDTree
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.decomposition import PCA
+from sklearn.preprocessing import StandardScaler
+
+
+class ProjectedKNNClassifier(ClassifierMixin, BaseEstimator):
+    """
+    KNN on standardized, PCA-reduced float32 features, backed by a KD-tree.
+    """
+
+    def __init__(self, n_components=8, n_neighbors=5, leaf_size=16, dtype="float32"):
+        """
+        :param n_components: Dimensions kept by PCA
+        :param n_neighbors: Neighbours voting for each prediction
+        :param leaf_size: KD-tree leaf size
+        :param dtype: Precision of the projection and of the index
+        """
+        self.n_components = n_components
+        self.n_neighbors = n_neighbors
+        self.leaf_size = leaf_size
+        self.dtype = dtype
+
+    def fit(self, X, y):
+        """
+        Learns the projection and builds the index over the projected training set.
+        """
+        if hasattr(X, "columns"):
+            self.feature_names_in_ = np.asarray(X.columns, dtype=object)
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y)
+        self.n_features_in_ = X.shape[1]
+        self.classes_, y_codes = np.unique(y, return_inverse=True)
+
+        scaler = StandardScaler().fit(X)
+        pca = PCA(n_components=self.n_components, random_state=42).fit(scaler.transform(X))
+        # ((x - mean) / scale - pca_mean) @ components.T  ==  x @ W + b
+        self.projection_ = (pca.components_ / scaler.scale_).T.astype(self.dtype)
+        self.offset_ = (-(scaler.mean_ / scaler.scale_ + pca.mean_) @ pca.components_.T).astype(self.dtype)
+        self.explained_variance_ratio_ = pca.explained_variance_ratio_
+
+        self.tree_ = cKDTree(self.transform(X), leafsize=self.leaf_size, balanced_tree=False)
+        self.neighbor_codes_ = y_codes.astype(np.intp)
+        return self
+
+    def transform(self, X):
+        """
+        Projects flows into the reduced space.
+        """
+        return np.asarray(X, dtype=self.dtype) @ self.projection_ + self.offset_
+
+    def _votes(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        _, neighbors = self.tree_.query(self.transform(X), k=self.n_neighbors)
+        codes = self.neighbor_codes_[neighbors.reshape(len(X), -1)]
+        votes = np.zeros((len(X), len(self.classes_)), dtype=np.intp)
+        for column in codes.T:
+            votes[np.arange(len(X)), column] += 1
+        return votes
+
+    def predict_proba(self, X):
+        """
+        Fraction of the nearest neighbours of each class.
+        """
+        return self._votes(X) / self.n_neighbors
+
+    def predict(self, X):
+        """
+        Majority vote of the nearest neighbours; ties go to the lowest class,
+        as in KNeighborsClassifier.
+        """
+        return self.classes_[self._votes(X).argmax(axis=1)]
@@ -0,0 +1,147 @@
+"""
+flowrecords.py
+
+This module stores every scored flow as a fixed-schema binary row instead of a
+text line, so captures are cheap to write and can be loaded back without parsing.
+
+Each row holds the capture timestamp, the source IP, the predicted label code
+(see detection.LABEL_MAP, -1 if unknown) and the 46 flow features. Rows are
+written straight into a memory-mapped NumPy .npy segment; when a segment is full
+it is finalized and a new one is started.
+
+Main components:
+- FlowRecordWriter: appends rows and rotates segments
+- load_segments: loads finished segments as memory-mapped structured arrays
+- read_records: concatenates all segments of a directory into one array
+
+Segments are plain .npy files, so they can also be read without this module:
+    np.load("flows/flows-20250615-202705-0000.npy", mmap_mode="r")
+"""
+
+import atexit
+import glob
+import os
+import time
+import numpy as np
+from detection import FEATURES, LABEL_MAP
+
+# Fixed row layout: metadata followed by the features in model order
+RECORD_DTYPE = np.dtype(
+    [('timestamp', 'f8'), ('src', 'S39'), ('prediction', 'i1')] +
+    [(feature, 'f8') for feature in FEATURES]
+)
+
+LABEL_CODES = {label: code for code, label in LABEL_MAP.items()}
+
+
+class FlowRecordWriter:
+    """
+    Appends flow records to rotating, memory-mapped .npy segments.
+
+    The segment being written has a '.npy.part' suffix and a fixed capacity;
+    it is renamed (or trimmed, when closed early) to '.npy' once finished.
+    """
+
+    def __init__(self, directory='flows', segment_rows=65536, max_segments=None):
+        """
+        :param directory: Directory receiving the segments
+        :param segment_rows: Rows per segment before rotating
+        :param max_segments: Keep only the newest N finished segments (None keeps all)
+        """
+        self.directory = directory
+        self.segment_rows = segment_rows
+        self.max_segments = max_segments
+        self.segment = None
+        self.segment_path = None
+        self.count = 0
+        self.sequence = 0
+        os.makedirs(directory, exist_ok=True)
+        atexit.register(self.close)
+
+    def _open_segment(self):
+        name = f"flows-{time.strftime('%Y%m%d-%H%M%S')}-{self.sequence:04d}.npy"
+        self.sequence += 1
+        self.segment_path = os.path.join(self.directory, name)
+        self.segment = np.lib.format.open_memmap(
+            self.segment_path + '.part', mode='w+', dtype=RECORD_DTYPE, shape=(self.segment_rows,)
+        )
+        self.count = 0
+
+    def _finish_segment(self):
+        if self.segment is None:
+            return
+        part = self.segment_path + '.part'
+        if self.count == self.segment_rows:
+            self.segment.flush()
+            del self.segment
+            os.replace(part, self.segment_path)
+        else:
+            if self.count:
+                np.save(self.segment_path, self.segment[:self.count])
+            del self.segment
+            os.remove(part)
+        self.segment = None
+        self._prune()
+
+    def _prune(self):
+        if not self.max_segments:
+            return
+        segments = sorted(glob.glob(os.path.join(self.directory, 'flows-*.npy')))
+        for path in segments[:-self.max_segments]:
+            os.remove(path)
+
+    def append(self, timestamp, src, metrics, prediction):
+        """
+        Appends one scored flow.
+
+        :param timestamp: Capture time of the flow (seconds since the epoch)
+        :param src: Source IP address
+        :param metrics: Feature dictionary as returned by MetricsExtractor.get_metrics
+        :param prediction: Predicted label (e.g. "HULK")
+        """
+        if self.segment is None:
+            self._open_segment()
+        self.segment[self.count] = (timestamp, src.encode('ascii'), LABEL_CODES.get(prediction, -1)) + \
+            tuple(metrics[feature] for feature in FEATURES)
+        self.count += 1
+        if self.count == self.segment_rows:
+            self._finish_segment()
+
+    def close(self):
+        """
+        Finalizes the current segment, trimming unused rows.
+        """
+        self._finish_segment()
+
+
+def load_segments(directory='flows', mmap=True, include_partial=False):
+    """
+    Loads the segments of a directory in chronological order.
+
+    :param directory: Directory containing the segments
+    :param mmap: Memory-map the files instead of reading them into memory
+    :param include_partial: Also load segments still being written (or left by a
+        crash); their unwritten rows (timestamp 0) are skipped
+    :return: List of structured arrays with RECORD_DTYPE-compatible fields
+    """
+    mmap_mode = 'r' if mmap else None
+    paths = glob.glob(os.path.join(directory, 'flows-*.npy'))
+    if include_partial:
+        paths += glob.glob(os.path.join(directory, 'flows-*.npy.part'))
+    segments = []
+    for path in sorted(paths):
+        segment = np.load(path, mmap_mode=mmap_mode)
+        if path.endswith('.part'):
+            segment = segment[segment['timestamp'] > 0]
+        segments.append(segment)
+    return segments
+
+
+def read_records(directory='flows', include_partial=False):
+    """
+    Returns every record of a directory as a single structured array.
+    """
+    segments = load_segments(directory, include_partial=include_partial)
+    if not segments:
+        return np.empty(0, dtype=RECORD_DTYPE)
+    return np.concatenate(segments)
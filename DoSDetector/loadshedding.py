@@ -0,0 +1,100 @@
+"""
+loadshedding.py
+
+This module keeps the sensor's features meaningful when it cannot keep up with
+the traffic. Without it the kernel drops packets at random once the capture
+buffer is full: the windows that are still tracked miss packets, their counts
+are too low and their IATs too large, and floods are scored as benign.
+
+The OverloadController watches the processing lag (capture time to processing
+time of a packet) and the log queue depth. When either stays above its high
+mark, it switches to deterministic 1-in-N sampling per source: packet 0, N,
+2N... of every source are processed and the others are only counted. N is
+doubled while the sensor stays overloaded (up to max_rate), and halved again
+once the lag and the queue are back under their low marks. Changes are at
+least `hold` seconds apart, so each step has time to take effect.
+
+Sampled windows are rescaled by MetricsExtractor before they are scored (see
+rescale_metrics in metrics.py): packet, byte and flag counts and the rates are
+multiplied by the sampling factor of the window, and the inter-arrival times
+are divided by it. Lengths and their statistics are unbiased and kept.
+
+Floods from spoofed sources that send one packet each are not thinned: the
+first packet of every source is always processed.
+
+Main components:
+- OverloadController: rate control and the per-source sampling decision
+
+Usage:
+    python metrics.py --load-shedding --shed-lag-ms 250 --recover-lag-ms 50
+    python samplingaccuracy.py --rates 1,2,4,8,16     # accuracy under sampling
+"""
+
+# Sources tracked by the sampling counters before they are cleared
+MAX_TRACKED_SOURCES = 1_000_000
+
+
+class OverloadController:
+    """
+    Chooses the sampling rate from the processing lag and the queue depth and
+    decides which packets of each source are processed.
+    """
+
+    def __init__(self, lag_high=0.25, lag_low=0.05, queue_high=None, queue_low=None, max_rate=64, hold=1.0,
+                 rescale=True):
+        """
+        :param lag_high: Processing lag (seconds) above which the rate is doubled
+        :param lag_low: Processing lag below which the rate is halved
+        :param queue_high: Queue depth above which the rate is doubled (None: not watched)
+        :param queue_low: Queue depth below which the rate may be halved (default: queue_high / 4)
+        :param max_rate: Largest N of 1-in-N sampling
+        :param hold: Seconds between two rate changes
+        :param rescale: Rescale the features of sampled windows (disabled only to measure its effect)
+        """
+        self.lag_high = lag_high
+        self.lag_low = lag_low
+        self.queue_high = queue_high
+        self.queue_low = queue_high / 4 if queue_high and queue_low is None else queue_low
+        self.max_rate = max_rate
+        self.hold = hold
+        self.rescale = rescale
+        self.rate = 1
+        self.counts = {}  # src -> packets seen since sampling started
+        self.changed_at = None
+        self.changes = 0
+        self.sampled_out = 0
+
+    def update(self, lag, queue_depth, now):
+        """
+        Adjusts the sampling rate from the latest lag and queue depth.
+
+        :return: The new rate if it changed, else None
+        """
+        if self.changed_at is not None and now - self.changed_at < self.hold:
+            return None
+        queued = self.queue_high is not None and queue_depth > self.queue_high
+        drained = self.queue_high is None or queue_depth < self.queue_low
+        if (lag > self.lag_high or queued) and self.rate < self.max_rate:
+            self.rate = min(self.rate * 2, self.max_rate)
+        elif lag < self.lag_low and drained and self.rate > 1:
+            self.rate //= 2
+            if self.rate == 1:
+                self.counts.clear()
+        else:
+            return None
+        self.changed_at = now
+        self.changes += 1
+        return self.rate
+
+    def keep(self, src):
+        """
+        Tells whether the next packet of `src` is processed (every rate-th one is).
+        """
+        count = self.counts.get(src, 0)
+        if not count and len(self.counts) >= MAX_TRACKED_SOURCES:
+            self.counts.clear()
+        self.counts[src] = count + 1
+        if count % self.rate:
+            self.sampled_out += 1
+            return False
+        return True
@@ -5,14 +5,79 @@ This module provides a simple logging setup function for the application.
 It configures a logger to write INFO and higher level logs to a file named 'server.log',
 including timestamps and log levels in each log entry.
 
+Records are handed to a bounded in-memory queue and written by a background
+listener thread, so the packet capture thread never blocks on disk I/O. Messages
+are formatted lazily on the listener thread, log files are rotated by size, and
+a drop policy decides what happens when the queue is full.
+
 Usage:
     logger = setup_logger()
     logger.info("This is an info message")
+    logger.info("[%s] Metrics: %s", src, metrics)   # formatted on the listener thread
 """
 
+import atexit
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Policies applied when the log queue is full
+DROP_POLICIES = ('drop_new', 'drop_old', 'block')
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    QueueHandler with a bounded queue and a configurable drop policy.
 
-def setup_logger(filename='server.log', logger_name=__name__):
+    Records are queued as-is (message arguments included) and only formatted by
+    the listener thread, so arguments must not be mutated after logging.
+    """
+
+    def __init__(self, log_queue, drop_policy='drop_new'):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy '{drop_policy}', expected one of {DROP_POLICIES}")
+        super().__init__(log_queue)
+        self.drop_policy = drop_policy
+        self.dropped = 0
+        self.listener = None
+
+    def prepare(self, record):
+        """
+        Skips the eager formatting done by QueueHandler; the queue never leaves the process.
+        """
+        return record
+
+    def enqueue(self, record):
+        """
+        Queues a record, applying the drop policy if the queue is full.
+        """
+        if self.drop_policy == 'block':
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            if self.drop_policy == 'drop_old':
+                try:
+                    self.queue.get_nowait()
+                    self.queue.put_nowait(record)
+                except (queue.Empty, queue.Full):
+                    pass
+
+
+class DrainingQueueListener(QueueListener):
+    """
+    QueueListener that waits for room in a full queue when stopping, so pending
+    records are flushed at exit instead of failing.
+    """
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+def setup_logger(filename='server.log', logger_name=__name__, queue_size=10000,
+                 max_bytes=50 * 1024 * 1024, backup_count=5, drop_policy='drop_new'):
     """
     Configure and return a logger instance for the application.
 
@@ -22,6 +87,10 @@ def setup_logger(filename='server.log', logger_name=__name__):
     Args:
         filename (str): The file where logs will be saved.
         logger_name (str): The name of the logger to create/use.
+        queue_size (int): Maximum number of records waiting to be written.
+        max_bytes (int): Size at which the log file is rotated (0 disables rotation).
+        backup_count (int): Number of rotated files to keep.
+        drop_policy (str): 'drop_new', 'drop_old' or 'block' when the queue is full.
 
     Returns:
         logging.Logger: Configured logger instance.
@@ -31,12 +100,18 @@ def setup_logger(filename='server.log', logger_name=__name__):
 
     # Only configure the logger once to avoid duplicate handlers
     if not logger.hasHandlers():
-        # Define a file handler that logs to the specified file
-        handler = logging.FileHandler(filename)
+        # Define a rotating file handler, written to by the listener thread
+        file_handler = RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count)
 
         # Define log format: timestamp - log level - message
         formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        handler.setFormatter(formatter)
+        file_handler.setFormatter(formatter)
+
+        # The logger itself only pushes records to a bounded queue
+        handler = BoundedQueueHandler(queue.Queue(maxsize=queue_size), drop_policy=drop_policy)
+        handler.listener = DrainingQueueListener(handler.queue, file_handler, respect_handler_level=True)
+        handler.listener.start()
+        atexit.register(handler.listener.stop)
 
         # Add handler to the logger
         logger.addHandler(handler)
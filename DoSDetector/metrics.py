@@ -14,16 +14,40 @@ Main components:
 - KNN-based attack prediction (via AttackDetector)
 - Blacklist management and logging (via BlacklistManager)
 - Real-time flow segmentation with timeout
+- Per-stage latency histograms and gauges on a Prometheus /metrics endpoint
+  (via common/instrumentation.py)
+- Sampling profiler started on SIGUSR1, on /debug/profile (opt-in, loopback
+  only) or when the log queue or the processing lag crosses a threshold
+  (via common/profiler.py)
+- Startup time breakdown, with the model warmed up before the capture opens
+  (via startup.py)
+- Warm restart from periodic snapshots of the flow and warning state
+  (via checkpoint.py)
+- 1-in-N per-source sampling with rescaled features while the sensor is
+  overloaded (via loadshedding.py)
+
+Only the Scapy modules in use are imported (scapy.all loads every layer and
+takes most of a second); pandas and netifaces stay off the startup path.
 """
 
-from scapy.all import sniff, IP, TCP, UDP
-import pandas as pd
-import numpy as np
 import time
-import netifaces
+from startup import StartupTimer, import_profile
+STARTUP = StartupTimer()  # Started before the heavy imports below
+
+from scapy.config import conf
+from scapy.layers.inet import IP, TCP, UDP
+from scapy.sendrecv import sniff
+import scapy.arch  # Sets conf.L2listen / conf.L2socket for this platform
+import numpy as np
 from detection import AttackDetector
-from blacklist import BlacklistManager
-from logger import setup_logger
+from blacklist import BlacklistManager, MAX_WARNINGS
+from flowrecords import FlowRecordWriter
+from slidingwindow import SlidingWindowEngine
+from checkpoint import StateCheckpointer
+from loadshedding import OverloadController
+from logger import setup_logger, BoundedQueueHandler
+from common.instrumentation import stage, counter, gauge, start_metrics_server  # On the path via startup.py
+from common.profiler import SamplingProfiler, install_signal
 import subprocess
 import re
 import sys
@@ -32,23 +56,211 @@ import signal
 import threading
 import socket
 import platform
+import struct
+import json
+import os
+
+STARTUP.mark("imports")
+
+# Features that grow with the window length; provisional (early) windows are
+# scaled to a 1-second window before being scored
+EXTENSIVE_FEATURES = (
+    'Total Fwd Packets', 'Total Backward Packets', 'Total Length of Fwd Packets', 'Total Length of Bwd Packets',
+    'Fwd IAT Total', 'Bwd IAT Total', 'FIN Flag Count', 'SYN Flag Count', 'RST Flag Count', 'PSH Flag Count',
+    'ACK Flag Count', 'Fwd PSH Flags', 'Bwd PSH Flags', 'Fwd URG Flags', 'Bwd URG Flags'
+)
+
+# Features of a sampled window scaled up to the full traffic (counts and rates)
+# and down (inter-arrival times); IAT totals span the same time and are kept
+SAMPLED_COUNT_FEATURES = tuple(feature for feature in EXTENSIVE_FEATURES if 'IAT' not in feature) + (
+    'Flow Bytes/s', 'Flow Packets/s', 'Fwd Packets/s', 'Bwd Packets/s'
+)
+SAMPLED_IAT_FEATURES = tuple(f"{direction} IAT {stat}" for direction in ('Flow', 'Fwd', 'Bwd')
+                             for stat in ('Mean', 'Std', 'Max', 'Min'))
+
+# Fewest packets a provisional window needs before it is scored
+EARLY_MIN_PACKETS = 10
+
+# Linux packet socket statistics (struct tpacket_stats: packets, drops)
+SOL_PACKET = 263
+PACKET_STATISTICS = 6
 
+# Per-packet stages (parse, flow_update) are timed on one packet in
+# STAGE_SAMPLE_EVERY: a timed packet costs ~1.5 us, too much for every packet
+STAGE_SAMPLE_EVERY = 16
+
+PARSE_TIME = stage("parse")
+FLOW_UPDATE_TIME = stage("flow_update")
+FEATURES_TIME = stage("features")
 
 
 class MetricsExtractor:  
-    def __init__(self, iface=None):
+    def __init__(self, iface=None, blacklist_url=None, sync_interval=30, verbose=True, log_options=None,
+                 records_dir=None, model_options=None, streaming=None, sliding=None, checkpoint=None,
+                 load_shedding=None, metrics_port=None, profile_options=None, startup_timer=None):
         """
         Initializes the metrics extractor with a given network interface.
         Sets up logger, detector, and blacklist manager.
+
+        :param blacklist_url: Server to bootstrap the blacklist from, then sync every sync_interval seconds
+        :param verbose: Per-flow console output (log files are kept either way)
+        :param log_options: setup_logger options (queue_size, max_bytes, drop_policy)
+        :param records_dir: Store scored flows as binary flow records (see flowrecords.py)
+        :param model_options: load_model options (watch_interval, cascade_path, warm_up, mmap)
+        :param streaming: Early decision options (packets, interval, confidence); None: off
+        :param sliding: SlidingWindowEngine options (bins, bin_width); None: tumbling windows
+        :param checkpoint: StateCheckpointer options (path, interval, warning_ttl); None: off
+        :param load_shedding: OverloadController options ({} for the defaults); None: off
+        :param metrics_port: Serve /metrics on this port (see common/instrumentation.py)
+        :param profile_options: start_profiler options
+        :param startup_timer: Records the startup phases (default: a new StartupTimer)
         """  
+        self.startup = startup_timer if startup_timer is not None else StartupTimer()
+        self.startup.mark("setup")
         self.iface = iface
         self._stop_sniff = False
-        self.logger = setup_logger('packets.log')
-        self.detector = AttackDetector()
+        self.verbose = verbose
+        self.logger = setup_logger('packets.log', **(log_options or {}))
+        self.log_handler = next((h for h in self.logger.handlers if isinstance(h, BoundedQueueHandler)), None)
+        self.startup.mark("logger")
+        self.load_model(**(model_options or {}))
         self.flows = {}
-        self.blacklist_manager = BlacklistManager(logger='blacklist.log')
+        self.configure_streaming(**(streaming or {}))
+        self.sliding = SlidingWindowEngine(**sliding) if sliding else None
+        self.records = FlowRecordWriter(records_dir) if records_dir else None
+        # Sliding windows overlap: every packet is part of `bins` verdicts
+        self.blacklist_manager = BlacklistManager(logger='blacklist.log',
+                                                  max_warnings=MAX_WARNINGS * (self.sliding.bins if self.sliding else 1))
+        self.local_ip = self.get_local_ip()
+        if blacklist_url:
+            self.blacklist_manager.start_sync(blacklist_url, interval=sync_interval)
+        self.packets_seen = 0
+        self.processing_lag = 0.0
+        self.capture_socket = None
+        self.kernel_packets = 0
+        self.kernel_drops = 0
+        self.kernel_stats_available = False
+        self._kernel_lock = threading.Lock()
+        self.checkpointer = StateCheckpointer(self, **checkpoint) if checkpoint else None
+        self.shedder = OverloadController(**load_shedding) if load_shedding is not None else None
+        self.register_gauges()
+        self.start_profiler(**(profile_options or {}))
+        routes = {'/debug/profile': self.profile_route} if self.profile_endpoint else None
+        self.metrics_server = start_metrics_server(metrics_port, routes=routes) if metrics_port else None
+        self.startup.mark("services")
+
+    def load_model(self, watch_interval=5, cascade_path=None, warm_up=True, mmap=False):
+        """
+        Loads the detector. With warm_up, the model scores a synthetic batch
+        before the capture opens; with mmap, its arrays are memory-mapped. The
+        model directory is polled every watch_interval seconds and new models
+        are swapped in without stopping the capture (0 disables it). Flows
+        matched by the rules at cascade_path skip the model (see cascade.py).
+        """
+        self.detector = AttackDetector(verbose=self.verbose, on_reload=self.log_model_reload,
+                                       cascade_path=cascade_path, mmap_mode='r' if mmap else None)
+        self.startup.mark("model")
+        if warm_up:
+            self.detector.warm_up()
+            self.startup.mark("warm-up")
+        if watch_interval:
+            self.detector.start_watching(watch_interval)
+
+    def configure_streaming(self, packets=None, interval=None, confidence=0.8):
+        """
+        Streaming mode: open windows are scored every `packets` packets and/or
+        `interval` seconds, and an attack predicted with at least `confidence`
+        is acted on before the window closes (one verdict per window).
+        """
+        self.early_packets = packets
+        self.early_interval = interval
+        self.early_confidence = confidence
 
-        
+    def start_profiler(self, output_dir='profiles', seconds=10, queue_threshold=None, lag_threshold=None,
+                       endpoint=False):
+        """
+        Creates the sampling profiler and, if thresholds are given, watches
+        the log queue depth and the processing lag to start captures.
+        """
+        self.profiler = SamplingProfiler(output_dir)
+        self.profile_seconds = seconds
+        self.profile_endpoint = endpoint
+        checks = {}
+        if queue_threshold and self.log_handler is not None:
+            checks['queue'] = lambda: self.log_handler.queue.qsize() >= queue_threshold
+        if lag_threshold:
+            checks['lag'] = lambda: self.processing_lag >= lag_threshold
+        if checks:
+            self.profiler.watch(checks, seconds=seconds)
+
+    def profile_route(self, query):
+        """
+        /debug/profile?seconds=N on the metrics port (loopback clients only): starts a profile capture.
+        """
+        status, response = self.profiler.handle_request(query, self.profile_seconds)
+        return status, 'application/json', json.dumps(response).encode('utf-8')
+
+    def register_gauges(self):
+        """
+        Registers the gauges and counters read at scrape time: packets, open
+        flows, log queue, blacklist size, kernel capture counters and model reloads.
+        """
+        counter("dbdos_packets_total", "Packets handed to the sensor by the capture",
+                function=lambda: self.packets_seen)
+        gauge("dbdos_active_flows", "Sources with an open window",
+              function=lambda: len(self.sliding.sources) if self.sliding is not None else len(self.flows))
+        gauge("dbdos_processing_lag_seconds", "Delay between the capture of a packet and its processing",
+              function=lambda: self.processing_lag)
+        gauge("dbdos_blacklisted_hosts", "Hosts blacklisted by this detector",
+              function=lambda: sum(1 for state in list(self.blacklist_manager.blacklist_local.values())
+                                   if state["blacklisted"]))
+        if self.log_handler is not None:
+            gauge("dbdos_log_queue_depth", "Log records waiting to be written", function=self.log_handler.queue.qsize)
+            counter("dbdos_log_dropped_total", "Log records dropped because the queue was full",
+                    function=lambda: self.log_handler.dropped)
+        counter("dbdos_kernel_packets_total", "Packets seen by the capture socket (kernel count)",
+                function=lambda: (self.read_kernel_stats() or (None,))[0])
+        counter("dbdos_kernel_drops_total", "Packets dropped by the kernel before the sensor read them",
+                function=lambda: (self.read_kernel_stats() or (None, None))[1])
+        for key in ("reloads", "failed_reloads", "rollbacks"):
+            counter(f"dbdos_model_{key}_total", f"Model {key.replace('_', ' ')} since start",
+                    function=lambda key=key: self.detector.reload_stats[key])
+        if self.shedder is not None:
+            gauge("dbdos_sampling_rate", "N of the 1-in-N per-source packet sampling (1: every packet is processed)",
+                  function=lambda: self.shedder.rate)
+            counter("dbdos_sampled_out_packets_total", "Packets skipped by the load shedding sampler",
+                    function=lambda: self.shedder.sampled_out)
+        if self.detector.cascade is not None:
+            gauge("dbdos_cascade_skip_ratio", "Fraction of flows decided without the model",
+                  function=self.detector.cascade.skip_rate)
+
+    def read_kernel_stats(self):
+        """
+        Reads PACKET_STATISTICS from the capture socket and accumulates it (the
+        kernel resets the counters on every read).
+
+        :return: (packets, drops) since the extractor started, or None if the
+                 capture socket never provided them (not Linux, or no capture yet)
+        """
+        sock = getattr(self.capture_socket, 'ins', None)
+        with self._kernel_lock:
+            if sock is not None:
+                try:
+                    packets, drops = struct.unpack("II", sock.getsockopt(SOL_PACKET, PACKET_STATISTICS, 8))
+                    self.kernel_packets += packets
+                    self.kernel_drops += drops
+                    self.kernel_stats_available = True
+                except (OSError, AttributeError, struct.error):
+                    pass
+            if not self.kernel_stats_available:
+                return None
+            return self.kernel_packets, self.kernel_drops
+
+    def log_model_reload(self, stats):
+        """
+        Logs the outcome of a model reload with its duration and swap pause.
+        """
+        self.logger.info("Model reload: %s", stats)
 
     def reset_metrics_for_ip(self, ip):
         """
@@ -72,21 +284,42 @@ class MetricsExtractor:
             'fwd_times': [],
             'bwd_times': [],
             'fwd_iat_list': [],
-            'bwd_iat_list': []
+            'bwd_iat_list': [],
+            'checkpoint_packets': 0,
+            'checkpoint_time': None,
+            'skipped_packets': 0,
+            'early_decided': 0
         }
 
-    def process_packet(self, pkt):
+    def process_packet(self, pkt, timed=False):
         """
         Processes a single packet and updates flow metrics.
-        If the flow duration exceeds 1s, it computes the metrics and returns them.
+        If the flow duration exceeds 1s, it computes the metrics and returns them
+        as (src, metrics, None). In streaming mode, a confident early attack
+        verdict on a checkpoint returns (src, metrics, prediction) instead, and
+        the rest of that window returns nothing.
+        With timed=True, the flow update is recorded in the flow_update histogram.
         """
         if IP not in pkt:
             return None
 
+        start = time.perf_counter_ns() if timed else 0
         pkt_time = pkt.time
         src = pkt[IP].src
         dst = pkt[IP].dst
 
+        if self.sliding is not None:
+            # Window features are merged inside add(), so they count as flow_update here
+            dport = pkt[TCP].dport if TCP in pkt else pkt[UDP].dport if UDP in pkt else 0
+            flags = int(pkt[TCP].flags) if TCP in pkt else 0
+            metrics = self.sliding.add(src, pkt_time, dport, len(pkt), flags)
+            if metrics and self.shedder is not None and self.shedder.rate > 1 and self.shedder.rescale:
+                # Bins do not count skipped packets: the current rate is applied to the whole window
+                self.rescale_metrics(metrics, self.shedder.rate)
+            if timed:
+                FLOW_UPDATE_TIME.record(time.perf_counter_ns() - start)
+            return (src, metrics, None) if metrics else None
+
         if src not in self.flows:
             self.reset_metrics_for_ip(src)
 
@@ -132,15 +365,73 @@ class MetricsExtractor:
                 flow['bwd_iat_list'].append(pkt_time - flow['bwd_times'][-1])
             flow['bwd_times'].append(pkt_time)
 
+        if timed:
+            FLOW_UPDATE_TIME.record(time.perf_counter_ns() - start)
+
         # If flow is long enough, return computed metrics
         flow_duration = flow['end_time'] - flow['start_time']
         if flow_duration >= 1:
+            if flow['early_decided']:
+                # Already acted on by its early verdict: one warning per window
+                self.reset_metrics_for_ip(src)
+                return None
             metrics = self.get_metrics(flow)
             self.reset_metrics_for_ip(src)
-            return src, metrics
+            return src, metrics, None
+
+        if (self.early_packets or self.early_interval) and not flow['early_decided'] \
+                and self.early_checkpoint(flow, pkt_time):
+            metrics = self.project_metrics(self.get_metrics(flow), flow_duration)
+            prediction, confidence = self.detector.predict_with_confidence(metrics)
+            if prediction not in ("BENIGN", "UNKNOWN") and confidence is not None \
+                    and confidence >= self.early_confidence:
+                flow['early_decided'] = 1
+                return src, metrics, prediction
 
         return None
 
+    def early_checkpoint(self, flow, pkt_time):
+        """
+        Tells whether an open window has reached a checkpoint (early_packets
+        packets or early_interval seconds since the previous one).
+        """
+        if flow['checkpoint_time'] is None:
+            flow['checkpoint_time'] = flow['start_time']
+        packets = len(flow['fwd_times']) + len(flow['bwd_times'])
+        if packets < EARLY_MIN_PACKETS or flow['end_time'] <= flow['start_time']:
+            return False
+        if (self.early_packets and packets - flow['checkpoint_packets'] >= self.early_packets) or \
+                (self.early_interval and pkt_time - flow['checkpoint_time'] >= self.early_interval):
+            flow['checkpoint_packets'] = packets
+            flow['checkpoint_time'] = pkt_time
+            return True
+        return False
+
+    @staticmethod
+    def project_metrics(metrics, duration):
+        """
+        Scales the features of a partial window to a 1-second window, so they
+        are comparable with the windows the model was trained on.
+        """
+        scale = 1 / float(duration)
+        for feature in EXTENSIVE_FEATURES:
+            metrics[feature] *= scale
+        metrics['Flow Duration'] = 1.0
+        return metrics
+
+    @staticmethod
+    def rescale_metrics(metrics, scale):
+        """
+        Scales the features of a window in which one packet in `scale` was
+        processed back to the full traffic: counts and rates grow by `scale`
+        and inter-arrival times shrink by it.
+        """
+        for feature in SAMPLED_COUNT_FEATURES:
+            metrics[feature] *= scale
+        for feature in SAMPLED_IAT_FEATURES:
+            metrics[feature] /= scale
+        return metrics
+
     @staticmethod
     def safe_stats(data):
         """
@@ -161,6 +452,7 @@ class MetricsExtractor:
         """
         Computes all relevant metrics for a completed flow window.
         """
+        start = time.perf_counter_ns()
         flow_duration = flow['end_time'] - flow['start_time']
 
         fwd_stats = self.safe_stats(flow['fwd_packet_lengths'])
@@ -182,7 +474,7 @@ class MetricsExtractor:
 
         destination_port = max(set(flow['dest_ports']), key=flow['dest_ports'].count) if flow['dest_ports'] else 0
 
-        return {
+        metrics = {
             'Destination Port': destination_port,
             'Flow Duration': flow_duration,
             'Total Fwd Packets': fwd_stats['count'],
@@ -230,6 +522,11 @@ class MetricsExtractor:
             'Fwd URG Flags': flow['fwd_urg_flags'],
             'Bwd URG Flags': flow['bwd_urg_flags']
         }
+        if flow['skipped_packets'] and self.shedder is not None and self.shedder.rescale:
+            kept = fwd_stats['count'] + bwd_stats['count']
+            self.rescale_metrics(metrics, (kept + flow['skipped_packets']) / kept)
+        FEATURES_TIME.record(time.perf_counter_ns() - start)
+        return metrics
 
     def get_local_ip(self):
         """
@@ -249,28 +546,96 @@ class MetricsExtractor:
         """
         Callback function triggered by Scapy for every captured packet.
         Applies detection logic and blacklist enforcement if needed.
+        Packets from the local host or from already blacklisted sources are
+        dropped before any flow accounting.
         """
+        self.packets_seen += 1
+        timed = not self.packets_seen % STAGE_SAMPLE_EVERY
+        start = time.perf_counter_ns() if timed else 0
         self.last_packet_time = time.time()
-        result = self.process_packet(pkt)
-        local_ip = self.get_local_ip()
+        if self.checkpointer is not None:
+            self.checkpointer.maybe_snapshot(self.last_packet_time)
+        if IP not in pkt:
+            return
+        src = pkt[IP].src
+        if timed:
+            self.processing_lag = self.last_packet_time - float(pkt.time)
+            if self.shedder is not None:
+                self.adjust_sampling()
+        if self.shedder is not None and self.shedder.rate > 1 and self.shed(src):
+            if timed:
+                PARSE_TIME.record(time.perf_counter_ns() - start)
+            return
+        if src == self.local_ip or self.blacklist_manager.is_blacklisted(src):
+            self.flows.pop(src, None)
+            if self.sliding is not None:
+                self.sliding.reset(src)
+            if timed:
+                PARSE_TIME.record(time.perf_counter_ns() - start)
+            return
+        if timed:
+            PARSE_TIME.record(time.perf_counter_ns() - start)
+        result = self.process_packet(pkt, timed)
         if result:
-            src, metrics = result
-            if self.blacklist_manager.is_blacklisted(src) or src==local_ip:     
-                return
-            print(f"[{src}] Flow metrics extracted: {metrics['Destination Port']}, Duration: {metrics['Flow Duration']:.2f}s")
-            self.logger.info(f"[{src}] Metrics: {metrics}")
-            prediction = self.detector.predict(metrics)
-            print(f"Prediction: {prediction}")
+            src, metrics, prediction = result
+            if prediction is not None:
+                # Early verdict on a provisional window; kept out of the dataset logs
+                if self.verbose:
+                    print(f"[{src}] Early decision: {prediction}")
+                self.logger.info("[%s] Early decision %s: %s", src, prediction, metrics)
+            else:
+                if self.verbose:
+                    print(f"[{src}] Flow metrics extracted: {metrics['Destination Port']}, Duration: {metrics['Flow Duration']:.2f}s")
+                prediction = self.detector.predict(metrics)
+                if self.records is not None:
+                    self.records.append(pkt.time, src, metrics, prediction)
+                else:
+                    self.logger.info("[%s] Metrics: %s", src, metrics)
+            if self.verbose:
+                print(f"Prediction: {prediction}")
             if prediction != "BENIGN":
                 warnings, blacklisted = self.blacklist_manager.add_warning(src, "DoS " + prediction)
-                print(f"[{prediction}] Warning {warnings} for {src}")
-                print(f"Current blacklist state for {src}: {self.blacklist_manager.blacklist_local[src]}")
-                if blacklisted:
-                    print(f"[{src}] Blacklisted after {warnings} warnings.")
+                if self.verbose:
+                    print(f"[{prediction}] Warning {warnings} for {src}")
+                    print(f"Current blacklist state for {src}: {self.blacklist_manager.blacklist_local[src]}")
+                    if blacklisted:
+                        print(f"[{src}] Blacklisted after {warnings} warnings.")
             else:
-                print(f"[{src}] Flow is benign, resetting warnings.")
+                if self.verbose:
+                    print(f"[{src}] Flow is benign, resetting warnings.")
                 self.blacklist_manager.reset_warnings(src)
 
+    def adjust_sampling(self):
+        """
+        Lets the overload controller adapt the sampling rate to the current
+        processing lag and log queue depth, and reports rate changes.
+        """
+        depth = self.log_handler.queue.qsize() if self.log_handler is not None else 0
+        rate = self.shedder.update(self.processing_lag, depth, self.last_packet_time)
+        if rate is None:
+            return
+        load = f"lag {self.processing_lag * 1000:.0f} ms, log queue {depth}"
+        if rate > 1:
+            print(f"[WARNING] Sensor overloaded ({load}): processing 1 packet in {rate} per source")
+            self.logger.warning("Load shedding: sampling 1 packet in %d per source (%s)", rate, load)
+        else:
+            print(f"[INFO] Load back to normal ({load}): processing every packet")
+            self.logger.info("Load shedding: sampling stopped (%s)", load)
+
+    def shed(self, src):
+        """
+        Applies the 1-in-N sampling of an overloaded sensor. A skipped packet is
+        only counted in its source's window, so the window can be rescaled.
+
+        :return: True if the packet is skipped
+        """
+        if self.shedder.keep(src):
+            return False
+        flow = self.flows.get(src)
+        if flow is not None:
+            flow['skipped_packets'] += 1
+        return True
+
     def start_sniffing(self, count=0, idle_timeout=5, timeout=300):
         """
         Starts the packet sniffer using Scapy.
@@ -281,14 +646,40 @@ class MetricsExtractor:
         self.last_packet_time = None
         self._stop_sniff = False
         self.idle_timeout = idle_timeout
+        if self.checkpointer is not None and not self.checkpointer.restored:
+            self.checkpointer.restore()
+            self.startup.mark("restore")
+
+        # Open the capture socket ourselves so its kernel drop counters can be read.
+        # Loopback delivers every packet twice (outgoing and incoming); an L2socket
+        # skips the outgoing copy, so flows are not counted double
+        listen = conf.L2socket if self.iface == conf.loopback_name else conf.L2listen
+        try:
+            self.capture_socket = listen(iface=self.iface)
+            source = {'opened_socket': self.capture_socket}
+        except Exception as e:
+            print(f"[WARNING] Could not open the capture socket directly ({e}); kernel drops will not be reported")
+            self.capture_socket = None
+            source = {'iface': self.iface}
+        if not self.startup.reported:
+            self.startup.mark("capture")
+            self.startup.report(self.logger)
 
-        sniff(
-            iface=self.iface,
-            prn=self.packet_callback,
-            stop_filter=self.stop_filter,
-            count=count,
-            timeout=timeout
-        )
+        try:
+            sniff(
+                prn=self.packet_callback,
+                stop_filter=self.stop_filter,
+                count=count,
+                timeout=timeout,
+                **source
+            )
+        finally:
+            if self.capture_socket is not None:
+                self.read_kernel_stats()
+                self.capture_socket.close()
+                self.capture_socket = None
+            if self.checkpointer is not None:
+                self.checkpointer.close()
         print("Sniffing finished.")
 
     def stop_filter(self, pkt):
@@ -316,6 +707,8 @@ class MetricsExtractor:
         Clears all stored flow metrics.
         """
         self.flows.clear()
+        if self.sliding is not None:
+            self.sliding.reset()
     
     
 
@@ -327,12 +720,56 @@ if __name__ == "__main__":
         sys.exit(0)
 
     # Parse IP and port from CLI or prompt
-    interfaces = netifaces.interfaces()
     interfaz = None
     
     parser = argparse.ArgumentParser(description="DoS Detector Metrics Extractor and Traffic Monitorer")
     parser.add_argument('--ip', type=str, help="Server's IP or partial IP")
     parser.add_argument('--port', type=str, help="Server's Port")
+    parser.add_argument('--blacklist-url', type=str, help="Server URL to sync the blacklist from, e.g. http://192.168.1.1:8080")
+    parser.add_argument('--sync-interval', type=int, default=30, help="Seconds between blacklist syncs (default: 30)")
+    parser.add_argument('--records', type=str, help="Directory for binary flow records (replaces 'Metrics:' log lines)")
+    parser.add_argument('--model-watch', type=int, default=5, help="Seconds between checks for a new model (default: 5, 0 disables)")
+    parser.add_argument('--cascade', nargs='?', const='models/cascade.json', metavar='RULES',
+                        help="Decide obvious flows with calibrated rules before the model (default: models/cascade.json)")
+    parser.add_argument('--early-packets', type=int, help="Score open windows every N packets (streaming mode)")
+    parser.add_argument('--early-ms', type=int, help="Score open windows every N milliseconds (streaming mode)")
+    parser.add_argument('--early-confidence', type=float, default=0.8,
+                        help="Minimum model confidence to act on an early verdict (default: 0.8)")
+    parser.add_argument('--sliding-bins', type=int, help="Use a sliding window of N time bins instead of 1 s tumbling windows")
+    parser.add_argument('--bin-ms', type=int, default=100, help="Sliding window bin width in milliseconds (default: 100)")
+    parser.add_argument('--metrics-port', type=int, help="Serve Prometheus metrics on this port (e.g. 9100)")
+    parser.add_argument('--profile-dir', type=str, default='profiles', help="Where profiles are saved (default: profiles)")
+    parser.add_argument('--profile-seconds', type=float, default=10, help="Length of a profile capture (default: 10)")
+    parser.add_argument('--profile-endpoint', action='store_true',
+                        help="Serve /debug/profile on the metrics port to loopback clients")
+    parser.add_argument('--profile-on-queue', type=int, metavar='RECORDS',
+                        help="Profile automatically when this many log records are waiting")
+    parser.add_argument('--profile-on-lag', type=int, metavar='MS',
+                        help="Profile automatically when packets are processed this late")
+    parser.add_argument('--no-warmup', action='store_true', help="Do not warm the model up before the capture opens")
+    parser.add_argument('--mmap-model', action='store_true',
+                        help="Memory-map the model arrays instead of reading them (shared by detector processes)")
+    parser.add_argument('--import-profile', action='store_true',
+                        help="Print the slowest imports of this module (-X importtime) and exit")
+    parser.add_argument('--checkpoint', type=str, metavar='PATH',
+                        help="Snapshot open windows and warnings to PATH and restore them on startup")
+    parser.add_argument('--checkpoint-interval', type=float, default=10, help="Seconds between snapshots (default: 10)")
+    parser.add_argument('--warning-ttl', type=float, default=3600,
+                        help="Drop restored warnings older than this many seconds (default: 3600)")
+    parser.add_argument('--load-shedding', action='store_true',
+                        help="Sample 1 in N packets per source while the sensor is overloaded")
+    parser.add_argument('--shed-lag-ms', type=int, default=250,
+                        help="Processing lag that increases the sampling (default: 250)")
+    parser.add_argument('--recover-lag-ms', type=int, default=50,
+                        help="Processing lag under which the sampling is reduced again (default: 50)")
+    parser.add_argument('--shed-queue', type=int, metavar='RECORDS',
+                        help="Log queue depth that also increases the sampling")
+    parser.add_argument('--max-sampling', type=int, default=64, help="Largest N of 1-in-N sampling (default: 64)")
+    parser.add_argument('--quiet', action='store_true', help="Disable per-flow console output (production mode)")
+    parser.add_argument('--log-queue-size', type=int, default=10000, help="Maximum log records waiting to be written (default: 10000)")
+    parser.add_argument('--log-max-bytes', type=int, default=50 * 1024 * 1024, help="Rotate log files at this size (default: 50 MB)")
+    parser.add_argument('--log-drop-policy', choices=['drop_new', 'drop_old', 'block'], default='drop_new',
+                        help="What to do when the log queue is full (default: drop_new)")
     args = parser.parse_args()
 
     # If the user provides 'help' as an argument, show usage and exit
@@ -340,6 +777,14 @@ if __name__ == "__main__":
         parser.print_help()
         sys.exit(0)
 
+    if args.import_profile:
+        total, imports = import_profile('metrics', cwd=os.path.dirname(os.path.abspath(__file__)))
+        print(f"[INFO] import metrics: {total:.3f}s in a fresh interpreter")
+        print(f"{'cumulative':>12}{'self':>10}  package")
+        for cumulative, own, name in imports:
+            print(f"{cumulative:>11.3f}s{own:>9.3f}s  {name}")
+        sys.exit(0)
+
     if args.ip:
         src = args.ip
     else:
@@ -367,7 +812,8 @@ if __name__ == "__main__":
 
     print(f"[INFO] Detected OS: {system_name}")
 
-    for interface in interfaces:
+    import netifaces  # Only needed to pick the interface
+    for interface in netifaces.interfaces():
         try:
             ip_address = netifaces.ifaddresses(interface)[netifaces.AF_INET][0]['addr']
             if ip_address.startswith(src):
@@ -384,6 +830,47 @@ if __name__ == "__main__":
         raise RuntimeError(f"No se encontró una interfaz con IP '{src}'")
 
     # Launch the extractor and bind Ctrl+C handler
-    extractor = MetricsExtractor(iface=interfaz)
+    log_options = {
+        'queue_size': args.log_queue_size,
+        'max_bytes': args.log_max_bytes,
+        'drop_policy': args.log_drop_policy
+    }
+    profile_options = {
+        'output_dir': args.profile_dir,
+        'seconds': args.profile_seconds,
+        'queue_threshold': args.profile_on_queue,
+        'lag_threshold': args.profile_on_lag / 1000 if args.profile_on_lag else None,
+        'endpoint': args.profile_endpoint
+    }
+    load_shedding = {
+        'lag_high': args.shed_lag_ms / 1000,
+        'lag_low': args.recover_lag_ms / 1000,
+        'queue_high': args.shed_queue,
+        'max_rate': args.max_sampling
+    } if args.load_shedding else None
+    model_options = {
+        'watch_interval': args.model_watch,
+        'cascade_path': args.cascade,
+        'warm_up': not args.no_warmup,
+        'mmap': args.mmap_model
+    }
+    streaming = {
+        'packets': args.early_packets,
+        'interval': args.early_ms / 1000 if args.early_ms else None,
+        'confidence': args.early_confidence
+    }
+    sliding = {'bins': args.sliding_bins, 'bin_width': args.bin_ms / 1000} if args.sliding_bins else None
+    checkpoint = {
+        'path': args.checkpoint,
+        'interval': args.checkpoint_interval,
+        'warning_ttl': args.warning_ttl
+    } if args.checkpoint else None
+    extractor = MetricsExtractor(iface=interfaz, blacklist_url=args.blacklist_url, sync_interval=args.sync_interval,
+                                 verbose=not args.quiet, log_options=log_options, records_dir=args.records,
+                                 model_options=model_options, streaming=streaming, sliding=sliding,
+                                 checkpoint=checkpoint, load_shedding=load_shedding, metrics_port=args.metrics_port,
+                                 profile_options=profile_options, startup_timer=STARTUP)
     signal.signal(signal.SIGINT, signal_handler)
+    if install_signal(extractor.profiler, args.profile_seconds):
+        print(f"[INFO] Send SIGUSR1 (kill -USR1 {os.getpid()}) to profile for {args.profile_seconds:g}s")
     extractor.start_sniffing(timeout=900)
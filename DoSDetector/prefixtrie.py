@@ -0,0 +1,229 @@
+"""
+prefixtrie.py
+
+This module keeps hierarchical warning counters for source addresses so that
+attacks spread across a subnet can be blocked as a single CIDR entry instead of
+one blacklist entry (and one blockchain transaction) per host.
+
+Counters are stored in a level-compressed prefix trie:
+- IPv4: /16 -> /24 -> /32
+- IPv6: /64 -> /128
+
+Every warning is added to the host and to each enclosing prefix. A prefix is
+blocked when enough of its children are blocked. The narrowest prefix above the
+hosts (/24, /64) is also blocked when enough hosts have warnings and their
+aggregated count reaches the prefix threshold, which catches floods where every
+source stays below the per-host limit.
+
+Blocked networks whose length is not a tracked level (a /20, or anything wider
+than /16) are kept exact, grouped by prefix length, and checked by containment
+at match time. They are never widened to the enclosing level.
+
+Usage:
+    trie = PrefixTrie(max_children=4, max_warnings=12)
+    trie.add_warning("10.0.0.7")
+    trie.match("10.0.0.7")   # -> "10.0.0.0/24" once the /24 is blocked
+"""
+
+import ipaddress
+
+# Prefix lengths tracked per address family, from the widest to the host entry
+IPV4_LEVELS = (16, 24, 32)
+IPV6_LEVELS = (64, 128)
+
+
+class PrefixTrie:
+    """
+    Prefix trie with per-node warning counters and blocked flags.
+    """
+
+    def __init__(self, max_children=4, max_warnings=12, ipv4_levels=IPV4_LEVELS, ipv6_levels=IPV6_LEVELS):
+        """
+        Initialize an empty trie.
+
+        :param max_children: Blocked (or warned) children needed to block a prefix
+        :param max_warnings: Aggregated host warnings needed to block the narrowest prefix
+        :param ipv4_levels: Ascending IPv4 prefix lengths, ending at 32
+        :param ipv6_levels: Ascending IPv6 prefix lengths, ending at 128
+        """
+        self.max_children = max_children
+        self.max_warnings = max_warnings
+        self.levels = {4: tuple(ipv4_levels), 6: tuple(ipv6_levels)}
+        self.roots = {4: {}, 6: {}}
+        self.networks = {4: {}, 6: {}}  # Blocked non-level networks: prefix length -> set of network keys
+
+    @staticmethod
+    def _new_node(prefix, hosts=False):
+        return {
+            'prefix': prefix,
+            'hosts': hosts,     # Children are host entries
+            'warnings': 0,
+            'warned': set(),    # Child keys with at least one warning
+            'flagged': set(),   # Child keys that are blocked
+            'blocked': False,
+            'children': {}
+        }
+
+    def _path(self, address, create=False):
+        """
+        Returns the (key, node) pairs from the widest prefix down to the host entry.
+        Stops early (returning a shorter path) if a node is missing and create is False.
+        """
+        addr = ipaddress.ip_address(address) if isinstance(address, str) else address
+        value = int(addr)
+        bits = addr.max_prefixlen
+        children = self.roots[addr.version]
+        levels = self.levels[addr.version]
+        path = []
+        for depth, length in enumerate(levels):
+            key = value >> (bits - length)
+            node = children.get(key)
+            if node is None:
+                if not create:
+                    break
+                network = type(addr)(key << (bits - length))
+                node = self._new_node(f"{network}/{length}", hosts=depth == len(levels) - 2)
+                children[key] = node
+            path.append((key, node))
+            children = node['children']
+        return path
+
+    def _propagate(self, path, index):
+        """
+        Re-evaluates the prefixes above path[index] after a change.
+        Returns the list of prefixes that became blocked.
+        """
+        newly_blocked = []
+        for i in range(index - 1, -1, -1):
+            child_key, child = path[i + 1]
+            key, node = path[i]
+            if child['blocked']:
+                node['flagged'].add(child_key)
+            if node['blocked']:
+                break
+            spread = node['hosts'] and len(node['warned'] | node['flagged']) >= self.max_children \
+                and node['warnings'] >= self.max_warnings
+            if len(node['flagged']) >= self.max_children or spread:
+                node['blocked'] = True
+                newly_blocked.append(node['prefix'])
+            elif not child['blocked']:
+                break
+        return newly_blocked
+
+    def add_warning(self, address, count=1):
+        """
+        Adds warnings to the host and all enclosing prefixes.
+
+        :return: List of prefixes (CIDR strings) blocked as a result
+        """
+        path = self._path(address, create=True)
+        for i, (key, node) in enumerate(path):
+            node['warnings'] += count
+            if i > 0:
+                path[i - 1][1]['warned'].add(key)
+        return self._propagate(path, len(path) - 1)
+
+    def flag(self, address):
+        """
+        Marks the host entry as blocked and re-evaluates its enclosing prefixes.
+
+        :return: List of enclosing prefixes (CIDR strings) blocked as a result
+        """
+        path = self._path(address, create=True)
+        path[-1][1]['blocked'] = True
+        return self._propagate(path, len(path) - 1)
+
+    def reset(self, address):
+        """
+        Clears the warnings and blocked flag of a host entry.
+        Blocks already placed on enclosing prefixes are kept.
+        """
+        path = self._path(address)
+        if len(path) < len(self.levels[ipaddress.ip_address(address).version]):
+            return
+        key, leaf = path[-1]
+        warnings = leaf['warnings']
+        leaf['warnings'] = 0
+        leaf['blocked'] = False
+        for i in range(len(path) - 2, -1, -1):
+            node = path[i][1]
+            node['warnings'] -= warnings
+            child_key, child = path[i + 1]
+            if child['warnings'] == 0:
+                node['warned'].discard(child_key)
+            if not child['blocked']:
+                node['flagged'].discard(child_key)
+
+    @staticmethod
+    def _network_key(network):
+        return int(network.network_address) >> (network.max_prefixlen - network.prefixlen)
+
+    def block(self, prefix, propagate=True):
+        """
+        Marks an address or CIDR block as blocked. Prefix lengths that are not
+        tracked levels are stored as exact networks.
+
+        :param propagate: Count the block towards the enclosing prefixes. Entries
+                          learned from the shared blacklist use False, so only
+                          local evidence escalates to a subnet.
+        :return: List of enclosing prefixes (CIDR strings) blocked as a result
+        """
+        network = ipaddress.ip_network(prefix, strict=False)
+        levels = self.levels[network.version]
+        if network.prefixlen not in levels:
+            self.networks[network.version].setdefault(network.prefixlen, set()).add(self._network_key(network))
+            return []
+        path = self._path(network.network_address, create=True)[:levels.index(network.prefixlen) + 1]
+        path[-1][1]['blocked'] = True
+        return self._propagate(path, len(path) - 1) if propagate else []
+
+    def unblock(self, prefix):
+        """
+        Removes the blocked flag from an address or CIDR block.
+        """
+        network = ipaddress.ip_network(prefix, strict=False)
+        levels = self.levels[network.version]
+        if network.prefixlen not in levels:
+            keys = self.networks[network.version].get(network.prefixlen)
+            if keys is not None:
+                keys.discard(self._network_key(network))
+                if not keys:
+                    del self.networks[network.version][network.prefixlen]
+            return
+        depth = levels.index(network.prefixlen) + 1
+        path = self._path(network.network_address)[:depth]
+        if len(path) < depth:
+            return
+        path[-1][1]['blocked'] = False
+        if len(path) > 1:
+            path[-2][1]['flagged'].discard(path[-1][0])
+
+    def match(self, address):
+        """
+        Longest-prefix match against the blocked entries.
+
+        :return: The most specific blocked prefix containing the address, or None
+        """
+        addr = ipaddress.ip_address(address)
+        matched, matched_length = None, -1
+        levels = self.levels[addr.version]
+        for depth, (_, node) in enumerate(self._path(addr)):
+            if node['blocked']:
+                matched, matched_length = node['prefix'], levels[depth]
+        value, bits = int(addr), addr.max_prefixlen
+        for length, keys in self.networks[addr.version].items():
+            key = value >> (bits - length)
+            if length > matched_length and key in keys:
+                matched, matched_length = f"{type(addr)(key << (bits - length))}/{length}", length
+        return matched
+
+    def get_warnings(self, prefix):
+        """
+        Returns the aggregated warning count of an address or tracked prefix.
+        """
+        network = ipaddress.ip_network(prefix, strict=False)
+        levels = [length for length in self.levels[network.version] if length <= network.prefixlen]
+        path = self._path(network.network_address)[:len(levels)]
+        if not levels or len(path) < len(levels):
+            return 0
+        return path[-1][1]['warnings']
@@ -1,25 +1,33 @@
 """
 Used For data processing
+
+Evaluates the deployed model on the parsed and labelled dataset in two modes:
+- batch: the feature matrix is loaded once and scored with chunked
+  AttackDetector.predict_batch calls, optionally across a process pool
+- online: every row is scored on its own with AttackDetector.predict, as the
+  sensor does, after a warm-up, to measure the per-row latency distribution
+
+Usage:
+    python rendimiento.py
+    python rendimiento.py --mode batch --chunk-size 8192 --workers 4
+    python rendimiento.py --mode online --warmup 200 --online-rows 1000
 """
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
-from detection import AttackDetector
+from detection import AttackDetector, FEATURES
 from sklearn.metrics import classification_report, confusion_matrix
 import matplotlib.pyplot as plt
 import seaborn as sns
-import time
 
 # ---------- CONFIGURATION ----------
 CSV_DATASET_PATH = "dataset.csv"     # Parsed and labeled dataset
+LATENCY_PATH = "latency_values.csv"  # Online per-row latencies (used by data/graph.py)
+PERFORMANCE_PATH = "performance_report.csv"
+REPORT_PATH = "evaluation_report.csv"
 
-# ---------- LOAD DETECTION MODEL ----------
-print("[INFO] Loading detection model...")
-model = AttackDetector()
-
-# ---------- LOAD DATASET ----------
-print("[INFO] Loading parsed dataset...")
-df = pd.read_csv(CSV_DATASET_PATH)
-
-# ---------- CLEAN LABELS ----------
 label_map = {
     "BENIGN": 0,
     "HULK": 1,
@@ -27,46 +35,162 @@ label_map = {
     "UDPFLOOD": 3,
     "POSTFLOOD": 4
 }
-df["label"] = df["label"].str.upper().str.strip()
-df["label"] = df["label"].replace({"BENIGNO": "BENIGN"})
-df["Label"] = df["label"].map(label_map)
-
-# ---------- PREDICTIONS WITH LATENCY ----------
-print("[INFO] Running predictions with latency measurement...")
-def predict_with_latency(row):
-    features = row.drop(["label", "Label"]).to_dict()
+
+# Model loaded once per pool worker
+_worker_model = None
+
+
+def _init_worker():
+    global _worker_model
+    _worker_model = AttackDetector(verbose=False)
+
+
+def _predict_chunk(X):
+    return _worker_model.predict_batch(X)
+
+
+def latency_summary(mode, latencies_ms, rows, elapsed_s):
+    """
+    Summarizes a latency sample (ms) and the throughput of a run.
+    """
+    latencies_ms = np.asarray(latencies_ms)
+    return {
+        "Mode": mode,
+        "Rows": rows,
+        "Elapsed (s)": elapsed_s,
+        "Throughput (rows/s)": rows / elapsed_s if elapsed_s > 0 else float("inf"),
+        "Latency mean (ms)": float(np.mean(latencies_ms)),
+        "Latency p50 (ms)": float(np.percentile(latencies_ms, 50)),
+        "Latency p95 (ms)": float(np.percentile(latencies_ms, 95)),
+        "Latency p99 (ms)": float(np.percentile(latencies_ms, 99)),
+        "Latency max (ms)": float(np.max(latencies_ms))
+    }
+
+
+def run_batch(model, X, chunk_size, workers):
+    """
+    Scores the whole matrix in chunks; returns predicted labels and a summary
+    where latency is the amortized time per row of each chunk.
+    """
+    chunks = [X[start:start + chunk_size] for start in range(0, len(X), chunk_size)]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            # Warm every worker before timing
+            list(pool.map(_predict_chunk, [X[:1]] * workers))
+            start = time.perf_counter()
+            results = list(pool.map(_predict_chunk, chunks))
+            elapsed = time.perf_counter() - start
+        chunk_latencies = [elapsed / len(chunks)] * len(chunks)
+    else:
+        model.predict_batch(X[:chunk_size])  # Warm-up
+        results, chunk_latencies = [], []
+        start = time.perf_counter()
+        for chunk in chunks:
+            t0 = time.perf_counter()
+            results.append(model.predict_batch(chunk, chunk_size=chunk_size))
+            chunk_latencies.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - start
+
+    per_row_ms = [latency * 1000 / len(chunk) for latency, chunk in zip(chunk_latencies, chunks)]
+    return np.concatenate(results), latency_summary("batch", per_row_ms, len(X), elapsed)
+
+
+def run_online(model, rows, warmup):
+    """
+    Scores rows one at a time through AttackDetector.predict, after `warmup`
+    untimed calls; returns per-row latencies (ms) and a summary.
+    """
+    for features in rows[:warmup]:
+        model.predict(features)
+    latencies = np.empty(len(rows))
     start = time.perf_counter()
-    prediction = model.predict(features)
-    end = time.perf_counter()
-    latency_ms = (end - start) * 1000
-    return label_map.get(prediction, -1), latency_ms
-
-results = df.apply(lambda row: pd.Series(predict_with_latency(row), index=["Predicted", "Latency_ms"]), axis=1)
-df = pd.concat([df, results], axis=1)
-
-# ---------- CLASSIFICATION REPORT ----------
-print("[INFO] Generating classification report...")
-report = classification_report(df["Label"], df["Predicted"], target_names=label_map.keys(), output_dict=True)
-report_df = pd.DataFrame(report).transpose()
-print(report_df)
-
-# ---------- LATENCY STATISTICS ----------
-print("[INFO] Latency statistics (ms):")
-print(df["Latency_ms"].describe())
-df["Latency_ms"].to_csv("latency_values.csv", index=False)
-
-# ---------- CONFUSION MATRIX ----------
-conf_matrix = confusion_matrix(df["Label"], df["Predicted"])
-plt.figure(figsize=(8, 6))
-sns.heatmap(conf_matrix, annot=True, fmt="d", cmap="Blues",
-            xticklabels=label_map.keys(), yticklabels=label_map.keys())
-plt.xlabel("Predicted")
-plt.ylabel("True Label")
-plt.title("Confusion Matrix")
-plt.tight_layout()
-plt.savefig("confusion_matrix.png")
-plt.show()
-
-# ---------- SAVE REPORT ----------
-report_df.to_csv("evaluation_report.csv")
-print("[INFO] Classification report saved as 'evaluation_report.csv'")
+    for i, features in enumerate(rows):
+        t0 = time.perf_counter()
+        model.predict(features)
+        latencies[i] = (time.perf_counter() - t0) * 1000
+    elapsed = time.perf_counter() - start
+    return latencies, latency_summary("online", latencies, len(rows), elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate accuracy, throughput and latency of the deployed model.")
+    parser.add_argument("--dataset", default=CSV_DATASET_PATH, help="Labelled dataset (default: dataset.csv)")
+    parser.add_argument("--mode", choices=["batch", "online", "both"], default="both", help="Evaluation mode")
+    parser.add_argument("--chunk-size", type=int, default=4096, help="Rows per predict_batch call")
+    parser.add_argument("--workers", type=int, default=1, help="Processes for batch scoring")
+    parser.add_argument("--warmup", type=int, default=100, help="Untimed online predictions before measuring")
+    parser.add_argument("--online-rows", type=int, help="Rows sampled for online latency (default: all)")
+    parser.add_argument("--no-plot", action="store_true", help="Save the confusion matrix without showing it")
+    args = parser.parse_args()
+
+    # ---------- LOAD DETECTION MODEL ----------
+    print("[INFO] Loading detection model...")
+    model = AttackDetector(verbose=False)
+
+    # ---------- LOAD DATASET ----------
+    print("[INFO] Loading parsed dataset...")
+    df = pd.read_csv(args.dataset)
+
+    # ---------- CLEAN LABELS ----------
+    df["label"] = df["label"].str.upper().str.strip()
+    df["label"] = df["label"].replace({"BENIGNO": "BENIGN"})
+    df["Label"] = df["label"].map(label_map)
+    X = df[FEATURES].to_numpy(dtype=np.float64)
+
+    summaries = []
+
+    # ---------- BATCH PREDICTIONS ----------
+    predicted = None
+    if args.mode in ("batch", "both"):
+        print(f"[INFO] Running batch predictions (chunk size {args.chunk_size}, {args.workers} worker(s))...")
+        labels, summary = run_batch(model, X, args.chunk_size, args.workers)
+        predicted = pd.Series(labels).map(label_map).fillna(-1).astype(int).to_numpy()
+        summaries.append(summary)
+
+    # ---------- ONLINE PREDICTIONS WITH LATENCY ----------
+    if args.mode in ("online", "both"):
+        print("[INFO] Running online predictions with latency measurement...")
+        sample = df if args.online_rows is None else df.sample(n=min(args.online_rows, len(df)), random_state=42)
+        rows = sample[FEATURES].to_dict(orient="records")
+        latencies, summary = run_online(model, rows, args.warmup)
+        summaries.append(summary)
+        pd.DataFrame({"Latency_ms": latencies}).to_csv(LATENCY_PATH, index=False)
+
+    if predicted is None:
+        predicted = pd.Series(model.predict_batch(X)).map(label_map).fillna(-1).astype(int).to_numpy()
+
+    # ---------- THROUGHPUT AND LATENCY ----------
+    performance_df = pd.DataFrame(summaries)
+    print("[INFO] Throughput and latency:")
+    print(performance_df.round(4).to_string(index=False))
+    performance_df.to_csv(PERFORMANCE_PATH, index=False)
+
+    # ---------- CLASSIFICATION REPORT ----------
+    print("[INFO] Generating classification report...")
+    df["Predicted"] = predicted
+    report = classification_report(df["Label"], df["Predicted"], labels=list(label_map.values()),
+                                   target_names=label_map.keys(), output_dict=True, zero_division=0)
+    report_df = pd.DataFrame(report).transpose()
+    print(report_df)
+
+    # ---------- CONFUSION MATRIX ----------
+    conf_matrix = confusion_matrix(df["Label"], df["Predicted"], labels=list(label_map.values()))
+    plt.figure(figsize=(8, 6))
+    sns.heatmap(conf_matrix, annot=True, fmt="d", cmap="Blues",
+                xticklabels=label_map.keys(), yticklabels=label_map.keys())
+    plt.xlabel("Predicted")
+    plt.ylabel("True Label")
+    plt.title("Confusion Matrix")
+    plt.tight_layout()
+    plt.savefig("confusion_matrix.png")
+    if not args.no_plot:
+        plt.show()
+
+    # ---------- SAVE REPORT ----------
+    report_df.to_csv(REPORT_PATH)
+    print(f"[INFO] Classification report saved as '{REPORT_PATH}'")
+    print(f"[INFO] Throughput and latency saved as '{PERFORMANCE_PATH}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+samplingaccuracy.py
+
+Measures how well the detector classifies traffic thinned by the load shedding
+sampler (see loadshedding.py). Traffic of every class is replayed through
+MetricsExtractor in capture time, as in timetodetect.py, with a fixed 1-in-N
+per-source sampling rate, with and without the rescaling of sampled windows.
+Every window verdict is compared with the class of the traffic.
+
+For every class, rate and rescaling mode the report gives:
+- the packets processed and the windows scored
+- accuracy: windows labelled with the class of the traffic
+- attack verdicts: windows labelled as any attack (for BENIGN traffic, the
+  false positive rate)
+
+Usage:
+    python samplingaccuracy.py                                      # synthetic, 5 s per class
+    python samplingaccuracy.py --rates 1,2,4,8,16,32
+    python samplingaccuracy.py --pcap hulk=captures/hulk.pcap --pcap benign=captures/benign.pcap
+"""
+
+import argparse
+import pandas as pd
+from scapy.all import IP
+from metrics import MetricsExtractor
+from timetodetect import load_streams
+
+REPORT_PATH = "sampling_accuracy.csv"
+
+
+def replay_sampled(extractor, packets, label):
+    """
+    Feeds packets through the sampler, the extractor and the detector.
+
+    Returns:
+        dict: packets processed, windows, accuracy and attack verdict rate
+    """
+    extractor.reset_metrics()
+    extractor.shedder.counts.clear()
+    processed = windows = correct = attacks = 0
+
+    for pkt in packets:
+        if IP in pkt and extractor.shedder.rate > 1 and extractor.shed(pkt[IP].src):
+            continue
+        processed += 1
+        result = extractor.process_packet(pkt)
+        if not result:
+            continue
+        _, metrics, prediction = result
+        if prediction is None:
+            prediction = extractor.detector.predict(metrics)
+        windows += 1
+        correct += prediction == label
+        attacks += prediction != "BENIGN"
+
+    return {
+        "Packets": len(packets),
+        "Processed": processed,
+        "Windows": windows,
+        "Accuracy": correct / windows if windows else None,
+        "Attack verdicts": attacks / windows if windows else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure detection accuracy under 1-in-N packet sampling.")
+    parser.add_argument("--pcap", action="append", default=[], metavar="LABEL=PATH",
+                        help="Replay a capture of one class (repeatable); default: synthetic traffic")
+    parser.add_argument("--dataset", default="../model/DBDoS2025.csv", help="Labelled flows used to synthesize traffic")
+    parser.add_argument("--seconds", type=float, default=5, help="Seconds of synthetic traffic per class")
+    parser.add_argument("--rates", default="1,2,4,8,16", help="Comma-separated sampling rates N (default: 1,2,4,8,16)")
+    parser.add_argument("--cascade", nargs="?", const="models/cascade.json", help="Use the rule cascade")
+    args = parser.parse_args()
+
+    streams = load_streams(args.pcap, args.dataset, args.seconds)
+    extractor = MetricsExtractor(verbose=False, model_options={'watch_interval': 0, 'cascade_path': args.cascade},
+                                 load_shedding={})
+    rates = [int(rate) for rate in args.rates.split(",")]
+
+    rows = []
+    for label, packets in streams.items():
+        for rate in rates:
+            for rescale in ((True, False) if rate > 1 else (True,)):
+                extractor.shedder.rate, extractor.shedder.rescale = rate, rescale
+                print(f"[INFO] Replaying {len(packets)} {label} packets (1 in {rate}"
+                      f"{', rescaled' if rescale and rate > 1 else ', raw' if rate > 1 else ''})...")
+                rows.append(dict({"Class": label, "Rate": rate, "Rescaled": rescale},
+                                 **replay_sampled(extractor, packets, label)))
+
+    report = pd.DataFrame(rows)
+    print(report.round(3).to_string(index=False))
+    summary = report.pivot_table(index="Rate", columns="Rescaled", values="Accuracy", aggfunc="mean")
+    print("\nMean accuracy over classes (columns: rescaled):")
+    print(summary.round(3).to_string())
+    report.to_csv(REPORT_PATH, index=False)
+    print(f"[INFO] Report saved as '{REPORT_PATH}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""
+sharedmodel.py
+
+This module stores a model so that several detector processes share one copy
+of it in memory.
+
+model.pkl normally holds every array of the model, so each process that loads
+it gets its own copy: hundreds of MB for a forest or a KNN trained on the
+SMOTE-expanded dataset. Here the large arrays are written to uncompressed
+.npy files next to a small model.pkl, and loaded with np.load(mmap_mode='r').
+Every process maps the same files, so the pages sit once in the page cache,
+and loading only reads the small pickle.
+
+scikit-learn trees copy their node tables into private memory when they are
+unpickled, so DecisionTree, RandomForest and ExtraTrees classifiers are first
+converted to a FlatTreeEnsemble: the node tables of all trees concatenated in
+plain arrays, traversed with NumPy. Its predictions match the original model.
+KNN training matrices (KNeighborsClassifier, ProjectedKNNClassifier) are kept
+by their estimators as they are, so they are shared without conversion.
+
+Release layout (written by model/deploy.py):
+    model.pkl         pickle with references to the arrays
+    arrays/<n>.npy    arrays of at least ARRAY_MIN_BYTES
+    manifest.json     lists every array with its size and SHA-256
+
+Main components:
+- FlatTreeEnsemble: tree ensemble stored as flat node arrays
+- dump / load: write and read the layout above
+- load_release: load a published model, shared or self-contained
+- memory_report: load the model in N worker processes and report their memory
+
+Usage:
+    python sharedmodel.py models/ownmodel --workers 4     # RSS/PSS per worker, read vs memory-mapped
+"""
+
+import argparse
+import hashlib
+import os
+import pickle
+import time
+import numpy as np
+
+ARRAY_DIR = "arrays"
+# Smaller arrays stay inside model.pkl
+ARRAY_MIN_BYTES = 64 * 1024
+
+
+class FlatTreeEnsemble:
+    """
+    Decision trees stored as flat node arrays. A forest predicts the mean of
+    the class probabilities of its trees, like scikit-learn.
+    """
+
+    def __init__(self, classes, roots, left, right, feature, threshold, value, max_depth):
+        """
+        :param classes: Class labels, in the column order of value
+        :param roots: Index of the root node of every tree
+        :param left: Left child of every node (-1 for leaves), indices into the flat arrays
+        :param right: Right child of every node (-1 for leaves)
+        :param feature: Feature tested by every node
+        :param threshold: Rows with feature <= threshold go left
+        :param value: Class probabilities of every node
+        :param max_depth: Depth of the deepest tree
+        """
+        self.classes_ = classes
+        self.roots = roots
+        self.left = left
+        self.right = right
+        self.feature = feature
+        self.threshold = threshold
+        self.value = value
+        self.max_depth = max_depth
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """
+        Converts a fitted DecisionTreeClassifier, RandomForestClassifier or
+        ExtraTreesClassifier.
+        """
+        trees = [model.tree_] if hasattr(model, "tree_") else [estimator.tree_ for estimator in model.estimators_]
+        roots, left, right, feature, threshold, value = [], [], [], [], [], []
+        offset = 0
+        for tree in trees:
+            roots.append(offset)
+            is_leaf = tree.children_left < 0
+            left.append(np.where(is_leaf, -1, tree.children_left + offset))
+            right.append(np.where(is_leaf, -1, tree.children_right + offset))
+            feature.append(tree.feature)
+            threshold.append(tree.threshold)
+            # Counts (or fractions, depending on the version) -> probabilities
+            counts = tree.value[:, 0, :]
+            totals = counts.sum(axis=1, keepdims=True)
+            value.append(np.divide(counts, totals, out=np.zeros_like(counts), where=totals > 0))
+            offset += tree.node_count
+        return cls(np.asarray(model.classes_), np.asarray(roots, dtype=np.intp),
+                   np.concatenate(left).astype(np.intp), np.concatenate(right).astype(np.intp),
+                   np.concatenate(feature).astype(np.intp), np.concatenate(threshold),
+                   np.concatenate(value), max(tree.max_depth for tree in trees))
+
+    def predict_proba(self, X):
+        """
+        Mean class probabilities of the leaves reached in every tree.
+        """
+        # Trees compare float32 features with float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        rows = np.arange(len(X))[:, None]
+        nodes = np.repeat(self.roots[None, :], len(X), axis=0)
+        for _ in range(self.max_depth):
+            left = self.left[nodes]
+            internal = left >= 0
+            if not internal.any():
+                break
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(internal, np.where(go_left, left, self.right[nodes]), nodes)
+        return self.value[nodes].mean(axis=1)
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def flatten(model):
+    """
+    Returns a FlatTreeEnsemble for supported tree models, or the model unchanged.
+    """
+    name = type(model).__name__
+    if name in ("DecisionTreeClassifier", "ExtraTreeClassifier", "RandomForestClassifier", "ExtraTreesClassifier"):
+        return FlatTreeEnsemble.from_sklearn(model)
+    return model
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class _ArrayPickler(pickle.Pickler):
+    """
+    Writes large arrays to .npy files and pickles a reference to them instead.
+    """
+
+    def __init__(self, file, directory, min_bytes):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.directory = directory
+        self.min_bytes = min_bytes
+        self.arrays = []
+
+    def persistent_id(self, obj):
+        if type(obj) is not np.ndarray or obj.dtype.hasobject or obj.nbytes < self.min_bytes:
+            return None
+        name = f"{len(self.arrays)}.npy"
+        path = os.path.join(self.directory, ARRAY_DIR, name)
+        with open(path, "wb") as f:
+            np.save(f, obj, allow_pickle=False)
+            f.flush()
+            os.fsync(f.fileno())
+        self.arrays.append(name)
+        return ("npy", name)
+
+
+class _ArrayUnpickler(pickle.Unpickler):
+    def __init__(self, file, directory, mmap_mode):
+        super().__init__(file)
+        self.directory = directory
+        self.mmap_mode = mmap_mode
+
+    def persistent_load(self, pid):
+        kind, name = pid
+        if kind != "npy":
+            raise pickle.UnpicklingError(f"Unknown array reference {pid}")
+        # Plain ndarray view of the mapping (estimators may check the exact type)
+        return np.asarray(np.load(os.path.join(self.directory, ARRAY_DIR, name), mmap_mode=self.mmap_mode,
+                                  allow_pickle=False))
+
+
+def dump(model, directory, min_bytes=ARRAY_MIN_BYTES):
+    """
+    Writes model.pkl and arrays/*.npy into `directory`. Tree models are flattened first.
+
+    :return: {array name: {"bytes": ..., "sha256": ...}} for the manifest
+    """
+    os.makedirs(os.path.join(directory, ARRAY_DIR), exist_ok=True)
+    with open(os.path.join(directory, "model.pkl"), "wb") as f:
+        pickler = _ArrayPickler(f, directory, min_bytes)
+        pickler.dump(flatten(model))
+        f.flush()
+        os.fsync(f.fileno())
+    arrays = {}
+    for name in pickler.arrays:
+        path = os.path.join(directory, ARRAY_DIR, name)
+        arrays[name] = {"bytes": os.path.getsize(path), "sha256": _sha256(path)}
+    return arrays
+
+
+def is_shared(directory):
+    """
+    Tells whether a model directory uses the shared-array layout.
+    """
+    return os.path.isdir(os.path.join(directory, ARRAY_DIR))
+
+
+def check_arrays(directory, arrays, checksums=False):
+    """
+    Checks the arrays of a release against its manifest: sizes always (cheap),
+    SHA-256 only with checksums=True (reads every array once).
+
+    :raises ValueError: If an array is missing or does not match
+    """
+    for name, expected in arrays.items():
+        path = os.path.join(directory, ARRAY_DIR, name)
+        if not os.path.exists(path) or os.path.getsize(path) != expected["bytes"]:
+            raise ValueError(f"{ARRAY_DIR}/{name} in {directory} does not match the manifest size")
+        if checksums and _sha256(path) != expected["sha256"]:
+            raise ValueError(f"{ARRAY_DIR}/{name} in {directory} does not match the manifest checksum")
+
+
+def load(directory, mmap_mode="r"):
+    """
+    Loads a model written by dump.
+
+    :param mmap_mode: np.load mmap_mode for the arrays; None reads them into
+                      private memory. Estimators that need writable buffers
+                      get a copy-on-write mapping ('c'), still shared until written.
+    """
+    file = os.path.join(directory, "model.pkl")
+    try:
+        with open(file, "rb") as f:
+            return _ArrayUnpickler(f, directory, mmap_mode).load()
+    except ValueError as e:
+        if mmap_mode != "r" or "read-only" not in str(e):
+            raise
+    with open(file, "rb") as f:
+        return _ArrayUnpickler(f, directory, "c").load()
+
+
+def load_release(path, mmap_mode=None):
+    """
+    Loads a published model, whether its arrays are shared (see dump) or the
+    release holds a self-contained model.pkl.
+
+    :param path: Release directory, or its model.pkl
+    :param mmap_mode: mmap_mode for the arrays; None reads them into private memory
+    """
+    directory = os.path.dirname(path) if os.path.basename(path) == "model.pkl" else path
+    if is_shared(directory):
+        return load(directory, mmap_mode)
+    import joblib
+    return joblib.load(os.path.join(directory, "model.pkl"), mmap_mode=mmap_mode)
+
+
+# ---------- Memory report ----------
+
+def _memory_mb():
+    """
+    (RSS, PSS, private) of this process in MB. PSS divides shared pages among
+    the processes mapping them; private pages are what one more worker costs.
+    """
+    values = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    values[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    except OSError:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        return rss, None, None
+    return values.get("Rss"), values.get("Pss"), values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)
+
+
+def _worker(directory, mmap, n_features, barrier, results):
+    import warnings
+    try:
+        import joblib, sklearn.ensemble, sklearn.neighbors  # Libraries are not part of the model's cost
+    except ImportError:
+        pass
+    before = _memory_mb()
+    start = time.perf_counter()
+    model = load_release(directory, "r" if mmap else None)
+    loaded = time.perf_counter() - start
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        model.predict(np.zeros((64, n_features)))
+    barrier.wait()  # Every worker holds the model while memory is measured
+    after = _memory_mb()
+    results.put((os.getpid(), loaded, before, after))
+    barrier.wait()
+
+
+def memory_report(directory, workers=4, n_features=46):
+    """
+    Loads the model in `workers` fresh processes at once, read and then
+    memory-mapped, and prints load time and memory per worker.
+
+    :return: {mode: [(load seconds, RSS MB, PSS MB, private MB), ...]} (model share only)
+    """
+    import multiprocessing
+    directory = os.path.realpath(directory)
+    context = multiprocessing.get_context("spawn")  # Fork would share the parent's pages
+    report = {}
+    for mode, mmap in (("read", False), ("mmap", True)):
+        barrier = context.Barrier(workers)
+        results = context.Queue()
+        processes = [context.Process(target=_worker, args=(directory, mmap, n_features, barrier, results))
+                     for _ in range(workers)]
+        for process in processes:
+            process.start()
+        rows = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        report[mode] = [(loaded, after[0] - before[0],
+                         after[1] - before[1] if after[1] is not None else None,
+                         after[2] - before[2] if after[2] is not None else None)
+                        for _, loaded, before, after in rows]
+
+    print(f"Model: {directory} ({'shared arrays' if is_shared(directory) else 'joblib pickle'}), {workers} workers")
+    print(f"{'mode':<6}{'load s':>10}{'RSS MB':>10}{'PSS MB':>10}{'private MB':>12}")
+    for mode, rows in report.items():
+        for loaded, rss, pss, private in rows:
+            print(f"{mode:<6}{loaded:>10.3f}{rss:>10.1f}"
+                  f"{pss if pss is not None else float('nan'):>10.1f}"
+                  f"{private if private is not None else float('nan'):>12.1f}")
+        if rows[0][3] is not None:
+            print(f"[INFO] {mode}: each additional worker adds {np.mean([row[3] for row in rows]):.1f} MB "
+                  f"of private memory, load {np.median([row[0] for row in rows]) * 1000:.1f} ms")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory use of a model loaded by several detector processes.")
+    parser.add_argument("model", nargs="?", default=os.path.join("models", "ownmodel"), help="Model directory")
+    parser.add_argument("--workers", type=int, default=4, help="Processes loading the model at once (default: 4)")
+    args = parser.parse_args()
+    memory_report(args.model, args.workers)
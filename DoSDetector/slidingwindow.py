@@ -0,0 +1,250 @@
+"""
+slidingwindow.py
+
+This module extracts flow features over a sliding window instead of tumbling
+1-second windows.
+
+Every source keeps a ring buffer of fixed-width time bins (by default 10 bins of
+100 ms). Each bin holds running aggregates of its packets: counts, byte sums and
+sums of squares, minimum and maximum lengths, inter-arrival time aggregates, TCP
+flag counts and destination port counts. When a source's traffic enters a new
+bin, the features of the last full window are obtained by merging the bins,
+in O(bins) time, without rescanning packets. A source is therefore scored every
+bin width over the last second, using constant memory per source.
+
+Only full windows are scored: a new source is first scored once it has been
+tracked for `bins` bins, as a tumbling window is only scored after one second.
+Consecutive windows overlap by bins - 1 bins, so the same evidence is seen by
+`bins` verdicts; warning thresholds must be scaled by `bins` (see
+MetricsExtractor).
+
+The features are the same as MetricsExtractor.get_metrics computes for a
+tumbling window holding the same packets. As in process_packet, every packet of
+a source counts as forward traffic.
+
+Main components:
+- SlidingWindowEngine: per-source rings, packet updates and window features
+"""
+
+from collections import Counter
+import math
+
+# Bin layout (list positions)
+INDEX, PACKETS, BYTES, BYTES_SQ, LEN_MIN, LEN_MAX, FIRST, LAST, \
+    IAT_COUNT, IAT_SUM, IAT_SQ, IAT_MIN, IAT_MAX, LEAD_IAT, FIN, SYN, RST, PSH, ACK, URG, PORTS = range(21)
+
+
+def _empty_bin(index):
+    return [index, 0, 0.0, 0.0, math.inf, 0.0, None, None,
+            0, 0.0, 0.0, math.inf, 0.0, None, 0, 0, 0, 0, 0, 0, Counter()]
+
+
+class SlidingWindowEngine:
+    """
+    Per-source rings of time bins, merged into window features on bin boundaries.
+    """
+
+    def __init__(self, bins=10, bin_width=0.1, min_packets=2):
+        """
+        :param bins: Bins per window (window length = bins * bin_width)
+        :param bin_width: Width of a bin in seconds, i.e. how often a source is scored
+        :param min_packets: Fewest packets a full window needs to be scored
+        """
+        self.bins = bins
+        self.bin_width = bin_width
+        self.min_packets = min_packets
+        self.sources = {}  # src -> {'ring': [...], 'current': bin index, 'first': bin index, 'last_time': t}
+        self.last_sweep = None
+
+    def add(self, src, pkt_time, dport, length, flags):
+        """
+        Adds a packet of a source.
+
+        :param src: Source IP address
+        :param pkt_time: Capture time (seconds)
+        :param dport: Destination port (0 if none)
+        :param length: Packet length in bytes
+        :param flags: TCP flags as an integer (0 if not TCP)
+        :return: Features of the full window that ended when this packet opened
+                 a new bin, or None
+        """
+        pkt_time = float(pkt_time)
+        index = int(pkt_time // self.bin_width)
+        state = self.sources.get(src)
+        if state is None:
+            state = self.sources[src] = {'ring': [None] * self.bins, 'current': index, 'first': index,
+                                         'last_time': None}
+
+        metrics = None
+        if index != state['current']:
+            # Traffic moved to a new bin: score the window ending with the previous one
+            metrics = self.window_metrics(src, state['current'])
+            state['current'] = index
+
+        slot = state['ring'][index % self.bins]
+        if slot is None or slot[INDEX] != index:
+            slot = state['ring'][index % self.bins] = _empty_bin(index)
+
+        slot[PACKETS] += 1
+        slot[BYTES] += length
+        slot[BYTES_SQ] += length * length
+        if length < slot[LEN_MIN]:
+            slot[LEN_MIN] = length
+        if length > slot[LEN_MAX]:
+            slot[LEN_MAX] = length
+
+        if state['last_time'] is not None:
+            iat = pkt_time - state['last_time']
+            if slot[FIRST] is None:
+                # Only part of the window if an earlier bin of the window is too
+                slot[LEAD_IAT] = iat
+            else:
+                slot[IAT_COUNT] += 1
+                slot[IAT_SUM] += iat
+                slot[IAT_SQ] += iat * iat
+                if iat < slot[IAT_MIN]:
+                    slot[IAT_MIN] = iat
+                if iat > slot[IAT_MAX]:
+                    slot[IAT_MAX] = iat
+        if slot[FIRST] is None:
+            slot[FIRST] = pkt_time
+        slot[LAST] = pkt_time
+        state['last_time'] = pkt_time
+
+        if flags:
+            if flags & 0x01: slot[FIN] += 1
+            if flags & 0x02: slot[SYN] += 1
+            if flags & 0x04: slot[RST] += 1
+            if flags & 0x08: slot[PSH] += 1
+            if flags & 0x10: slot[ACK] += 1
+            if flags & 0x20: slot[URG] += 1
+        slot[PORTS][dport] += 1
+
+        self.sweep(pkt_time)
+        return metrics
+
+    def window_metrics(self, src, last_index):
+        """
+        Merges the bins of the window ending with bin `last_index` into the
+        feature dictionary of MetricsExtractor.get_metrics.
+
+        :return: Feature dictionary, or None if the source has not been tracked
+                 for a full window yet or the window has too few packets
+        """
+        state = self.sources.get(src)
+        if state is None or last_index - state['first'] + 1 < self.bins:
+            return None
+        window = sorted((slot for slot in state['ring']
+                         if slot is not None and last_index - self.bins < slot[INDEX] <= last_index),
+                        key=lambda slot: slot[INDEX])
+        packets = sum(slot[PACKETS] for slot in window)
+        if packets < max(self.min_packets, 1):
+            return None
+
+        total = sum(slot[BYTES] for slot in window)
+        total_sq = sum(slot[BYTES_SQ] for slot in window)
+        len_min = min(slot[LEN_MIN] for slot in window)
+        len_max = max(slot[LEN_MAX] for slot in window)
+        mean = total / packets
+        var = max(total_sq / packets - mean * mean, 0.0)
+
+        iat_count = iat_sum = iat_sq = iat_max = 0.0
+        iat_min = math.inf
+        for position, slot in enumerate(window):
+            iat_count += slot[IAT_COUNT]
+            iat_sum += slot[IAT_SUM]
+            iat_sq += slot[IAT_SQ]
+            iat_min = min(iat_min, slot[IAT_MIN])
+            iat_max = max(iat_max, slot[IAT_MAX])
+            # The gap before a bin's first packet belongs to the window unless
+            # it is the window's first packet
+            if position and slot[LEAD_IAT] is not None:
+                lead = slot[LEAD_IAT]
+                iat_count += 1
+                iat_sum += lead
+                iat_sq += lead * lead
+                iat_min = min(iat_min, lead)
+                iat_max = max(iat_max, lead)
+        if iat_count:
+            iat_mean = iat_sum / iat_count
+            iat_std = math.sqrt(max(iat_sq / iat_count - iat_mean * iat_mean, 0.0))
+        else:
+            iat_mean = iat_std = iat_min = 0.0
+
+        duration = window[-1][LAST] - window[0][FIRST]
+        rate = (lambda value: value / duration if duration > 0 else 0)
+        ports = Counter()
+        for slot in window:
+            ports.update(slot[PORTS])
+        fin, syn, rst, psh, ack, urg = (sum(slot[field] for slot in window) for field in (FIN, SYN, RST, PSH, ACK, URG))
+        std = math.sqrt(var)
+
+        return {
+            'Destination Port': ports.most_common(1)[0][0] if ports else 0,
+            'Flow Duration': duration,
+            'Total Fwd Packets': packets,
+            'Total Backward Packets': 0,
+            'Total Length of Fwd Packets': float(total),
+            'Total Length of Bwd Packets': 0,
+            'Fwd Packet Length Max': float(len_max),
+            'Fwd Packet Length Min': float(len_min),
+            'Fwd Packet Length Mean': mean,
+            'Fwd Packet Length Std': std,
+            'Bwd Packet Length Max': 0,
+            'Bwd Packet Length Min': 0,
+            'Bwd Packet Length Mean': 0,
+            'Bwd Packet Length Std': 0,
+            'Flow Bytes/s': rate(total),
+            'Flow Packets/s': rate(packets),
+            'Fwd Packets/s': rate(packets),
+            'Bwd Packets/s': 0,
+            'Min Packet Length': float(len_min),
+            'Max Packet Length': float(len_max),
+            'Packet Length Mean': mean,
+            'Packet Length Std': std,
+            'Packet Length Variance': var,
+            'Flow IAT Mean': iat_mean,
+            'Flow IAT Std': iat_std,
+            'Flow IAT Max': iat_max,
+            'Flow IAT Min': iat_min,
+            'Fwd IAT Total': iat_sum,
+            'Fwd IAT Mean': iat_mean,
+            'Fwd IAT Std': iat_std,
+            'Fwd IAT Max': iat_max,
+            'Fwd IAT Min': iat_min,
+            'Bwd IAT Total': 0,
+            'Bwd IAT Mean': 0,
+            'Bwd IAT Std': 0,
+            'Bwd IAT Max': 0,
+            'Bwd IAT Min': 0,
+            'FIN Flag Count': fin,
+            'SYN Flag Count': syn,
+            'RST Flag Count': rst,
+            'PSH Flag Count': psh,
+            'ACK Flag Count': ack,
+            'Fwd PSH Flags': psh,
+            'Bwd PSH Flags': 0,
+            'Fwd URG Flags': urg,
+            'Bwd URG Flags': 0
+        }
+
+    def sweep(self, now):
+        """
+        Drops sources with no packet in the last window, at most once per window.
+        """
+        window = self.bins * self.bin_width
+        if self.last_sweep is not None and now - self.last_sweep < window:
+            return
+        self.last_sweep = now
+        for src in [src for src, state in self.sources.items()
+                    if state['last_time'] is not None and now - state['last_time'] > window]:
+            del self.sources[src]
+
+    def reset(self, src=None):
+        """
+        Forgets one source, or every source.
+        """
+        if src is None:
+            self.sources.clear()
+        else:
+            self.sources.pop(src, None)
@@ -0,0 +1,146 @@
+"""
+startup.py
+
+This module measures how long the sensor takes to start. Until the capture is
+open the network is not watched, so a restart after a crash should take well
+under a second.
+
+Main components:
+- StartupTimer: wall time of each startup phase (interpreter, imports, model
+  load, warm-up, capture socket...), printed once the capture is open and
+  exported as the dbdos_startup_seconds gauge
+- import_profile: runs `python -X importtime -c "import <module>"` in a fresh
+  interpreter and returns the slowest top-level imports
+
+Usage:
+    STARTUP = StartupTimer()      # before the heavy imports
+    ...
+    STARTUP.mark("imports")
+    STARTUP.report()
+"""
+
+import os
+import subprocess
+import sys
+import time
+# common/ (shared by the sensor and the server) is a package at the repository root
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.append(REPO_DIR)
+from common.instrumentation import gauge
+
+# Startup time the sensor should stay under, in seconds
+STARTUP_TARGET = 1.0
+
+
+def _process_age():
+    """
+    Seconds since this process was started (Linux only, None elsewhere), so
+    the interpreter startup before the first line of Python is counted too.
+    """
+    try:
+        with open("/proc/self/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        # Fields after the command name start at 'state' (field 3 of proc(5))
+        return max(uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK"), 0.0)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupTimer:
+    """
+    Sequential startup phases: each mark() closes the phase that started at
+    the previous mark (or when the timer was created).
+    """
+
+    def __init__(self):
+        self.phases = []
+        age = _process_age()
+        if age is not None:
+            self.phases.append(("interpreter", age))
+        self._last = time.perf_counter()
+        self.reported = False
+
+    def mark(self, phase):
+        """
+        Ends a phase.
+
+        :param phase: Name of the phase that just finished
+        :return: Its duration in seconds
+        """
+        now = time.perf_counter()
+        duration = now - self._last
+        self.phases.append((phase, duration))
+        self._last = now
+        return duration
+
+    def total(self):
+        return sum(duration for _, duration in self.phases)
+
+    def summary(self):
+        return " | ".join(f"{phase} {duration:.3f}s" for phase, duration in self.phases)
+
+    def report(self, logger=None, target=STARTUP_TARGET):
+        """
+        Prints the breakdown (once), logs it and sets the startup gauges.
+        """
+        if self.reported:
+            return
+        self.reported = True
+        total = self.total()
+        print(f"[INFO] Startup took {total:.3f}s: {self.summary()}")
+        if total > target:
+            print(f"[WARNING] Startup exceeded the {target:g}s target; "
+                  f"run with --import-profile to see the slowest imports")
+        if logger is not None:
+            logger.info("Startup took %.3fs: %s", total, self.summary())
+        for phase, duration in self.phases + [("total", total)]:
+            gauge("dbdos_startup_seconds", "Seconds spent in each startup phase", phase=phase).set(duration)
+
+
+def import_profile(module, cwd=None, top=15):
+    """
+    Imports `module` in a fresh interpreter with -X importtime and groups the
+    imported modules by top-level package.
+
+    :param module: Module to import, e.g. 'metrics'
+    :param cwd: Directory the module is imported from
+    :param top: Number of packages to return
+    :return: (total seconds, [(cumulative seconds, self seconds, package), ...])
+             for the slowest packages other than `module`. Cumulative time
+             includes the imports a package triggered; self time only counts
+             the package's own modules.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, cwd=cwd)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+    lines = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        lines.append((depth, int(own) / 1e6, int(cumulative) / 1e6, name.strip().split(".")[0]))
+
+    total = 0.0
+    packages = {}  # package -> [cumulative, self]
+    ancestors = []  # (depth, package) of the enclosing imports
+    # A module is listed after the imports it triggered, so its parent is the next shallower line
+    for depth, own, cumulative, package in reversed(lines):
+        while ancestors and ancestors[-1][0] >= depth:
+            ancestors.pop()
+        parent = ancestors[-1][1] if ancestors else None
+        ancestors.append((depth, package))
+        if depth == 0:
+            total += cumulative
+        entry = packages.setdefault(package, [0.0, 0.0])
+        entry[1] += own
+        if parent != package:
+            # Submodules imported from within the package are already in its cumulative time
+            entry[0] += cumulative
+    packages.pop(module, None)
+    imports = sorted(((cumulative, own, package) for package, (cumulative, own) in packages.items()), reverse=True)
+    return total, imports[:top]
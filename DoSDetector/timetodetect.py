@@ -0,0 +1,204 @@
+"""
+timetodetect.py
+
+Measures how long the detector takes to react to each attack class when traffic
+is replayed through MetricsExtractor, comparing the default 1-second windows
+with the early-decision (streaming) mode and the sliding window.
+
+Traffic comes from pcap files labelled on the command line, or is synthesized
+from the labelled flows of the dataset: every row describes about one second of
+traffic of its class (packet count, sizes, inter-arrival times and TCP flags),
+and consecutive rows are chained into one continuous stream per class.
+
+Packets are replayed in capture time, so results do not depend on the speed of
+this machine. For every class and mode the report gives:
+- time to detect: first attack verdict after the traffic starts
+- time to blacklist: when the source reaches max_warnings consecutive attack
+  verdicts (the BlacklistManager rule, times the bins of the sliding window;
+  nothing is sent to the blockchain)
+- the label of the first verdict and the number of early decisions
+
+Usage:
+    python timetodetect.py                                   # synthetic, 5 s per class
+    python timetodetect.py --pcap hulk=captures/hulk.pcap --pcap synflood=captures/syn.pcap
+    python timetodetect.py --early-packets 1000 --early-ms 100 --early-confidence 0.8
+"""
+
+import argparse
+import numpy as np
+import pandas as pd
+from scapy.all import Ether, IP, TCP, UDP, Raw, rdpcap
+from metrics import MetricsExtractor
+from slidingwindow import SlidingWindowEngine
+
+REPORT_PATH = "time_to_detect.csv"
+
+HEADER_LENGTH = 54  # Ethernet + IPv4 + TCP headers
+
+SOURCE_IP = "10.0.0.66"
+TARGET_IP = "10.0.0.1"
+
+
+def synthesize_row(row, start, label, rng):
+    """
+    Builds the packets of one dataset row (one window of traffic) from its
+    packet count, duration, size statistics and TCP flag counts.
+
+    Returns:
+        tuple: (list of packets, end time)
+    """
+    count = max(int(round(row['Total Fwd Packets'])), 1)
+    duration = max(float(row['Flow Duration']), 1e-3)
+    times = start + np.sort(rng.uniform(0, duration, count))
+    times[0] = start
+    lengths = np.clip(rng.normal(row['Fwd Packet Length Mean'], row['Fwd Packet Length Std'], count),
+                      max(row['Fwd Packet Length Min'], HEADER_LENGTH), max(row['Fwd Packet Length Max'], HEADER_LENGTH))
+
+    flags = np.zeros(count, dtype=np.int64)
+    for bit, feature in ((0x01, 'FIN Flag Count'), (0x02, 'SYN Flag Count'), (0x04, 'RST Flag Count'),
+                         (0x08, 'PSH Flag Count'), (0x10, 'ACK Flag Count')):
+        hits = min(int(round(row[feature])), count)
+        flags[rng.choice(count, hits, replace=False)] |= bit
+
+    packets = []
+    for t, length, flag in zip(times, lengths.astype(int), flags):
+        if label == "UDPFLOOD":
+            pkt = Ether() / IP(src=SOURCE_IP, dst=TARGET_IP) / UDP(dport=int(row['Destination Port']))
+        else:
+            pkt = Ether() / IP(src=SOURCE_IP, dst=TARGET_IP) / TCP(dport=int(row['Destination Port']), flags=int(flag))
+        pkt = pkt / Raw(load=b"x" * max(int(length) - len(pkt), 0))
+        pkt.time = float(t)
+        packets.append(pkt)
+    return packets, start + duration
+
+
+def synthesize(dataset, seconds, seed=42):
+    """
+    Synthesizes `seconds` of continuous traffic for every label of the dataset.
+
+    Returns:
+        dict: label -> list of packets
+    """
+    df = pd.read_csv(dataset)
+    df["label"] = df["label"].str.upper().str.strip().replace({"BENIGNO": "BENIGN"})
+    rng = np.random.default_rng(seed)
+    streams = {}
+    for label, rows in df.groupby("label"):
+        rows = rows.sample(frac=1, random_state=seed)
+        packets, t = [], 0.0
+        for _, row in rows.iterrows():
+            if t >= seconds:
+                break
+            window, t = synthesize_row(row, t, label, rng)
+            packets += window
+        streams[label] = packets
+    return streams
+
+
+def load_streams(pcaps, dataset, seconds):
+    """
+    Loads the labelled captures given as LABEL=PATH, or synthesizes `seconds`
+    of traffic per class from the dataset if there are none.
+
+    Returns:
+        dict: label -> list of packets
+    """
+    if not pcaps:
+        print(f"[INFO] Synthesizing {seconds:g} s of traffic per class from {dataset}...")
+        return synthesize(dataset, seconds)
+    streams = {}
+    for spec in pcaps:
+        label, path = spec.split("=", 1)
+        packets = list(rdpcap(path))
+        for pkt in packets:
+            pkt.time = float(pkt.time)  # rdpcap() gives EDecimal, sniffed packets have floats
+        streams[label.upper()] = packets
+    return streams
+
+
+def replay(extractor, packets, max_warnings=3):
+    """
+    Feeds packets through the extractor and detector in capture time.
+
+    Returns:
+        dict: detection and blacklisting times (seconds after the first packet)
+    """
+    extractor.reset_metrics()
+    start = float(packets[0].time)
+    detected = blacklisted = first_label = None
+    warnings = verdicts = early = 0
+
+    for pkt in packets:
+        result = extractor.process_packet(pkt)
+        if not result:
+            continue
+        _, metrics, prediction = result
+        verdicts += 1
+        if prediction is not None:
+            early += 1
+        else:
+            prediction = extractor.detector.predict(metrics)
+        elapsed = float(pkt.time) - start
+
+        if prediction != "BENIGN":
+            if detected is None:
+                detected, first_label = elapsed, prediction
+            warnings += 1
+            if warnings >= max_warnings and blacklisted is None:
+                blacklisted = elapsed
+        else:
+            warnings = 0
+
+    return {
+        "Packets": len(packets),
+        "Verdicts": verdicts,
+        "Early decisions": early,
+        "Time to detect (s)": detected,
+        "First verdict": first_label,
+        "Time to blacklist (s)": blacklisted
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure time-to-detect and time-to-blacklist per attack class.")
+    parser.add_argument("--pcap", action="append", default=[], metavar="LABEL=PATH",
+                        help="Replay a capture of one class (repeatable); default: synthetic traffic")
+    parser.add_argument("--dataset", default="../model/DBDoS2025.csv", help="Labelled flows used to synthesize traffic")
+    parser.add_argument("--seconds", type=float, default=5, help="Seconds of synthetic traffic per class")
+    parser.add_argument("--early-packets", type=int, default=1000, help="Early checkpoint every N packets")
+    parser.add_argument("--early-ms", type=int, default=100, help="Early checkpoint every N milliseconds")
+    parser.add_argument("--early-confidence", type=float, default=0.8, help="Confidence needed for an early verdict")
+    parser.add_argument("--sliding-bins", type=int, default=10, help="Bins of the sliding window")
+    parser.add_argument("--bin-ms", type=int, default=100, help="Sliding window bin width in milliseconds")
+    parser.add_argument("--max-warnings", type=int, default=3, help="Warnings before blacklisting")
+    parser.add_argument("--cascade", nargs="?", const="models/cascade.json", help="Use the rule cascade")
+    args = parser.parse_args()
+
+    streams = load_streams(args.pcap, args.dataset, args.seconds)
+
+    extractor = MetricsExtractor(verbose=False, model_options={'watch_interval': 0, 'cascade_path': args.cascade})
+    # Mode -> (early_packets, early_interval, sliding window)
+    modes = {
+        "window": (None, None, None),
+        "early": (args.early_packets, args.early_ms / 1000 if args.early_ms else None, None),
+        "sliding": (None, None, (args.sliding_bins, args.bin_ms / 1000))
+    }
+
+    rows = []
+    for label, packets in streams.items():
+        for mode, (early_packets, early_interval, sliding) in modes.items():
+            extractor.configure_streaming(early_packets, early_interval, args.early_confidence)
+            extractor.sliding = SlidingWindowEngine(*sliding) if sliding else None
+            print(f"[INFO] Replaying {len(packets)} {label} packets ({mode})...")
+            # Overlapping sliding windows need as many verdicts per warning as there are bins
+            max_warnings = args.max_warnings * (sliding[0] if sliding else 1)
+            rows.append(dict({"Class": label, "Mode": mode}, **replay(extractor, packets, max_warnings)))
+
+    report = pd.DataFrame(rows)
+    print(report.round(3).to_string(index=False))
+    report.to_csv(REPORT_PATH, index=False)
+    print(f"[INFO] Report saved as '{REPORT_PATH}'")
+
+
+if __name__ == "__main__":
+    main()
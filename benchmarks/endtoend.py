@@ -0,0 +1,650 @@
+"""
+endtoend.py
+
+This script benchmarks the whole system in a closed loop on one host: the
+traffic generator (client/scenario.py) sends a scenario through the loopback
+interface, the sensor (DoSDetector/metrics.py) classifies it and logs attackers
+to a local ledger stand-in (ledger.py), and the server (server/server.py)
+fetches the ledger and starts refusing the blocked sources.
+
+Every component runs as its own process with its normal command line; the
+only difference from a deployment is DBDOS_LEDGER_URL, which replaces the
+VeChain scripts with the stand-in. The ledger keeps the two delays of the real
+chain (transaction submission and block inclusion), and the server keeps its
+periodic blacklist fetch, so time-to-block includes all of them.
+
+Scenario sources must be loopback addresses (127.0.0.0/8): HTTP traffic binds
+to them without any setup, and SYN/UDP floods spoof them. The server listens
+on the address used to reach the internet (--host), which the sensor ignores
+like in a deployment, and the benchmark polls and scrapes from it too, so its
+own requests are not classified. Needs root (capture and raw sockets).
+
+While the scenario runs, the benchmark samples every --interval seconds:
+- CPU (% of one core) and RSS of every component (/proc, children included)
+- packets processed and dropped by the sensor (its /metrics endpoint)
+and polls the server's /blacklist every --poll seconds to timestamp each block.
+
+Results (in --output):
+- report.json: per attack entry, the time to detect (first attack verdict),
+  to log (ledger write submitted), to commit (ledger block) and to block
+  (entry served by the server), plus precision/recall, the false-block rate
+  (benign sources blocked), the sustained packet rate before the first kernel
+  drop, and CPU/RSS per component; the raw samples are in 'timeline'
+- figure_e2e_*.png: timeline, latency breakdown and resource plots
+- ground_truth.jsonl, flows/ and one log file per component
+
+Main components:
+- Component: a process of the loop with its CPU/RSS sampling
+- Monitor: samples components and the sensor, polls the blacklist
+- analyze: turns the samples, ground truth and flow records into the report
+- plot_report: figures in the style of data/graph.py
+
+Usage:
+    sudo python endtoend.py scenarios/loopback.json --output results/loopback
+    sudo python endtoend.py scenarios/loopback.json --block-time 0 --server-update 1
+"""
+
+import argparse
+import http.client
+import ipaddress
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "client"))
+
+import scenario as scenarios
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+PAGE_KB = os.sysconf("SC_PAGE_SIZE") / 1024
+
+# Seconds to wait for a component to answer after it is started
+STARTUP_TIMEOUT = 60
+# Seconds a component gets to exit after SIGINT/SIGTERM before it is killed
+STOP_TIMEOUT = 10
+
+
+# ---------- Components ----------
+
+def _proc_stat(pid):
+    """
+    (parent pid, CPU seconds, RSS in MB) of a process from /proc, or None if it exited.
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    # Fields after the command name start at 'state' (field 3 of proc(5))
+    return int(fields[1]), (int(fields[11]) + int(fields[12])) / CLOCK_TICKS, int(fields[21]) * PAGE_KB / 1024
+
+
+def _process_tree(pid):
+    """
+    The process and all its descendants (e.g. scenario worker processes).
+    """
+    children = {}
+    for name in os.listdir("/proc"):
+        if name.isdigit():
+            stat = _proc_stat(int(name))
+            if stat is not None:
+                children.setdefault(stat[0], []).append(int(name))
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, ()))
+    return tree
+
+
+class Component:
+    """
+    One process of the loop, started with its normal command line.
+    """
+
+    def __init__(self, name, command, cwd, log_path, env=None):
+        self.name = name
+        self.command = command
+        self.cwd = cwd
+        self.log_path = log_path
+        self.env = env
+        self.process = None
+        self._last = None  # (time, CPU seconds) of the previous sample
+
+    def start(self):
+        self.log = open(self.log_path, "w")
+        self.process = subprocess.Popen(self.command, cwd=self.cwd, env=self.env, stdout=self.log,
+                                        stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL)
+        print(f"[INFO] Started {self.name} (pid {self.process.pid}): {' '.join(self.command)}")
+
+    def running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def sample(self):
+        """
+        CPU use (% of one core since the previous sample) and RSS in MB of the
+        process tree, or None if it is not running.
+        """
+        if not self.running():
+            return None
+        stats = [stat for stat in map(_proc_stat, _process_tree(self.process.pid)) if stat is not None]
+        now, cpu = time.monotonic(), sum(stat[1] for stat in stats)
+        rss = sum(stat[2] for stat in stats)
+        last, self._last = self._last, (now, cpu)
+        if last is None or now <= last[0]:
+            return None
+        return {"cpu_percent": round(100 * max(cpu - last[1], 0.0) / (now - last[0]), 1), "rss_mb": round(rss, 1)}
+
+    def stop(self, sig=signal.SIGINT):
+        """
+        Asks the process to exit (Ctrl+C by default) and kills it if it does not.
+        """
+        if self.running():
+            self.process.send_signal(sig)
+            try:
+                self.process.wait(STOP_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                print(f"[WARNING] {self.name} did not exit after {STOP_TIMEOUT}s, killing it")
+                self.process.kill()
+                self.process.wait()
+        if self.process is not None:
+            self.log.close()
+
+
+def _http_get(url, source=None, timeout=5):
+    """
+    Body of a GET request, sent from `source` if given.
+
+    Raises:
+        OSError: If the request fails or the status is not 200
+    """
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout,
+                                            source_address=(source, 0) if source else None)
+    try:
+        connection.request("GET", parts.path + (f"?{parts.query}" if parts.query else ""))
+        response = connection.getresponse()
+        body = response.read()
+    except http.client.HTTPException as e:
+        raise OSError(f"Bad response from {url}: {e!r}")
+    finally:
+        connection.close()
+    if response.status != 200:
+        raise OSError(f"HTTP {response.status} from {url}")
+    return body
+
+
+def _wait_ready(component, url, source, timeout=STARTUP_TIMEOUT):
+    """
+    Waits until the component answers `url`.
+
+    Raises:
+        RuntimeError: If it exits or does not answer in time
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not component.running():
+            raise RuntimeError(f"{component.name} exited during startup (see {component.log_path})")
+        try:
+            _http_get(url, source, timeout=1)
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f"{component.name} did not answer {url} within {timeout}s (see {component.log_path})")
+
+
+def _scrape(text):
+    """
+    Values of the unlabelled series of a Prometheus text page.
+    """
+    values = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#") and "{" not in line:
+            name, _, value = line.partition(" ")
+            try:
+                values[name] = float(value)
+            except ValueError:
+                pass
+    return values
+
+
+# ---------- Monitoring ----------
+
+class Monitor:
+    """
+    Samples the components and the sensor counters, and timestamps every
+    blacklist entry the first time the server serves it.
+    """
+
+    def __init__(self, components, server_url, sensor_url, source, interval=1.0, poll=0.2):
+        """
+        :param components: Components to sample
+        :param server_url: Base URL of the server (polled on /blacklist)
+        :param sensor_url: Sensor /metrics URL
+        :param source: Address the requests are sent from (ignored by the sensor)
+        """
+        self.components = components
+        self.server_url = server_url
+        self.sensor_url = sensor_url
+        self.source = source
+        self.interval = interval
+        self.poll = poll
+        self.samples = []  # Resource and sensor samples
+        self.blocks = {}  # Blacklist entry -> first time served, and its ledger record
+        self.poll_errors = 0
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for target in (self._sample_loop, self._poll_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+    def _sample_loop(self):
+        for component in self.components:
+            component.sample()  # First CPU reading
+        while not self._stop.wait(self.interval):
+            sample = {"time": time.time()}
+            for component in self.components:
+                usage = component.sample()
+                if usage is not None:
+                    sample[component.name] = usage
+            try:
+                counters = _scrape(_http_get(self.sensor_url, self.source).decode())
+                sample["sensor_counters"] = {key: counters.get(f"dbdos_{key}_total")
+                                             for key in ("packets", "kernel_packets", "kernel_drops", "log_dropped")}
+            except OSError:
+                pass
+            self.samples.append(sample)
+
+    def _poll_loop(self):
+        while not self._stop.wait(self.poll):
+            try:
+                data = json.loads(_http_get(f"{self.server_url}/blacklist", self.source))
+            except (OSError, ValueError):
+                self.poll_errors += 1
+                continue
+            now = time.time()
+            for attack in data.get("attacks", []):
+                if attack.get("ip") not in self.blocks:
+                    self.blocks[attack["ip"]] = dict(attack, seen=now)
+
+
+# ---------- Analysis ----------
+
+def _rates(samples):
+    """
+    Per-interval sensor rates: time, packets processed per second and kernel drops.
+    """
+    rates = []
+    previous = None
+    for sample in samples:
+        counters = sample.get("sensor_counters")
+        if not counters or counters["packets"] is None:
+            continue
+        if previous is not None:
+            elapsed = sample["time"] - previous["time"]
+            drops = (counters["kernel_drops"] or 0) - (previous["sensor_counters"]["kernel_drops"] or 0)
+            rates.append({"time": sample["time"],
+                          "pps": (counters["packets"] - previous["sensor_counters"]["packets"]) / elapsed,
+                          "drops": max(drops, 0)})
+        previous = sample
+    return rates
+
+
+def _covers(entry, address):
+    try:
+        return ipaddress.ip_address(address) in ipaddress.ip_network(entry, strict=False)
+    except ValueError:
+        return False
+
+
+def analyze(truth, verdicts, blocks, samples, components):
+    """
+    Builds the report from the ground truth, the flow-record verdicts, the
+    blacklist timestamps and the samples.
+
+    Returns:
+        dict: entries, detection, blocking, throughput and resources
+    """
+    result = scenarios.score(truth, verdicts)
+    detections = {(entry["phase"], entry["entry"]): entry for entry in result["detections"]}
+
+    attack_sources, benign_sources = set(), set()
+    for record in truth:
+        (benign_sources if record["label"] == "BENIGN" else attack_sources).update(record["sources"])
+    benign_sources -= attack_sources
+
+    def since(start, value):
+        return round(value - start, 3) if value is not None else None
+
+    entries = []
+    for key, detection in detections.items():
+        sources = {source for record in truth if (record["phase"], record["entry"]) == key
+                   for source in record["sources"]}
+        covering = [block for entry, block in blocks.items() if any(_covers(entry, source) for source in sources)]
+        first = min(covering, key=lambda block: block["seen"]) if covering else None
+        start = detection["start"]
+        entries.append(dict(
+            detection,
+            sources=sorted(sources),
+            blocked_as=first["ip"] if first else None,
+            blocked_before_start=bool(first and first["seen"] < start),
+            time_to_log=since(start, first.get("submitted")) if first else None,
+            time_to_commit=since(start, first.get("committed")) if first else None,
+            time_to_block=round(max(first["seen"] - start, 0.0), 3) if first else None))
+
+    blocked_benign = sorted(source for source in benign_sources
+                            if any(_covers(entry, source) for entry in blocks))
+    false_entries = sorted(entry for entry in blocks
+                           if not any(_covers(entry, source) for source in attack_sources))
+
+    rates = _rates(samples)
+    first_drop = next((rate for rate in rates if rate["drops"] > 0), None)
+    clean = [rate["pps"] for rate in rates if first_drop is None or rate["time"] < first_drop["time"]]
+    throughput = {
+        "sustained_pps": round(max(clean), 1) if clean else None,
+        "first_drop_pps": round(first_drop["pps"], 1) if first_drop else None,
+        "first_drop_time": first_drop["time"] if first_drop else None,
+        "kernel_drops": int(sum(rate["drops"] for rate in rates)),
+        "peak_pps": round(max((rate["pps"] for rate in rates), default=0.0), 1)
+    }
+
+    resources = {}
+    for component in components:
+        usage = [sample[component.name] for sample in samples if component.name in sample]
+        if usage:
+            resources[component.name] = {
+                "cpu_percent_mean": round(sum(u["cpu_percent"] for u in usage) / len(usage), 1),
+                "cpu_percent_max": max(u["cpu_percent"] for u in usage),
+                "rss_mb_max": max(u["rss_mb"] for u in usage)
+            }
+
+    def mean(key):
+        values = [entry[key] for entry in entries if entry[key] is not None]
+        return round(sum(values) / len(values), 3) if values else None
+
+    return {
+        "entries": entries,
+        "detection": {key: result[key] for key in ("tp", "fp", "fn", "tn", "outside", "precision", "recall",
+                                                   "class_accuracy")},
+        "blocking": {
+            "attack_entries": len(entries),
+            "blocked_entries": sum(entry["time_to_block"] is not None for entry in entries),
+            "mean_time_to_detect": mean("time_to_detect"),
+            "mean_time_to_block": mean("time_to_block"),
+            "benign_sources": len(benign_sources),
+            "blocked_benign_sources": blocked_benign,
+            "false_block_rate": len(blocked_benign) / len(benign_sources) if benign_sources else None,
+            "entries_without_attack_source": false_entries
+        },
+        "throughput": throughput,
+        "resources": resources
+    }
+
+
+def print_report(report):
+    def seconds(value):
+        return "-" if value is None else f"{value:.2f}s"
+
+    print(f"\n{'Phase':<16} {'Class':<10} {'Rate/s':>10} {'Detect':>8} {'Log':>8} {'Commit':>8} {'Block':>8}")
+    for entry in report["entries"]:
+        print(f"{entry['phase']:<16} {entry['label']:<10} {entry['achieved_rate']:>10,.1f} "
+              f"{seconds(entry['time_to_detect']):>8} {seconds(entry['time_to_log']):>8} "
+              f"{seconds(entry['time_to_commit']):>8} {seconds(entry['time_to_block']):>8}")
+    blocking, throughput = report["blocking"], report["throughput"]
+    rate = blocking["false_block_rate"]
+    print(f"\nBlocked {blocking['blocked_entries']}/{blocking['attack_entries']} attack entries | "
+          f"false-block rate: {'n/a' if rate is None else f'{100 * rate:.1f}%'} "
+          f"({len(blocking['blocked_benign_sources'])}/{blocking['benign_sources']} benign sources)")
+    print(f"Sustained rate before drops: {throughput['sustained_pps'] or 0:,.0f} pps "
+          f"(peak {throughput['peak_pps']:,.0f} pps, {throughput['kernel_drops']:,} kernel drops)")
+    for name, usage in report["resources"].items():
+        print(f"  {name:<8} CPU {usage['cpu_percent_mean']:6.1f}% mean, {usage['cpu_percent_max']:6.1f}% max | "
+              f"RSS {usage['rss_mb_max']:8.1f} MB max")
+
+
+# ---------- Plots ----------
+
+def plot_report(report, output_dir):
+    """
+    Saves the timeline, latency and resource figures (same style as data/graph.py).
+    """
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+    except ImportError:
+        print("[WARNING] matplotlib/seaborn not installed, skipping the figures")
+        return []
+
+    sns.set(style="whitegrid", font_scale=1.2)
+    start = report["start"]
+    samples = report["timeline"]
+    paths = []
+
+    # ----------- Sensor throughput, drops and blocks -----------
+    rates = _rates(samples)
+    fig, ax = plt.subplots(figsize=(10, 4))
+    ax.plot([r["time"] - start for r in rates], [r["pps"] for r in rates], color="#4682B4", linewidth=2,
+            label="Packets processed/s")
+    ax.plot([r["time"] - start for r in rates], [r["drops"] for r in rates], color="#F08080", linewidth=1.5,
+            label="Kernel drops/s")
+    for entry in report["entries"]:
+        ax.axvspan(entry["start"] - start, entry["start"] - start + entry["duration"], color="#F08080", alpha=0.08)
+        if entry["time_to_block"] is not None:
+            ax.axvline(entry["start"] - start + entry["time_to_block"], color="#2E8B57", linestyle="--", linewidth=1)
+    ax.set_title("End-to-end run: sensor throughput (shaded: attacks, dashed: blocks)")
+    ax.set_xlabel("Time since scenario start (s)")
+    ax.set_ylabel("Packets per second")
+    ax.set_yscale("symlog", linthresh=10)  # Drops can be orders of magnitude above the processed rate
+    ax.set_ylim(bottom=0)
+    ax.legend(loc="upper left")
+    fig.tight_layout()
+    paths.append(os.path.join(output_dir, "figure_e2e_timeline.png"))
+    fig.savefig(paths[-1], dpi=300)
+
+    # ----------- Latency breakdown per attack entry -----------
+    steps = [("time_to_detect", "Detect", "#4682B4"), ("time_to_log", "Ledger write", "#DAA520"),
+             ("time_to_commit", "Ledger block", "#9370DB"), ("time_to_block", "Server block", "#2E8B57")]
+    labels = [f"{entry['phase']}\n{entry['label']}" for entry in report["entries"]]
+    fig, ax = plt.subplots(figsize=(max(6, 1.6 * len(labels)), 4))
+    width = 0.8 / len(steps)
+    for i, (key, name, color) in enumerate(steps):
+        ax.bar([x + (i - 1.5) * width for x in range(len(labels))],
+               [entry[key] if entry[key] is not None else 0 for entry in report["entries"]],
+               width=width, color=color, label=name)
+    ax.set_xticks(range(len(labels)))
+    ax.set_xticklabels(labels)
+    ax.set_title("Time from first attack packet to each stage")
+    ax.set_ylabel("Seconds")
+    ax.legend(loc="upper left", fontsize="small")
+    fig.tight_layout()
+    paths.append(os.path.join(output_dir, "figure_e2e_latency.png"))
+    fig.savefig(paths[-1], dpi=300)
+
+    # ----------- CPU and RSS per component -----------
+    fig, (cpu_ax, rss_ax) = plt.subplots(1, 2, figsize=(12, 4))
+    for name, color in zip(report["resources"], ("#4682B4", "#F08080", "#2E8B57", "#DAA520")):
+        points = [(sample["time"] - start, sample[name]) for sample in samples if name in sample]
+        cpu_ax.plot([t for t, _ in points], [u["cpu_percent"] for _, u in points], color=color, label=name)
+        rss_ax.plot([t for t, _ in points], [u["rss_mb"] for _, u in points], color=color, label=name)
+    cpu_ax.set_title("CPU per component")
+    cpu_ax.set_xlabel("Time since scenario start (s)")
+    cpu_ax.set_ylabel("% of one core")
+    rss_ax.set_title("Resident memory per component")
+    rss_ax.set_xlabel("Time since scenario start (s)")
+    rss_ax.set_ylabel("RSS (MB)")
+    cpu_ax.legend()
+    fig.tight_layout()
+    paths.append(os.path.join(output_dir, "figure_e2e_resources.png"))
+    fig.savefig(paths[-1], dpi=300)
+    plt.close("all")
+    return paths
+
+
+# ---------- Orchestration ----------
+
+def _local_address():
+    """
+    Address used to reach the internet: the server listens on it and the
+    sensor ignores it (127.0.0.1 without a default route).
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        try:
+            sock.connect(("8.8.8.8", 80))
+            return sock.getsockname()[0]
+        except OSError:
+            return "127.0.0.1"
+
+
+def run(args):
+    scenario = scenarios.load_scenario(args.scenario)
+    if args.seed is not None:
+        scenario["seed"] = args.seed
+    output_dir = os.path.abspath(args.output)
+    os.makedirs(output_dir, exist_ok=True)
+    records_dir = os.path.join(output_dir, "flows")
+    truth_path = os.path.join(output_dir, "ground_truth.jsonl")
+
+    host = _local_address()
+    if host.startswith("127."):
+        print("[WARNING] No address outside loopback: the sensor will see the server's own packets as a source")
+    for phase in scenario["phases"]:
+        for entry in phase.get("traffic", []):
+            sources = scenarios.expand_sources(entry.get("sources")) or []
+            if not sources or any(not ipaddress.ip_address(source).is_loopback for source in sources):
+                print(f"[WARNING] Phase '{phase['name']}': {entry['type']} sources should be 127.x addresses "
+                      f"so the sensor sees them on loopback and they can be told apart")
+
+    server_url = f"http://{host}:{args.server_port}"
+    ledger_url = f"http://127.0.0.1:{args.ledger_port}"
+    sensor_url = f"http://{host}:{args.metrics_port}/metrics"
+    env = dict(os.environ, DBDOS_LEDGER_URL=ledger_url)
+    python = sys.executable
+
+    ledger = Component("ledger", [python, os.path.join(REPO_DIR, "benchmarks", "ledger.py"),
+                                  "--port", str(args.ledger_port), "--block-time", str(args.block_time),
+                                  "--submit-latency", str(args.submit_latency)],
+                       REPO_DIR, os.path.join(output_dir, "ledger.log"))
+    server = Component("server", [python, "server.py", "--host", host, "--port", str(args.server_port),
+                                  "--update-interval", str(args.server_update)],
+                       os.path.join(REPO_DIR, "server"), os.path.join(output_dir, "server.log"), env)
+    sensor = Component("sensor", [python, "metrics.py", "--ip", args.sensor_ip, "--port", str(args.server_port),
+                                  "--records", records_dir, "--metrics-port", str(args.metrics_port), "--quiet",
+                                  *args.sensor_args.split()],
+                       os.path.join(REPO_DIR, "DoSDetector"), os.path.join(output_dir, "sensor.log"), env)
+    client = Component("client", [python, "scenario.py", "run", os.path.abspath(args.scenario),
+                                  "--url", server_url, "--workers", str(args.workers),
+                                  "--seed", str(scenario["seed"]), "--truth", truth_path],
+                       os.path.join(REPO_DIR, "client"), os.path.join(output_dir, "client.log"))
+    components = [ledger, server, sensor, client]
+
+    monitor = Monitor(components, server_url, sensor_url, host, args.interval, args.poll)
+    started = time.time()
+    try:
+        ledger.start()
+        _wait_ready(ledger, f"{ledger_url}/stats", None)
+        server.start()
+        _wait_ready(server, f"{server_url}/blacklist", host)
+        sensor.start()
+        _wait_ready(sensor, sensor_url, host)
+        monitor.start()
+        client.start()
+        client.process.wait()
+        if client.process.returncode != 0:
+            print(f"[ERROR] The scenario failed (see {client.log_path})")
+        settle = args.settle if args.settle is not None else args.block_time + args.server_update + 5
+        print(f"[INFO] Scenario finished, waiting {settle:g}s for late blocks...")
+        time.sleep(settle)
+    except RuntimeError as e:
+        print(f"[ERROR] {e}")
+        return None
+    finally:
+        monitor.stop()
+        for component in (client, sensor, server):
+            component.stop()
+        ledger.stop(signal.SIGTERM)
+
+    if not os.path.exists(truth_path):
+        print("[ERROR] No ground truth was written")
+        return None
+    truth = scenarios.load_ground_truth(truth_path)
+    try:
+        verdicts = scenarios._load_verdicts(records_dir)
+    except (OSError, ValueError) as e:
+        print(f"[WARNING] Could not read the sensor's flow records: {e}")
+        verdicts = []
+    with open(truth_path) as f:
+        header = json.loads(f.readline())
+
+    report = {
+        "scenario": scenario["name"], "seed": scenario["seed"], "start": header["start"], "end": header["end"],
+        "config": {"host": host, "workers": args.workers, "block_time": args.block_time,
+                   "submit_latency": args.submit_latency, "server_update": args.server_update,
+                   "sensor_args": args.sensor_args, "started": started},
+        **analyze(truth, verdicts, monitor.blocks, monitor.samples, components),
+        "blocks": list(monitor.blocks.values()),
+        "poll_errors": monitor.poll_errors,
+        "timeline": monitor.samples
+    }
+    durations = {(phase["name"], i): phase["duration"]
+                 for phase in scenario["phases"] for i, _ in enumerate(phase.get("traffic", []))}
+    for entry in report["entries"]:
+        entry["duration"] = durations[(entry["phase"], entry["entry"])]
+
+    report_path = os.path.join(output_dir, "report.json")
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    print(f"\n[INFO] Report saved to '{report_path}'")
+    if not args.no_plots:
+        for path in plot_report(report, output_dir):
+            print(f"[INFO] Figure saved to '{path}'")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Closed-loop benchmark: client -> sensor -> ledger -> server.")
+    parser.add_argument("scenario", help="Scenario file with 127.x sources (see scenarios/loopback.json)")
+    parser.add_argument("--output", default="results", help="Directory for the report, figures and logs")
+    parser.add_argument("--workers", type=int, default=1, help="Scenario worker processes")
+    parser.add_argument("--seed", type=int, help="Override the scenario seed")
+    parser.add_argument("--block-time", type=float, default=10.0, help="Ledger block interval in seconds (default: 10)")
+    parser.add_argument("--submit-latency", type=float, default=1.55,
+                        help="Ledger write latency in seconds (default: 1.55)")
+    parser.add_argument("--server-update", type=float, default=30.0,
+                        help="Seconds between server blacklist fetches (default: 30, as the server)")
+    parser.add_argument("--sensor-ip", default="127.0.0.", help="Address prefix of the capture interface (default: loopback)")
+    parser.add_argument("--sensor-args", default="", help="Extra arguments for metrics.py, e.g. \"--early-ms 200\"")
+    parser.add_argument("--server-port", type=int, default=8080)
+    parser.add_argument("--ledger-port", type=int, default=8545)
+    parser.add_argument("--metrics-port", type=int, default=9100, help="Sensor /metrics port")
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds between CPU/RSS and sensor samples")
+    parser.add_argument("--poll", type=float, default=0.2, help="Seconds between blacklist polls")
+    parser.add_argument("--settle", type=float, help="Seconds to wait after the scenario for late blocks "
+                                                     "(default: block time + server update + 5)")
+    parser.add_argument("--no-plots", action="store_true", help="Only write report.json")
+    args = parser.parse_args()
+
+    if os.geteuid() != 0:
+        print("[WARNING] Not running as root: the sensor cannot capture and floods cannot spoof sources")
+    sys.exit(0 if run(args) is not None else 1)
+
+
+if __name__ == "__main__":
+    main()
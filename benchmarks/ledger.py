@@ -0,0 +1,260 @@
+"""
+ledger.py
+
+This script runs a local stand-in for the VeChain smart contract, so the whole
+detection loop (sensor -> ledger -> server) can be benchmarked on one host
+without a testnet account, gas or network access.
+
+It keeps the attack list in memory and mimics the two delays that matter for
+time-to-block:
+- submission: a write (POST /attacks) only returns after --submit-latency
+  seconds, like sendAttackLog.cjs waiting for "Transaction sent" (about 1.55 s
+  in data/blockchain_latency.csv)
+- inclusion: a write only becomes visible to readers at the next block
+  boundary, every --block-time seconds (VeChainThor produces a block every 10 s)
+
+Deletions are applied immediately. The server and the sensor use it instead of
+the Node.js scripts when DBDOS_LEDGER_URL points to it (see blacklist.py in
+both directories).
+
+Endpoints:
+- GET /attacks: {"total": n, "attacks": [...]} (committed attacks only)
+- GET /attacks/<i>: one attack
+- GET /stats: writes, deletes and pending transactions
+- POST /attacks {"ip": ..., "attack_type": ...}: {"tx_id": ..., "committed": ...}
+  ({"attacks": [{"ip": ..., "attack_type": ...}, ...]} logs a batch in one transaction)
+- DELETE /attacks/<i> and DELETE /attacks
+
+Every attack has ip, attack_type and timestamp like the contract, plus the
+tx_id and the submitted/committed epoch times.
+
+Main components:
+- Ledger: in-memory attack list with submission and block delays
+- LedgerHandler: HTTP interface of the ledger
+
+Usage:
+    python ledger.py --port 8545 --block-time 10 --submit-latency 1.55
+    DBDOS_LEDGER_URL=http://127.0.0.1:8545 python ../server/server.py --port 8080
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import signal
+import sys
+import threading
+import time
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+
+# Defaults: VeChainThor block interval and the median of data/blockchain_latency.csv
+BLOCK_TIME = 10.0
+SUBMIT_LATENCY = 1.55
+
+
+class Ledger:
+    """
+    In-memory list of attacks whose writes are delayed like blockchain transactions.
+    """
+
+    def __init__(self, block_time=BLOCK_TIME, submit_latency=SUBMIT_LATENCY):
+        """
+        :param block_time: Seconds between blocks (0: writes are visible at once)
+        :param submit_latency: Seconds a write takes before it is accepted
+        """
+        self.block_time = block_time
+        self.submit_latency = submit_latency
+        self.genesis = time.time()
+        self.attacks = []
+        self.pending = []  # Accepted transactions waiting for their block
+        self.writes = 0
+        self.deletes = 0
+        self._lock = threading.Lock()
+
+    def next_block(self, now):
+        """
+        Epoch time of the first block at or after `now`.
+        """
+        if self.block_time <= 0:
+            return now
+        return self.genesis + math.ceil((now - self.genesis) / self.block_time) * self.block_time
+
+    def _commit_due(self, now):
+        """
+        Moves the pending transactions whose block has been produced. Must be
+        called with the lock held.
+        """
+        while self.pending and self.pending[0]["committed"] <= now:
+            self.attacks.append(self.pending.pop(0))
+
+    def log_attacks(self, attacks):
+        """
+        Submits one transaction with one or more attacks (a multi-clause
+        transaction on VeChain). Blocks for the submission latency, like the
+        real contract call, and returns the attack records.
+
+        :param attacks: List of (ip, attack_type) pairs
+        """
+        submitted = time.time()
+        time.sleep(self.submit_latency)
+        now = time.time()
+        with self._lock:
+            self.writes += 1
+            tx_id = "0x" + hashlib.sha256(f"{self.writes}:{attacks[0]}:{now}".encode()).hexdigest()
+            committed = self.next_block(now)
+            records = [{"ip": ip, "attack_type": attack_type, "timestamp": str(int(committed)),
+                        "tx_id": tx_id, "submitted": submitted, "committed": committed}
+                       for ip, attack_type in attacks]
+            self.pending.extend(records)
+            self.pending.sort(key=lambda record: record["committed"])
+            self._commit_due(now)
+        return records
+
+    def get_attacks(self):
+        """
+        Returns the committed attacks.
+        """
+        with self._lock:
+            self._commit_due(time.time())
+            return list(self.attacks)
+
+    def delete_attack(self, index):
+        """
+        Deletes the committed attack at `index`.
+
+        :return: The deleted attack, or None if there is no such index
+        """
+        with self._lock:
+            self._commit_due(time.time())
+            if not 0 <= index < len(self.attacks):
+                return None
+            self.deletes += 1
+            return self.attacks.pop(index)
+
+    def clear(self):
+        """
+        Deletes every committed and pending attack.
+
+        :return: Number of attacks deleted
+        """
+        with self._lock:
+            count = len(self.attacks) + len(self.pending)
+            self.attacks, self.pending = [], []
+            self.deletes += count
+            return count
+
+    def stats(self):
+        with self._lock:
+            self._commit_due(time.time())
+            return {"committed": len(self.attacks), "pending": len(self.pending), "writes": self.writes,
+                    "deletes": self.deletes, "block_time": self.block_time, "submit_latency": self.submit_latency}
+
+
+class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
+    """
+    Multithreaded HTTP server, so slow writes do not block readers.
+    """
+    daemon_threads = True
+
+
+class LedgerHandler(BaseHTTPRequestHandler):
+    """
+    Handles the HTTP requests of the ledger stand-in.
+    """
+    ledger = None
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def attack_index(self):
+        """
+        Index of /attacks/<i>, None for /attacks, or False for any other path.
+        """
+        parts = self.path.split("?")[0].strip("/").split("/")
+        if parts[0] != "attacks" or len(parts) > 2:
+            return False
+        if len(parts) == 1:
+            return None
+        try:
+            return int(parts[1])
+        except ValueError:
+            return False
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self.send_json(200, self.ledger.stats())
+            return
+        index = self.attack_index()
+        if index is False:
+            self.send_json(404, {"error": "Endpoint not found"})
+            return
+        attacks = self.ledger.get_attacks()
+        if index is None:
+            self.send_json(200, {"total": len(attacks), "attacks": attacks})
+        elif 0 <= index < len(attacks):
+            self.send_json(200, attacks[index])
+        else:
+            self.send_json(404, {"error": f"No attack found at index {index}"})
+
+    def do_POST(self):
+        if self.attack_index() is not None:
+            self.send_json(404, {"error": "Endpoint not found"})
+            return
+        try:
+            data = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            attacks = [(attack["ip"], attack["attack_type"]) for attack in data.get("attacks", [data])]
+        except (ValueError, KeyError, TypeError, AttributeError):
+            attacks = None
+        if not attacks:
+            self.send_json(400, {"error": "Invalid JSON or missing fields"})
+            return
+        records = self.ledger.log_attacks(attacks)
+        self.send_json(200, {"status": f"{len(records)} attack(s) logged", "tx_id": records[0]["tx_id"],
+                             "committed": records[0]["committed"]})
+
+    def do_DELETE(self):
+        index = self.attack_index()
+        if index is False:
+            self.send_json(404, {"error": "Endpoint not found"})
+        elif index is None:
+            count = self.ledger.clear()
+            self.send_json(200, {"status": f"{count} attacks deleted", "tx_id": "0x" + "0" * 64})
+        elif self.ledger.delete_attack(index) is None:
+            self.send_json(404, {"error": f"No attack found at index {index}"})
+        else:
+            self.send_json(200, {"status": "Attack deleted", "tx_id": "0x" + "0" * 64})
+
+    def log_message(self, format, *args):
+        pass  # One line per request would flood the benchmark output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the VeChain attack ledger.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8545, help="Port to listen on (default: 8545)")
+    parser.add_argument("--block-time", type=float, default=BLOCK_TIME,
+                        help=f"Seconds between blocks; 0 commits writes at once (default: {BLOCK_TIME:g})")
+    parser.add_argument("--submit-latency", type=float, default=SUBMIT_LATENCY,
+                        help=f"Seconds a write takes to be accepted (default: {SUBMIT_LATENCY:g})")
+    args = parser.parse_args()
+
+    LedgerHandler.ledger = Ledger(args.block_time, args.submit_latency)
+    httpd = ThreadedHTTPServer((args.host, args.port), LedgerHandler)
+    signal.signal(signal.SIGTERM, lambda sig, frame: sys.exit(0))
+    print(f"[INFO] Ledger stand-in at http://{args.host}:{args.port} "
+          f"(block time {args.block_time:g}s, submit latency {args.submit_latency:g}s)")
+    try:
+        httpd.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,487 @@
+"""
+regression.py
+
+This script is a regression benchmark suite for the hot paths of the sensor
+and the server. It times each function on fixed synthetic inputs, stores the
+results as a per-machine baseline and flags later runs that are slower than
+the baseline by more than a threshold.
+
+Benchmarks (per call, or per packet/flow/request where noted):
+- process_packet: a fixed capture of 4096 pre-dissected packets from 64
+  sources (SYN, HTTP and UDP), including the window closes it triggers
+- get_metrics: the HULK flow of detection.py (2502 packets) and a 10-packet flow
+- predict: AttackDetector.predict on the HULK sample and on rows of
+  DBDoS2025.csv (skipped if the model or the dataset is missing)
+- fetch_blacklist: a full refresh from an in-process ledger stand-in
+  (benchmarks/ledger.py, no delays) holding --registry attacks
+- the HTTP handlers of server.py (GET /blacklist, a delta GET, GET /metrics,
+  POST /blacklist/log), one request per connection like the sensor's sync
+
+Timing follows timeit: each benchmark is calibrated to run for at least
+--min-time seconds per repeat, and the median and minimum of --repeat repeats
+are kept. The sensor and the server both have a blacklist.py and share one metrics
+registry (common/instrumentation.py), so each side is measured in its own process.
+
+Baselines are stored in baselines/<machine>.json (the host name by default)
+and are only compared with runs on the same machine. compare exits with
+status 1 if any benchmark regressed, if a group's worker failed, or if a
+baseline benchmark within the selected groups and filters did not run, so it
+can gate a CI job.
+
+Usage:
+    python regression.py run --save-baseline                  # record this machine's baseline
+    python regression.py compare                              # run again and compare (10% threshold)
+    python regression.py compare --results results/regression.json --threshold 0.05
+    python regression.py run --filter predict --repeat 11
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(REPO_DIR, "benchmarks")
+BASELINE_DIR = os.path.join(BENCH_DIR, "baselines")
+RESULTS_JSON = os.path.join(BENCH_DIR, "results", "regression.json")
+MODEL_PATH = os.path.join(REPO_DIR, "DoSDetector", "models", "ownmodel")
+DATASET_PATH = os.path.join(REPO_DIR, "model", "DBDoS2025.csv")
+
+GROUPS = ("sensor", "server")
+
+# Fixed synthetic inputs
+CAPTURE_SOURCES = 64
+CAPTURE_PACKETS = 4096
+DATASET_ROWS = 256
+REGISTRY_SIZE = 1000
+SEED = 2025
+
+
+# ---------- Timing ----------
+
+def measure(function, ops=1, min_time=0.2, repeat=7):
+    """
+    Times `function` like timeit: the loop count is doubled until one repeat
+    takes at least `min_time`, then `repeat` repeats are run.
+
+    :param function: Callable without arguments
+    :param ops: Operations (packets, flows, requests) done by one call
+    :return: Median, minimum and spread of the time per operation, in microseconds
+    """
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        if time.perf_counter() - start >= min_time:
+            break
+        loops *= 2
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        times.append((time.perf_counter() - start) / (loops * ops) * 1e6)
+    return {
+        "median_us": round(statistics.median(times), 3),
+        "min_us": round(min(times), 3),
+        "stdev_us": round(statistics.stdev(times), 3) if len(times) > 1 else 0.0,
+        "loops": loops,
+        "ops": ops,
+        "repeat": repeat
+    }
+
+
+# ---------- Sensor benchmarks ----------
+
+def synthetic_capture():
+    """
+    A fixed capture: CAPTURE_PACKETS packets from CAPTURE_SOURCES sources over
+    three seconds, each source sending SYNs, HTTP requests or UDP datagrams.
+    Packets are built once and dissected from bytes, like captured packets.
+    """
+    from scapy.all import Ether, IP, TCP, UDP, Raw
+
+    rng = random.Random(SEED)
+    kinds = ("syn", "http", "udp")
+    packets = []
+    for i in range(CAPTURE_PACKETS):
+        source = i % CAPTURE_SOURCES
+        kind = kinds[source % len(kinds)]
+        ip = IP(src=f"10.1.{source // 256}.{source % 256}", dst="10.0.0.1")
+        if kind == "syn":
+            layer = TCP(sport=rng.randrange(1024, 65535), dport=8080, flags="S")
+        elif kind == "http":
+            layer = TCP(sport=40000 + source, dport=8080, flags="PA") / Raw(b"GET / HTTP/1.1\r\n" + b"x" * rng.randrange(0, 400))
+        else:
+            layer = UDP(sport=rng.randrange(1024, 65535), dport=53) / Raw(b"\0" * rng.randrange(16, 512))
+        packet = Ether(bytes(Ether() / ip / layer))
+        packet.time = 1_700_000_000 + 3.0 * i / CAPTURE_PACKETS
+        packets.append(packet)
+    return packets
+
+
+def synthetic_flow(extractor, packets):
+    """
+    A flow window as built by process_packet: `packets` forward packets within
+    one second, with lengths and flag counts in the proportions of the HULK sample.
+    """
+    from detection import HULK
+
+    extractor.reset_metrics_for_ip("flow")
+    flow = extractor.flows.pop("flow")
+    scale = packets / HULK['Total Fwd Packets']
+    lengths = (66, 66, 66, 74, 512)
+    flow['start_time'] = 0.0
+    flow['end_time'] = 0.999
+    flow['dest_ports'] = [8080] * packets
+    flow['fwd_packet_lengths'] = [lengths[i % len(lengths)] for i in range(packets)]
+    flow['fwd_times'] = [0.999 * i / max(packets - 1, 1) for i in range(packets)]
+    flow['fwd_iat_list'] = [t2 - t1 for t1, t2 in zip(flow['fwd_times'][:-1], flow['fwd_times'][1:])]
+    for key, feature in (('fin_flag_count', 'FIN Flag Count'), ('syn_flag_count', 'SYN Flag Count'),
+                         ('rst_flag_count', 'RST Flag Count'), ('psh_flag_count', 'PSH Flag Count'),
+                         ('ack_flag_count', 'ACK Flag Count'), ('fwd_psh_flags', 'Fwd PSH Flags')):
+        flow[key] = round(HULK[feature] * scale)
+    return flow
+
+
+def bench_sensor(args, selected):
+    """
+    process_packet, get_metrics and AttackDetector.predict.
+    """
+    sys.path.insert(0, os.path.join(REPO_DIR, "DoSDetector"))
+    from detection import AttackDetector, FEATURES, HULK
+    from metrics import MetricsExtractor
+
+    # Only the flow state is needed: no capture, model, logger or blacklist
+    extractor = MetricsExtractor.__new__(MetricsExtractor)
+    extractor.flows = {}
+    extractor.sliding = None
+    extractor.early_packets = None
+    extractor.early_interval = None
+
+    results = {}
+    if selected("process_packet"):
+        packets = synthetic_capture()
+
+        def process_capture():
+            extractor.flows = {}
+            for packet in packets:
+                extractor.process_packet(packet)
+
+        results["process_packet"] = measure(process_capture, len(packets), args.min_time, args.repeat)
+
+    for name, size in (("get_metrics[hulk]", HULK['Total Fwd Packets']), ("get_metrics[10]", 10)):
+        if selected(name):
+            flow = synthetic_flow(extractor, size)
+            results[name] = measure(lambda: extractor.get_metrics(flow), 1, args.min_time, args.repeat)
+
+    if not (selected("predict[hulk]") or selected("predict[dataset]")):
+        return results
+    if not os.path.exists(os.path.join(args.model, "model.pkl")):
+        print(f"[WARNING] No model.pkl in {args.model}; skipping predict")
+        return results
+    detector = AttackDetector(args.model, verbose=False)
+    if selected("predict[hulk]"):
+        results["predict[hulk]"] = measure(lambda: detector.predict(HULK), 1, args.min_time, args.repeat)
+    if selected("predict[dataset]") and not os.path.exists(args.dataset):
+        print(f"[WARNING] {args.dataset} not found; skipping predict[dataset]")
+    elif selected("predict[dataset]"):
+        import pandas as pd
+        dataset = pd.read_csv(args.dataset)
+        rows = dataset.sample(min(DATASET_ROWS, len(dataset)), random_state=SEED)[FEATURES].to_dict("records")
+
+        def predict_rows():
+            for row in rows:
+                detector.predict(row)
+
+        results["predict[dataset]"] = measure(predict_rows, len(rows), args.min_time, args.repeat)
+    return results
+
+
+# ---------- Server benchmarks ----------
+
+def bench_server(args, selected):
+    """
+    fetch_blacklist and the HTTP handlers of server.py, against an in-process
+    ledger stand-in.
+    """
+    sys.path.insert(0, os.path.join(REPO_DIR, "server"))
+    import blacklist
+    import ledger
+    import server
+
+    ledger.LedgerHandler.ledger = ledger.Ledger(block_time=0, submit_latency=0)
+    ledger.LedgerHandler.ledger.log_attacks([(f"10.2.{i // 256 % 256}.{i % 256}", "DoS Benchmark")
+                                             for i in range(args.registry)])
+    ledger_httpd = ledger.ThreadedHTTPServer(("127.0.0.1", 0), ledger.LedgerHandler)
+    threading.Thread(target=ledger_httpd.serve_forever, daemon=True).start()
+    blacklist.LEDGER_URL = f"http://127.0.0.1:{ledger_httpd.server_address[1]}"
+
+    class QuietHandler(server.SimpleRESTHandler):
+        def log_message(self, format, *args):
+            pass  # One line per request would flood the benchmark output
+
+    httpd = server.ThreadedHTTPServer(("127.0.0.1", 0), QuietHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    port = httpd.server_address[1]
+
+    def request(method, path, body=None):
+        connection = http.client.HTTPConnection("127.0.0.1", port)
+        connection.request(method, path, body=body, headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        response.read()
+        connection.close()
+        if response.status != 200:
+            raise RuntimeError(f"{method} {path} returned {response.status}")
+
+    results = {}
+    # fetch_blacklist prints one line per refresh
+    with open(os.devnull, "w") as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            blacklist.fetch_blacklist()
+            if selected("fetch_blacklist"):
+                results[f"fetch_blacklist[{args.registry}]"] = measure(blacklist.fetch_blacklist, 1,
+                                                                       args.min_time, args.repeat)
+            state = blacklist.get_blacklist_delta()
+            handlers = (
+                ("GET /blacklist", "GET", "/blacklist", None),
+                ("GET /blacklist delta", "GET", f"/blacklist?since={state['total']}&epoch={state['epoch']}", None),
+                ("GET /metrics", "GET", "/metrics", None),
+                ("POST /blacklist/log", "POST", "/blacklist/log",
+                 json.dumps({"ip": "10.3.0.1", "attack_type": "DoS Benchmark"}))
+            )
+            for name, method, path, body in handlers:
+                if selected(name):
+                    results[name] = measure(lambda: request(method, path, body), 1, args.min_time, args.repeat)
+        finally:
+            sys.stdout = stdout
+            httpd.shutdown()
+            ledger_httpd.shutdown()
+    return results
+
+
+def worker(args):
+    """
+    Runs one group in this process and writes its results to args.out.
+    """
+    selected = lambda name: not args.filter or any(text in name for text in args.filter)
+    results = bench_sensor(args, selected) if args.group == "sensor" else bench_server(args, selected)
+    with open(args.out, "w") as f:
+        json.dump(results, f)
+
+
+# ---------- Suite ----------
+
+def machine_info():
+    return {
+        "machine": platform.node(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version()
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=REPO_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_suite(args):
+    """
+    Runs every selected group in its own process.
+
+    Returns:
+        dict: commit, date, machine, the groups and filters run, the groups
+              whose worker failed and per-benchmark timings
+    """
+    benchmarks = {}
+    failed = []
+    for group in args.groups:
+        print(f"[INFO] Running the {group} benchmarks...")
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+            out = f.name
+        command = [sys.executable, os.path.abspath(__file__), "worker", group, "--out", out,
+                   "--min-time", str(args.min_time), "--repeat", str(args.repeat), "--model", args.model,
+                   "--dataset", args.dataset, "--registry", str(args.registry)]
+        if args.filter:
+            command += ["--filter", *args.filter]
+        try:
+            subprocess.run(command, check=True, cwd=BENCH_DIR)
+            with open(out) as f:
+                results = json.load(f)
+        except (subprocess.CalledProcessError, OSError, ValueError):
+            print(f"[ERROR] The {group} benchmarks failed")
+            failed.append(group)
+            results = {}
+        finally:
+            os.remove(out)
+        for name, timing in results.items():
+            timing["group"] = group
+            print(f"[OK] {name:<24} median {timing['median_us']:>12.3f} us | min {timing['min_us']:>12.3f} us")
+        benchmarks.update(results)
+    return {
+        "commit": git_commit(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "machine": machine_info(),
+        "selection": {"groups": list(args.groups), "filter": args.filter},
+        "failed_groups": failed,
+        "benchmarks": benchmarks
+    }
+
+
+def baseline_path(machine):
+    return os.path.join(BASELINE_DIR, f"{machine}.json")
+
+
+def save(results, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"[INFO] Results saved to '{path}'")
+
+
+def selected(results, name, timing):
+    """
+    Tells whether a baseline benchmark was part of the groups and filters of a run.
+    """
+    selection = results.get("selection", {})
+    group = timing.get("group")
+    if selection.get("groups") and group is not None and group not in selection["groups"]:
+        return False
+    return not selection.get("filter") or any(pattern in name for pattern in selection["filter"])
+
+
+def compare(current, baseline, threshold):
+    """
+    Prints the change of every benchmark against the baseline (medians).
+
+    Returns:
+        tuple: (names of the benchmarks slower than the baseline by more than
+               `threshold`, names of the selected baseline benchmarks missing
+               from the current results)
+    """
+    for key in ("python", "cpus", "processor"):
+        if current["machine"].get(key) != baseline["machine"].get(key):
+            print(f"[WARNING] The baseline was recorded with {key} {baseline['machine'].get(key)}, "
+                  f"this run uses {current['machine'].get(key)}")
+    print(f"\nBaseline {baseline['commit']} ({baseline['date']}) -> {current['commit']}, threshold {threshold:.0%}\n")
+    print(f"{'benchmark':<26}{'baseline us':>14}{'current us':>14}{'change':>10}")
+    regressions, missing = [], []
+    for name in sorted(set(baseline["benchmarks"]) | set(current["benchmarks"])):
+        before = baseline["benchmarks"].get(name)
+        after = current["benchmarks"].get(name)
+        if before is None:
+            print(f"{name:<26}{'new':>38}")
+            continue
+        if after is None:
+            if selected(current, name, before):
+                print(f"{name:<26}{'MISSING':>38}")
+                missing.append(name)
+            continue
+        change = after["median_us"] / before["median_us"] - 1
+        status = ""
+        if change > threshold:
+            status = "  REGRESSION"
+            regressions.append(name)
+        elif change < -threshold:
+            status = "  faster"
+        print(f"{name:<26}{before['median_us']:>14.3f}{after['median_us']:>14.3f}{change:>+10.1%}{status}")
+    return regressions, missing
+
+
+# ---------- MAIN ----------
+
+def main():
+    parser = argparse.ArgumentParser(description="Regression benchmarks for the sensor and server hot paths.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_suite_options(subparser):
+        subparser.add_argument("--groups", nargs="+", choices=GROUPS, default=list(GROUPS),
+                               help="Benchmark groups to run (default: all)")
+        subparser.add_argument("--filter", nargs="+", help="Only run benchmarks whose name contains one of these")
+        subparser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per repeat (default: 0.2)")
+        subparser.add_argument("--repeat", type=int, default=7, help="Repeats per benchmark (default: 7)")
+        subparser.add_argument("--model", default=MODEL_PATH, help="Model directory for predict")
+        subparser.add_argument("--dataset", default=DATASET_PATH, help="Labelled flows for predict[dataset]")
+        subparser.add_argument("--registry", type=int, default=REGISTRY_SIZE,
+                               help=f"Attacks on the ledger for fetch_blacklist (default: {REGISTRY_SIZE})")
+        subparser.add_argument("--machine", default=platform.node(),
+                               help="Baseline name (default: the host name)")
+
+    run_parser = subparsers.add_parser("run", help="Run the suite and save the results")
+    add_suite_options(run_parser)
+    run_parser.add_argument("--output", default=RESULTS_JSON, help="Where to save the results")
+    run_parser.add_argument("--save-baseline", action="store_true", help="Also store the results as this machine's baseline")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare with this machine's baseline")
+    add_suite_options(compare_parser)
+    compare_parser.add_argument("--results", help="Compare saved results instead of running the suite")
+    compare_parser.add_argument("--baseline", help="Baseline file (default: baselines/<machine>.json)")
+    compare_parser.add_argument("--threshold", type=float, default=0.10,
+                                help="Slowdown flagged as a regression (default: 0.10, i.e. 10%%)")
+
+    worker_parser = subparsers.add_parser("worker")  # Internal: one group in a fresh process
+    worker_parser.add_argument("group", choices=GROUPS)
+    worker_parser.add_argument("--out", required=True)
+    worker_parser.add_argument("--filter", nargs="+")
+    worker_parser.add_argument("--min-time", type=float, default=0.2)
+    worker_parser.add_argument("--repeat", type=int, default=7)
+    worker_parser.add_argument("--model", default=MODEL_PATH)
+    worker_parser.add_argument("--dataset", default=DATASET_PATH)
+    worker_parser.add_argument("--registry", type=int, default=REGISTRY_SIZE)
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        worker(args)
+        return
+
+    if args.command == "run":
+        results = run_suite(args)
+        save(results, args.output)
+        if args.save_baseline:
+            save(results, baseline_path(args.machine))
+        return
+
+    path = args.baseline or baseline_path(args.machine)
+    if not os.path.exists(path):
+        print(f"[ERROR] No baseline at '{path}'; record one with 'python regression.py run --save-baseline'")
+        sys.exit(2)
+    with open(path) as f:
+        baseline = json.load(f)
+    if args.results:
+        with open(args.results) as f:
+            current = json.load(f)
+    else:
+        current = run_suite(args)
+        save(current, RESULTS_JSON)
+    regressions, missing = compare(current, baseline, args.threshold)
+    failed = current.get("failed_groups", [])
+    if failed:
+        print(f"\n[ERROR] Benchmark group(s) failed: {', '.join(failed)}")
+    if missing:
+        print(f"\n[ERROR] {len(missing)} baseline benchmark(s) did not run: {', '.join(missing)}")
+    if regressions:
+        print(f"\n[ERROR] {len(regressions)} benchmark(s) regressed: {', '.join(regressions)}")
+    if failed or missing or regressions:
+        sys.exit(1)
+    print("\n[OK] No regressions")
+
+
+if __name__ == "__main__":
+    main()
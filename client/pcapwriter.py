@@ -0,0 +1,569 @@
+"""
+pcapwriter.py
+
+This module synthesizes the traffic of the client's generators offline and writes
+it to a pcap file, so the detector can be benchmarked and datasets generated
+without root privileges or a network.
+
+Packets are not built one by one. Every traffic class is described by
+conversation templates: the packets of one HTTP connection, one SYN or one
+datagram, each with its direction, TCP flags, payload and time offset. A
+capture repeats the templates with NumPy. Per-conversation values (start time,
+addresses, ports, sequence numbers) are broadcast over the template rows, and
+headers and checksums are computed column-wise. Whole chunks of records are
+written with one call, so ten million packets take seconds.
+
+Traffic of each class, as captured on the server (where the detector runs):
+- benign, hulk, postflood: one HTTP/1.0 connection per request, because the
+  server closes it after each response. Each has a handshake, the request,
+  the response and a FIN exchange. Requests are the client's (random HULK
+  query strings, POST bodies of `size` random bytes). Responses are sized like
+  the server's (front page, 404 JSON)
+- synflood: the spoofed SYN (built like Scapy's) and the server's SYN-ACK
+- udpflood: datagrams of `size` random bytes, with ICMP port-unreachable
+  errors limited to one per millisecond as Linux does
+Floods leave in sendmmsg() bursts, as they do from the live client. HTTP
+connections open at the paced rate. Rates can be constant or a profile
+(see scenario.py).
+
+Labels go to a sidecar '<capture>.labels.jsonl' in the ground-truth format of
+scenario.py: one record per stream with its class, sources, start and end time,
+and request and packet counts.
+
+Main components:
+- TrafficStream: one traffic class over a time interval
+- write_capture: merges streams in time order into a pcap and its labels
+
+Usage:
+    stream = TrafficStream("hulk", "192.168.1.140", 8080, duration=60, rate=2000)
+    write_capture("hulk.pcap", [stream], seed=1)
+"""
+
+import json
+import string
+import time
+
+import numpy as np
+
+# Default rates (requests or packets per second) when synthesizing offline
+PCAP_RATES = {"benign": 1, "hulk": 2000, "postflood": 1000, "synflood": 100000, "udpflood": 100000}
+
+# Default client address of each class (SYN floods are spoofed as in client.py)
+PCAP_SOURCES = {"benign": "192.168.1.10", "hulk": "192.168.1.20", "postflood": "192.168.1.30",
+                "synflood": "192.168.1.100", "udpflood": "192.168.1.40"}
+
+LABELS = {"benign": "BENIGN", "hulk": "HULK", "postflood": "POSTFLOOD", "synflood": "SYNFLOOD",
+          "udpflood": "UDPFLOOD"}
+
+CLIENT_MAC = np.frombuffer(bytes.fromhex("020000000001"), dtype=np.uint8)
+SERVER_MAC = np.frombuffer(bytes.fromhex("020000000002"), dtype=np.uint8)
+
+MSS = 1460
+RTT = 0.0005           # Client <-> server round trip (LAN)
+TURNAROUND = 0.00002   # Gap between packets sent back to back by one host
+BURST_GAP = 0.000002   # Gap between the packets of one sendmmsg() burst
+HTTP_JITTER = 0.00005  # Mean random delay added to paced HTTP connections
+ICMP_INTERVAL = 0.001  # Linux sends at most one ICMP error per millisecond
+POOL_SIZE = 256        # Distinct requests or payloads per stream
+BATCH_SIZE = 64
+
+# Seconds the server takes to answer each class (front page vs. 404)
+SERVICE_TIME = {"benign": 0.002, "hulk": 0.0005, "postflood": 0.0005}
+
+# Options of Linux SYN and SYN-ACK segments: MSS, SACK permitted, timestamps, window scale
+SYN_OPTIONS = bytes.fromhex("020405b40402080a000000010000000001030307")
+SYN_ACK_OPTIONS = bytes.fromhex("020405b40402080a000000020000000101030307")
+
+SERVER_HEADERS = "Server: BaseHTTP/0.6 Python/3.11\r\nDate: Mon, 19 Oct 2026 10:00:00 GMT\r\n"
+FRONT_PAGE_SIZE = 9767  # server/frontend/frontend.html
+NOT_FOUND_BODY = b'{"error": "Endpoint not found"}'
+
+# Records are built in chunks of at most this many packets / bytes
+CHUNK_PACKETS = 1 << 19
+CHUNK_BYTES = 64 << 20
+
+FIN, SYN, RST, PSH, ACK = 0x01, 0x02, 0x04, 0x08, 0x10
+TCP, UDP, ICMP = 6, 17, 1
+FWD, BWD = 0, 1
+
+# One row per packet of a conversation template
+TEMPLATE_DTYPE = np.dtype([
+    ("dir", "u1"), ("proto", "u1"), ("flags", "u1"),
+    ("seg", "i4"),        # Bytes after the L4 header (index in the segment pool, -1 for none)
+    ("opt", "u1"),        # How many of those bytes are TCP options
+    ("seq", "i8"), ("ack", "i8"),  # Offsets from the sender / receiver ISN (ack -1: no ACK)
+    ("t", "f8"), ("win", "u2"), ("df", "u1"), ("ipid", "i4")  # ipid -1: random
+])
+
+_RECORD = [("ts_sec", "<u4"), ("ts_usec", "<u4"), ("incl_len", "<u4"), ("orig_len", "<u4"),
+           ("eth_dst", "u1", (6,)), ("eth_src", "u1", (6,)), ("eth_type", ">u2")]
+_IP = [("vhl", "u1"), ("tos", "u1"), ("ip_len", ">u2"), ("ip_id", ">u2"), ("frag", ">u2"),
+       ("ttl", "u1"), ("ip_proto", "u1"), ("ip_sum", ">u2"), ("src", ">u4"), ("dst", ">u4")]
+TCP_DTYPE = np.dtype(_RECORD + _IP + [
+    ("sport", ">u2"), ("dport", ">u2"), ("seq", ">u4"), ("ack", ">u4"), ("doff", "u1"), ("flags", "u1"),
+    ("win", ">u2"), ("l4_sum", ">u2"), ("urg", ">u2")])
+UDP_DTYPE = np.dtype(_RECORD + _IP + [("sport", ">u2"), ("dport", ">u2"), ("ulen", ">u2"), ("l4_sum", ">u2")])
+# ICMP error quoting the IP header and the first 8 bytes (UDP header) of the datagram
+ICMP_DTYPE = np.dtype(_RECORD + _IP + [("icmp_type", "u1"), ("icmp_code", "u1"), ("l4_sum", ">u2"),
+                                       ("unused", ">u4")] +
+                      [("q_" + name, *rest) for name, *rest in _IP] +
+                      [("q_sport", ">u2"), ("q_dport", ">u2"), ("q_ulen", ">u2"), ("q_sum", ">u2")])
+HEADER_DTYPES = {TCP: TCP_DTYPE, UDP: UDP_DTYPE, ICMP: ICMP_DTYPE}
+RECORD_HEADER = 16
+
+PCAP_HEADER = np.array([(0xA1B2C3D4, 2, 4, 0, 0, 65535, 1)],
+                       dtype=[("magic", "<u4"), ("major", "<u2"), ("minor", "<u2"), ("zone", "<i4"),
+                              ("sigfigs", "<u4"), ("snaplen", "<u4"), ("linktype", "<u4")]).tobytes()
+
+
+def _ip_to_int(address):
+    a, b, c, d = (int(part) for part in address.split("."))
+    return (a << 24) | (b << 16) | (c << 8) | d
+
+
+def _fold(total):
+    """
+    One's complement of a 16-bit one's complement sum (vectorized).
+    """
+    for _ in range(3):
+        total = (total & 0xFFFF) + (total >> 16)
+    return (~total) & 0xFFFF
+
+
+def _words(value):
+    """
+    Sum of the two 16-bit halves of 32-bit values.
+    """
+    value = value.astype(np.uint64)
+    return (value >> 16) + (value & 0xFFFF)
+
+
+class _SegmentPool:
+    """
+    Payloads (and TCP options) shared by the templates, padded into one 2-D
+    array so they can be copied into records with a single row gather.
+    """
+
+    def __init__(self):
+        self.segments = []
+        self._index = {}
+
+    def add(self, data):
+        if data not in self._index:
+            self._index[data] = len(self.segments)
+            self.segments.append(data)
+        return self._index[data]
+
+    def freeze(self):
+        self.lengths = np.array([len(s) for s in self.segments] or [0], dtype=np.int64)
+        self.data = np.zeros((max(len(self.segments), 1), max(int(self.lengths.max()), 1)), dtype=np.uint8)
+        self.sums = np.zeros(len(self.data), dtype=np.uint64)
+        for i, segment in enumerate(self.segments):
+            self.data[i, :len(segment)] = np.frombuffer(segment, dtype=np.uint8)
+            padded = segment + b"\0" * (len(segment) % 2)
+            self.sums[i] = np.frombuffer(padded, dtype=">u2").sum(dtype=np.uint64)
+
+
+def _rows(*rows):
+    return np.array(list(rows), dtype=TEMPLATE_DTYPE)
+
+
+def _segments(data):
+    return [data[i:i + MSS] for i in range(0, len(data), MSS)] or [b""]
+
+
+class TrafficStream:
+    """
+    Traffic of one class between one set of sources and the target, over
+    [start, start + duration) seconds of capture time.
+    """
+
+    def __init__(self, kind, target_ip, port=8080, start=0.0, duration=60.0, rate=None, sources=None,
+                 size=None, batch_size=BATCH_SIZE, name=None):
+        """
+        :param kind: benign, hulk, postflood, synflood or udpflood
+        :param rate: Requests or packets per second, or a function of the seconds
+                     since the stream started (default: PCAP_RATES[kind])
+        :param sources: Client addresses, used in turn (default: PCAP_SOURCES[kind])
+        :param size: Payload bytes (UDP datagrams, POST bodies), or a (min, max) pair
+        :param name: Phase name written to the labels
+        """
+        if kind not in LABELS:
+            raise ValueError(f"Unknown traffic type '{kind}' (valid: {', '.join(LABELS)})")
+        self.kind = kind
+        self.target_ip = target_ip
+        self.port = port
+        self.start = start
+        self.duration = duration
+        self.rate = rate if rate is not None else PCAP_RATES[kind]
+        self.sources = list(sources or [PCAP_SOURCES[kind]])
+        self.size = size if size is not None else (1024 if kind == "udpflood" else 512)
+        self.batch_size = batch_size
+        self.name = name or kind
+        self._last_icmp_slot = -1.0
+
+    def _size(self, rng):
+        return int(rng.integers(self.size[0], self.size[1] + 1)) if isinstance(self.size, (list, tuple)) \
+            else int(self.size)
+
+    def _http_template(self, pool, request, response_head, response_body):
+        """
+        HTTP/1.0 connection: handshake, request, response, server-side close.
+        """
+        request_segments = _segments(request)
+        response_segments = [response_head] + _segments(response_body)
+        request_length = len(request)
+        response_length = sum(len(s) for s in response_segments)
+        rows = [
+            (FWD, TCP, SYN, pool.add(SYN_OPTIONS), len(SYN_OPTIONS), 0, -1, 0.0, 64240, 1, -1),
+            (BWD, TCP, SYN | ACK, pool.add(SYN_ACK_OPTIONS), len(SYN_ACK_OPTIONS), 0, 1, TURNAROUND, 65160, 1, 0),
+            (FWD, TCP, ACK, -1, 0, 1, 1, RTT, 502, 1, -1),
+        ]
+        t, offset = RTT, 1
+        for i, segment in enumerate(request_segments):
+            t += TURNAROUND
+            last = i == len(request_segments) - 1
+            rows.append((FWD, TCP, ACK | (PSH if last else 0), pool.add(segment), 0, offset, 1, t, 502, 1, -1))
+            offset += len(segment)
+        t += SERVICE_TIME[self.kind]
+        offset = 1
+        for segment in response_segments:
+            rows.append((BWD, TCP, PSH | ACK, pool.add(segment), 0, offset, 1 + request_length, t, 509, 1, -1))
+            offset += len(segment)
+            t += TURNAROUND
+        rows += [
+            (BWD, TCP, FIN | ACK, -1, 0, 1 + response_length, 1 + request_length, t, 509, 1, -1),
+            (FWD, TCP, ACK, -1, 0, 1 + request_length, 2 + response_length, t + RTT, 501, 1, -1),
+            (FWD, TCP, FIN | ACK, -1, 0, 1 + request_length, 2 + response_length, t + RTT + TURNAROUND, 501, 1, -1),
+            (BWD, TCP, ACK, -1, 0, 2 + response_length, 2 + request_length, t + 2 * RTT + TURNAROUND, 509, 1, 0),
+        ]
+        return _rows(*rows)
+
+    def templates(self, pool, rng):
+        """
+        Conversation templates of the stream; conversations pick one at random
+        (UDP floods: even indices without, odd indices with an ICMP error).
+        """
+        host = self.target_ip if self.port == 80 else f"{self.target_ip}:{self.port}"
+        if self.kind in SERVICE_TIME:
+            not_found = (f"HTTP/1.0 404 Not Found\r\n{SERVER_HEADERS}Content-Type: application/json\r\n\r\n").encode()
+            if self.kind == "benign":
+                request = (f"GET / HTTP/1.1\r\nHost: {host}\r\nUser-Agent: Mozilla/5.0\r\n"
+                           f"Accept: text/html\r\nConnection: keep-alive\r\n\r\n").encode()
+                head = f"HTTP/1.0 200 OK\r\n{SERVER_HEADERS}Content-Type: text/html\r\n\r\n".encode()
+                body = (b"<!DOCTYPE html>\n<html>" + b" " * FRONT_PAGE_SIZE)[:FRONT_PAGE_SIZE - 8] + b"</html>\n"
+                return [self._http_template(pool, request, head, body)]
+            letters = np.frombuffer(string.ascii_letters.encode(), dtype=np.uint8)
+            templates = []
+            for _ in range(POOL_SIZE):
+                if self.kind == "hulk":
+                    query = letters[rng.integers(0, len(letters), 8)].tobytes().decode()
+                    request = (f"GET /?{query} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: Mozilla/5.0\r\n"
+                               f"Accept: */*\r\nConnection: keep-alive\r\n\r\n").encode()
+                else:
+                    body = f"data={rng.bytes(self._size(rng)).hex()}".encode()
+                    request = (f"POST / HTTP/1.1\r\nHost: {host}\r\nUser-Agent: Mozilla/5.0\r\n"
+                               f"Content-Type: application/x-www-form-urlencoded\r\nContent-Length: {len(body)}\r\n"
+                               f"Connection: keep-alive\r\n\r\n").encode() + body
+                templates.append(self._http_template(pool, request, not_found, NOT_FOUND_BODY))
+            return templates
+
+        if self.kind == "synflood":
+            # Scapy's defaults: IP id 1, no DF, window 8192, no options
+            return [_rows((FWD, TCP, SYN, -1, 0, 0, -1, 0.0, 8192, 0, 1),
+                          (BWD, TCP, SYN | ACK, pool.add(SYN_ACK_OPTIONS), len(SYN_ACK_OPTIONS), 0, 1,
+                           TURNAROUND, 65160, 1, 0))]
+
+        templates = []
+        for _ in range(POOL_SIZE):
+            segment = pool.add(rng.bytes(self._size(rng)))
+            datagram = (FWD, UDP, 0, segment, 0, 0, -1, 0.0, 0, 1, -1)
+            templates += [_rows(datagram), _rows(datagram, (BWD, ICMP, 0, segment, 0, 0, -1, TURNAROUND, 0, 0, -1))]
+        return templates
+
+    def arrivals(self, rng):
+        """
+        Start time of every conversation, relative to the stream start.
+        """
+        if callable(self.rate):
+            step = 0.001
+            grid = np.arange(0.0, self.duration, step)
+            rates = np.array([max(self.rate(t), 0.0) for t in grid])
+            area = np.cumsum(rates * step)
+            count = int(area[-1]) if len(area) else 0
+            times = np.interp(np.arange(1, count + 1), area, grid + step)
+        else:
+            count = int(self.rate * self.duration)
+            rates = None
+            times = np.arange(count) / self.rate
+
+        if self.kind in ("synflood", "udpflood"):
+            # Bursts of up to batch_size packets, at most 10 ms of traffic each, as in client._flood()
+            local_rate = np.interp(times, grid, rates) if rates is not None else np.full(count, float(self.rate))
+            batch = np.clip((local_rate / 100).astype(np.int64), 1, self.batch_size)
+            index = np.arange(count)
+            position = index % batch
+            gap = np.minimum(BURST_GAP, 1 / np.maximum(local_rate, 1.0))
+            times = times[index - position] + position * gap
+        else:
+            times = times + rng.exponential(HTTP_JITTER, count)
+        return times[times < self.duration]
+
+    def conversations(self, rng, first, times, template_count):
+        """
+        Per-conversation values of `len(times)` conversations starting with
+        number `first` of the stream.
+
+        Returns:
+            dict: column name -> array
+        """
+        count = len(times)
+        index = np.arange(first, first + count)
+        sources = np.array([_ip_to_int(ip) for ip in self.sources], dtype=np.uint32)
+        columns = {
+            "time": self.start + times,
+            "client": sources[index % len(sources)],
+            "server": np.full(count, _ip_to_int(self.target_ip), dtype=np.uint32),
+            "server_port": np.full(count, self.port, dtype=np.uint16),
+            "server_isn": rng.integers(0, 1 << 32, count, dtype=np.uint64),
+        }
+        if self.kind in SERVICE_TIME:
+            # Ephemeral ports of the client, in turn as Linux assigns them
+            columns["client_port"] = (32768 + index % 28232).astype(np.uint16)
+            columns["client_isn"] = rng.integers(0, 1 << 32, count, dtype=np.uint64)
+            columns["template"] = rng.integers(0, template_count, count)
+        elif self.kind == "synflood":
+            columns["client_port"] = rng.integers(1024, 65536, count).astype(np.uint16)
+            columns["client_isn"] = rng.integers(1000, 9001, count).astype(np.uint64)
+            columns["template"] = np.zeros(count, dtype=np.int64)
+        else:
+            columns["client_port"] = rng.integers(1024, 65536, count).astype(np.uint16)
+            columns["client_isn"] = np.zeros(count, dtype=np.uint64)
+            # One ICMP error per millisecond: the first datagram of each millisecond gets it
+            slot = np.floor(columns["time"] / ICMP_INTERVAL)
+            previous = np.concatenate(([self._last_icmp_slot], slot[:-1]))
+            if count:
+                self._last_icmp_slot = slot[-1]
+            columns["template"] = 2 * rng.integers(0, template_count // 2, count) + (slot != previous)
+        return columns
+
+
+def _expand(conversations, stream_ids, table, first, lengths):
+    """
+    Turns conversations into packets by broadcasting them over their template rows.
+    """
+    template = conversations["template"]
+    counts = lengths[template]
+    conversation = np.repeat(np.arange(len(template)), counts)
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    rows = table[np.repeat(first[template], counts) + np.arange(len(conversation)) - starts]
+
+    fwd = rows["dir"] == FWD
+    take = {name: values[conversation] for name, values in conversations.items()}
+    packets = {
+        "time": take["time"] + rows["t"],
+        "stream": stream_ids[conversation],
+        "proto": rows["proto"], "flags": rows["flags"], "seg": rows["seg"], "opt": rows["opt"],
+        "win": rows["win"], "df": rows["df"], "ipid": rows["ipid"], "fwd": fwd,
+        "src": np.where(fwd, take["client"], take["server"]),
+        "dst": np.where(fwd, take["server"], take["client"]),
+        # ICMP errors quote the datagram, so they keep its ports
+        "sport": np.where(fwd | (rows["proto"] == ICMP), take["client_port"], take["server_port"]),
+        "dport": np.where(fwd | (rows["proto"] == ICMP), take["server_port"], take["client_port"]),
+    }
+    own_isn = np.where(fwd, take["client_isn"], take["server_isn"])
+    peer_isn = np.where(fwd, take["server_isn"], take["client_isn"])
+    packets["seq"] = (own_isn + rows["seq"].astype(np.uint64)) & 0xFFFFFFFF
+    packets["ack"] = np.where(rows["ack"] < 0, 0, (peer_isn + np.maximum(rows["ack"], 0).astype(np.uint64)) & 0xFFFFFFFF)
+    return packets
+
+
+def _encode(packets, pool, rng):
+    """
+    Builds the pcap records (record header and frame) of time-sorted packets.
+
+    Returns:
+        numpy.ndarray: The records, concatenated, as bytes
+    """
+    count = len(packets["time"])
+    proto = packets["proto"]
+    segment = packets["seg"]
+    has_payload = (segment >= 0) & (proto != ICMP)
+    payload = np.where(has_payload, pool.lengths[np.maximum(segment, 0)], 0)
+    header = np.select([proto == TCP, proto == UDP], [TCP_DTYPE.itemsize, UDP_DTYPE.itemsize], ICMP_DTYPE.itemsize)
+    record_length = header + payload
+    width = int(record_length.max())
+    records = np.zeros((count, width), dtype=np.uint8)
+
+    seconds = np.floor(packets["time"])
+    microseconds = np.minimum(np.round((packets["time"] - seconds) * 1e6), 999999)
+    src, dst = packets["src"], packets["dst"]
+    ip_id = np.where(packets["ipid"] >= 0, packets["ipid"], rng.integers(0, 1 << 16, count)).astype(np.uint64)
+    fragment = packets["df"].astype(np.uint64) * 0x4000
+
+    for number, dtype in HEADER_DTYPES.items():
+        selected = np.flatnonzero(proto == number)
+        if not len(selected):
+            continue
+        fwd = packets["fwd"][selected]
+        frames = np.zeros(len(selected), dtype=dtype)
+        frame_length = record_length[selected] - RECORD_HEADER
+        ip_length = (frame_length - 14).astype(np.uint64)
+        frames["ts_sec"], frames["ts_usec"] = seconds[selected], microseconds[selected]
+        frames["incl_len"] = frames["orig_len"] = frame_length
+        frames["eth_dst"], frames["eth_src"] = SERVER_MAC, CLIENT_MAC
+        frames["eth_dst"][~fwd], frames["eth_src"][~fwd] = CLIENT_MAC, SERVER_MAC
+        frames["eth_type"] = 0x0800
+        frames["vhl"], frames["ttl"], frames["ip_proto"] = 0x45, 64, number
+        frames["ip_len"], frames["ip_id"], frames["frag"] = ip_length, ip_id[selected], fragment[selected]
+        frames["src"], frames["dst"] = src[selected], dst[selected]
+        frames["ip_sum"] = _fold(0x4500 + ip_length + ip_id[selected] + fragment[selected] + (64 << 8) + number +
+                                 _words(src[selected]) + _words(dst[selected]))
+        sport = packets["sport"][selected].astype(np.uint64)
+        dport = packets["dport"][selected].astype(np.uint64)
+        sums = pool.sums[np.maximum(segment[selected], 0)] * (segment[selected] >= 0)
+
+        if number == TCP:
+            seq, ack = packets["seq"][selected], packets["ack"][selected]
+            flags, win = packets["flags"][selected].astype(np.uint64), packets["win"][selected].astype(np.uint64)
+            offset = (5 + packets["opt"][selected].astype(np.uint64) // 4) << 4
+            frames["sport"], frames["dport"], frames["seq"], frames["ack"] = sport, dport, seq, ack
+            frames["doff"], frames["flags"], frames["win"] = offset, flags, win
+            frames["l4_sum"] = _fold(_words(src[selected]) + _words(dst[selected]) + TCP + (ip_length - 20) +
+                                     sport + dport + _words(seq) + _words(ack) + (offset << 8) + flags + win + sums)
+        elif number == UDP:
+            length = ip_length - 20
+            frames["sport"], frames["dport"], frames["ulen"] = sport, dport, length
+            checksum = _fold(_words(src[selected]) + _words(dst[selected]) + UDP + 2 * length + sport + dport + sums)
+            frames["l4_sum"] = np.where(checksum == 0, 0xFFFF, checksum)
+        else:
+            # The quoted datagram went the other way (client -> server)
+            quoted_length = (pool.lengths[segment[selected]] + 8).astype(np.uint64)
+            quoted_ip_length = quoted_length + 20
+            quoted_id = rng.integers(0, 1 << 16, len(selected)).astype(np.uint64)
+            quoted_src, quoted_dst = dst[selected], src[selected]
+            udp_sum = _fold(_words(quoted_src) + _words(quoted_dst) + UDP + 2 * quoted_length + sport + dport + sums)
+            udp_sum = np.where(udp_sum == 0, 0xFFFF, udp_sum)
+            ip_sum = _fold(0x4500 + quoted_ip_length + quoted_id + 0x4000 + (64 << 8) + UDP +
+                           _words(quoted_src) + _words(quoted_dst))
+            frames["icmp_type"], frames["icmp_code"] = 3, 3
+            frames["q_vhl"], frames["q_ttl"], frames["q_ip_proto"], frames["q_frag"] = 0x45, 64, UDP, 0x4000
+            frames["q_ip_len"], frames["q_ip_id"], frames["q_ip_sum"] = quoted_ip_length, quoted_id, ip_sum
+            frames["q_src"], frames["q_dst"] = quoted_src, quoted_dst
+            frames["q_sport"], frames["q_dport"], frames["q_ulen"], frames["q_sum"] = sport, dport, quoted_length, udp_sum
+            frames["l4_sum"] = _fold(0x0303 + 0x4500 + quoted_ip_length + quoted_id + 0x4000 + (64 << 8) + UDP +
+                                     ip_sum + _words(quoted_src) + _words(quoted_dst) + sport + dport +
+                                     quoted_length + udp_sum)
+
+        records[selected, :dtype.itemsize] = frames.view(np.uint8).reshape(len(selected), dtype.itemsize)
+        with_payload = selected[has_payload[selected]]
+        if len(with_payload):
+            columns = min(pool.data.shape[1], width - dtype.itemsize)
+            records[with_payload, dtype.itemsize:dtype.itemsize + columns] = pool.data[segment[with_payload], :columns]
+
+    return records[np.arange(width) < record_length[:, None]]
+
+
+def _concat(parts):
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+
+def _take(packets, selected):
+    return {name: values[selected] for name, values in packets.items()}
+
+
+def write_capture(path, streams, seed=0, start_time=None, labels_path=None, target_url=None):
+    """
+    Synthesizes the streams into one time-ordered pcap file and writes the
+    labels sidecar.
+
+    Args:
+        streams (list): TrafficStream objects (they may overlap in time)
+        seed (int): Seed of every random choice; the same seed writes the same capture
+        start_time (float): Epoch time of the capture start (default: now)
+        labels_path (str): Sidecar path (default: '<path>.labels.jsonl')
+        target_url (str): Target written to the labels
+
+    Returns:
+        list: Label records, one per stream
+    """
+    start_time = float(int(time.time())) if start_time is None else start_time
+    labels_path = labels_path or path + ".labels.jsonl"
+    pool = _SegmentPool()
+    rngs = [np.random.default_rng([seed, i]) for i in range(len(streams))]
+
+    # Templates of every stream in one table, addressed by (first row, length)
+    tables, base, template_counts = [], [], []
+    for stream, rng in zip(streams, rngs):
+        stream._last_icmp_slot = -1.0
+        templates = stream.templates(pool, rng)
+        base.append(len(tables))
+        template_counts.append(len(templates))
+        tables += templates
+    pool.freeze()
+    lengths = np.array([len(t) for t in tables], dtype=np.int64)
+    first = np.cumsum(lengths) - lengths
+    table = np.concatenate(tables)
+
+    # Conversation start times of all streams, merged in time order
+    arrivals = [stream.arrivals(rng) + stream.start for stream, rng in zip(streams, rngs)]
+    merged = np.concatenate(arrivals)
+    order = np.argsort(merged, kind="stable")
+    merged = merged[order]
+    stream_of = np.concatenate([np.full(len(a), i, dtype=np.int64) for i, a in enumerate(arrivals)])[order]
+    position = np.zeros(len(streams), dtype=np.int64)  # Conversations consumed per stream
+
+    widest = ICMP_DTYPE.itemsize + int(pool.lengths.max())
+    chunk = max(1, min(CHUNK_PACKETS, CHUNK_BYTES // widest) // int(lengths.max()))
+    encode_rng = np.random.default_rng([seed, len(streams)])
+    packet_counts = np.zeros(len(streams), dtype=np.int64)
+    pending = None
+    with open(path, "wb") as f:
+        f.write(PCAP_HEADER)
+        for begin in range(0, len(order), chunk):
+            ids = stream_of[begin:begin + chunk]
+            parts = []
+            for i, stream in enumerate(streams):
+                taken = int(np.count_nonzero(ids == i))
+                if not taken:
+                    continue
+                times = arrivals[i][position[i]:position[i] + taken] - stream.start
+                columns = stream.conversations(rngs[i], position[i], times, template_counts[i])
+                columns["template"] = columns["template"] + base[i]
+                columns["stream"] = np.full(taken, i, dtype=np.int64)
+                parts.append(columns)
+                position[i] += taken
+            conversations = _concat(parts)
+            packets = _expand(conversations, conversations.pop("stream"), table, first, lengths)
+            if pending is not None:
+                packets = _concat([pending, packets])
+            packets = _take(packets, np.argsort(packets["time"], kind="stable"))
+
+            # Packets after the next conversation starts wait for the next chunk
+            boundary = merged[begin + chunk] if begin + chunk < len(merged) else np.inf
+            ready = int(np.searchsorted(packets["time"], boundary))
+            pending = _take(packets, slice(ready, None))
+            packets = _take(packets, slice(0, ready))
+            if ready:
+                packets["time"] = packets["time"] + start_time
+                _encode(packets, pool, encode_rng).tofile(f)
+                packet_counts += np.bincount(packets["stream"], minlength=len(streams))
+
+    labels = []
+    for i, stream in enumerate(streams):
+        labels.append({
+            "event": "traffic", "phase": stream.name, "entry": i, "worker": 0, "type": stream.kind,
+            "label": LABELS[stream.kind], "sources": stream.sources, "target": target_url or stream.target_ip,
+            "rate": None if callable(stream.rate) else stream.rate,
+            "planned_start": start_time + stream.start, "planned_end": start_time + stream.start + stream.duration,
+            "start": start_time + stream.start, "end": start_time + stream.start + stream.duration,
+            "sent": int(position[i]), "achieved_rate": round(position[i] / stream.duration, 1), "errors": 0,
+            "packets": int(packet_counts[i])
+        })
+    with open(labels_path, "w") as f:
+        f.write(json.dumps({"event": "scenario", "name": path, "seed": seed, "workers": 1, "target": target_url,
+                            "start": start_time, "end": start_time + max(s.start + s.duration for s in streams),
+                            "capture": path}) + "\n")
+        for record in labels:
+            f.write(json.dumps(record) + "\n")
+    return labels
@@ -0,0 +1,484 @@
+"""
+scenario.py
+
+This script runs deterministic traffic scenarios against the detector and writes
+the ground truth of what was sent, so detection precision and time-to-detect
+can be computed afterwards instead of being read off the logs by hand.
+
+A scenario (JSON, or YAML when PyYAML is installed) is a list of timed phases.
+Each phase runs one or more traffic entries at the same time, every one with its
+own attack class, rate profile, source addresses and payload sizes:
+
+    {
+      "name": "syn-ramp",
+      "seed": 7,
+      "target": "http://192.168.1.140:8080",
+      "phases": [
+        {"name": "baseline", "duration": 20, "traffic": [{"type": "benign", "rate": 2}]},
+        {"name": "ramp", "duration": 40, "traffic": [
+          {"type": "benign", "rate": 2},
+          {"type": "synflood", "rate": {"from": 100, "to": 20000, "curve": "linear"},
+           "sources": "10.66.0.0/29"}
+        ]}
+      ]
+    }
+
+Phase fields: name, duration (seconds), start (offset from the scenario start;
+default: when the previous phase ends, so phases can also overlap) and traffic.
+Traffic fields:
+- type: benign, hulk, postflood, synflood or udpflood
+- rate: requests or packets per second, either a number or a profile:
+  {"from": a, "to": b, "curve": "linear" | "exponential" | "step", "steps": n}
+  or {"points": [[seconds, rate], ...]} (piecewise linear); no rate means as
+  fast as possible
+- sources: CIDR block or list of IPv4 addresses. SYN and UDP floods spoof
+  them on a raw socket (root); HTTP traffic binds its connections to them, so
+  they must be assigned to this host. Default: the address used to reach the
+  target (SPOOFED_SRC for SYN floods)
+- size: payload bytes (UDP datagrams, POST bodies), a number or [min, max]
+- concurrency (HTTP), batch (floods) and port (floods)
+
+All random content (source ports, query strings, payloads) comes from
+generators seeded with the scenario seed, the phase and the entry, so two runs
+send the same packets. With --workers N, every entry is split over N processes
+(rate and concurrency divided by N, sources dealt round-robin); all workers
+start each phase at the same wall-clock time.
+
+The ground truth is a JSON Lines file: a 'scenario' line (the scenario itself
+and its start time), then one 'traffic' line per entry and worker with the
+class label, the sources, the actual start/end times (epoch seconds, the clock
+of the detector's records) and the achieved rate.
+
+Main components:
+- load_scenario: reads and validates a scenario file
+- rate_profile: turns a rate specification into a function of time
+- run_scenario: runs the phases and writes the ground truth
+- write_scenario_pcap: synthesizes the scenario into a labelled capture instead
+- score: matches detector flow records (metrics.py --records) with the ground truth
+
+Usage:
+    python scenario.py run scenarios/mixed_incident.json --url http://192.168.1.140:8080 --workers 4
+    python scenario.py pcap scenarios/mixed_incident.json incident.pcap
+    python scenario.py score ground_truth.jsonl --records ../DoSDetector/flows
+"""
+
+import argparse
+import ipaddress
+import json
+import math
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import client
+
+# Attack class of each traffic type, as labelled by the detector
+LABELS = {"benign": "BENIGN", "hulk": "HULK", "postflood": "POSTFLOOD", "synflood": "SYNFLOOD",
+          "udpflood": "UDPFLOOD"}
+HTTP_TYPES = ("benign", "hulk", "postflood")
+
+GROUND_TRUTH_PATH = "ground_truth.jsonl"
+
+# Seconds before the first phase, so every worker is ready when it starts
+START_DELAY = 2.0
+
+# Verdicts up to this many seconds after an entry ends still belong to it
+# (the detector reports a window after it closes)
+SCORE_GRACE = 2.0
+
+
+# ---------- Scenario files ----------
+
+def load_scenario(path):
+    """
+    Reads a JSON or YAML scenario and fills in the phase start times.
+
+    Raises:
+        ValueError: If the scenario is not valid
+    """
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("YAML scenarios need PyYAML (pip install pyyaml); use JSON otherwise")
+            scenario = yaml.safe_load(f)
+        else:
+            scenario = json.load(f)
+
+    if not isinstance(scenario, dict) or not scenario.get("phases"):
+        raise ValueError("A scenario needs a non-empty 'phases' list")
+    scenario.setdefault("name", os.path.splitext(os.path.basename(path))[0])
+    scenario.setdefault("seed", 0)
+
+    offset = 0.0
+    for i, phase in enumerate(scenario["phases"]):
+        phase.setdefault("name", f"phase{i}")
+        if not phase.get("duration", 0) > 0:
+            raise ValueError(f"Phase '{phase['name']}' needs a positive duration")
+        phase.setdefault("start", offset)
+        offset = phase["start"] + phase["duration"]
+        for entry in phase.get("traffic", []):
+            if entry.get("type") not in LABELS:
+                raise ValueError(f"Phase '{phase['name']}': unknown traffic type {entry.get('type')!r} "
+                                 f"(valid: {', '.join(LABELS)})")
+            rate_profile(entry.get("rate"), phase["duration"])  # Fails early on bad profiles
+            expand_sources(entry.get("sources"))
+    return scenario
+
+
+def rate_profile(spec, duration, scale=1.0):
+    """
+    Turns a rate specification into a number (constant rate), a function of
+    the seconds since the entry started (profile) or None (unlimited).
+
+    Raises:
+        ValueError: If the specification is not valid
+    """
+    if spec is None:
+        return None
+    if isinstance(spec, (int, float)):
+        if spec <= 0:
+            raise ValueError(f"Rates must be positive, got {spec}")
+        return spec * scale
+
+    if "points" in spec:
+        points = sorted((float(t), max(float(rate), 0.0) * scale) for t, rate in spec["points"])
+        if not points:
+            raise ValueError("A 'points' profile needs at least one point")
+
+        def profile(t):
+            if t <= points[0][0]:
+                return points[0][1]
+            for (t0, r0), (t1, r1) in zip(points, points[1:]):
+                if t < t1:
+                    return r0 + (r1 - r0) * (t - t0) / (t1 - t0)
+            return points[-1][1]
+        return profile
+
+    try:
+        start, end = max(float(spec["from"]), 0.0) * scale, max(float(spec["to"]), 0.0) * scale
+    except KeyError:
+        raise ValueError(f"A rate profile needs 'from' and 'to' (or 'points'): {spec}")
+    curve = spec.get("curve", "linear")
+    if curve == "linear":
+        return lambda t: start + (end - start) * min(t / duration, 1.0)
+    if curve == "exponential":
+        if start <= 0 or end <= 0:
+            raise ValueError("Exponential ramps need positive 'from' and 'to' rates")
+        return lambda t: start * (end / start) ** min(t / duration, 1.0)
+    if curve == "step":
+        steps = int(spec.get("steps", 5))
+        if steps < 2:
+            raise ValueError("Step ramps need at least 2 steps")
+        return lambda t: start + (end - start) * min(int(t / duration * steps), steps - 1) / (steps - 1)
+    raise ValueError(f"Unknown ramp curve '{curve}' (valid: linear, exponential, step)")
+
+
+def expand_sources(spec):
+    """
+    List of IPv4 addresses of a CIDR block or list (None if not given).
+    """
+    if not spec:
+        return None
+    if isinstance(spec, str):
+        network = ipaddress.ip_network(spec, strict=False)
+        return [str(ip) for ip in (network.hosts() if network.num_addresses > 2 else network)]
+    return [str(ipaddress.ip_address(ip)) for ip in spec]
+
+
+def _local_address(host):
+    """
+    Address this host uses to reach the target (no packet is sent).
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.connect((host, 9))
+        return sock.getsockname()[0]
+
+
+# ---------- Execution ----------
+
+def _run_entry(scenario, target_url, phase, index, entry, worker, workers, start_at, results):
+    """
+    Runs one traffic entry of one worker: waits for the phase start, sends,
+    and appends the ground-truth record to `results`.
+    """
+    kind = entry["type"]
+    rng = random.Random(f"{scenario['seed']}:{phase['name']}:{index}:{worker}")
+    sources = expand_sources(entry.get("sources"))
+    if sources and len(sources) >= workers:
+        sources = sources[worker::workers]
+    rate = rate_profile(entry.get("rate"), phase["duration"], 1 / workers)
+    tag = f"{phase['name']}/{kind}" + (f"#{worker}" if workers > 1 else "")
+
+    planned_start = start_at + phase["start"]
+    time.sleep(max(0.0, planned_start - time.time()))
+    started = time.time()
+    try:
+        if kind in HTTP_TYPES:
+            concurrency = math.ceil(entry.get("concurrency", client.CONCURRENCY[kind]) / workers)
+            if kind == "benign":
+                summary = client.benign_attack(target_url, phase["duration"], rate, concurrency, sources, tag=tag)
+            elif kind == "hulk":
+                summary = client.hulk_attack(target_url, phase["duration"], rate, concurrency, sources, rng, tag=tag)
+            else:
+                summary = client.postflood_attack(target_url, phase["duration"], rate, concurrency, sources,
+                                                  entry.get("size", 512), rng, tag=tag)
+        else:
+            batch_size = entry.get("batch", client.BATCH_SIZE)
+            if kind == "synflood":
+                summary = client.synflood_attack(target_url, phase["duration"], rate, batch_size, sources,
+                                                 entry.get("port", client.SYN_PORT), rng, tag=tag)
+            else:
+                summary = client.udpflood_attack(target_url, phase["duration"], rate, batch_size, sources,
+                                                 entry.get("port", client.UDP_PORT), entry.get("size", 1024), rng, tag=tag)
+    except Exception as e:
+        # e.g. raw sockets without root, or source addresses not assigned to this host
+        print(f"[ERROR] {tag}: {e}")
+        summary = {"sent": 0, "rate": 0.0, "errors": 1}
+
+    if not sources:
+        host = socket.gethostbyname(urlsplit(target_url).hostname)
+        sources = [client.SPOOFED_SRC] if kind == "synflood" else [_local_address(host)]
+    results.append({
+        "event": "traffic", "phase": phase["name"], "entry": index, "worker": worker,
+        "type": kind, "label": LABELS[kind], "sources": sources, "target": target_url,
+        "rate": entry.get("rate"), "planned_start": planned_start,
+        "planned_end": planned_start + phase["duration"], "start": started, "end": time.time(),
+        "sent": summary["sent"], "achieved_rate": round(summary["rate"], 1), "errors": summary["errors"]
+    })
+
+
+def _run_worker(scenario, target_url, worker, workers, start_at):
+    """
+    Runs every entry of every phase for one worker, each on its own thread.
+
+    Returns:
+        list: Ground-truth records of this worker
+    """
+    results = []
+    threads = [threading.Thread(target=_run_entry, name=f"{phase['name']}-{index}", daemon=True,
+                                args=(scenario, target_url, phase, index, entry, worker, workers, start_at, results))
+               for phase in scenario["phases"] for index, entry in enumerate(phase.get("traffic", []))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def run_scenario(scenario, target_url, workers=1, truth_path=GROUND_TRUTH_PATH):
+    """
+    Runs a scenario in this process (workers=1) or split across worker
+    processes, and writes the ground truth.
+
+    Returns:
+        list: Ground-truth traffic records, sorted by start time
+    """
+    start_at = time.time() + START_DELAY
+    total = max(phase["start"] + phase["duration"] for phase in scenario["phases"])
+    print(f"[INFO] Scenario '{scenario['name']}': {len(scenario['phases'])} phases, {total:g}s, "
+          f"{workers} worker(s), seed {scenario['seed']}")
+    if workers == 1:
+        records = _run_worker(scenario, target_url, 0, 1, start_at)
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            shards = pool.starmap(_run_worker, [(scenario, target_url, worker, workers, start_at)
+                                                for worker in range(workers)])
+        records = [record for shard in shards for record in shard]
+    records.sort(key=lambda record: (record["start"], record["phase"], record["entry"], record["worker"]))
+
+    with open(truth_path, "w") as f:
+        f.write(json.dumps({"event": "scenario", "name": scenario["name"], "seed": scenario["seed"],
+                            "workers": workers, "target": target_url, "start": start_at,
+                            "end": time.time(), "scenario": scenario}) + "\n")
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    print(f"[INFO] Ground truth saved to '{truth_path}' ({len(records)} traffic records)")
+    return records
+
+
+def write_scenario_pcap(scenario, target_url, path):
+    """
+    Synthesizes the whole scenario into a pcap file and its labels instead
+    of sending it (see pcapwriter.py). Entries without a rate use
+    pcapwriter.PCAP_RATES.
+
+    Returns:
+        list: The label records (ground truth) of the capture
+    """
+    from pcapwriter import TrafficStream, write_capture
+
+    url = urlsplit(target_url)
+    host = socket.gethostbyname(url.hostname)
+    streams = []
+    for phase in scenario["phases"]:
+        for entry in phase.get("traffic", []):
+            kind = entry["type"]
+            port = (url.port or 80) if kind in HTTP_TYPES else \
+                entry.get("port", client.SYN_PORT if kind == "synflood" else client.UDP_PORT)
+            streams.append(TrafficStream(kind, host, port, phase["start"], phase["duration"],
+                                         rate_profile(entry.get("rate"), phase["duration"]),
+                                         expand_sources(entry.get("sources")), entry.get("size"),
+                                         entry.get("batch", client.BATCH_SIZE), phase["name"]))
+    labels = write_capture(path, streams, scenario["seed"], target_url=target_url)
+    print(f"[INFO] {sum(record['packets'] for record in labels):,} packets written to '{path}' "
+          f"(labels: '{path}.labels.jsonl')")
+    return labels
+
+
+# ---------- Scoring ----------
+
+def load_ground_truth(path):
+    """
+    Returns the traffic records of a ground-truth file.
+    """
+    with open(path) as f:
+        return [record for record in map(json.loads, f) if record.get("event") == "traffic"]
+
+
+def _load_verdicts(records_dir):
+    """
+    (timestamp, source, label) of every flow record of the detector.
+    """
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "DoSDetector"))
+    from flowrecords import read_records
+    from detection import LABEL_MAP
+
+    rows = read_records(records_dir, include_partial=True)
+    return [(float(row["timestamp"]), row["src"].decode(), LABEL_MAP.get(int(row["prediction"]), "UNKNOWN"))
+            for row in rows]
+
+
+def score(truth, verdicts, grace=SCORE_GRACE):
+    """
+    Matches detector verdicts with the ground truth by source address and time.
+
+    An attack verdict is a true positive when an attack entry of that source
+    was running (or had ended less than `grace` seconds before), and counts as
+    correctly classified when its label is one of those entries' labels.
+    Verdicts on sources that are not in the ground truth are reported apart.
+
+    Returns:
+        dict: precision, recall, class accuracy, counts and the time to detect
+        of every attack entry
+    """
+    by_source = {}
+    for record in truth:
+        for source in record["sources"]:
+            by_source.setdefault(source, []).append(record)
+
+    counts = dict(tp=0, fp=0, fn=0, tn=0, correct_class=0, outside=0)
+    first_hit = {}  # (phase, entry) -> first attack verdict
+    for timestamp, source, label in sorted(verdicts):
+        running = [record for record in by_source.get(source, ())
+                   if record["start"] <= timestamp <= record["end"] + grace]
+        if not running:
+            counts["outside"] += 1
+            continue
+        attacks = [record for record in running if record["label"] != "BENIGN"]
+        if label == "BENIGN":
+            counts["fn" if attacks else "tn"] += 1
+        elif not attacks:
+            counts["fp"] += 1
+        else:
+            counts["tp"] += 1
+            matching = [record for record in attacks if record["label"] == label]
+            counts["correct_class"] += bool(matching)
+            # Credit the entry of the predicted class, and one still running over one that just ended
+            candidates = matching or attacks
+            candidates = [record for record in candidates if timestamp <= record["end"]] or candidates
+            for record in candidates:
+                first_hit.setdefault((record["phase"], record["entry"]), timestamp)
+
+    # The shards of an entry split over several workers are reported together
+    entries = {}
+    for record in truth:
+        if record["label"] != "BENIGN":
+            entry = entries.setdefault((record["phase"], record["entry"]), dict(
+                phase=record["phase"], entry=record["entry"], label=record["label"], start=record["start"],
+                achieved_rate=0.0))
+            entry["start"] = min(entry["start"], record["start"])
+            entry["achieved_rate"] += record["achieved_rate"]
+    detections = []
+    for key, entry in entries.items():
+        hit = first_hit.get(key)
+        detections.append(dict(entry, achieved_rate=round(entry["achieved_rate"], 1),
+                               time_to_detect=round(hit - entry["start"], 3) if hit is not None else None))
+
+    flagged = counts["tp"] + counts["fp"]
+    attack_verdicts = counts["tp"] + counts["fn"]
+    return dict(counts,
+                precision=counts["tp"] / flagged if flagged else None,
+                recall=counts["tp"] / attack_verdicts if attack_verdicts else None,
+                class_accuracy=counts["correct_class"] / counts["tp"] if counts["tp"] else None,
+                detections=detections)
+
+
+def print_score(result):
+    def percent(value):
+        return "n/a" if value is None else f"{100 * value:.1f}%"
+
+    print(f"Verdicts: {result['tp']} TP, {result['fp']} FP, {result['fn']} FN, {result['tn']} TN, "
+          f"{result['outside']} outside the scenario")
+    print(f"Precision: {percent(result['precision'])} | Recall: {percent(result['recall'])} | "
+          f"Correct class: {percent(result['class_accuracy'])}")
+    for detection in result["detections"]:
+        ttd = "not detected" if detection["time_to_detect"] is None else f"{detection['time_to_detect']:.3f}s"
+        print(f"  {detection['phase']:<16} {detection['label']:<10} "
+              f"{detection['achieved_rate']:>10,.1f}/s  time to detect: {ttd}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run traffic scenarios and score the detector against them.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run a scenario and write its ground truth")
+    run_parser.add_argument("scenario", help="Scenario file (.json, or .yaml with PyYAML)")
+    run_parser.add_argument("--url", help="Target URL (default: the scenario's 'target')")
+    run_parser.add_argument("--workers", type=int, default=1, help="Worker processes sharing the traffic")
+    run_parser.add_argument("--seed", type=int, help="Override the scenario seed")
+    run_parser.add_argument("--truth", default=GROUND_TRUTH_PATH, help="Ground-truth output file")
+
+    pcap_parser = subparsers.add_parser("pcap", help="Synthesize a scenario into a pcap file and its labels")
+    pcap_parser.add_argument("scenario", help="Scenario file (.json, or .yaml with PyYAML)")
+    pcap_parser.add_argument("output", help="Capture file to write")
+    pcap_parser.add_argument("--url", help="Target URL (default: the scenario's 'target')")
+    pcap_parser.add_argument("--seed", type=int, help="Override the scenario seed")
+
+    score_parser = subparsers.add_parser("score", help="Score detector flow records against a ground truth")
+    score_parser.add_argument("truth", help="Ground-truth file written by 'run'")
+    score_parser.add_argument("--records", required=True, help="Flow-record directory of the detector (--records)")
+    score_parser.add_argument("--grace", type=float, default=SCORE_GRACE,
+                              help="Seconds after an entry ends during which its verdicts still count")
+    score_parser.add_argument("--json", help="Also save the result as JSON")
+
+    args = parser.parse_args()
+    if args.command in ("run", "pcap"):
+        try:
+            scenario = load_scenario(args.scenario)
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] Invalid scenario: {e}")
+            sys.exit(1)
+        if args.seed is not None:
+            scenario["seed"] = args.seed
+        target_url = args.url or scenario.get("target")
+        if not target_url:
+            print("[ERROR] No target: pass --url or set 'target' in the scenario")
+            sys.exit(1)
+        if args.command == "run":
+            run_scenario(scenario, target_url, max(args.workers, 1), args.truth)
+        else:
+            write_scenario_pcap(scenario, target_url, args.output)
+    else:
+        result = score(load_ground_truth(args.truth), _load_verdicts(args.records), args.grace)
+        print_score(result)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(result, f, indent=2)
+            print(f"[INFO] Score saved to '{args.json}'")
@@ -0,0 +1,10 @@
+"""
+common
+
+Modules shared by the sensor (DoSDetector/) and the server (server/):
+- instrumentation: latency histograms, counters, gauges and the /metrics endpoint
+- profiler: runtime sampling profiler
+
+Scripts in DoSDetector/ and server/ add the repository root to their import
+path before importing from this package.
+"""
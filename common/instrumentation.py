@@ -0,0 +1,333 @@
+"""
+instrumentation.py
+
+This module provides lightweight latency histograms, counters and gauges for the
+live pipeline, exported in the Prometheus text format on a /metrics endpoint.
+
+Histograms are HDR-style: values are recorded in nanoseconds into log-linear
+buckets (16 sub-buckets per power of two, about 6% relative error) from
+1 ns to about 100 s. Each thread records into its own bucket array, so the hot
+path takes no lock; arrays are merged only when the metrics are scraped.
+Gauges are callbacks evaluated at scrape time and cost nothing in between.
+
+Shared by the sensor (DoSDetector/) and the server (server/).
+
+Main components:
+- Histogram, Counter, Gauge and the module-level REGISTRY
+- histogram/counter/gauge: create or fetch a metric in REGISTRY
+- stage: the histogram of one pipeline stage
+- render: Prometheus text exposition of a registry
+- start_metrics_server: serves /metrics from a background thread
+- is_loopback: tells whether a client address is local (guards debug routes)
+- timed: decorator timing every call of a function
+
+Usage:
+    PREDICT_TIME = stage("predict")
+    start = time.perf_counter_ns()
+    ...
+    PREDICT_TIME.record(time.perf_counter_ns() - start)
+"""
+
+import functools
+import ipaddress
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+BUCKETS = 40 * SUB_BUCKETS  # Covers values up to 2^40 ns (~18 minutes)
+
+# Bucket bounds exported to Prometheus, in seconds
+EXPORT_BOUNDS = [m * 10 ** e for e in range(-6, 1) for m in (1, 2.5, 5)] + [10.0]
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Shared histogram for the pipeline stages, labelled by stage
+STAGE_METRIC = "dbdos_stage_seconds"
+STAGE_HELP = "Seconds spent in each stage of the detection pipeline"
+
+
+def _bucket(value):
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    if shift <= 0:
+        return value
+    index = shift * SUB_BUCKETS + (value >> shift)
+    return index if index < BUCKETS else BUCKETS - 1
+
+
+def _upper_bound(index):
+    """
+    Exclusive upper bound (ns) of a bucket.
+    """
+    if index < 2 * SUB_BUCKETS:
+        return index + 1
+    shift = index // SUB_BUCKETS - 1
+    return ((index - shift * SUB_BUCKETS) + 1) << shift
+
+
+class Histogram:
+    """
+    Latency histogram with one lock-free bucket array per recording thread.
+    """
+
+    def __init__(self, name, help_text, labels=None):
+        self.name = name
+        self.help = help_text
+        self.labels = labels or {}
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()  # Only taken when a new thread starts recording
+
+    def _shard(self):
+        shard = [[0] * BUCKETS, 0]  # bucket counts, sum
+        with self._lock:
+            self._shards.append(shard)
+        self._local.shard = shard
+        return shard
+
+    def record(self, nanoseconds):
+        """
+        Records one duration in nanoseconds.
+        """
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._shard()
+        # _bucket() inlined: this runs on the packet path
+        shift = nanoseconds.bit_length() - SUB_BUCKET_BITS - 1
+        if shift <= 0:
+            index = nanoseconds if nanoseconds > 0 else 0
+        else:
+            index = shift * SUB_BUCKETS + (nanoseconds >> shift)
+            if index >= BUCKETS:
+                index = BUCKETS - 1
+        shard[0][index] += 1
+        shard[1] += nanoseconds
+
+    def snapshot(self):
+        """
+        Merges the per-thread arrays.
+
+        :return: (bucket counts, total count, sum in ns)
+        """
+        counts = [0] * BUCKETS
+        total_sum = 0
+        with self._lock:
+            shards = list(self._shards)
+        for buckets, shard_sum in shards:
+            for i, count in enumerate(buckets):
+                if count:
+                    counts[i] += count
+            total_sum += shard_sum
+        return counts, sum(counts), total_sum
+
+    def percentile(self, q):
+        """
+        Approximate q-th percentile (0-100) in seconds, or None if empty.
+        """
+        counts, total, _ = self.snapshot()
+        if not total:
+            return None
+        target = total * q / 100
+        seen = 0
+        for i, count in enumerate(counts):
+            seen += count
+            if count and seen >= target:
+                return _upper_bound(i) / 1e9
+        return _upper_bound(BUCKETS - 1) / 1e9
+
+    def samples(self):
+        counts, total, total_sum = self.snapshot()
+        cumulative, i = 0, 0
+        lines = []
+        for bound in EXPORT_BOUNDS:
+            limit = bound * 1e9
+            while i < BUCKETS and _upper_bound(i) <= limit:
+                cumulative += counts[i]
+                i += 1
+            lines.append((self.name + "_bucket", dict(self.labels, le=f"{bound:g}"), cumulative))
+        lines.append((self.name + "_bucket", dict(self.labels, le="+Inf"), total))
+        lines.append((self.name + "_sum", self.labels, total_sum / 1e9))
+        lines.append((self.name + "_count", self.labels, total))
+        return lines
+
+
+class Counter:
+    """
+    Monotonic counter; increments from several threads may race, which only
+    affects accuracy, never correctness. A counter kept elsewhere (e.g. a
+    plain attribute on the hot path) can be exported with a callback instead.
+    """
+
+    def __init__(self, name, help_text, labels=None, function=None):
+        self.name = name
+        self.help = help_text
+        self.labels = labels or {}
+        self.function = function
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self):
+        if self.function is None:
+            return [(self.name, self.labels, self.value)]
+        try:
+            value = self.function()
+        except Exception:
+            return []
+        return [] if value is None else [(self.name, self.labels, value)]
+
+
+class Gauge(Counter):
+    """
+    Value that can go up and down, read from a callback at scrape time (or set
+    explicitly).
+    """
+
+    def set(self, value):
+        self.value = value
+
+
+class Registry:
+    """
+    Collection of metrics keyed by name and labels.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def get(self, kind, metric_type, name, help_text, labels, **kwargs):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            metric = self.metrics.get(key)
+            if metric is None:
+                metric = self.metrics[key] = kind(name, help_text, labels, **kwargs)
+                metric.type = metric_type
+            elif kwargs.get("function") is not None:
+                metric.function = kwargs["function"]
+        return metric
+
+
+REGISTRY = Registry()
+
+
+def histogram(name, help_text, registry=REGISTRY, **labels):
+    return registry.get(Histogram, "histogram", name, help_text, labels)
+
+
+def stage(name, registry=REGISTRY):
+    """
+    Histogram of one pipeline stage (parse, flow_update, features, predict, ...).
+    """
+    return histogram(STAGE_METRIC, STAGE_HELP, registry, stage=name)
+
+
+def counter(name, help_text, function=None, registry=REGISTRY, **labels):
+    return registry.get(Counter, "counter", name, help_text, labels, function=function)
+
+
+def gauge(name, help_text, function=None, registry=REGISTRY, **labels):
+    return registry.get(Gauge, "gauge", name, help_text, labels, function=function)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for key, value in labels.items())
+    return "{" + ",".join(escaped) + "}"
+
+
+def render(registry=REGISTRY):
+    """
+    Renders every metric in the Prometheus text exposition format.
+    """
+    with registry._lock:
+        metrics = sorted(registry.metrics.values(), key=lambda metric: metric.name)
+    lines = []
+    described = set()
+    for metric in metrics:
+        if metric.name not in described:
+            described.add(metric.name)
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+    routes = {}
+
+    def do_GET(self):
+        path, _, query = self.path.partition("?")
+        if path == "/metrics":
+            status, content_type, body = 200, CONTENT_TYPE, render(self.registry).encode("utf-8")
+        elif path in self.routes and is_loopback(self.client_address[0]):
+            status, content_type, body = self.routes[path](query)
+        else:
+            self.send_error(404, "Path not found")
+            return
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes are too frequent to print
+
+
+def is_loopback(address):
+    """
+    Tells whether a client address is a loopback address (IPv4-mapped IPv6 included).
+    """
+    try:
+        ip = ipaddress.ip_address(address.split("%")[0])
+    except ValueError:
+        return False
+    mapped = getattr(ip, "ipv4_mapped", None)
+    return (mapped or ip).is_loopback
+
+
+class _ThreadedServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def start_metrics_server(port, host="0.0.0.0", registry=REGISTRY, routes=None):
+    """
+    Serves GET /metrics on host:port from a daemon thread.
+
+    Args:
+        routes (dict): Extra GET paths, mapped to functions taking the query
+            string and returning (status, content type, body bytes). They are
+            served to loopback clients only; others get 404.
+
+    Returns:
+        HTTPServer: The running server (call shutdown() to stop it)
+    """
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry, "routes": routes or {}})
+    server = _ThreadedServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def timed(metric):
+    """
+    Decorator recording the duration of every call into a histogram.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                metric.record(time.perf_counter_ns() - start)
+        return wrapper
+    return decorator
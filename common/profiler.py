@@ -0,0 +1,224 @@
+"""
+profiler.py
+
+This module provides a sampling profiler that can be switched on while the
+sensor or the server keeps running, so the state being diagnosed is not lost
+by restarting under a profiler.
+
+While a capture is active, a background thread reads the stack of every other
+thread (sys._current_frames) every `interval` seconds, for `seconds` seconds.
+Nothing is hooked into the profiled code, so there is no cost outside captures
+and, at the default 100 Hz, about one stack walk per thread every 10 ms during
+them. Samples are wall-clock: threads waiting on I/O or locks show up in the
+functions they wait in.
+
+Each capture writes two files to the output directory:
+- <timestamp>-<reason>.collapsed: one "thread;outer;...;inner count" line per
+  distinct stack (the input format of flamegraph.pl and speedscope)
+- <timestamp>-<reason>.txt: samples per thread and the top functions by
+  self and total samples
+
+Shared by the sensor (DoSDetector/) and the server (server/).
+
+Main components:
+- SamplingProfiler: start/sample/write captures, HTTP request helper
+- SamplingProfiler.watch: starts a capture when a check (queue depth, lag...) fires
+- install_signal: starts a capture on SIGUSR1
+
+Usage:
+    profiler = SamplingProfiler("profiles")
+    install_signal(profiler, seconds=10)        # kill -USR1 <pid>
+    profiler.watch({"lag": lambda: lag() > 0.5}, seconds=10)
+"""
+
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from urllib.parse import parse_qs
+
+# Longest capture accepted from an HTTP request
+MAX_SECONDS = 300
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of all threads for a number of seconds on demand.
+    """
+
+    def __init__(self, output_dir="profiles", interval=0.01, max_depth=64):
+        """
+        :param output_dir: Directory for the collapsed stacks and summaries
+        :param interval: Seconds between samples
+        :param max_depth: Innermost frames kept per stack
+        """
+        self.output_dir = output_dir
+        self.interval = interval
+        self.max_depth = max_depth
+        self.running = False
+        self.captures = 0
+        self.last_result = None  # Paths of the last capture
+        self._lock = threading.Lock()
+        self._stop_watch = threading.Event()
+
+    def start(self, seconds=10, reason="manual"):
+        """
+        Starts a capture on a background thread.
+
+        :return: True if started, False if a capture is already running
+        """
+        with self._lock:
+            if self.running:
+                return False
+            self.running = True
+        threading.Thread(target=self._run, args=(seconds, reason), name="profiler", daemon=True).start()
+        return True
+
+    def _run(self, seconds, reason):
+        try:
+            stacks = self.sample(seconds)
+            self.last_result = self.write(stacks, reason)
+            self.captures += 1
+            print(f"[INFO] Profile ({reason}, {sum(stacks.values())} samples) saved to {self.last_result['collapsed']}")
+        except Exception as e:
+            print(f"[ERROR] Profile capture failed: {e}")
+        finally:
+            self.running = False
+
+    def sample(self, seconds):
+        """
+        Samples every other thread for `seconds` seconds.
+
+        :return: Counter of collapsed stacks ("thread;outer;...;inner")
+        """
+        own = threading.get_ident()
+        stacks = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    stack.append(self.frame_name(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                stacks[";".join(reversed(stack)).replace(" ", "_")] += 1
+            frame = None  # Do not keep the frames alive while sleeping
+            time.sleep(self.interval)
+        return stacks
+
+    @staticmethod
+    def frame_name(frame):
+        """
+        "module:Class.function" of a frame (scripts are named after their file).
+        """
+        code = frame.f_code
+        module = frame.f_globals.get("__name__", "?")
+        if module == "__main__":
+            module = os.path.splitext(os.path.basename(code.co_filename))[0]
+        return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+    @staticmethod
+    def summarize(stacks, top=25):
+        """
+        Text summary: samples per thread and the functions with the most self
+        (innermost frame) and total (anywhere in the stack) samples.
+        """
+        total = sum(stacks.values()) or 1
+        threads, own, inclusive = Counter(), Counter(), Counter()
+        for stack, count in stacks.items():
+            frames = stack.split(";")
+            threads[frames[0]] += count
+            if len(frames) > 1:
+                own[frames[-1]] += count
+            for function in set(frames[1:]):
+                inclusive[function] += count
+
+        lines = [f"Samples: {total}", "", "Threads:"]
+        lines += [f"  {count:8d} {100 * count / total:6.1f}%  {name}" for name, count in threads.most_common()]
+        lines += ["", f"Top {top} functions by self samples:", "      self          total   function"]
+        lines += [f"  {count:8d} {100 * count / total:5.1f}%  {inclusive[name]:8d} {100 * inclusive[name] / total:5.1f}%  {name}"
+                  for name, count in own.most_common(top)]
+        return "\n".join(lines) + "\n"
+
+    def write(self, stacks, reason):
+        """
+        Writes the collapsed stacks and the summary of a capture.
+
+        :return: Dictionary with the 'collapsed' and 'summary' paths
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{reason}")
+        paths = {"collapsed": base + ".collapsed", "summary": base + ".txt"}
+        with open(paths["collapsed"], "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(paths["summary"], "w") as f:
+            f.write(self.summarize(stacks))
+        return paths
+
+    def handle_request(self, query, default_seconds=10):
+        """
+        Starts a capture for an HTTP request such as /debug/profile?seconds=30.
+
+        :param query: Query string of the request
+        :return: (HTTP status, JSON-serializable response)
+        """
+        try:
+            seconds = float(parse_qs(query).get("seconds", [default_seconds])[0])
+        except ValueError:
+            return 400, {"error": "seconds must be a number"}
+        if not 0 < seconds <= MAX_SECONDS:
+            return 400, {"error": f"seconds must be between 0 and {MAX_SECONDS}"}
+        if not self.start(seconds, "request"):
+            return 409, {"error": "A profile is already being captured", "last": self.last_result}
+        return 202, {"status": "Profiling started", "seconds": seconds, "last": self.last_result}
+
+    def watch(self, checks, seconds=10, interval=1.0, cooldown=300):
+        """
+        Starts a capture whenever one of the checks returns True, at most once
+        every `cooldown` seconds.
+
+        :param checks: Dictionary of reason -> function returning True when a
+                       capture is needed (e.g. queue depth above a threshold)
+        :param seconds: Length of the automatic captures
+        :param interval: Seconds between checks
+        """
+        def watch_loop():
+            last = None
+            while not self._stop_watch.wait(interval):
+                if last is not None and time.monotonic() - last < cooldown:
+                    continue
+                for reason, check in checks.items():
+                    try:
+                        triggered = check()
+                    except Exception:
+                        triggered = False
+                    if triggered and self.start(seconds, reason):
+                        print(f"[WARNING] Threshold '{reason}' crossed, profiling for {seconds:g}s")
+                        last = time.monotonic()
+                        break
+
+        self._stop_watch.clear()
+        threading.Thread(target=watch_loop, name="profiler-watch", daemon=True).start()
+
+    def stop_watching(self):
+        self._stop_watch.set()
+
+
+def install_signal(profiler, seconds=10, signum=None):
+    """
+    Starts a capture whenever the process receives SIGUSR1 (or signum).
+    Must be called from the main thread; not available on Windows.
+
+    :return: True if the handler was installed
+    """
+    signum = signum if signum is not None else getattr(signal, "SIGUSR1", None)
+    if signum is None:
+        return False
+    signal.signal(signum, lambda sig, frame: profiler.start(seconds, "signal"))
+    return True
@@ -1,35 +1,295 @@
+"""
+logtodataset.py
+
+Converts detector output into a labelled dataset (dataset.csv by default).
+
+Inputs found in the log directory:
+- '<label>.log': text logs with one "Metrics: {...}" line per scored flow
+- '<label>/': directories of binary flow records (see DoSDetector/flowrecords.py)
+
+Text logs are streamed in fixed-size byte ranges that are parsed in parallel by
+worker processes. The metric values of a whole range are extracted with a single
+regular expression pass instead of evaluating each line as a Python literal;
+ranges whose lines do not all share one key layout fall back to ast.literal_eval.
+Parsed ranges are appended to the output as they arrive, so memory use stays
+constant regardless of the log size. Every feature is written as float64, as in
+the binary flow records, so all chunks (and Parquet parts) share one schema.
+
+With --since, the byte offset reached in every log is stored in a state file
+and the next run only processes the bytes appended since then.
+
+Usage:
+    python logtodataset.py
+    python logtodataset.py --log-dir /var/log/dbdos --workers 8 --format parquet --output dataset.parquet
+    python logtodataset.py --since            # incremental, appends to the output
+"""
+
 import os
+import re
 import ast
+import glob
+import json
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
 
+# Metadata fields of binary flow records (see DoSDetector/flowrecords.py)
+RECORD_METADATA = ("timestamp", "src", "prediction")
+
+# Size of the byte ranges handed to each worker
+CHUNK_SIZE = 32 * 1024 * 1024
+
+DEFAULT_STATE_PATH = ".logtodataset_state.json"
+
+METRICS_MARKER = b"Metrics: {"
+KEY_PATTERN = re.compile(rb"'([^']+)': ")
+VALUE_PATTERN = re.compile(rb"': ([^,}]+)")
+# Characters of a float repr; deleting them leaves a line's key layout
+VALUE_CHARS = b"0123456789.+-e"
+
+
+def _literal_row(line):
+    """
+    Slow path for a single line: evaluates the metrics dictionary literally.
+    """
+    try:
+        text = line.decode("utf-8", errors="replace")
+        return ast.literal_eval(text[text.index("{"):])
+    except Exception as e:
+        print(f"Error parsing line: {line!r}\n{e}")
+        return None
+
+
+def parse_chunk(data, label):
+    """
+    Parses the "Metrics:" lines of a block of complete log lines.
+
+    Args:
+        data (bytes): Log lines, ending at a line boundary
+        label (str): Label assigned to every row
+
+    Returns:
+        pandas.DataFrame: One row per metrics line (float64 features) plus a 'label' column
+    """
+    lines = [line for line in data.split(b"\n") if METRICS_MARKER in line]
+    if not lines:
+        return pd.DataFrame()
+
+    first = lines[0]
+    keys = [key.decode() for key in KEY_PATTERN.findall(first[first.index(b"{"):])]
+    block = b"\n".join(line[line.index(b"{"):] for line in lines)
+    values = VALUE_PATTERN.findall(block)
+
+    # The values only fill a matrix if every line has the first line's keys in the same order
+    layout = first[first.index(b"{"):].translate(None, VALUE_CHARS)
+    same_layout = block.translate(None, VALUE_CHARS) == b"\n".join([layout] * len(lines))
+
+    frame = None
+    if keys and same_layout and len(values) == len(lines) * len(keys):
+        try:
+            matrix = np.array(values, dtype=np.float64).reshape(len(lines), len(keys))
+            frame = pd.DataFrame(matrix, columns=keys)
+        except ValueError:
+            frame = None
+
+    if frame is None:
+        # Mixed layouts or unusual values: parse line by line
+        rows = [row for row in (_literal_row(line) for line in lines) if row is not None]
+        # A column's dtype must not depend on the values of one chunk
+        frame = pd.DataFrame(rows).astype(np.float64)
+
+    frame["label"] = label.upper()
+    return frame
+
+
+def _parse_range(path, start, end, label):
+    """
+    Worker entry point: parses bytes [start, end) of a log file.
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return parse_chunk(data, label)
+
+
+def split_ranges(path, start=0, chunk_size=CHUNK_SIZE):
+    """
+    Splits a log file into byte ranges that end on line boundaries.
+    Bytes after the last newline (a line still being written) are left out.
+
+    Returns:
+        tuple: (list of (start, end) ranges, offset reached)
+    """
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, "rb") as f:
+        while start < size:
+            end = min(start + chunk_size, size)
+            f.seek(end - 1)
+            tail = f.read(chunk_size)
+            newline = tail.find(b"\n")
+            if newline == -1:
+                # No newline ahead: end the range at the last complete line
+                f.seek(start)
+                last = f.read(end - start).rfind(b"\n")
+                if last == -1:
+                    break
+                ranges.append((start, start + last + 1))
+                start = start + last + 1
+                break
+            end = end + newline
+            ranges.append((start, end))
+            start = end
+    return ranges, start
+
+
 def parse_log_file(filepath, label):
-    metrics = []
-    with open(filepath, 'r') as f:
-        for line in f:
-            if "Metrics:" in line:
-                try:
-                    dict_start = line.index("{")
-                    metrics_str = line[dict_start:]
-                    metrics_dict = ast.literal_eval(metrics_str)
-                    metrics_dict["label"] = label.upper()
-                    metrics.append(metrics_dict)
-                except Exception as e:
-                    print(f"Error parsing line: {line}\n{e}")
-    return metrics
-
-def parse_all_logs(log_dir="."):
-    all_data = []
-    for filename in os.listdir(log_dir):
-        if filename.endswith(".log"):
-            label = filename.replace(".log", "")
+    """
+    Parses a whole text log in the current process.
+    """
+    ranges, _ = split_ranges(filepath)
+    frames = [_parse_range(filepath, start, end, label) for start, end in ranges]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def parse_record_dir(dirpath, label):
+    """
+    Loads the binary flow-record segments (flows-*.npy) of a directory as one
+    DataFrame; segments are memory-mapped and converted column by column.
+    """
+    segments = [np.load(path, mmap_mode="r") for path in sorted(glob.glob(os.path.join(dirpath, "flows-*.npy")))]
+    if not segments:
+        return pd.DataFrame()
+    records = np.concatenate(segments)
+    features = [name for name in records.dtype.names if name not in RECORD_METADATA]
+    df = pd.DataFrame({name: records[name] for name in features})
+    df["label"] = label.upper()
+    return df
+
+
+class DatasetWriter:
+    """
+    Appends DataFrame chunks to a CSV file or to a directory of Parquet parts.
+    """
+
+    def __init__(self, output, fmt="csv", append=False):
+        self.output = output
+        self.format = fmt
+        self.rows = 0
+        self.columns = None
+        if fmt == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)")
+            os.makedirs(output, exist_ok=True)
+            self.part = len(glob.glob(os.path.join(output, "part-*.parquet"))) if append else 0
+            if not append:
+                for path in glob.glob(os.path.join(output, "part-*.parquet")):
+                    os.remove(path)
+        else:
+            self.header = not (append and os.path.exists(output) and os.path.getsize(output) > 0)
+            if not append and os.path.exists(output):
+                os.remove(output)
+            elif not self.header:
+                self.columns = list(pd.read_csv(output, nrows=0).columns)
+
+    def write(self, frame):
+        if frame.empty:
+            return
+        if self.columns is None:
+            self.columns = list(frame.columns)
+        frame = frame.reindex(columns=self.columns)
+        if self.format == "parquet":
+            frame.to_parquet(os.path.join(self.output, f"part-{self.part:05d}.parquet"), index=False)
+            self.part += 1
+        else:
+            frame.to_csv(self.output, mode="a", header=self.header, index=False)
+            self.header = False
+        self.rows += len(frame)
+
+
+def load_state(path):
+    if path and os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(path, state):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+def parse_all_logs(log_dir=".", output="dataset.csv", fmt="csv", workers=None, state_path=None,
+                   chunk_size=CHUNK_SIZE):
+    """
+    Builds the dataset from every '<label>.log' text log and every '<label>/'
+    directory of binary flow records found in log_dir.
+
+    Args:
+        log_dir (str): Directory with the inputs
+        output (str): CSV file, or directory of Parquet parts
+        fmt (str): 'csv' or 'parquet'
+        workers (int): Parser processes (default: number of CPUs)
+        state_path (str): If set, only bytes appended since the offsets stored
+            in this file are processed, and the output is appended to
+        chunk_size (int): Bytes per parsing task
+    """
+    incremental = state_path is not None
+    state = load_state(state_path) if incremental else {}
+    writer = DatasetWriter(output, fmt, append=incremental)
+    workers = workers or os.cpu_count() or 1
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for filename in sorted(os.listdir(log_dir)):
             path = os.path.join(log_dir, filename)
-            print(f"Procesando {filename} como '{label.upper()}'")
-            entries = parse_log_file(path, label)
-            all_data.extend(entries)
+            if filename.endswith(".log"):
+                label = filename.replace(".log", "")
+                key = os.path.abspath(path)
+                stat = os.stat(path)
+                previous = state.get(key, {})
+                start = previous.get("offset", 0)
+                # Rotated or truncated logs are processed again from the start
+                if previous.get("inode") != stat.st_ino or start > stat.st_size:
+                    start = 0
+                ranges, offset = split_ranges(path, start, chunk_size)
+                print(f"Procesando {filename} como '{label.upper()}' ({offset - start} bytes nuevos)")
+
+                # Keep a bounded number of ranges in flight to cap memory use
+                pending = deque()
+                for begin, end in ranges:
+                    pending.append(pool.submit(_parse_range, path, begin, end, label))
+                    if len(pending) >= 2 * workers:
+                        writer.write(pending.popleft().result())
+                while pending:
+                    writer.write(pending.popleft().result())
+
+                state[key] = {"offset": offset, "inode": stat.st_ino}
+            elif os.path.isdir(path) and glob.glob(os.path.join(path, "flows-*.npy")):
+                if incremental:
+                    print(f"[WARNING] Omitiendo {filename}/: los registros binarios no admiten --since")
+                    continue
+                print(f"Procesando registros de {filename}/ como '{filename.upper()}'")
+                writer.write(parse_record_dir(path, filename))
+
+    if incremental:
+        save_state(state_path, state)
+    print(f"[INFO] Guardado en {output} con {writer.rows} entradas nuevas.")
 
-    df = pd.DataFrame(all_data)
-    df.to_csv("dataset.csv", index=False)
-    print(f"[INFO] Guardado en dataset.csv con {len(df)} entradas.")
 
 if __name__ == "__main__":
-    parse_all_logs()
+    parser = argparse.ArgumentParser(description="Convert detector logs and flow records into a labelled dataset.")
+    parser.add_argument("--log-dir", default=".", help="Directory with <label>.log files and <label>/ record directories")
+    parser.add_argument("--output", default="dataset.csv", help="Output CSV file or Parquet directory")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="Output format (default: csv)")
+    parser.add_argument("--workers", type=int, help="Parser processes (default: number of CPUs)")
+    parser.add_argument("--chunk-mb", type=int, default=CHUNK_SIZE // (1024 * 1024), help="Megabytes per parsing task")
+    parser.add_argument("--since", nargs="?", const=DEFAULT_STATE_PATH, metavar="STATE_FILE",
+                        help=f"Only process bytes added since the last run (state kept in {DEFAULT_STATE_PATH})")
+    args = parser.parse_args()
+    parse_all_logs(args.log_dir, args.output, args.format, args.workers, args.since, args.chunk_mb * 1024 * 1024)
@@ -0,0 +1,354 @@
+"""
+deploy.py
+
+Latency-constrained model selection and deployment into DoSDetector/models.
+
+Every candidate is trained on the shared, cached data of train.py and then
+benchmarked the way the sensor calls it:
+- cold: load from disk and score the first flow
+- warm single-row: one flow dictionary per call, converted in feature order
+- warm micro-batch: a few flows per call
+
+The most accurate candidate whose warm single-row p99 latency and memory use
+fit the configured budgets is published as a new release:
+
+    DoSDetector/models/releases/<release>/model.pkl
+    DoSDetector/models/releases/<release>/arrays/*.npy
+    DoSDetector/models/releases/<release>/manifest.json
+    DoSDetector/models/ownmodel -> releases/<release>
+
+Large arrays (tree node tables, KNN training matrices) are stored as .npy files
+that detectors memory-map, so detector processes on one host share a single
+copy (see DoSDetector/sharedmodel.py; --pickle keeps a self-contained model.pkl).
+
+The release directory is completed before the 'ownmodel' link is swapped with a
+single rename, so the detector never sees a half-written model. The manifest
+records the feature order, label map, latency profile, dataset hash and the
+SHA-256 of model.pkl; AttackDetector verifies it when loading.
+
+Usage:
+    python deploy.py                                  # select among all models and publish
+    python deploy.py --p99-ms 2 --memory-mb 50 --models knn decision_tree random_forest
+    python deploy.py --dry-run                        # only print the benchmark
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+import numpy as np
+import pandas as pd
+import joblib
+import sklearn
+from joblib import Parallel, delayed
+
+from train import MODELS, LABEL_MAP, TARGET_NAMES, prepare_data, train_model
+
+# sharedmodel.py lives with the detector, which loads the arrays it writes
+DETECTOR_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "DoSDetector"))
+if DETECTOR_DIR not in sys.path:
+    sys.path.insert(0, DETECTOR_DIR)
+from sharedmodel import dump as dump_shared, load as load_shared
+
+# ---------- CONFIGURATION ----------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MODELS_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", "DoSDetector", "models"))
+
+SELECTION_PATH = os.path.join(BASE_DIR, "model_selection.csv")
+
+P99_BUDGET_MS = 5.0       # Warm single-row p99 latency budget
+MEMORY_BUDGET_MB = 256.0  # Peak memory to load the model and score a flow
+MICRO_BATCH = 32          # Rows per micro-batch call
+BENCH_ROWS = 500          # Timed single-row calls per candidate
+BENCH_WARMUP = 50         # Untimed calls before the warm measurements
+KEEP_RELEASES = 3         # Releases kept for rollback
+CANARY_PER_CLASS = 20     # Held-out flows per class in models/canary.csv
+
+# Detector labels (see DoSDetector/detection.py) of the training labels
+DETECTOR_LABELS = {"benigno": "BENIGN"}
+
+
+# ---------- BENCHMARK ----------
+def _percentiles(latencies_ms):
+    return {
+        "mean_ms": float(np.mean(latencies_ms)),
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "max_ms": float(np.max(latencies_ms))
+    }
+
+
+def benchmark_model(model, X_test, rows=BENCH_ROWS, warmup=BENCH_WARMUP, batch_size=MICRO_BATCH):
+    """
+    Benchmarks a fitted model under the sensor's calling pattern.
+
+    Args:
+        model: Fitted estimator
+        X_test (DataFrame): Held-out flows, columns in model feature order
+        rows (int): Timed single-row predictions
+        warmup (int): Untimed predictions before the warm measurements
+        batch_size (int): Rows per micro-batch prediction
+
+    Returns:
+        dict: Latency profile (cold, warm single-row, warm micro-batch) and memory use
+    """
+    features = list(X_test.columns)
+    flows = X_test.head(rows).to_dict(orient="records")
+    X = X_test.to_numpy(dtype=np.float64)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model.pkl")
+        joblib.dump(model, path)
+        model_bytes = os.path.getsize(path)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)  # Fitted with feature names
+
+            # Cold: load from disk and score the first flow
+            tracemalloc.start()
+            start = time.perf_counter()
+            loaded = joblib.load(path)
+            loaded_at = time.perf_counter()
+            loaded.predict(np.array([flows[0][feat] for feat in features]).reshape(1, -1))
+            first_at = time.perf_counter()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            # Warm single-row, as AttackDetector.predict builds its input
+            for flow in flows[:warmup]:
+                loaded.predict(np.array([flow[feat] for feat in features]).reshape(1, -1))
+            single = np.empty(len(flows))
+            for i, flow in enumerate(flows):
+                t0 = time.perf_counter()
+                loaded.predict(np.array([flow[feat] for feat in features]).reshape(1, -1))
+                single[i] = (time.perf_counter() - t0) * 1000
+
+            # Warm micro-batch
+            batches = [X[i:i + batch_size] for i in range(0, min(len(X), rows * batch_size) - batch_size + 1, batch_size)]
+            batch = np.empty(len(batches))
+            for i, rows_batch in enumerate(batches):
+                t0 = time.perf_counter()
+                loaded.predict(rows_batch)
+                batch[i] = (time.perf_counter() - t0) * 1000
+
+    return {
+        "cold": {"load_ms": (loaded_at - start) * 1000, "first_prediction_ms": (first_at - loaded_at) * 1000},
+        "single_row": _percentiles(single),
+        "micro_batch": dict(_percentiles(batch), size=batch_size, per_row_ms=float(np.median(batch) / batch_size)),
+        "model_bytes": model_bytes,
+        "memory_mb": peak / (1024 * 1024)
+    }
+
+
+def select_model(candidates, p99_budget_ms=P99_BUDGET_MS, memory_budget_mb=MEMORY_BUDGET_MB):
+    """
+    Picks the most accurate candidate within the latency and memory budgets;
+    ties go to the lower single-row p99.
+
+    Args:
+        candidates (list): Dictionaries with 'key', 'accuracy' and 'profile'
+
+    Returns:
+        dict: The selected candidate, or None if no candidate fits the budgets
+    """
+    eligible = [c for c in candidates
+                if c["profile"]["single_row"]["p99_ms"] <= p99_budget_ms
+                and c["profile"]["memory_mb"] <= memory_budget_mb]
+    if not eligible:
+        return None
+    return max(eligible, key=lambda c: (c["accuracy"], -c["profile"]["single_row"]["p99_ms"]))
+
+
+# ---------- PUBLISH ----------
+def build_manifest(key, features, data_hash, stats, profile, budgets=None):
+    """
+    Describes a model release; model_sha256 and model_bytes are filled in by publish().
+    """
+    return {
+        "model": MODELS[key][0],
+        "key": key,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "features": list(features),
+        "label_map": {str(code): DETECTOR_LABELS.get(label, label.upper()) for label, code in LABEL_MAP.items()},
+        "dataset_hash": data_hash,
+        "accuracy": stats.get("Accuracy"),
+        "f1_score": stats.get("F1-Score"),
+        "latency_profile": profile,
+        "budgets": budgets or {},
+        "sklearn_version": sklearn.__version__
+    }
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_synced(path, write):
+    with open(path, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def build_canary(X_test, y_test, per_class=CANARY_PER_CLASS):
+    """
+    Samples a few held-out flows of every class, labelled with detector labels.
+    """
+    canary = X_test.copy()
+    canary["label"] = [DETECTOR_LABELS.get(TARGET_NAMES[code], TARGET_NAMES[code].upper()) for code in y_test]
+    return canary.sample(frac=1, random_state=42).groupby("label").head(per_class)
+
+
+def publish(model, manifest, models_dir=MODELS_DIR, keep=KEEP_RELEASES, canary=None, shared_arrays=True):
+    """
+    Publishes a model and its manifest as a new release and atomically points
+    'ownmodel' at it.
+
+    Args:
+        model: Fitted estimator
+        manifest (dict): Manifest from build_manifest
+        models_dir (str): DoSDetector/models directory
+        keep (int): Number of releases kept, the published one included
+        canary (DataFrame): Labelled flows saved as models/canary.csv if there is
+            none yet; the detector checks reloaded models against it
+        shared_arrays (bool): Store large arrays as memory-mappable .npy files
+            instead of inside model.pkl
+
+    Returns:
+        str: Path of the published release directory
+    """
+    releases = os.path.join(models_dir, "releases")
+    os.makedirs(releases, exist_ok=True)
+
+    # The canary set is kept across releases so every new model faces the same check
+    canary_file = os.path.join(models_dir, "canary.csv")
+    if canary is not None and not os.path.exists(canary_file):
+        canary.to_csv(canary_file, index=False)
+
+    # Build the release in a staging directory
+    staging = tempfile.mkdtemp(prefix=".staging-", dir=releases)
+    os.chmod(staging, 0o755)
+    model_file = os.path.join(staging, "model.pkl")
+    if shared_arrays:
+        manifest = dict(manifest, arrays=dump_shared(model, staging))
+        if canary is not None:
+            # Tree models are converted on export; they must still predict the same labels
+            X = canary[manifest["features"]].to_numpy(dtype=np.float64)
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", UserWarning)  # Fitted with feature names
+                if not np.array_equal(load_shared(staging).predict(X), model.predict(X)):
+                    shutil.rmtree(staging, ignore_errors=True)
+                    raise RuntimeError("The exported model predicts differently from the trained one")
+    else:
+        _write_synced(model_file, lambda f: joblib.dump(model, f))
+    manifest = dict(manifest, model_file="model.pkl", model_sha256=_sha256(model_file),
+                    model_bytes=os.path.getsize(model_file))
+    _write_synced(os.path.join(staging, "manifest.json"),
+                  lambda f: f.write(json.dumps(manifest, indent=2).encode()))
+
+    release_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{manifest['key']}-{manifest['model_sha256'][:8]}"
+    release = os.path.join(releases, release_id)
+    os.rename(staging, release)
+
+    current = os.path.join(models_dir, "ownmodel")
+    if os.path.isdir(current) and not os.path.islink(current):
+        # Directory left by a manual export: keep it as a release
+        os.rename(current, os.path.join(releases, f"{time.strftime('%Y%m%d-%H%M%S')}-legacy"))
+
+    # Swap the link with a single rename
+    link = os.path.join(models_dir, ".ownmodel.tmp")
+    if os.path.lexists(link):
+        os.remove(link)
+    os.symlink(os.path.join("releases", release_id), link)
+    os.replace(link, current)
+
+    _prune_releases(releases, keep, release_id)
+    return release
+
+
+def _prune_releases(releases, keep, active):
+    names = sorted(name for name in os.listdir(releases) if not name.startswith("."))
+    for name in names[:-keep] if keep else []:
+        if name != active:
+            shutil.rmtree(os.path.join(releases, name), ignore_errors=True)
+
+
+# ---------- MAIN ----------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Select the most accurate model within latency and memory budgets and deploy it.")
+    parser.add_argument("--models", nargs="+", choices=list(MODELS), default=list(MODELS),
+                        help="Candidate models (default: all)")
+    parser.add_argument("--p99-ms", type=float, default=P99_BUDGET_MS,
+                        help=f"Warm single-row p99 latency budget in ms (default: {P99_BUDGET_MS})")
+    parser.add_argument("--memory-mb", type=float, default=MEMORY_BUDGET_MB,
+                        help=f"Memory budget in MB (default: {MEMORY_BUDGET_MB})")
+    parser.add_argument("--jobs", type=int, default=-1, help="Parallel training processes (default: all cores)")
+    parser.add_argument("--models-dir", default=MODELS_DIR, help="Deployment directory (default: DoSDetector/models)")
+    parser.add_argument("--keep", type=int, default=KEEP_RELEASES, help="Releases kept for rollback")
+    parser.add_argument("--dry-run", action="store_true", help="Benchmark and select without publishing")
+    parser.add_argument("--pickle", action="store_true",
+                        help="Publish a self-contained model.pkl instead of memory-mappable arrays")
+    args = parser.parse_args(argv)
+
+    data = prepare_data()
+    X_test = data["X"].iloc[data["test_idx"]]
+    y_test = data["y"].iloc[data["test_idx"]]
+
+    print(f"[INFO] Training {len(args.models)} candidate(s)...")
+    results = Parallel(n_jobs=args.jobs)(delayed(train_model)(key, data, False) for key in args.models)
+
+    # ---------- BENCHMARK ----------
+    candidates = []
+    for key, model, stats, _ in results:
+        print(f"[INFO] Benchmarking {stats['Modelo']}...")
+        profile = benchmark_model(model, X_test)
+        candidates.append({"key": key, "model": model, "stats": stats, "accuracy": stats["Accuracy"], "profile": profile})
+
+    table = pd.DataFrame([{
+        "Modelo": c["stats"]["Modelo"],
+        "Accuracy": c["accuracy"],
+        "Cold load (ms)": c["profile"]["cold"]["load_ms"],
+        "Cold first (ms)": c["profile"]["cold"]["first_prediction_ms"],
+        "Row p50 (ms)": c["profile"]["single_row"]["p50_ms"],
+        "Row p99 (ms)": c["profile"]["single_row"]["p99_ms"],
+        f"Batch {MICRO_BATCH} p99 (ms)": c["profile"]["micro_batch"]["p99_ms"],
+        "Memory (MB)": c["profile"]["memory_mb"],
+        "Size (MB)": c["profile"]["model_bytes"] / (1024 * 1024),
+        "Within budget": c["profile"]["single_row"]["p99_ms"] <= args.p99_ms and c["profile"]["memory_mb"] <= args.memory_mb
+    } for c in candidates]).sort_values("Accuracy", ascending=False)
+    print(table.round(4).to_string(index=False))
+    table.to_csv(SELECTION_PATH, index=False)
+
+    # ---------- SELECT ----------
+    selected = select_model(candidates, args.p99_ms, args.memory_mb)
+    if selected is None:
+        print(f"[ERROR] No model meets p99 <= {args.p99_ms} ms and memory <= {args.memory_mb} MB; nothing deployed.")
+        return 1
+    print(f"[INFO] Selected {selected['stats']['Modelo']} (accuracy {selected['accuracy']:.4f}, "
+          f"p99 {selected['profile']['single_row']['p99_ms']:.3f} ms)")
+
+    if args.dry_run:
+        return 0
+
+    # ---------- PUBLISH ----------
+    manifest = build_manifest(selected["key"], X_test.columns, data["hash"], selected["stats"], selected["profile"],
+                              {"p99_ms": args.p99_ms, "memory_mb": args.memory_mb})
+    release = publish(selected["model"], manifest, args.models_dir, args.keep, build_canary(X_test, y_test),
+                      shared_arrays=not args.pickle)
+    print(f"[SUCCESS] Published {release}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,192 +1,16 @@
 """
 knngenerator.py
 
-This script loads a labeled dataset, balances class distribution using SMOTE,
-trains a K-Nearest Neighbours (KNN) classifier, and saves the model for use
-in the detection module. It also outputs a classification report and confusion matrix.
+This script trains a K-Nearest Neighbours (KNN) classifier on the SMOTE-balanced dataset,
+evaluates it and saves the model for use in the detection module.
 
-Outputs:
-- Trained model: ownmodel/kmodel.pkl
-- Classification report: classification_report.csv
-- Confusion matrix: displayed with seaborn
-"""
-
-import pandas as pd
-import numpy as np
-import os
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.neighbors import KNeighborsClassifier
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.metrics import classification_report, confusion_matrix, accuracy_score, precision_score, recall_score, f1_score
-from imblearn.over_sampling import SMOTE
-import matplotlib.pyplot as plt
-import seaborn as sns
-import joblib
-import time
-
-from sklearn.preprocessing import StandardScaler, label_binarize
-from sklearn.decomposition import PCA
-from sklearn.metrics import roc_curve, auc
-
-# ---------- CONFIGURATION ----------
-DATASET_PATH = "DBDoS2025.csv"
-
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-
-MODEL_DIR = os.path.join(BASE_DIR, "..", "DoSDetector", "models", "ownmodel")
-
-MODEL_PATH = os.path.abspath(os.path.join("..", "DoSDetector", "models", "ownmodel", "model.pkl"))
-MODEL_DIR = os.path.dirname(MODEL_PATH)
-
-REPORT_PATH = os.path.join("./", "classification_report_knn.csv")
-
-EXCEL_PATH = "../DoSDetector/models/model_stats.xlsx"
-
-K_NEIGHBORS = 5
-
-LABEL_MAP = {
-    "benigno": 0,
-    "hulk": 1,
-    "synflood": 2,
-    "udpflood": 3,
-    "postflood": 4
-}
-TARGET_NAMES = list(LABEL_MAP.keys())
-
-# ---------- LOAD DATA ----------
-print("[INFO] Loading dataset...")
-df = pd.read_csv(DATASET_PATH)
-
-if "label" not in df.columns:
-    raise ValueError("Dataset must include a 'label' column.")
-
-# Normalize label casing and map to integers
-df["label"] = df["label"].str.lower().map(LABEL_MAP)
-if df["label"].isnull().any():
-    raise ValueError("Unrecognized labels found. Check LABEL_MAP and dataset contents.")
-
-X = df.drop("label", axis=1)
-y = df["label"]
-print(f"[INFO] Original class distribution: {y.value_counts().to_dict()}")
+Kept for compatibility; it is equivalent to:
+    python train.py --models knn --export knn --plots
 
-# ---------- APPLY SMOTE ----------
-print("[INFO] Applying SMOTE to balance class distribution...")
-smote = SMOTE(random_state=42)
-X_resampled, y_resampled = smote.fit_resample(X, y)
-print(f"[INFO] Resampled class distribution: {pd.Series(y_resampled).value_counts().to_dict()}")
-
-# ---------- TRAINING ----------
-print(f"[INFO] Training KNN model with k={K_NEIGHBORS}...")
-X_train, X_test, y_train, y_test = train_test_split(
-    X_resampled, y_resampled, test_size=0.3, random_state=42, stratify=y_resampled
-)
-
-start_train = time.time()
-knn = KNeighborsClassifier(n_neighbors=K_NEIGHBORS, metric='euclidean')
-knn.fit(X_train, y_train)
-end_train = time.time()
-
-print("[INFO] Making predictions...")
-start_pred = time.time()
-y_pred = knn.predict(X_test)
-end_pred = time.time()
-
-# ---------- REPORT ----------
-print("[INFO] Generating classification report...")
-report = classification_report(y_test, y_pred, target_names=TARGET_NAMES, output_dict=True)
-report_df = pd.DataFrame(report).transpose()
-print(report_df.round(4))
-report_df.to_csv(REPORT_PATH)
-print(f"[INFO] Report saved to {REPORT_PATH}")
-
-# ---------- CONFUSION MATRIX ----------
-print("[INFO] Displaying confusion matrix...")
-conf_matrix = confusion_matrix(y_test, y_pred)
-plt.figure(figsize=(8, 6))
-sns.heatmap(conf_matrix, annot=True, fmt="d", cmap="Blues",
-            xticklabels=TARGET_NAMES, yticklabels=TARGET_NAMES)
-plt.xlabel("Predicted")
-plt.ylabel("Actual")
-plt.title("Confusion Matrix - KNN")
-plt.tight_layout()
-plt.savefig(f"confusion_matrix_knn.png")
-plt.close()
-
-# ---------- ROC CURVES ----------
-print("[INFO] Generating ROC curves...")
-
-N_CLASSES = len(LABEL_MAP)
-
-y_test_bin = label_binarize(y_test, classes=range(N_CLASSES))
-y_score = knn.predict_proba(X_test)
-
-plt.figure(figsize=(8, 6))
-for i in range(N_CLASSES):
-    fpr, tpr, _ = roc_curve(y_test_bin[:, i], y_score[:, i])
-    roc_auc = auc(fpr, tpr)
-    plt.plot(fpr, tpr, label=f'{TARGET_NAMES[i]} (AUC = {roc_auc:.2f})')
-plt.plot([0, 1], [0, 1], 'k--')
-plt.title("ROC Curve - Decision Tree")
-plt.xlabel("False Positive Rate")
-plt.ylabel("True Positive Rate")
-plt.legend()
-plt.grid()
-plt.tight_layout()
-plt.savefig("roc_curve_decision_tree.png")
-plt.close()
-
-# ---------- PCA PLOT ----------
-print("[INFO] Generating PCA scatter plot...")
-X_scaled = StandardScaler().fit_transform(X_resampled)
-pca = PCA(n_components=2)
-pca_result = pca.fit_transform(X_scaled)
-df_pca = pd.DataFrame({
-    'PC1': pca_result[:, 0],
-    'PC2': pca_result[:, 1],
-    'Label': [TARGET_NAMES[i] for i in y_resampled]
-})
-plt.figure(figsize=(8, 6))
-sns.scatterplot(data=df_pca, x='PC1', y='PC2', hue='Label', palette='tab10', alpha=0.7)
-plt.title("PCA of Network Traffic - Resampled")
-plt.tight_layout()
-plt.savefig("pca_plot_decision_tree.png")
-plt.close()
-
-# ---------- SAVE MODEL ----------
-print(f"[INFO] Saving model to {MODEL_PATH}...")
-os.makedirs(MODEL_DIR, exist_ok=True)
-joblib.dump(knn, MODEL_PATH)
-print("[SUCCESS] Model trained and saved.")
-
-# ---------- STATS ----------
-accuracy = accuracy_score(y_test, y_pred)
-precision = precision_score(y_test, y_pred, average='macro', zero_division=0)
-recall = recall_score(y_test, y_pred, average='macro', zero_division=0)
-f1 = f1_score(y_test, y_pred, average='macro', zero_division=0)
-pred_time = (end_pred - start_pred)
-train_time = (end_train - start_train)
-avg_pred_time = pred_time / len(y_test)
-cv_scores = cross_val_score(knn, X_resampled, y_resampled, cv=5)
-
-row = {
-    "Modelo": "KNN",
-    "Accuracy": accuracy,
-    "Precision": precision,
-    "Recall": recall,
-    "F1-Score": f1,
-    "Tiempo entrenamiento (s)": train_time,
-    "Tiempo total inferencia (s)": pred_time,
-    "Tiempo medio por predicción (s)": avg_pred_time,
-    "Accuracy Cross-Val (media)": np.mean(cv_scores),
-    "Cross-Val Std": np.std(cv_scores)
-}
-print(f"[INFO] Model Stats: {row}")
+See train.py for the shared data preparation, caching and outputs.
+"""
 
-if os.path.exists(EXCEL_PATH):
-    df_stats = pd.read_excel(EXCEL_PATH)
-    df_stats = pd.concat([df_stats, pd.DataFrame([row])], ignore_index=True)
-else:
-    df_stats = pd.DataFrame([row])
+from train import main
 
-df_stats.to_excel(EXCEL_PATH, index=False)
-print("[SUCCESS] Modelo entrenado y estadísticas guardadas.")
+if __name__ == "__main__":
+    main(["--models", "knn", "--export", "knn", "--plots"])
@@ -0,0 +1,382 @@
+"""
+train.py
+
+Unified training and benchmarking harness for the detection models.
+
+The labelled dataset is loaded and balanced with SMOTE once; the resampled data,
+the train/test split and the cross-validation folds are cached under .cache/,
+keyed by a hash of the dataset and the resampling settings, so later runs skip
+straight to training. Every selected model is then trained and cross-validated
+on the same data in parallel worker processes, and its inference latency is
+measured per row (the sensor's calling pattern) and per batch.
+
+Outputs:
+- Comparison table: model_comparison.csv (also appended to model_stats.xlsx)
+- Classification report per model: classification_report_<model>.csv
+- With --plots: confusion matrix and ROC curves per model, PCA scatter plot
+- With --export: the chosen model and its manifest, published to
+  DoSDetector/models/ownmodel (see deploy.py)
+
+Usage:
+    python train.py                                   # train and compare every model
+    python train.py --models knn random_forest --jobs 4
+    python train.py --models knn --export knn --plots
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import time
+import warnings
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+
+from sklearn.model_selection import train_test_split, cross_val_score, StratifiedKFold
+from sklearn.metrics import classification_report, confusion_matrix, accuracy_score, precision_score, recall_score, f1_score
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.ensemble import RandomForestClassifier, ExtraTreesClassifier, GradientBoostingClassifier, AdaBoostClassifier
+from sklearn.svm import SVC
+from imblearn.over_sampling import SMOTE
+
+# Custom estimators live with the detector so exported models unpickle there
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "DoSDetector"))
+from fastknn import ProjectedKNNClassifier
+
+# ---------- CONFIGURATION ----------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DATASET_PATH = os.path.join(BASE_DIR, "DBDoS2025.csv")
+
+MODEL_PATH = os.path.abspath(os.path.join(BASE_DIR, "..", "DoSDetector", "models", "ownmodel", "model.pkl"))
+
+EXCEL_PATH = os.path.abspath(os.path.join(BASE_DIR, "..", "DoSDetector", "models", "model_stats.xlsx"))
+
+COMPARISON_PATH = os.path.join(BASE_DIR, "model_comparison.csv")
+
+CACHE_DIR = os.path.join(BASE_DIR, ".cache")
+
+RANDOM_STATE = 42
+TEST_SIZE = 0.3
+CV_FOLDS = 5
+
+LATENCY_ROWS = 200      # Single-row predictions timed per model
+LATENCY_WARMUP = 20     # Untimed predictions before timing
+BATCH_SIZE = 256        # Rows per timed batch prediction
+
+LABEL_MAP = {
+    "benigno": 0,
+    "hulk": 1,
+    "synflood": 2,
+    "udpflood": 3,
+    "postflood": 4
+}
+TARGET_NAMES = list(LABEL_MAP.keys())
+
+# ---------- MODEL REGISTRY ----------
+# key -> (name recorded in model_stats.xlsx, factory returning an unfitted model)
+MODELS = {
+    "knn": ("KNN", lambda: KNeighborsClassifier(n_neighbors=5, metric='euclidean')),
+    "knn_fast": ("KNN PCA-8 KD-tree", lambda: ProjectedKNNClassifier(n_components=8, n_neighbors=5)),
+    "decision_tree": ("DecisionTreeClassifier", lambda: DecisionTreeClassifier()),
+    "random_forest": ("RandomForestClassifier", lambda: RandomForestClassifier()),
+    "extra_tree": ("ExtraTreesClassifier", lambda: ExtraTreesClassifier()),
+    "gradient_boosting": ("GradientBoostingClassifier", lambda: GradientBoostingClassifier()),
+    "adaboost": ("AdaBoostClassifier", lambda: AdaBoostClassifier()),
+    "svm": ("SVC", lambda: SVC()),
+}
+
+
+# ---------- DATA ----------
+def dataset_hash(path):
+    """
+    Hash of the dataset contents and of the settings that shape the cached data.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    digest.update(f"smote={RANDOM_STATE};test={TEST_SIZE};folds={CV_FOLDS}".encode())
+    return digest.hexdigest()
+
+
+def prepare_data(path=DATASET_PATH, cache_dir=CACHE_DIR, use_cache=True):
+    """
+    Loads the dataset, applies SMOTE and builds the train/test split and CV folds,
+    reusing the cached result for the same dataset hash.
+
+    Returns:
+        dict: X (DataFrame), y (Series), train/test indices, folds and dataset hash
+    """
+    data_hash = dataset_hash(path)
+    cache_path = os.path.join(cache_dir, f"{data_hash[:16]}.npz")
+
+    if use_cache and os.path.exists(cache_path):
+        print(f"[INFO] Using cached SMOTE output and splits ({os.path.basename(cache_path)})")
+        cached = np.load(cache_path, allow_pickle=False)
+        X = pd.DataFrame(cached["X"], columns=[str(c) for c in cached["columns"]])
+        y = pd.Series(cached["y"], name="label")
+        folds = [(cached[f"fold{i}_train"], cached[f"fold{i}_test"]) for i in range(CV_FOLDS)]
+        return {"X": X, "y": y, "train_idx": cached["train_idx"], "test_idx": cached["test_idx"],
+                "folds": folds, "hash": data_hash}
+
+    print("[INFO] Loading dataset...")
+    df = pd.read_csv(path)
+    if "label" not in df.columns:
+        raise ValueError("Dataset must include a 'label' column.")
+
+    # Normalize label casing and map to integers
+    df["label"] = df["label"].str.lower().map(LABEL_MAP)
+    if df["label"].isnull().any():
+        raise ValueError("Unrecognized labels found. Check LABEL_MAP and dataset contents.")
+
+    X = df.drop("label", axis=1)
+    y = df["label"].astype(int)
+    print(f"[INFO] Original class distribution: {y.value_counts().to_dict()}")
+
+    print("[INFO] Applying SMOTE to balance class distribution...")
+    X, y = SMOTE(random_state=RANDOM_STATE).fit_resample(X, y)
+    print(f"[INFO] Resampled class distribution: {pd.Series(y).value_counts().to_dict()}")
+
+    # Same partitions as train_test_split(X, y, ...) and cross_val_score(cv=5)
+    train_idx, test_idx = train_test_split(
+        np.arange(len(y)), test_size=TEST_SIZE, random_state=RANDOM_STATE, stratify=y
+    )
+    folds = list(StratifiedKFold(n_splits=CV_FOLDS).split(X, y))
+
+    os.makedirs(cache_dir, exist_ok=True)
+    arrays = {"X": X.to_numpy(dtype=np.float64), "y": y.to_numpy(), "columns": np.array(X.columns, dtype=str),
+              "train_idx": train_idx, "test_idx": test_idx}
+    for i, (fold_train, fold_test) in enumerate(folds):
+        arrays[f"fold{i}_train"] = fold_train
+        arrays[f"fold{i}_test"] = fold_test
+    np.savez(cache_path, **arrays)
+
+    return {"X": X.reset_index(drop=True), "y": pd.Series(y).reset_index(drop=True), "train_idx": train_idx,
+            "test_idx": test_idx, "folds": folds, "hash": data_hash}
+
+
+# ---------- TRAINING ----------
+def train_model(key, data, cross_validate=True):
+    """
+    Trains one registered model on the shared split and scores it.
+    Runs inside a worker process.
+
+    Returns:
+        tuple: (key, fitted model, stats dictionary, test predictions)
+    """
+    name, factory = MODELS[key]
+    X, y = data["X"], data["y"]
+    X_train, y_train = X.iloc[data["train_idx"]], y.iloc[data["train_idx"]]
+    X_test, y_test = X.iloc[data["test_idx"]], y.iloc[data["test_idx"]]
+
+    start_train = time.time()
+    model = factory()
+    model.fit(X_train, y_train)
+    end_train = time.time()
+
+    start_pred = time.time()
+    y_pred = model.predict(X_test)
+    end_pred = time.time()
+
+    cv_scores = cross_val_score(factory(), X, y, cv=data["folds"]) if cross_validate else np.array([np.nan])
+
+    pred_time = end_pred - start_pred
+    stats = {
+        "Modelo": name,
+        "Accuracy": accuracy_score(y_test, y_pred),
+        "Precision": precision_score(y_test, y_pred, average='macro', zero_division=0),
+        "Recall": recall_score(y_test, y_pred, average='macro', zero_division=0),
+        "F1-Score": f1_score(y_test, y_pred, average='macro', zero_division=0),
+        "Tiempo entrenamiento (s)": end_train - start_train,
+        "Tiempo total inferencia (s)": pred_time,
+        "Tiempo medio por predicción (s)": pred_time / len(y_test),
+        "Accuracy Cross-Val (media)": np.mean(cv_scores),
+        "Cross-Val Std": np.std(cv_scores)
+    }
+    return key, model, stats, y_pred
+
+
+def measure_latency(model, X_test, rows=LATENCY_ROWS, warmup=LATENCY_WARMUP, batch_size=BATCH_SIZE):
+    """
+    Times single-row predictions (as done by the sensor) and batch predictions.
+
+    Returns:
+        dict: per-row p50/p99 latency and per-batch latency, in milliseconds
+    """
+    X = np.asarray(X_test, dtype=np.float64)
+    single = X[:rows]
+    latencies = np.empty(len(single))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)  # Fitted with feature names
+        for row in single[:warmup]:
+            model.predict(row.reshape(1, -1))
+        for i, row in enumerate(single):
+            start = time.perf_counter()
+            model.predict(row.reshape(1, -1))
+            latencies[i] = (time.perf_counter() - start) * 1000
+
+        batches = [X[start:start + batch_size] for start in range(0, len(X) - batch_size + 1, batch_size)] or [X]
+        batch_latencies = np.empty(len(batches))
+        for i, batch in enumerate(batches):
+            start = time.perf_counter()
+            model.predict(batch)
+            batch_latencies[i] = (time.perf_counter() - start) * 1000
+
+    return {
+        "Latencia fila p50 (ms)": float(np.percentile(latencies, 50)),
+        "Latencia fila p99 (ms)": float(np.percentile(latencies, 99)),
+        f"Latencia lote {len(batches[0])} (ms)": float(np.median(batch_latencies)),
+        "Latencia por fila en lote (ms)": float(np.median(batch_latencies) / len(batches[0]))
+    }
+
+
+# ---------- PLOTS ----------
+def plot_model(key, model, X_test, y_test, y_pred):
+    """
+    Saves the confusion matrix and ROC curves of a trained model.
+    """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    from sklearn.preprocessing import label_binarize
+    from sklearn.metrics import roc_curve, auc
+
+    name = MODELS[key][0]
+    conf_matrix = confusion_matrix(y_test, y_pred)
+    plt.figure(figsize=(8, 6))
+    sns.heatmap(conf_matrix, annot=True, fmt="d", cmap="Blues",
+                xticklabels=TARGET_NAMES, yticklabels=TARGET_NAMES)
+    plt.xlabel("Predicted")
+    plt.ylabel("Actual")
+    plt.title(f"Confusion Matrix - {name}")
+    plt.tight_layout()
+    plt.savefig(os.path.join(BASE_DIR, f"confusion_matrix_{key}.png"))
+    plt.close()
+
+    if hasattr(model, "predict_proba"):
+        y_score = model.predict_proba(X_test)
+    elif hasattr(model, "decision_function"):
+        y_score = model.decision_function(X_test)
+    else:
+        return
+
+    n_classes = len(LABEL_MAP)
+    y_test_bin = label_binarize(y_test, classes=range(n_classes))
+    plt.figure(figsize=(8, 6))
+    for i in range(n_classes):
+        fpr, tpr, _ = roc_curve(y_test_bin[:, i], y_score[:, i])
+        plt.plot(fpr, tpr, label=f'{TARGET_NAMES[i]} (AUC = {auc(fpr, tpr):.2f})')
+    plt.plot([0, 1], [0, 1], 'k--')
+    plt.title(f"ROC Curve - {name}")
+    plt.xlabel("False Positive Rate")
+    plt.ylabel("True Positive Rate")
+    plt.legend()
+    plt.grid()
+    plt.tight_layout()
+    plt.savefig(os.path.join(BASE_DIR, f"roc_curve_{key}.png"))
+    plt.close()
+
+
+def plot_pca(X, y):
+    """
+    Saves a 2D PCA scatter plot of the resampled dataset.
+    """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.decomposition import PCA
+
+    pca_result = PCA(n_components=2).fit_transform(StandardScaler().fit_transform(X))
+    df_pca = pd.DataFrame({
+        'PC1': pca_result[:, 0],
+        'PC2': pca_result[:, 1],
+        'Label': [TARGET_NAMES[i] for i in y]
+    })
+    plt.figure(figsize=(8, 6))
+    sns.scatterplot(data=df_pca, x='PC1', y='PC2', hue='Label', palette='tab10', alpha=0.7)
+    plt.title("PCA of Network Traffic - Resampled")
+    plt.tight_layout()
+    plt.savefig(os.path.join(BASE_DIR, "pca_plot.png"))
+    plt.close()
+
+
+# ---------- MAIN ----------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train, compare and export the detection models.")
+    parser.add_argument("--models", nargs="+", choices=list(MODELS), default=list(MODELS),
+                        help="Models to train (default: all)")
+    parser.add_argument("--dataset", default=DATASET_PATH, help="Labelled dataset (default: DBDoS2025.csv)")
+    parser.add_argument("--jobs", type=int, default=-1, help="Parallel training processes (default: all cores)")
+    parser.add_argument("--no-cache", action="store_true", help="Recompute SMOTE output and splits")
+    parser.add_argument("--no-cv", action="store_true", help="Skip cross-validation")
+    parser.add_argument("--export", choices=list(MODELS), help=f"Save this model to {MODEL_PATH}")
+    parser.add_argument("--plots", action="store_true", help="Save confusion matrices, ROC curves and PCA plot")
+    parser.add_argument("--no-excel", action="store_true", help=f"Do not append the results to {EXCEL_PATH}")
+    args = parser.parse_args(argv)
+
+    if args.export and args.export not in args.models:
+        args.models.append(args.export)
+
+    data = prepare_data(args.dataset, use_cache=not args.no_cache)
+    print(f"[INFO] Dataset hash: {data['hash'][:16]}")
+    X_test = data["X"].iloc[data["test_idx"]]
+    y_test = data["y"].iloc[data["test_idx"]]
+
+    print(f"[INFO] Training {len(args.models)} model(s): {', '.join(args.models)}")
+    results = Parallel(n_jobs=args.jobs)(
+        delayed(train_model)(key, data, not args.no_cv) for key in args.models
+    )
+
+    # Latency is measured sequentially so models do not compete for the CPU
+    rows = []
+    models = {}
+    for key, model, stats, y_pred in results:
+        print(f"[INFO] Measuring inference latency of {stats['Modelo']}...")
+        stats.update(measure_latency(model, X_test))
+        stats["Dataset hash"] = data["hash"][:16]
+        rows.append(stats)
+        models[key] = model
+
+        report = classification_report(y_test, y_pred, target_names=TARGET_NAMES, output_dict=True, zero_division=0)
+        pd.DataFrame(report).transpose().to_csv(os.path.join(BASE_DIR, f"classification_report_{key}.csv"))
+        if args.plots:
+            plot_model(key, model, X_test, y_test, y_pred)
+
+    if args.plots:
+        plot_pca(data["X"], data["y"])
+
+    # ---------- COMPARISON ----------
+    comparison = pd.DataFrame(rows).sort_values("Accuracy", ascending=False)
+    print("[INFO] Model comparison:")
+    print(comparison.round(6).to_string(index=False))
+    comparison.to_csv(COMPARISON_PATH, index=False)
+    print(f"[INFO] Comparison saved to {COMPARISON_PATH}")
+
+    if not args.no_excel:
+        if os.path.exists(EXCEL_PATH):
+            df_stats = pd.read_excel(EXCEL_PATH)
+            df_stats = pd.concat([df_stats, comparison], ignore_index=True)
+        else:
+            df_stats = comparison
+        os.makedirs(os.path.dirname(EXCEL_PATH), exist_ok=True)
+        df_stats.to_excel(EXCEL_PATH, index=False)
+        print(f"[INFO] Statistics appended to {EXCEL_PATH}")
+
+    # ---------- SAVE MODEL ----------
+    if args.export:
+        from deploy import benchmark_model, build_canary, build_manifest, publish
+
+        print(f"[INFO] Publishing {MODELS[args.export][0]} to {MODEL_PATH}...")
+        stats = next(row for row in rows if row["Modelo"] == MODELS[args.export][0])
+        manifest = build_manifest(args.export, X_test.columns, data["hash"], stats,
+                                  benchmark_model(models[args.export], X_test))
+        publish(models[args.export], manifest, canary=build_canary(X_test, y_test))
+        print("[SUCCESS] Model trained and saved.")
+
+    return comparison, models
+
+
+if __name__ == "__main__":
+    main()
@@ -5,25 +5,59 @@ Provides functions to fetch, parse, and manage the blacklist of detected DoS att
 stored on the VeChain blockchain. Uses Node.js scripts to interact with smart contracts 
 and periodically syncs local memory with blockchain state.
 
+When the DBDOS_LEDGER_URL environment variable is set (e.g. http://127.0.0.1:8545),
+the same operations go to a local ledger stand-in over HTTP instead of VeChain
+(see benchmarks/ledger.py), so the whole system can be benchmarked offline.
+
 Main features:
 - fetch_blacklist: downloads all attacks from VeChain
 - get_blacklist: returns local cached copy
+- get_blacklist_delta: returns entries added since a client's last sync
 - force_update / start_periodic_update: sync options
 - log_attack / delete_attack: log or remove specific attack
+- log_attacks: log several attacks in one transaction (ledger stand-in only)
 - clear_blacklist: deletes all recorded attacks
+- get_blacklist_index / match_prefix: longest-prefix matching of IPs and CIDR blocks
 """
 
+import ipaddress
 import subprocess
 import json
 import threading
 import time
 import re
 import os
+import sys
+import urllib.request
+# common/ (shared by the sensor and the server) is a package at the repository root
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.append(REPO_DIR)
+from common.instrumentation import stage, timed
 
 # Global blacklist and lock to ensure thread-safe access
 _blacklist = []
 _blacklist_lock = threading.Lock()
 
+# Increased whenever the list changes other than by appending (deletions, clears)
+_blacklist_epoch = 0
+
+# Increased whenever _blacklist may change; keys the prefix index cache
+_blacklist_generation = 0
+
+# Prefix index derived from _blacklist, rebuilt when the generation changes
+_blacklist_index = []
+_blacklist_index_key = None
+
+NODE_TIME = stage("node")
+LEDGER_TIME = stage("ledger")
+FETCH_TIME = stage("blacklist_fetch")
+
+# Ledger stand-in used instead of the Node.js scripts when set
+LEDGER_URL = os.environ.get("DBDOS_LEDGER_URL")
+LEDGER_TIMEOUT = 10
+
+@timed(NODE_TIME)
 def _run_node_script(script: str, args: list = []):
     """
     Executes a Node.js or ts-node script located in the ./blacklist directory.
@@ -64,6 +98,29 @@ def _run_node_script(script: str, args: list = []):
         print(f"[EXCEPTION] Running {script}: {e}")
         return None
 
+@timed(LEDGER_TIME)
+def _ledger_request(method: str, path: str, body: dict = None):
+    """
+    Sends a request to the ledger stand-in at LEDGER_URL.
+
+    Args:
+        method (str): HTTP method
+        path (str): Path of the request, e.g. /attacks
+        body (dict): JSON body, if any
+
+    Returns:
+        dict or None: Decoded JSON response if successful; otherwise None
+    """
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    request = urllib.request.Request(LEDGER_URL.rstrip("/") + path, data=data, method=method,
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=LEDGER_TIMEOUT) as response:
+            return json.loads(response.read())
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] Ledger request {method} {path} failed: {e}")
+        return None
+
 def _parse_total_attacks(output: str):
     """
     Extracts the number of registered attacks from a VeChain query output string.
@@ -82,47 +139,97 @@ def _parse_total_attacks(output: str):
         return None
 
 
+def get_total_attacks():
+    """
+    Returns the number of registered attacks without fetching them.
+
+    Returns:
+        int or None: Attack count, or None if the query failed
+    """
+    if LEDGER_URL:
+        data = _ledger_request("GET", "/stats")
+        return data["committed"] if data else None
+    output = _run_node_script("getTotalAttacks.cjs")
+    return _parse_total_attacks(output) if output else None
+
+
+def _fetch_records(records: list):
+    """
+    Appends every attack registered on VeChain to the given list.
+    Attacks that cannot be fetched or parsed are skipped with a warning.
+
+    Args:
+        records (list): List receiving the attack dictionaries
+
+    Returns:
+        bool: False if the attack list itself could not be read
+    """
+    if LEDGER_URL:
+        data = _ledger_request("GET", "/attacks")
+        if data is None:
+            return False
+        records.extend(data["attacks"])
+        print(f"[INFO] Total attacks on the ledger: {len(data['attacks'])}")
+        return True
+
+    output = _run_node_script("getTotalAttacks.cjs")
+    if output is None:
+        print("[ERROR] Could not get output from getTotalAttacks.cjs script")
+        return False
+
+    total_attacks = _parse_total_attacks(output)
+    if total_attacks is None:
+        print("[ERROR] Could not obtain a valid total number of attacks.")
+        return False
+
+    print(f"[INFO] Total attacks on VeChain: {total_attacks}")
+
+    for i in range(total_attacks):
+        print(f"[INFO] Fetching attack {i}")
+        data = _run_node_script("getAttack.cjs", [str(i)])
+        if data:
+            try:
+                # Manually parse expected lines
+                lines = data.strip().splitlines()
+                if len(lines) >= 3:
+                    ip = lines[0].split("IP:")[1].strip()
+                    attack_type = lines[1].split("Attack type:")[1].strip()
+                    timestamp = lines[2].split("Timestamp:")[1].strip()
+                    records.append({
+                        "ip": ip,
+                        "attack_type": attack_type,
+                        "timestamp": timestamp
+                    })
+                else:
+                    print(f"[WARNING] Unexpected format in attack output {i}: {data}")
+            except Exception as e:
+                print(f"[ERROR] Failed to parse attack {i}: {e}")
+        else:
+            print(f"[WARNING] Could not fetch attack {i}.")
+    return True
+
+
+@timed(FETCH_TIME)
 def fetch_blacklist():
     """
     Retrieves all registered attacks from VeChain and stores them in local memory.
+    The blacklist epoch is increased unless the new list only appends to the old one.
+    If the fetch fails, the previous list and epoch are kept.
+
+    Returns:
+        bool: True if the blacklist was refreshed
     """
-    global _blacklist
+    global _blacklist, _blacklist_epoch, _blacklist_generation
+    records = []
+    if not _fetch_records(records):
+        print("[ERROR] Blacklist fetch failed; keeping the previous blacklist")
+        return False
     with _blacklist_lock:
-        _blacklist = []
-        output = _run_node_script("getTotalAttacks.cjs")
-        if output is None:
-            print("[ERROR] Could not get output from getTotalAttacks.cjs script")
-            return
-
-        total_attacks = _parse_total_attacks(output)
-        if total_attacks is None:
-            print("[ERROR] Could not obtain a valid total number of attacks.")
-            return
-
-        print(f"[INFO] Total attacks on VeChain: {total_attacks}")
-
-        for i in range(total_attacks):
-            print(f"[INFO] Fetching attack {i}")
-            data = _run_node_script("getAttack.cjs", [str(i)])
-            if data:
-                try:
-                    # Manually parse expected lines
-                    lines = data.strip().splitlines()
-                    if len(lines) >= 3:
-                        ip = lines[0].split("IP:")[1].strip()
-                        attack_type = lines[1].split("Attack type:")[1].strip()
-                        timestamp = lines[2].split("Timestamp:")[1].strip()
-                        _blacklist.append({
-                            "ip": ip,
-                            "attack_type": attack_type,
-                            "timestamp": timestamp
-                        })
-                    else:
-                        print(f"[WARNING] Unexpected format in attack output {i}: {data}")
-                except Exception as e:
-                    print(f"[ERROR] Failed to parse attack {i}: {e}")
-            else:
-                print(f"[WARNING] Could not fetch attack {i}.")
+        if records[:len(_blacklist)] != _blacklist:
+            _blacklist_epoch += 1
+        _blacklist = records
+        _blacklist_generation += 1
+    return True
 
 
 def get_blacklist():
@@ -135,6 +242,107 @@ def get_blacklist():
     with _blacklist_lock:
         return list(_blacklist)
 
+def get_blacklist_delta(since=0, epoch=None):
+    """
+    Returns the attacks added after the first `since` entries, so clients can
+    keep a cached copy fresh. Append-only refreshes keep the epoch; deletions
+    and clears change it, in which case the full list is returned.
+
+    Args:
+        since (int): Number of entries the client already has
+        epoch (int or None): Epoch the client's copy belongs to
+
+    Returns:
+        dict: epoch, total, delta (bool) and attacks
+    """
+    with _blacklist_lock:
+        delta = epoch == _blacklist_epoch and 0 <= since <= len(_blacklist)
+        return {
+            "epoch": _blacklist_epoch,
+            "total": len(_blacklist),
+            "delta": delta,
+            "attacks": list(_blacklist[since:]) if delta else list(_blacklist)
+        }
+
+def build_prefix_index(attacks):
+    """
+    Groups blacklisted addresses and CIDR blocks by prefix length for longest-prefix matching.
+
+    Args:
+        attacks (list): List of attack dictionaries with an 'ip' entry (address or CIDR)
+
+    Returns:
+        list: (version, prefix length, set of network addresses as int), longest prefixes first
+    """
+    groups = {}
+    for attack in attacks:
+        try:
+            network = ipaddress.ip_network(attack['ip'], strict=False)
+        except (KeyError, ValueError):
+            continue
+        groups.setdefault((network.version, network.prefixlen), set()).add(int(network.network_address))
+    return [(version, prefixlen, groups[(version, prefixlen)])
+            for version, prefixlen in sorted(groups, key=lambda key: key[1], reverse=True)]
+
+def get_blacklist_index():
+    """
+    Returns the prefix index of the current local blacklist, rebuilding it only when it changed.
+
+    Returns:
+        list: Prefix index as built by build_prefix_index
+    """
+    global _blacklist_index, _blacklist_index_key
+    with _blacklist_lock:
+        if _blacklist_generation != _blacklist_index_key:
+            _blacklist_index = build_prefix_index(_blacklist)
+            _blacklist_index_key = _blacklist_generation
+        return _blacklist_index
+
+def _remove_local(index=None):
+    """
+    Applies a successful deletion to the local blacklist without waiting for the
+    next fetch: removes the attack at `index`, or every attack if None. Clients
+    are sent the full list on their next sync (new epoch).
+
+    Args:
+        index (int or None): Index of the deleted attack
+    """
+    global _blacklist, _blacklist_epoch, _blacklist_generation
+    with _blacklist_lock:
+        if index is None:
+            _blacklist = []
+        elif 0 <= index < len(_blacklist):
+            _blacklist = _blacklist[:index] + _blacklist[index + 1:]
+        else:
+            return
+        _blacklist_epoch += 1
+        _blacklist_generation += 1
+
+def match_prefix(index, ip):
+    """
+    Longest-prefix match of an IP address against a prefix index.
+
+    Args:
+        index (list): Prefix index as built by build_prefix_index
+        ip (str): Address to check
+
+    Returns:
+        str or None: The most specific blacklisted entry containing the IP
+    """
+    try:
+        addr = ipaddress.ip_address(ip)
+    except ValueError:
+        return None
+    value = int(addr)
+    bits = addr.max_prefixlen
+    for version, prefixlen, networks in index:
+        if version != addr.version:
+            continue
+        network = (value >> (bits - prefixlen)) << (bits - prefixlen)
+        if network in networks:
+            return f"{type(addr)(network)}/{prefixlen}"
+    return None
+
 def start_periodic_update(interval=10):
     """
     Starts a background thread to periodically fetch the updated blacklist from VeChain.
@@ -171,15 +379,21 @@ def clear_blacklist():
     """
     Executes a script that deletes all attack entries on the blockchain.
     """
-    output = _run_node_script("deleteAllAttacks.cjs")
+    if LEDGER_URL:
+        data = _ledger_request("DELETE", "/attacks")
+        output = data and data.get("tx_id")
+    else:
+        output = _run_node_script("deleteAllAttacks.cjs")
     if output:
+        _remove_local()
         print(f"[INFO] All attacks deleted successfully. Tx Id: {output}")
     else:
         print("[ERROR] Failed to delete attacks.")
 
 def log_attack(ip, attack_type):
     """
-    Logs a new attack to the VeChain blockchain via Node.js script.
+    Logs a new attack to the VeChain blockchain via Node.js script
+    (or to the ledger stand-in when DBDOS_LEDGER_URL is set).
 
     Args:
         ip (str): IP address of the attacker
@@ -188,6 +402,24 @@ def log_attack(ip, attack_type):
     Returns:
         dict or None: Summary of transaction result or None if error
     """
+    if LEDGER_URL:
+        data = _ledger_request("POST", "/attacks", {"ip": ip, "attack_type": attack_type})
+        if data is None:
+            print("[ERROR] Failed to log attack on the ledger")
+            return None
+        print(f"[INFO] Attack logged on the ledger. Tx Id: {data['tx_id']}")
+        return {
+            "status": "Attack logged",
+            "tx_id": data["tx_id"],
+            "gas": data.get("gas", "Unknown")
+        }
+    return _log_to_vechain(ip, attack_type)
+
+@timed(NODE_TIME)
+def _log_to_vechain(ip, attack_type):
+    """
+    Sends the attack transaction with the sendAttackLog.cjs Node.js script.
+    """
     script_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "blacklist"))
     script_path = os.path.join(script_dir, "sendAttackLog.cjs")
 
@@ -222,7 +454,28 @@ def log_attack(ip, attack_type):
         error_msg = e.stderr.strip() if e.stderr else "Unknown error"
         print(f"[ERROR] Failed to log attack: {error_msg}")
         return None
-    
+
+def log_attacks(attacks):
+    """
+    Logs several attacks in one transaction. Only the ledger stand-in takes
+    batches (a multi-clause transaction on VeChain); with the Node.js script
+    each attack is its own transaction.
+
+    Args:
+        attacks (list): (ip, attack_type) pairs
+
+    Returns:
+        list: Transaction summary (or None if failed) of every attack
+    """
+    if not LEDGER_URL:
+        return [log_attack(ip, attack_type) for ip, attack_type in attacks]
+    data = _ledger_request("POST", "/attacks", {"attacks": [{"ip": ip, "attack_type": attack_type}
+                                                            for ip, attack_type in attacks]})
+    if data is None:
+        print(f"[ERROR] Failed to log {len(attacks)} attacks on the ledger")
+        return [None] * len(attacks)
+    return [{"status": "Attack logged", "tx_id": data["tx_id"], "gas": data.get("gas", "Unknown")}] * len(attacks)
+
 def delete_attack(index):
     """
     Deletes a specific attack entry on VeChain based on its index.
@@ -233,9 +486,22 @@ def delete_attack(index):
     Returns:
         dict or None: Summary of transaction or None if failed
     """
+    if LEDGER_URL:
+        data = _ledger_request("DELETE", f"/attacks/{index}")
+        if data is None:
+            print(f"[ERROR] Failed to delete attack at index {index}.")
+            return None
+        _remove_local(index)
+        return {
+            "status": "Attack deleted",
+            "tx_id": data["tx_id"],
+            "gas": data.get("gas", "Unknown")
+        }
+
     output = _run_node_script("deleteAttack.cjs", [str(index)])
 
     if output:
+        _remove_local(index)
         tx_match = re.search(r"Transaction sent, ID:\s*(0x[a-fA-F0-9]+)", output)
         tx_id = tx_match.group(1) if tx_match else "Not found"
 
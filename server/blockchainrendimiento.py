@@ -1,39 +1,339 @@
+"""
+blockchainrendimiento.py
+
+This script benchmarks the blockchain side of the blacklist. It runs against
+the VeChain testnet (the Node.js scripts) or against the local ledger stand-in
+(benchmarks/ledger.py), and measures:
+- submit latency: how long log_attack / log_attacks takes to return, swept
+  over the number of writes in flight (--concurrency) and attacks per
+  transaction (--batch; batches of more than one attack need the stand-in)
+- confirmation latency: from the start of a write until the registry count
+  includes it. Writes are matched to the count in the order they returned,
+  so with many writes in flight this is approximate
+- refresh time: how long fetch_blacklist takes as the registry grows
+  (--registry sizes; the registry is topped up with writes to each size)
+
+Each point is summarized with its mean, p50, p90, p99, p99.9 and maximum, computed
+from every sample rather than from histogram buckets. Every row is appended to
+a CSV together with the git commit, so results can be compared across commits.
+
+Testnet writes cost gas. The defaults therefore start a stand-in with VeChain-like
+delays (10 s blocks, 1.55 s per write) unless --backend testnet or
+--ledger-url is given.
+
+Usage:
+    python blockchainrendimiento.py                                # stand-in, default sweep
+    python blockchainrendimiento.py --concurrency 1 16 256 --batch 1 10 --registry 100 10000
+    python blockchainrendimiento.py --backend testnet --concurrency 1 --rounds 5 --registry
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
 import pandas as pd
-from blacklist import log_attack
+
+import blacklist
 
 # ---------- CONFIGURATION ----------
-NUM_TESTS = 5
-IP_BASE = "192.168.1."
+RESULTS_CSV = "blockchain_benchmark.csv"
 ATTACK_TYPE = "DoS Test"
+PERCENTILES = (50, 90, 99, 99.9)
+
+# Attacks per transaction and writes in flight used to fill the registry
+PREFILL_BATCH = 1000
+PREFILL_CONCURRENCY = 16
+
+LEDGER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks", "ledger.py")
+
+
+# ---------- Helpers ----------
+
+def test_ip(index):
+    """
+    Distinct address for the index-th test attack (10.0.0.0/8).
+    """
+    return f"10.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}"
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def summarize(values_s):
+    """
+    Mean, percentiles and maximum of a list of durations, in milliseconds.
+    """
+    if not values_s:
+        return {"mean_ms": None, "max_ms": None, **{f"p{p:g}_ms".replace(".", "_"): None for p in PERCENTILES}}
+    values = np.asarray(values_s) * 1000
+    row = {"mean_ms": round(float(values.mean()), 2), "max_ms": round(float(values.max()), 2)}
+    for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        row[f"p{p:g}_ms".replace(".", "_")] = round(float(value), 2)
+    return row
+
+
+def start_standin(block_time, submit_latency):
+    """
+    Starts benchmarks/ledger.py on a free local port.
+
+    Returns:
+        (subprocess.Popen, str): The process and its URL
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = subprocess.Popen([sys.executable, LEDGER_SCRIPT, "--port", str(port), "--block-time", str(block_time),
+                                "--submit-latency", str(submit_latency)], stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    blacklist.LEDGER_URL = url
+    deadline = time.monotonic() + 10
+    while blacklist.get_total_attacks() is None:
+        if time.monotonic() > deadline or process.poll() is not None:
+            process.kill()
+            raise RuntimeError("The ledger stand-in did not start")
+        time.sleep(0.2)
+    return process, url
+
+
+class CountPoller:
+    """
+    Polls the registry size from a background thread and remembers when each
+    count was first seen.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.history = []  # (time, count), counts increasing
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            count = blacklist.get_total_attacks()
+            if count is not None and (not self.history or count > self.history[-1][1]):
+                self.history.append((time.perf_counter(), count))
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def wait_for(self, count, timeout):
+        """
+        Waits until the registry holds at least `count` attacks.
 
-latencies = []
-tx_ids = []
+        Returns:
+            bool: False on timeout
+        """
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            if self.history and self.history[-1][1] >= count:
+                return True
+            time.sleep(self.interval)
+        return False
 
-print("[INFO] Starting blockchain logging latency measurement...")
+    def first_seen(self, count):
+        """
+        When the registry first held at least `count` attacks, or None.
+        """
+        return next((t for t, seen in self.history if seen >= count), None)
 
-for i in range(NUM_TESTS):
-    ip = IP_BASE + str(100 + i)
 
-    print(f"[INFO] Sending simulated attack from IP {ip}...")
+def write(next_index, batch):
+    """
+    Logs `batch` new attacks in one call.
+
+    Returns:
+        (start, end, succeeded) with perf_counter times
+    """
+    attacks = [(test_ip(next_index + i), ATTACK_TYPE) for i in range(batch)]
     start = time.perf_counter()
-    result = log_attack(ip, ATTACK_TYPE)
-    end = time.perf_counter()
-
-    elapsed = end - start
-    latencies.append(elapsed)
-    tx_ids.append(result.get("tx_id") if result else "ERROR")
-
-    print(f"[OK] Latency: {elapsed:.3f} s - TxID: {tx_ids[-1]}")
-
-# ---------- EXPORT RESULTS ----------
-df = pd.DataFrame({
-    "IP": [IP_BASE + str(100 + i) for i in range(NUM_TESTS)],
-    "Latency_s": latencies,
-    "TxID": tx_ids
-})
-
-df.to_csv("blockchain_latency.csv", index=False)
-print("\n[INFO] Results saved to 'blockchain_latency.csv'")
-print("\nLatency summary statistics:\n")
-print(df["Latency_s"].describe())
+    if batch == 1:
+        results = [blacklist.log_attack(*attacks[0])]
+    else:
+        results = blacklist.log_attacks(attacks)
+    return start, time.perf_counter(), all(result is not None for result in results)
+
+
+# ---------- Benchmarks ----------
+
+def bench_writes(concurrency, batch, rounds, poll, confirm_timeout, counter):
+    """
+    Runs rounds * concurrency writes of `batch` attacks with `concurrency` in flight.
+
+    Returns:
+        list: 'submit' and 'confirm' result rows
+    """
+    base = blacklist.get_total_attacks() or 0
+    calls = rounds * concurrency
+    first_index = counter[0]
+    counter[0] += calls * batch
+
+    poller = CountPoller(poll).start()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(write, first_index + i * batch, batch) for i in range(calls)]
+        results = [future.result() for future in futures]
+
+    succeeded = sorted((result for result in results if result[2]), key=lambda result: result[1])
+    records = len(succeeded) * batch
+    if not poller.wait_for(base + records, confirm_timeout):
+        print(f"[WARNING] Not every write was confirmed within {confirm_timeout:g}s")
+    poller.stop()
+
+    # The k-th write to return is taken as the one that brings the count to base + k * batch
+    confirms = []
+    for k, (start, end, _) in enumerate(succeeded, 1):
+        seen = poller.first_seen(base + k * batch)
+        if seen is not None:
+            confirms.append((start, seen))
+
+    elapsed = max(result[1] for result in results) - min(result[0] for result in results)
+    point = {"concurrency": concurrency, "batch": batch, "registry": base, "errors": len(results) - len(succeeded)}
+    rows = [dict(point, test="submit", samples=len(succeeded),
+                 throughput=round(records / elapsed, 2) if elapsed > 0 else None,
+                 **summarize([end - start for start, end, _ in succeeded]))]
+    confirm_elapsed = max((seen for _, seen in confirms), default=0) - min(result[0] for result in results)
+    rows.append(dict(point, test="confirm", samples=len(confirms),
+                     throughput=round(len(confirms) * batch / confirm_elapsed, 2) if confirms else None,
+                     **summarize([seen - start for start, seen in confirms])))
+    return rows
+
+
+def fill_registry(size, counter, confirm_timeout, batched):
+    """
+    Adds attacks until the registry holds `size` of them.
+
+    Returns:
+        int: The registry size reached
+    """
+    current = blacklist.get_total_attacks() or 0
+    missing = size - current
+    if missing <= 0:
+        return current
+    print(f"[INFO] Filling the registry from {current} to {size} attacks...")
+    batch = PREFILL_BATCH if batched else 1
+    sizes = [min(batch, missing - start) for start in range(0, missing, batch)]
+    starts = [int(start) for start in np.cumsum([counter[0]] + sizes[:-1])]
+    counter[0] += missing
+    with ThreadPoolExecutor(max_workers=PREFILL_CONCURRENCY) as pool:
+        list(pool.map(lambda args: write(*args), zip(starts, sizes)))
+    poller = CountPoller(0.5).start()
+    poller.wait_for(size, confirm_timeout)
+    poller.stop()
+    return blacklist.get_total_attacks() or 0
+
+
+def bench_refresh(runs):
+    """
+    Times fetch_blacklist `runs` times.
+
+    Returns:
+        dict: 'refresh' result row
+    """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        blacklist.fetch_blacklist()
+        times.append(time.perf_counter() - start)
+    size = len(blacklist.get_blacklist())
+    return dict(test="refresh", concurrency=1, batch=1, registry=size, errors=0, samples=runs,
+                throughput=round(size / np.mean(times), 2) if times else None, **summarize(times))
+
+
+# ---------- MAIN ----------
+
+def main():
+    parser = argparse.ArgumentParser(description="Blockchain write, confirmation and refresh benchmark.")
+    parser.add_argument("--backend", choices=["standin", "testnet"], default="standin",
+                        help="Local ledger stand-in (default) or the VeChain testnet through Node.js")
+    parser.add_argument("--ledger-url", help="Use an already running stand-in instead of starting one")
+    parser.add_argument("--block-time", type=float, default=10.0, help="Stand-in block interval (default: 10)")
+    parser.add_argument("--submit-latency", type=float, default=1.55, help="Stand-in write latency (default: 1.55)")
+    parser.add_argument("--concurrency", type=int, nargs="*", default=[1, 4, 16, 64, 256],
+                        help="Writes in flight to sweep (none: skip the write sweep)")
+    parser.add_argument("--batch", type=int, nargs="+", default=[1], help="Attacks per transaction to sweep")
+    parser.add_argument("--rounds", type=int, default=5, help="Writes per point = rounds x concurrency")
+    parser.add_argument("--registry", type=int, nargs="*", default=[10, 100, 1000, 10000, 100000],
+                        help="Registry sizes for the refresh benchmark (none: skip it)")
+    parser.add_argument("--refresh-runs", type=int, default=5, help="fetch_blacklist calls per registry size")
+    parser.add_argument("--poll", type=float, help="Seconds between registry counts (default: 0.05, testnet 2)")
+    parser.add_argument("--confirm-timeout", type=float, default=120, help="Seconds to wait for confirmations")
+    parser.add_argument("--clear", action="store_true", help="Delete every registered attack first")
+    parser.add_argument("--output", default=RESULTS_CSV, help=f"CSV the results are appended to (default: {RESULTS_CSV})")
+    args = parser.parse_args()
+
+    standin = None
+    if args.ledger_url:
+        blacklist.LEDGER_URL = args.ledger_url
+        backend = "standin"
+    elif args.backend == "standin":
+        standin, url = start_standin(args.block_time, args.submit_latency)
+        print(f"[INFO] Ledger stand-in at {url} (block time {args.block_time:g}s, "
+              f"submit latency {args.submit_latency:g}s)")
+        backend = "standin"
+    else:
+        blacklist.LEDGER_URL = None
+        backend = "testnet"
+        print("[WARNING] Every write is a testnet transaction and costs gas")
+    poll = args.poll or (0.05 if backend == "standin" else 2.0)
+    if backend == "testnet" and max(args.batch) > 1:
+        print("[WARNING] sendAttackLog.cjs logs one attack per transaction; batches are sent as separate writes")
+
+    rows = []
+    try:
+        if args.clear:
+            blacklist.clear_blacklist()
+        counter = [blacklist.get_total_attacks() or 0]  # Next test address index
+
+        for concurrency in args.concurrency:
+            for batch in args.batch:
+                print(f"[INFO] Writes: concurrency {concurrency}, batch {batch}, "
+                      f"{args.rounds * concurrency} calls...")
+                for row in bench_writes(concurrency, batch, args.rounds, poll, args.confirm_timeout, counter):
+                    rows.append(row)
+                    print(f"[OK] {row['test']:<8} p50 {row['p50_ms']} ms | p99 {row['p99_ms']} ms | "
+                          f"{row['throughput']} attacks/s | {row['errors']} errors")
+
+        for size in sorted(args.registry):
+            reached = fill_registry(size, counter, args.confirm_timeout, backend == "standin")
+            if reached > size:
+                print(f"[WARNING] The registry already holds {reached} attacks; measuring that instead of {size}")
+            row = bench_refresh(args.refresh_runs)
+            rows.append(row)
+            print(f"[OK] refresh  {row['registry']} attacks: p50 {row['p50_ms']} ms | max {row['max_ms']} ms")
+    finally:
+        if standin is not None:
+            standin.terminate()
+            standin.wait()
+
+    # ---------- EXPORT RESULTS ----------
+    df = pd.DataFrame(rows)
+    df.insert(0, "commit", git_commit())
+    df.insert(1, "date", datetime.now().isoformat(timespec="seconds"))
+    df.insert(2, "backend", backend)
+    df.insert(3, "block_time", args.block_time if standin is not None else None)
+    df.insert(4, "submit_latency", args.submit_latency if standin is not None else None)
+    df.to_csv(args.output, mode="a", header=not os.path.exists(args.output), index=False)
+    print(f"\n[INFO] {len(df)} rows appended to '{args.output}'")
+    print(df[["test", "concurrency", "batch", "registry", "samples", "throughput", "p50_ms", "p99_ms", "max_ms"]]
+          .to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
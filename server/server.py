@@ -6,13 +6,18 @@ This module starts a threaded HTTP REST server with the following features:
 - Provides GET/POST/DELETE endpoints for viewing and managing the blacklist
 - Periodically fetches the blacklist from the VeChain blockchain
 - Allows logging and deleting attack records via smart contract scripts
+- Exposes request latencies, blacklist fetch and Node.js script timings on
+  /metrics in the Prometheus text format (see common/instrumentation.py)
+- Samples its own stacks on SIGUSR1, on /debug/profile (opt-in with
+  --profile-endpoint, loopback clients only) or when too many requests are
+  in flight (see common/profiler.py)
 
 It integrates with:
 - blacklist.py for blockchain interaction
 - frontend/frontend.html as UI
 - Uses Python's built-in HTTP server (multithreaded)
 
-The server listens on the local IP (determined automatically) and port 8080.
+The server listens on the local IP (determined automatically, or --host) and port 8080.
 """
 
 import argparse
@@ -23,10 +28,17 @@ import json
 import signal
 import threading
 import subprocess
-from blacklist import get_blacklist, log_attack, force_update, fetch_blacklist, clear_blacklist, delete_attack
-import time
-from urllib.parse import urlparse
+import sys
 import os
+# common/ (shared by the sensor and the server) is a package at the repository root
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.append(REPO_DIR)
+from blacklist import get_blacklist, get_blacklist_delta, log_attack, force_update, fetch_blacklist, clear_blacklist, delete_attack, get_blacklist_index, match_prefix
+from common.instrumentation import histogram, gauge, timed, render, is_loopback, CONTENT_TYPE
+from common.profiler import SamplingProfiler, install_signal
+import time
+from urllib.parse import urlparse, parse_qs
 
 # Interval in seconds between automatic blacklist updates
 auto_update_interval = 30
@@ -35,6 +47,17 @@ stop_event = threading.Event()
 
 httpd=None
 
+REQUEST_HELP = "Seconds spent handling HTTP requests"
+GET_TIME = histogram("dbdos_server_request_seconds", REQUEST_HELP, method="GET")
+POST_TIME = histogram("dbdos_server_request_seconds", REQUEST_HELP, method="POST")
+DELETE_TIME = histogram("dbdos_server_request_seconds", REQUEST_HELP, method="DELETE")
+gauge("dbdos_server_blacklist_entries", "Attacks in the local blacklist copy", function=lambda: len(get_blacklist()))
+profiler = SamplingProfiler("profiles")
+profile_seconds = 10
+profile_endpoint = False  # /debug/profile is served only with --profile-endpoint
+
+gauge("dbdos_server_threads", "Live threads (one per open connection plus workers)", function=threading.active_count)
+
 # Load HTML for the frontend interface at root URL
 frontend_path = os.path.join(os.path.dirname(__file__), "frontend", "frontend.html")
 with open(frontend_path, "r", encoding="utf-8") as f:
@@ -81,25 +104,28 @@ class SimpleRESTHandler(BaseHTTPRequestHandler):
     """
     Handles HTTP requests to REST endpoints and frontend.
     """
-    blacklist_ips = set()
+    blacklist_index = []
 
     def load_blacklist(self):
         """
-        Loads current IP blacklist into memory for quick checks.
+        Loads the prefix index of the current blacklist (IPs and CIDR blocks) for quick checks.
         """
-        attacks = get_blacklist()
-        self.blacklist_ips = set(attack['ip'] for attack in attacks if 'ip' in attack)
+        self.blacklist_index = get_blacklist_index()
 
     def client_ip_blocked(self):
         """
-        Checks if the client IP is in the blacklist.
+        Checks if the client IP is covered by the blacklist (longest-prefix match).
         """
         client_ip = self.client_address[0]
-        return client_ip in self.blacklist_ips
+        return match_prefix(self.blacklist_index, client_ip) is not None
     
+    @timed(GET_TIME)
     def do_GET(self):
         """
-        Handles GET requests for root and /blacklist.
+        Handles GET requests for root, /blacklist, /metrics and /debug/profile
+        (with --profile-endpoint, from loopback clients only).
+        /blacklist?since=<n>&epoch=<e> only returns the entries added after the
+        first n, as long as the blacklist epoch is still e.
         """
         self.load_blacklist()
 
@@ -109,15 +135,39 @@ class SimpleRESTHandler(BaseHTTPRequestHandler):
             self.end_headers()
             self.wfile.write(json.dumps({"error": "Access denied: IP blocked"}).encode("utf-8"))
             return
-        if self.path == "/blacklist":
-            attacks = get_blacklist()
+        parsed_path = urlparse(self.path)
+        if parsed_path.path == "/metrics":
+            body = render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        if parsed_path.path == "/debug/profile" and profile_endpoint and is_loopback(self.client_address[0]):
+            status, response = profiler.handle_request(parsed_path.query, profile_seconds)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(json.dumps(response).encode("utf-8"))
+            return
+
+        if parsed_path.path == "/blacklist":
+            query = parse_qs(parsed_path.query)
+            try:
+                since = int(query.get("since", ["0"])[0])
+                epoch = int(query["epoch"][0]) if "epoch" in query else None
+            except ValueError:
+                self.send_response(400)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(json.dumps({"error": "since and epoch must be integers"}).encode("utf-8"))
+                return
+            response = {"status": "Blacklist fetched"}
+            response.update(get_blacklist_delta(since, epoch))
             self.send_response(200)
             self.send_header("Content-Type", "application/json")
             self.end_headers()
-            response = {
-                "status": "Blacklist fetched",
-                "attacks": attacks
-            }
             self.wfile.write(json.dumps(response).encode("utf-8"))
             return
 
@@ -136,6 +186,7 @@ class SimpleRESTHandler(BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(json.dumps({"error": "Endpoint not found"}).encode("utf-8"))
 
+    @timed(POST_TIME)
     def do_POST(self):
         """
         Handles POST requests for updating settings and logging new attacks.
@@ -232,6 +283,7 @@ class SimpleRESTHandler(BaseHTTPRequestHandler):
             self.wfile.write(json.dumps({"error": "Endpoint not found"}).encode("utf-8"))
     from http.server import BaseHTTPRequestHandler
 
+    @timed(DELETE_TIME)
     def do_DELETE(self):
         """
         Handles DELETE requests to remove specific attack entries from blockchain.
@@ -297,11 +349,30 @@ def main():
     """
     Starts the HTTP server and begins periodic blacklist updates.
     """
+    global profile_seconds, profile_endpoint, auto_update_interval
     parser = argparse.ArgumentParser(description="Start the Blacklist HTTP Server.")
     parser.add_argument('--port', type=int, help='Port number to run the server on (default: 8080)')
+    parser.add_argument('--host', help='Address to listen on (default: the local IP used to reach the internet)')
+    parser.add_argument('--update-interval', type=float,
+                        help=f'Seconds between blacklist updates (default: {auto_update_interval})')
+    parser.add_argument('--profile-dir', default='profiles', help='Where profiles are saved (default: profiles)')
+    parser.add_argument('--profile-seconds', type=float, default=10, help='Length of a profile capture (default: 10)')
+    parser.add_argument('--profile-endpoint', action='store_true',
+                        help='Serve /debug/profile to loopback clients (default: off)')
+    parser.add_argument('--profile-on-threads', type=int, metavar='THREADS',
+                        help='Profile automatically when this many threads (open requests) are alive')
     args = parser.parse_args()
 
-    ip = get_local_ip()
+    if args.update_interval:
+        auto_update_interval = args.update_interval
+    profiler.output_dir = args.profile_dir
+    profile_seconds = args.profile_seconds
+    profile_endpoint = args.profile_endpoint
+    if args.profile_on_threads:
+        profiler.watch({"threads": lambda: threading.active_count() >= args.profile_on_threads},
+                       seconds=args.profile_seconds)
+
+    ip = args.host or get_local_ip()
 
     if args.port is not None:
         port = args.port
@@ -320,6 +391,8 @@ def main():
     
 
     signal.signal(signal.SIGINT, signal_handler)
+    if install_signal(profiler, args.profile_seconds):
+        print(f"[INFO] Send SIGUSR1 (kill -USR1 {os.getpid()}) to profile for {args.profile_seconds:g}s")
 
     print(f"Updating blacklist & Starting HTTP server at http://{ip}:{port}")
     update_thread.start()
@@ -0,0 +1,18 @@
+"""
+Shared test setup: the sensor modules (DoSDetector/), the dataset tools (data/)
+and the benchmark scripts are imported the way the scripts import each other, from their own directory;
+the shared common/ package from the repository root.
+"""
+
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+for directory in ("DoSDetector", "data", "benchmarks"):
+    path = os.path.join(REPO_DIR, directory)
+    if path not in sys.path:
+        sys.path.insert(0, path)
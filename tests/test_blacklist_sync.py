@@ -0,0 +1,100 @@
+import sys
+import types
+import pytest
+from blacklist import BlacklistManager
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """
+    Replaces the HTTP client used by sync with canned /blacklist responses.
+    """
+    module = types.ModuleType("requests")
+    module.RequestException = type("RequestException", (Exception,), {})
+    module.calls = []
+    module.responses = []
+
+    def get(url, params=None, timeout=None):
+        module.calls.append(params)
+        response = module.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return FakeResponse(response)
+
+    module.get = get
+    monkeypatch.setitem(sys.modules, "requests", module)
+    return module
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return BlacklistManager(logger=str(tmp_path / "blacklist.log"))
+
+
+def attacks(*ips):
+    return [{"ip": ip, "attackType": "DoS Attack"} for ip in ips]
+
+
+def test_delta_sync_appends_entries(server, manager):
+    server.responses = [
+        {"epoch": 1, "total": 2, "delta": False, "attacks": attacks("10.0.0.1", "10.0.0.2")},
+        {"epoch": 1, "total": 3, "delta": True, "attacks": attacks("10.0.0.3")},
+    ]
+    assert manager.sync("http://server") == 2
+    assert manager.sync("http://server") == 1
+    assert server.calls == [{}, {"since": 2, "epoch": 1}]
+    assert manager.remote == {"10.0.0.1", "10.0.0.2", "10.0.0.3"}
+    assert all(manager.is_blacklisted(f"10.0.0.{i}") for i in (1, 2, 3))
+
+
+def test_server_entries_do_not_escalate_to_subnet(server, manager):
+    server.responses = [{"epoch": 1, "total": 4, "attacks": attacks(*(f"10.0.0.{i}" for i in range(4)))}]
+    assert manager.sync("http://server") == 4
+    assert not manager.is_blacklisted("10.0.0.200")
+
+
+def test_full_reload_unblocks_removed_entries(server, manager):
+    server.responses = [
+        {"epoch": 1, "total": 2, "attacks": attacks("10.0.0.1", "10.1.0.0/16")},
+        {"epoch": 2, "total": 1, "delta": False, "attacks": attacks("10.0.0.1")},
+    ]
+    manager.sync("http://server")
+    assert manager.is_blacklisted("10.1.2.3")
+    assert manager.sync("http://server") == 0
+    assert manager.remote == {"10.0.0.1"}
+    assert manager.is_blacklisted("10.0.0.1")
+    assert not manager.is_blacklisted("10.1.2.3")
+
+
+def test_full_reload_keeps_local_blacklist(server, manager):
+    server.responses = [
+        {"epoch": 1, "total": 1, "attacks": attacks("10.0.0.1")},
+        {"epoch": 2, "total": 0, "attacks": []},
+    ]
+    manager.sync("http://server")
+    manager.blacklist_local["10.0.0.1"] = {"warnings": 3, "blacklisted": True}
+    manager.sync("http://server")
+    assert manager.is_blacklisted("10.0.0.1")
+
+
+def test_failed_sync_keeps_state(server, manager):
+    server.responses = [
+        {"epoch": 1, "total": 1, "attacks": attacks("10.0.0.1")},
+        server.RequestException("connection refused"),
+    ]
+    manager.sync("http://server")
+    assert manager.sync("http://server") is None
+    assert manager.remote == {"10.0.0.1"}
+    assert (manager.remote_epoch, manager.remote_total) == (1, 1)
+    assert manager.is_blacklisted("10.0.0.1")
@@ -0,0 +1,66 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("joblib")  # cascade imports the detector module
+from cascade import RuleCascade, calibrate_rules
+from detection import FEATURES
+
+RATE = FEATURES.index("Flow Packets/s")
+SYN = FEATURES.index("SYN Flag Count")
+
+RULES = [
+    {"label": 2, "min": [1000.0, 100.0], "max": [1e6, 1e6]},  # SYNFLOOD: high rate, many SYNs
+    {"label": 1, "min": [500.0, 0.0], "max": [1e6, 10.0]},    # HULK: high rate, few SYNs
+]
+
+
+def flows(*pairs):
+    X = np.zeros((len(pairs), len(FEATURES)))
+    for row, (rate, syn) in enumerate(pairs):
+        X[row, RATE], X[row, SYN] = rate, syn
+    return X
+
+
+def make_cascade():
+    return RuleCascade(["Flow Packets/s", "SYN Flag Count"], RULES)
+
+
+def test_decide_one_uses_first_matching_rule():
+    cascade = make_cascade()
+    X = flows((5000, 500), (800, 2), (10, 0), (800, 50))
+    assert [cascade.decide_one(row) for row in X] == [2, 1, -1, -1]
+    assert cascade.skip_rate() == 0.5
+
+
+def test_decide_matches_decide_one():
+    cascade = make_cascade()
+    X = flows((5000, 500), (800, 2), (10, 0), (800, 50), (1000, 100), (1e6, 10))
+    single = [cascade.decide_one(row) for row in X]
+    assert cascade.decide(X).tolist() == single
+    assert cascade.total == 2 * len(X)
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "cascade.json")
+    make_cascade().save(path, purity=0.995)
+    cascade = RuleCascade.load(path)
+    assert cascade.decide(flows((5000, 500), (10, 0))).tolist() == [2, -1]
+
+
+def test_empty_cascade_sends_everything_to_model():
+    cascade = RuleCascade(["Flow Packets/s"], [])
+    assert cascade.decide(flows((5000, 500))).tolist() == [-1]
+    assert cascade.decide_one(flows((5000, 500))[0]) == -1
+
+
+def test_calibrated_rules_are_pure():
+    rng = np.random.default_rng(0)
+    benign = flows(*zip(rng.uniform(1, 100, 500), rng.integers(0, 3, 500)))
+    synflood = flows(*zip(rng.uniform(5000, 9000, 500), rng.integers(200, 400, 500)))
+    X = np.vstack([benign, synflood])
+    y = np.array([0] * 500 + [2] * 500)
+    cascade = calibrate_rules(X, y, target_purity=0.999)
+    codes = cascade.decide(X)
+    decided = codes >= 0
+    assert decided.mean() > 0.9
+    assert np.all(codes[decided] == y[decided])
@@ -0,0 +1,105 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+metrics = pytest.importorskip("metrics")  # Needs scapy and the detector's dependencies
+from blacklist import BlacklistManager
+from checkpoint import collect_state, read_state, restore_state, write_state
+from loadshedding import OverloadController
+
+NOW = 1_000_000.0
+
+
+def make_extractor(tmp_path, shedder=None):
+    """
+    Builds a MetricsExtractor with only the state the checkpoint reads and writes.
+    """
+    extractor = metrics.MetricsExtractor.__new__(metrics.MetricsExtractor)
+    extractor.flows = {}
+    extractor.sliding = None
+    extractor.shedder = shedder
+    extractor.blacklist_manager = BlacklistManager(logger=str(tmp_path / "blacklist.log"))
+    return extractor
+
+
+def add_flow(extractor, src, start, skipped=0):
+    extractor.reset_metrics_for_ip(src)
+    flow = extractor.flows[src]
+    flow.update({'start_time': start, 'end_time': start + 0.2, 'dest_ports': [80, 80], 'syn_flag_count': 2,
+                 'fwd_packet_lengths': [60, 1500], 'fwd_times': [start, start + 0.2], 'skipped_packets': skipped})
+
+
+def snapshot(tmp_path, extractor):
+    path = str(tmp_path / "state.npz")
+    write_state(path, collect_state(extractor))
+    return read_state(path)
+
+
+def test_round_trip_prunes_stale_state(tmp_path):
+    source = make_extractor(tmp_path)
+    add_flow(source, "10.0.0.1", NOW - 0.5)
+    add_flow(source, "10.0.0.2", NOW - 5.0)
+    manager = source.blacklist_manager
+    manager.blacklist_local["10.0.0.9"] = {"warnings": 1, "blacklisted": False}
+    manager.warning_times["10.0.0.9"] = NOW - 10
+    manager.blacklist_local["10.0.0.8"] = {"warnings": 1, "blacklisted": False}
+    manager.warning_times["10.0.0.8"] = NOW - 7200
+    manager.remote.add("10.5.0.0/16")
+    manager.prefixes.block("10.5.0.0/16", propagate=False)
+
+    target = make_extractor(tmp_path)
+    stats = restore_state(target, snapshot(tmp_path, source), now=NOW)
+
+    assert (stats["flows"], stats["flows_pruned"]) == (1, 1)
+    assert (stats["warnings"], stats["warnings_pruned"]) == (1, 1)
+    flow = target.flows["10.0.0.1"]
+    assert flow['syn_flag_count'] == 2
+    assert flow['fwd_iat_list'] == pytest.approx([0.2])
+    assert target.blacklist_manager.get_warnings("10.0.0.9") == 1
+    assert target.blacklist_manager.is_blacklisted("10.5.1.1")
+
+
+def test_skipped_packets_need_a_shedder(tmp_path):
+    source = make_extractor(tmp_path, OverloadController())
+    add_flow(source, "10.0.0.1", NOW - 0.5, skipped=6)
+    state = snapshot(tmp_path, source)
+
+    with_shedder = make_extractor(tmp_path, OverloadController())
+    restore_state(with_shedder, state, now=NOW)
+    assert with_shedder.flows["10.0.0.1"]['skipped_packets'] == 6
+
+    without_shedder = make_extractor(tmp_path)
+    restore_state(without_shedder, state, now=NOW)
+    assert without_shedder.flows["10.0.0.1"]['skipped_packets'] == 0
+
+
+def test_remote_entries_wait_for_the_first_sync(tmp_path):
+    source = make_extractor(tmp_path)
+    source.blacklist_manager.remote.add("10.5.0.0/16")
+    state = snapshot(tmp_path, source)
+
+    target = make_extractor(tmp_path)
+    target.blacklist_manager.remote_epoch = 3  # Already synced: the server list wins
+    restore_state(target, state, now=NOW)
+    assert not target.blacklist_manager.is_blacklisted("10.5.1.1")
+
+
+def test_sliding_rings_round_trip_without_pickle(tmp_path):
+    from slidingwindow import SlidingWindowEngine
+
+    source = make_extractor(tmp_path)
+    source.sliding = SlidingWindowEngine(bins=10, bin_width=0.1)
+    for i in range(1500):
+        source.sliding.add("10.0.0.1", NOW - 1.5 + i / 1000, 80 + i % 3, 60 + i % 7, 0x02 if i % 5 else 0x12)
+    state = snapshot(tmp_path, source)
+    assert all(array.dtype != object for array in state.values())
+
+    target = make_extractor(tmp_path)
+    target.sliding = SlidingWindowEngine(bins=10, bin_width=0.1)
+    stats = restore_state(target, state, now=NOW)
+    assert stats["sliding_sources"] == 1
+    last = source.sliding.sources["10.0.0.1"]['current']
+    assert target.sliding.window_metrics("10.0.0.1", last) == source.sliding.window_metrics("10.0.0.1", last)
+    # The restored ring keeps accumulating like the original one
+    for engine in (source.sliding, target.sliding):
+        engine.add("10.0.0.1", NOW + 0.05, 443, 1500, 0x10)
+    assert target.sliding.sources["10.0.0.1"]['ring'] == source.sliding.sources["10.0.0.1"]['ring']
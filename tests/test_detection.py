@@ -0,0 +1,88 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+joblib = pytest.importorskip("joblib")
+tree = pytest.importorskip("sklearn.tree")
+from detection import FEATURES, HULK, AttackDetector
+
+
+class FailingModel:
+    def predict(self, X):
+        raise RuntimeError("broken model")
+
+
+def publish(models_dir, name, code):
+    """
+    Writes a release whose model always predicts `code` and points 'ownmodel' at it.
+    """
+    release = models_dir / "releases" / name
+    release.mkdir(parents=True)
+    model = tree.DecisionTreeClassifier().fit(np.zeros((2, len(FEATURES))), [code, code])
+    joblib.dump(model, release / "model.pkl")
+    link = models_dir / "ownmodel.tmp"
+    os.symlink(release, link)
+    os.replace(link, models_dir / "ownmodel")
+
+
+@pytest.fixture
+def models_dir(tmp_path):
+    publish(tmp_path, "benign", 0)
+    return tmp_path
+
+
+def make_detector(models_dir):
+    return AttackDetector(str(models_dir / "ownmodel"), verbose=False)
+
+
+def test_reload_swaps_new_release(models_dir):
+    detector = make_detector(models_dir)
+    assert detector.predict(HULK) == "BENIGN"
+    assert not detector.reload()  # Nothing new published
+
+    publish(models_dir, "hulk", 1)
+    assert detector.reload()
+    assert detector.predict(HULK) == "HULK"
+    assert detector.reload_stats["reloads"] == 1
+    assert detector.reload_stats["model_path"].endswith("hulk")
+    assert not detector.reload()
+
+
+def test_invalid_release_is_rejected_once(models_dir):
+    detector = make_detector(models_dir)
+    publish(models_dir, "unknown", 9)  # Label code outside LABEL_MAP
+    assert not detector.reload()
+    assert detector.reload_stats["failed_reloads"] == 1
+    assert detector.predict(HULK) == "BENIGN"
+    assert not detector.reload()  # Not retried until republished
+    assert detector.reload_stats["failed_reloads"] == 1
+
+
+def test_rollback_restores_previous_model(models_dir):
+    detector = make_detector(models_dir)
+    publish(models_dir, "hulk", 1)
+    assert detector.reload()
+    assert detector.rollback()
+    assert detector.predict(HULK) == "BENIGN"
+    assert detector.reload_stats["rollbacks"] == 1
+    assert not detector.rollback()  # Only one previous model is kept
+    assert not detector.reload()  # The rolled back release stays rejected
+
+
+def test_failing_model_is_rolled_back_at_prediction_time(models_dir):
+    detector = make_detector(models_dir)
+    detector._swap(detector.model_path, FailingModel(), None)
+    assert detector.predict(HULK) == "BENIGN"
+    assert detector.reload_stats["rollbacks"] == 1
+
+    detector._swap(detector.model_path, FailingModel(), None)
+    labels = detector.predict_batch(np.zeros((5, len(FEATURES))), chunk_size=2)
+    assert labels.tolist() == ["BENIGN"] * 5
+
+
+def test_predict_batch_matches_predict(models_dir):
+    publish(models_dir, "hulk", 1)
+    detector = make_detector(models_dir)
+    X = np.array([[HULK[feature] for feature in FEATURES]] * 7)
+    assert detector.predict_batch(X, chunk_size=3).tolist() == [detector.predict(HULK)] * 7
@@ -0,0 +1,120 @@
+import pytest
+
+metrics = pytest.importorskip("metrics")  # Needs scapy and the detector's dependencies
+from scapy.layers.inet import IP, TCP
+
+
+class ConstantDetector:
+    """
+    Detector stand-in giving the same verdict to every window.
+    """
+
+    def __init__(self, label="HULK", confidence=0.95):
+        self.label, self.confidence = label, confidence
+        self.calls = 0
+
+    def predict_with_confidence(self, metrics):
+        self.calls += 1
+        return self.label, self.confidence
+
+
+def make_extractor(detector, early_packets=None, early_interval=0.1):
+    extractor = metrics.MetricsExtractor.__new__(metrics.MetricsExtractor)
+    extractor.flows = {}
+    extractor.sliding = None
+    extractor.shedder = None
+    extractor.detector = detector
+    extractor.configure_streaming(early_packets, early_interval, confidence=0.8)
+    return extractor
+
+
+def flood(seconds, rate=1000, src="10.0.0.1"):
+    packets = []
+    for i in range(int(seconds * rate)):
+        pkt = IP(src=src, dst="10.0.0.254") / TCP(dport=80, flags="S")
+        pkt.time = 1000.0 + i / rate
+        packets.append(pkt)
+    return packets
+
+
+def verdicts(extractor, packets):
+    results = []
+    for pkt in packets:
+        result = extractor.process_packet(pkt)
+        if result:
+            results.append((round(float(pkt.time) - 1000.0, 3), result[2]))
+    return results
+
+
+def test_one_verdict_per_window():
+    detector = ConstantDetector()
+    results = verdicts(make_extractor(detector), flood(3.5))
+    # Decided 100 ms into every window; the rest of the window is not scored again
+    assert [prediction for _, prediction in results] == ["HULK"] * 4
+    assert [elapsed for elapsed, _ in results] == pytest.approx([0.1, 1.1, 2.1, 3.1], abs=0.01)
+    assert detector.calls == 4
+
+
+def test_uncertain_checkpoints_keep_the_window_open():
+    detector = ConstantDetector(confidence=0.5)
+    results = verdicts(make_extractor(detector), flood(2.05))
+    assert [prediction for _, prediction in results] == [None, None]
+    assert detector.calls >= 9  # Every 100 ms of both windows
+
+
+def test_early_packets_checkpoint():
+    detector = ConstantDetector(label="BENIGN")
+    verdicts(make_extractor(detector, early_packets=250, early_interval=None), flood(0.9))
+    assert detector.calls == 3  # After 250, 500 and 750 packets
+
+
+def test_projection_scales_counts_to_one_second():
+    window = dict.fromkeys(metrics.EXTENSIVE_FEATURES, 10.0)
+    window.update({"Flow Packets/s": 1000.0, "Fwd Packet Length Mean": 60.0})
+    projected = metrics.MetricsExtractor.project_metrics(window, 0.1)
+    assert projected["Total Fwd Packets"] == pytest.approx(100)
+    assert projected["Flow Packets/s"] == 1000.0
+    assert projected["Fwd Packet Length Mean"] == 60.0
+
+
+class LabelModel:
+    """
+    Model without predict_proba, like a bare decision function.
+    """
+
+    def predict(self, X):
+        return [1] * len(X)
+
+
+def make_detector(model, cascade=None):
+    from detection import AttackDetector
+    detector = AttackDetector.__new__(AttackDetector)
+    detector.model, detector.previous, detector.cascade, detector.verbose = model, None, cascade, False
+    return detector
+
+
+def test_predict_with_confidence_uses_class_probability():
+    np = pytest.importorskip("numpy")
+    tree = pytest.importorskip("sklearn.tree")
+    from detection import FEATURES, HULK
+    X = np.array([[HULK[feature] for feature in FEATURES]] * 4)
+    X[:, FEATURES.index("Flow Packets/s")] = [1, 2, 3, 4]
+    # Leaf of the first two rows: two HULK flows and one SYNFLOOD flow
+    model = tree.DecisionTreeClassifier(max_depth=1).fit(np.vstack([X, X[:1]]), [1, 1, 0, 0, 2])
+    flow = dict(HULK, **{"Flow Packets/s": 1})
+    label, confidence = make_detector(model).predict_with_confidence(flow)
+    assert label == "HULK"
+    assert confidence == pytest.approx(2 / 3)
+    assert make_detector(model).predict(flow) == label
+
+
+def test_predict_with_confidence_without_probabilities():
+    from detection import HULK
+    assert make_detector(LabelModel()).predict_with_confidence(HULK) == ("HULK", None)
+
+
+def test_rule_decisions_are_certain():
+    from cascade import RuleCascade
+    from detection import HULK
+    cascade = RuleCascade(["Flow Packets/s"], [{"label": 2, "min": [0.0], "max": [1e9]}])
+    assert make_detector(LabelModel(), cascade).predict_with_confidence(HULK) == ("SYNFLOOD", 1.0)
@@ -0,0 +1,55 @@
+import pickle
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+pytest.importorskip("sklearn")
+from sklearn.base import clone
+from sklearn.decomposition import PCA
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+from fastknn import ProjectedKNNClassifier
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    centers = rng.normal(0, 10, (3, 12))
+    y = rng.integers(0, 3, 600)
+    X = centers[y] + rng.normal(0, 3, (600, 12)) * rng.uniform(0.1, 100, 12)
+    return X[:500], y[:500], X[500:]
+
+
+def test_projection_matches_scaler_and_pca(data):
+    X, y, X_test = data
+    model = ProjectedKNNClassifier(n_components=4, dtype="float64").fit(X, y)
+    reference = make_pipeline(StandardScaler(), PCA(n_components=4, random_state=42)).fit(X)
+    np.testing.assert_allclose(model.transform(X_test), reference.transform(X_test), atol=1e-8)
+
+
+def test_predictions_match_knn_pipeline(data):
+    X, y, X_test = data
+    model = ProjectedKNNClassifier(n_components=4, n_neighbors=5, dtype="float64").fit(X, y)
+    reference = make_pipeline(StandardScaler(), PCA(n_components=4, random_state=42),
+                              KNeighborsClassifier(n_neighbors=5)).fit(X, y)
+    assert np.mean(model.predict(X_test) == reference.predict(X_test)) >= 0.98
+    np.testing.assert_allclose(model.predict_proba(X_test).sum(axis=1), 1.0)
+
+
+def test_single_row_and_labels(data):
+    X, y, X_test = data
+    labels = np.array(["BENIGN", "HULK", "SYNFLOOD"])[y]
+    model = ProjectedKNNClassifier(n_components=4).fit(X, labels)
+    assert model.predict(X_test[0]).tolist() == model.predict(X_test[:1]).tolist()
+    assert set(model.predict(X_test)) <= set(labels)
+    assert model.projection_.dtype == np.float32
+
+
+def test_clone_and_pickle(data):
+    X, y, X_test = data
+    model = ProjectedKNNClassifier(n_components=4, n_neighbors=3).fit(X, y)
+    assert clone(model).get_params() == model.get_params()
+    restored = pickle.loads(pickle.dumps(model))
+    assert restored.predict(X_test).tolist() == model.predict(X_test).tolist()
@@ -0,0 +1,52 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+flowrecords = pytest.importorskip("flowrecords")  # Needs the detector's dependencies
+from detection import FEATURES
+from flowrecords import FlowRecordWriter, load_segments, read_records
+
+
+def make_metrics(value):
+    return {feature: value + index for index, feature in enumerate(FEATURES)}
+
+
+def test_records_round_trip_across_segments(tmp_path):
+    writer = FlowRecordWriter(str(tmp_path), segment_rows=2)
+    for row in range(5):
+        writer.append(1000.0 + row, f"10.0.0.{row}", make_metrics(row), "HULK" if row % 2 else "BENIGN")
+    writer.close()
+
+    assert len(load_segments(str(tmp_path))) == 3  # Two full segments and the trimmed last one
+    records = read_records(str(tmp_path))
+    assert records['timestamp'].tolist() == [1000.0, 1001.0, 1002.0, 1003.0, 1004.0]
+    assert records['src'].tolist() == [f"10.0.0.{row}".encode() for row in range(5)]
+    assert records['prediction'].tolist() == [0, 1, 0, 1, 0]
+    for row in range(5):
+        assert [records[feature][row] for feature in FEATURES] == list(make_metrics(row).values())
+
+
+def test_unknown_prediction_is_stored_as_minus_one(tmp_path):
+    writer = FlowRecordWriter(str(tmp_path))
+    writer.append(1000.0, "2001:db8::1", make_metrics(0), "UNKNOWN")
+    writer.close()
+    records = read_records(str(tmp_path))
+    assert records['prediction'].tolist() == [-1]
+    assert records['src'].tolist() == [b"2001:db8::1"]
+
+
+def test_partial_segment_is_only_read_on_request(tmp_path):
+    writer = FlowRecordWriter(str(tmp_path), segment_rows=4)
+    writer.append(1000.0, "10.0.0.1", make_metrics(0), "BENIGN")
+    writer.segment.flush()
+    assert len(read_records(str(tmp_path))) == 0
+    assert len(read_records(str(tmp_path), include_partial=True)) == 1  # Unwritten rows are skipped
+    writer.close()
+    assert len(read_records(str(tmp_path))) == 1
+
+
+def test_max_segments_prunes_oldest(tmp_path):
+    writer = FlowRecordWriter(str(tmp_path), segment_rows=1, max_segments=2)
+    for row in range(4):
+        writer.append(1000.0 + row, "10.0.0.1", make_metrics(row), "BENIGN")
+    writer.close()
+    assert read_records(str(tmp_path))['timestamp'].tolist() == [1002.0, 1003.0]
@@ -0,0 +1,38 @@
+from loadshedding import OverloadController
+
+
+def test_rate_doubles_under_load_and_respects_hold():
+    controller = OverloadController(lag_high=0.25, lag_low=0.05, max_rate=8, hold=1.0)
+    assert controller.update(0.5, 0, now=0.0) == 2
+    assert controller.update(0.5, 0, now=0.5) is None  # Within the hold time
+    assert controller.update(0.5, 0, now=1.0) == 4
+    assert controller.update(0.5, 0, now=2.0) == 8
+    assert controller.update(0.5, 0, now=3.0) is None  # Capped at max_rate
+    assert controller.rate == 8
+
+
+def test_rate_halves_when_load_drops():
+    controller = OverloadController(lag_high=0.25, lag_low=0.05, hold=1.0)
+    controller.update(0.5, 0, now=0.0)
+    controller.update(0.5, 0, now=1.0)
+    assert controller.update(0.1, 0, now=2.0) is None  # Between the marks: unchanged
+    assert controller.update(0.01, 0, now=3.0) == 2
+    controller.keep("10.0.0.1")
+    assert controller.update(0.01, 0, now=4.0) == 1
+    assert controller.counts == {}
+
+
+def test_queue_depth_triggers_and_blocks_recovery():
+    controller = OverloadController(lag_high=0.25, lag_low=0.05, queue_high=100, hold=0)
+    assert controller.update(0.0, 200, now=0.0) == 2
+    assert controller.update(0.0, 50, now=1.0) is None  # Above queue_high / 4
+    assert controller.update(0.0, 10, now=2.0) == 1
+
+
+def test_keep_is_deterministic_per_source():
+    controller = OverloadController()
+    controller.rate = 4
+    kept = [controller.keep("a") for _ in range(8)]
+    assert kept == [True, False, False, False, True, False, False, False]
+    assert controller.keep("b")  # First packet of every source is processed
+    assert controller.sampled_out == 6
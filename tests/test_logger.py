@@ -0,0 +1,61 @@
+import logging
+import queue
+import threading
+
+import pytest
+
+from logger import BoundedQueueHandler
+
+
+def make_record(message):
+    return logging.LogRecord("test", logging.INFO, __file__, 0, message, None, None)
+
+
+def drain(handler):
+    messages = []
+    while not handler.queue.empty():
+        messages.append(handler.queue.get_nowait().getMessage())
+    return messages
+
+
+def test_drop_new_keeps_queued_records():
+    handler = BoundedQueueHandler(queue.Queue(maxsize=2), drop_policy='drop_new')
+    for message in ("a", "b", "c", "d"):
+        handler.emit(make_record(message))
+    assert drain(handler) == ["a", "b"]
+    assert handler.dropped == 2
+
+
+def test_drop_old_keeps_latest_records():
+    handler = BoundedQueueHandler(queue.Queue(maxsize=2), drop_policy='drop_old')
+    for message in ("a", "b", "c", "d"):
+        handler.emit(make_record(message))
+    assert drain(handler) == ["c", "d"]
+    assert handler.dropped == 2
+
+
+def test_block_waits_for_room():
+    handler = BoundedQueueHandler(queue.Queue(maxsize=1), drop_policy='block')
+    handler.emit(make_record("a"))
+    writer = threading.Thread(target=handler.emit, args=(make_record("b"),))
+    writer.start()
+    writer.join(timeout=0.1)
+    assert writer.is_alive()  # Queue is full, the producer waits instead of dropping
+    assert handler.queue.get_nowait().getMessage() == "a"
+    writer.join(timeout=1)
+    assert not writer.is_alive()
+    assert drain(handler) == ["b"]
+    assert handler.dropped == 0
+
+
+def test_records_are_not_formatted_when_queued():
+    handler = BoundedQueueHandler(queue.Queue(maxsize=1))
+    arguments = [60, 1500]
+    handler.emit(logging.LogRecord("test", logging.INFO, __file__, 0, "metrics %s", (arguments,), None))
+    record = handler.queue.get_nowait()
+    assert record.args == (arguments,)  # Formatting is left to the listener thread
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        BoundedQueueHandler(queue.Queue(maxsize=1), drop_policy='drop_all')
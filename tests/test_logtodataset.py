@@ -0,0 +1,72 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+from logtodataset import parse_chunk, split_ranges
+
+
+def metrics_line(src, port, duration, packets):
+    return (f"2025-06-14 00:56:46,957 - INFO - [{src}] Metrics: "
+            f"{{'Destination Port': {port}, 'Flow Duration': {duration}, 'Total Fwd Packets': {packets}}}\n").encode()
+
+
+LOG = b"".join([
+    metrics_line("10.0.0.1", 80, 1.0, 10),
+    b"2025-06-14 00:56:47,001 - WARNING - 10.0.0.1 reached max warnings (3). Adding to blacklist.\n",
+    metrics_line("10.0.0.2", 8080, 0.5, 3),
+    metrics_line("10.0.0.3", 443, 2.25, 7),
+])
+
+
+def test_parse_chunk_extracts_metrics_lines():
+    frame = parse_chunk(LOG, "hulk")
+    assert list(frame.columns) == ['Destination Port', 'Flow Duration', 'Total Fwd Packets', 'label']
+    assert frame['Destination Port'].tolist() == [80.0, 8080.0, 443.0]
+    assert frame['Flow Duration'].tolist() == [1.0, 0.5, 2.25]
+    assert frame['Total Fwd Packets'].dtype == np.float64
+    assert set(frame['label']) == {"HULK"}
+
+
+def test_parse_chunk_falls_back_to_literal_parsing():
+    # Lines with a different key order cannot be reshaped into one matrix
+    other = b"... - INFO - [10.0.0.4] Metrics: {'Total Fwd Packets': 4, 'Destination Port': 22, 'Flow Duration': 0.1}\n"
+    frame = parse_chunk(LOG + other, "synflood")
+    assert frame['Destination Port'].tolist() == [80.0, 8080.0, 443.0, 22.0]
+    assert frame['Total Fwd Packets'].tolist() == [10.0, 3.0, 7.0, 4.0]
+    assert frame['Flow Duration'].dtype == np.float64
+
+
+def test_parse_chunk_without_metrics_lines():
+    assert parse_chunk(b"2025-06-14 00:56:47,001 - INFO - Warnings reset for 10.0.0.1\n", "benign").empty
+
+
+def test_split_ranges_end_on_line_boundaries(tmp_path):
+    path = tmp_path / "hulk.log"
+    path.write_bytes(LOG)
+    ranges, offset = split_ranges(str(path), chunk_size=64)
+    assert len(ranges) > 1
+    assert ranges[0][0] == 0 and offset == len(LOG)
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start
+    for start, end in ranges:
+        assert LOG[end - 1:end] == b"\n"
+    frame = pd.concat([parse_chunk(LOG[start:end], "hulk") for start, end in ranges], ignore_index=True)
+    assert frame['Destination Port'].tolist() == [80.0, 8080.0, 443.0]
+
+
+def test_split_ranges_leaves_out_incomplete_line(tmp_path):
+    path = tmp_path / "hulk.log"
+    path.write_bytes(LOG + b"2025-06-14 00:56:48,000 - INFO - [10.0.0.5] Metr")
+    for chunk_size in (64, 1 << 20):
+        ranges, offset = split_ranges(str(path), chunk_size=chunk_size)
+        assert offset == len(LOG)
+        assert ranges[-1][1] == len(LOG)
+
+
+def test_split_ranges_resumes_from_offset(tmp_path):
+    path = tmp_path / "hulk.log"
+    first = metrics_line("10.0.0.1", 80, 1.0, 10)
+    path.write_bytes(LOG)
+    ranges, offset = split_ranges(str(path), start=len(first))
+    assert ranges == [(len(first), len(LOG))]
+    assert split_ranges(str(path), start=offset) == ([], len(LOG))
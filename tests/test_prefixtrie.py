@@ -0,0 +1,68 @@
+from prefixtrie import PrefixTrie
+
+
+def test_host_block_and_match():
+    trie = PrefixTrie()
+    trie.block("10.0.0.7")
+    assert trie.match("10.0.0.7") == "10.0.0.7/32"
+    assert trie.match("10.0.0.8") is None
+
+
+def test_level_prefix_block_and_unblock():
+    trie = PrefixTrie()
+    trie.block("10.1.2.0/24")
+    assert trie.match("10.1.2.200") == "10.1.2.0/24"
+    trie.unblock("10.1.2.0/24")
+    assert trie.match("10.1.2.200") is None
+
+
+def test_non_level_prefix_is_not_widened():
+    trie = PrefixTrie()
+    trie.block("10.1.16.0/20")
+    assert trie.match("10.1.17.1") == "10.1.16.0/20"
+    assert trie.match("10.1.200.1") is None
+
+
+def test_wide_and_non_level_prefixes_use_longest_match():
+    trie = PrefixTrie()
+    trie.block("10.0.0.0/8")
+    trie.block("10.1.16.0/20")
+    trie.block("10.1.17.0/24")
+    assert trie.match("10.9.9.9") == "10.0.0.0/8"
+    assert trie.match("10.1.18.1") == "10.1.16.0/20"
+    assert trie.match("10.1.17.1") == "10.1.17.0/24"
+    trie.unblock("10.1.16.0/20")
+    assert trie.match("10.1.18.1") == "10.0.0.0/8"
+
+
+def test_ipv6_non_level_prefix():
+    trie = PrefixTrie()
+    trie.block("2001:db8::/48")
+    assert trie.match("2001:db8:0:1::1") == "2001:db8::/48"
+    assert trie.match("2001:db9::1") is None
+
+
+def test_flagged_hosts_escalate_to_subnet():
+    trie = PrefixTrie(max_children=4, max_warnings=12)
+    blocked = []
+    for i in range(4):
+        blocked += trie.flag(f"10.2.0.{i}")
+    assert blocked == ["10.2.0.0/24"]
+    assert trie.match("10.2.0.200") == "10.2.0.0/24"
+
+
+def test_blocks_without_propagation_do_not_escalate():
+    trie = PrefixTrie(max_children=4, max_warnings=12)
+    for i in range(4):
+        assert trie.block(f"10.2.0.{i}", propagate=False) == []
+    assert trie.match("10.2.0.200") is None
+    trie.unblock("10.2.0.0")
+    assert trie.match("10.2.0.0") is None
+
+
+def test_reset_clears_host_warnings():
+    trie = PrefixTrie()
+    trie.add_warning("10.3.0.1", 2)
+    assert trie.get_warnings("10.3.0.0/24") == 2
+    trie.reset("10.3.0.1")
+    assert trie.get_warnings("10.3.0.0/24") == 0
@@ -0,0 +1,35 @@
+import json
+import urllib.error
+import urllib.request
+import pytest
+from common.instrumentation import is_loopback, start_metrics_server
+from common.profiler import SamplingProfiler
+
+
+@pytest.mark.parametrize("address, local", [
+    ("127.0.0.1", True), ("127.8.0.1", True), ("::1", True), ("::ffff:127.0.0.1", True),
+    ("192.168.1.10", False), ("::ffff:10.0.0.1", False), ("2001:db8::1", False), ("not an ip", False),
+])
+def test_is_loopback(address, local):
+    assert is_loopback(address) == local
+
+
+def test_request_does_not_reveal_the_output_dir(tmp_path):
+    profiler = SamplingProfiler(str(tmp_path))
+    status, response = profiler.handle_request("seconds=0.05")
+    assert status == 202
+    assert "output_dir" not in response and str(tmp_path) not in json.dumps(response)
+    assert profiler.handle_request("seconds=1000")[0] == 400
+
+
+def test_debug_routes_are_served_to_loopback_clients():
+    server = start_metrics_server(0, host="127.0.0.1", routes={"/debug/ping": lambda query: (200, "text/plain", b"pong")})
+    try:
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(base + "/debug/ping", timeout=5) as response:
+            assert response.read() == b"pong"
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(base + "/debug/other", timeout=5)
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,39 @@
+from regression import compare
+
+
+def results(benchmarks, groups=None, filters=None):
+    return {
+        "machine": {"python": "3.12", "cpus": 8, "processor": "x86_64"},
+        "commit": "abc1234",
+        "date": "2026-01-01",
+        "selection": {"groups": groups, "filter": filters},
+        "benchmarks": benchmarks,
+    }
+
+
+def timing(median_us, group="sensor"):
+    return {"median_us": median_us, "group": group}
+
+
+def test_regression_above_threshold():
+    baseline = results({"a": timing(10.0), "b": timing(10.0), "c": timing(10.0)})
+    current = results({"a": timing(10.5), "b": timing(13.0), "c": timing(5.0)})
+    assert compare(current, baseline, 0.10) == (["b"], [])
+
+
+def test_missing_benchmark_is_reported():
+    baseline = results({"a": timing(10.0), "b": timing(10.0)})
+    current = results({"a": timing(10.0)})
+    assert compare(current, baseline, 0.10) == ([], ["b"])
+
+
+def test_benchmarks_outside_the_selection_are_not_missing():
+    baseline = results({"a": timing(10.0), "b": timing(10.0, group="server"), "c": timing(10.0)})
+    current = results({"a": timing(10.0)}, groups=["sensor"], filters=["a"])
+    assert compare(current, baseline, 0.10) == ([], [])
+
+
+def test_new_benchmarks_are_not_regressions():
+    baseline = results({"a": timing(10.0)})
+    current = results({"a": timing(10.0), "new": timing(100.0)})
+    assert compare(current, baseline, 0.10) == ([], [])
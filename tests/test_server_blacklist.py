@@ -0,0 +1,112 @@
+import importlib.util
+import os
+import pytest
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server")
+
+
+@pytest.fixture
+def server_blacklist():
+    """
+    Loads server/blacklist.py under its own name (the sensor has a blacklist module too).
+    """
+    spec = importlib.util.spec_from_file_location("server_blacklist", os.path.join(SERVER_DIR, "blacklist.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def fetcher(*records, ok=True):
+    def fetch(out):
+        out.extend(records)
+        return ok
+    return fetch
+
+
+def test_fetch_appending_keeps_the_epoch(server_blacklist, monkeypatch):
+    monkeypatch.setattr(server_blacklist, "_fetch_records", fetcher({"ip": "10.0.0.1"}))
+    assert server_blacklist.fetch_blacklist()
+    epoch = server_blacklist.get_blacklist_delta()["epoch"]
+    monkeypatch.setattr(server_blacklist, "_fetch_records", fetcher({"ip": "10.0.0.1"}, {"ip": "10.0.0.2"}))
+    assert server_blacklist.fetch_blacklist()
+    delta = server_blacklist.get_blacklist_delta(since=1, epoch=epoch)
+    assert delta["delta"] and delta["attacks"] == [{"ip": "10.0.0.2"}]
+
+
+def test_failed_fetch_keeps_the_previous_blacklist(server_blacklist, monkeypatch):
+    monkeypatch.setattr(server_blacklist, "_fetch_records", fetcher({"ip": "10.0.0.1"}, {"ip": "10.0.0.2"}))
+    server_blacklist.fetch_blacklist()
+    before = server_blacklist.get_blacklist_delta()
+    monkeypatch.setattr(server_blacklist, "_fetch_records", fetcher({"ip": "10.0.0.1"}, ok=False))
+    assert not server_blacklist.fetch_blacklist()
+    assert server_blacklist.get_blacklist_delta() == before
+
+
+def node_outputs(total, attacks):
+    """
+    Stands in for the Node.js scripts: getTotalAttacks.cjs and getAttack.cjs outputs.
+    """
+    def run(script, args=[]):
+        if script == "getTotalAttacks.cjs":
+            return None if total is None else f"Number of Registered Attacks: {total}"
+        return attacks.get(int(args[0]))
+    return run
+
+
+def attack_output(ip):
+    return f"IP: {ip}\nAttack type: DoS Attack\nTimestamp: 1700000000"
+
+
+def test_unreadable_records_are_skipped(server_blacklist, monkeypatch):
+    outputs = {0: attack_output("10.0.0.1"), 1: "garbage", 3: attack_output("10.0.0.4")}
+    monkeypatch.setattr(server_blacklist, "_run_node_script", node_outputs(4, outputs))
+    assert server_blacklist.fetch_blacklist()
+    assert [attack["ip"] for attack in server_blacklist.get_blacklist()] == ["10.0.0.1", "10.0.0.4"]
+
+
+def test_unreadable_total_fails_the_refresh(server_blacklist, monkeypatch):
+    monkeypatch.setattr(server_blacklist, "_run_node_script", node_outputs(1, {0: attack_output("10.0.0.1")}))
+    server_blacklist.fetch_blacklist()
+    monkeypatch.setattr(server_blacklist, "_run_node_script", node_outputs(None, {}))
+    assert not server_blacklist.fetch_blacklist()
+    assert [attack["ip"] for attack in server_blacklist.get_blacklist()] == ["10.0.0.1"]
+
+
+def test_deleted_attacks_are_unblocked(server_blacklist, monkeypatch):
+    monkeypatch.setattr(server_blacklist, "_fetch_records",
+                        fetcher({"ip": "10.0.0.1"}, {"ip": "10.1.0.0/16"}, {"ip": "10.0.0.3"}))
+    server_blacklist.fetch_blacklist()
+    index = server_blacklist.get_blacklist_index()
+    assert server_blacklist.match_prefix(index, "10.1.2.3") == "10.1.0.0/16"
+    epoch = server_blacklist.get_blacklist_delta()["epoch"]
+
+    monkeypatch.setattr(server_blacklist, "LEDGER_URL", "http://ledger")
+    monkeypatch.setattr(server_blacklist, "_ledger_request", lambda *args, **kwargs: {"tx_id": "0x1"})
+    assert server_blacklist.delete_attack(1)
+    index = server_blacklist.get_blacklist_index()
+    assert server_blacklist.match_prefix(index, "10.1.2.3") is None
+    assert server_blacklist.match_prefix(index, "10.0.0.3") == "10.0.0.3/32"
+    delta = server_blacklist.get_blacklist_delta(since=3, epoch=epoch)
+    assert not delta["delta"] and len(delta["attacks"]) == 2
+
+    server_blacklist.clear_blacklist()
+    assert server_blacklist.get_blacklist() == []
+    assert server_blacklist.match_prefix(server_blacklist.get_blacklist_index(), "10.0.0.1") is None
+
+
+def test_failed_deletion_keeps_the_blacklist(server_blacklist, monkeypatch):
+    monkeypatch.setattr(server_blacklist, "_fetch_records", fetcher({"ip": "10.0.0.1"}))
+    server_blacklist.fetch_blacklist()
+    monkeypatch.setattr(server_blacklist, "LEDGER_URL", "http://ledger")
+    monkeypatch.setattr(server_blacklist, "_ledger_request", lambda *args, **kwargs: None)
+    assert server_blacklist.delete_attack(0) is None
+    server_blacklist.clear_blacklist()
+    assert server_blacklist.match_prefix(server_blacklist.get_blacklist_index(), "10.0.0.1") == "10.0.0.1/32"
+
+
+def test_ledger_logging_is_not_timed_as_node(server_blacklist, monkeypatch):
+    monkeypatch.setattr(server_blacklist, "LEDGER_URL", "http://ledger")
+    monkeypatch.setattr(server_blacklist, "_ledger_request", lambda *args, **kwargs: {"tx_id": "0x1"})
+    before = server_blacklist.NODE_TIME.snapshot()[1]
+    assert server_blacklist.log_attack("10.0.0.1", "DoS HULK")["tx_id"] == "0x1"
+    assert server_blacklist.NODE_TIME.snapshot()[1] == before
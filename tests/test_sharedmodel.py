@@ -0,0 +1,82 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+joblib = pytest.importorskip("joblib")
+ensemble = pytest.importorskip("sklearn.ensemble")
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.tree import DecisionTreeClassifier
+from sharedmodel import ARRAY_DIR, FlatTreeEnsemble, check_arrays, dump, flatten, is_shared, load, load_release
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(0, 1, (2000, 12)) * rng.uniform(1, 1000, 12)
+    y = (X[:, 0] > 0).astype(int) + (X[:, 3] > X[:, 5]) * 2
+    return X, y, rng.normal(0, 1, (500, 12)) * 500
+
+
+@pytest.mark.parametrize("model", [
+    DecisionTreeClassifier(random_state=0),
+    ensemble.RandomForestClassifier(n_estimators=10, random_state=0),
+    ensemble.ExtraTreesClassifier(n_estimators=10, max_depth=6, random_state=0),
+], ids=["decision_tree", "random_forest", "extra_trees"])
+def test_flat_trees_match_sklearn(data, model):
+    X, y, X_test = data
+    model.fit(X, y)
+    flat = FlatTreeEnsemble.from_sklearn(model)
+    np.testing.assert_allclose(flat.predict_proba(X_test), model.predict_proba(X_test), atol=1e-12)
+    assert flat.predict(X_test).tolist() == model.predict(X_test).tolist()
+    assert flat.predict(X_test[0]).tolist() == model.predict(X_test[:1]).tolist()
+
+
+def test_other_models_are_not_flattened():
+    model = KNeighborsClassifier()
+    assert flatten(model) is model
+
+
+def test_dump_and_load_share_large_arrays(tmp_path, data):
+    X, y, X_test = data
+    model = ensemble.RandomForestClassifier(n_estimators=20, random_state=0).fit(X, y)
+    arrays = dump(model, str(tmp_path), min_bytes=4096)
+    assert is_shared(str(tmp_path)) and arrays
+    check_arrays(str(tmp_path), arrays, checksums=True)
+
+    loaded = load(str(tmp_path))
+    assert isinstance(loaded, FlatTreeEnsemble)
+    assert type(loaded.threshold) is np.ndarray and not loaded.threshold.flags.writeable  # Mapped read-only
+    assert loaded.roots.flags.writeable  # Small arrays stay in model.pkl
+    assert loaded.predict(X_test).tolist() == model.predict(X_test).tolist()
+    assert load_release(str(tmp_path / "model.pkl")).predict(X_test).tolist() == model.predict(X_test).tolist()
+
+
+def test_knn_training_matrix_is_shared(tmp_path, data):
+    X, y, X_test = data
+    model = KNeighborsClassifier(n_neighbors=3).fit(X, y)
+    assert dump(model, str(tmp_path), min_bytes=4096)
+    loaded = load(str(tmp_path))
+    assert loaded.predict(X_test).tolist() == model.predict(X_test).tolist()
+
+
+def test_check_arrays_detects_changed_files(tmp_path, data):
+    X, y, _ = data
+    arrays = dump(DecisionTreeClassifier(random_state=0).fit(X, y), str(tmp_path), min_bytes=1024)
+    name = next(iter(arrays))
+    path = tmp_path / ARRAY_DIR / name
+    content = bytearray(path.read_bytes())
+    content[-1] ^= 0xFF
+    path.write_bytes(bytes(content))
+    check_arrays(str(tmp_path), arrays)  # Same size: only the checksum notices
+    with pytest.raises(ValueError):
+        check_arrays(str(tmp_path), arrays, checksums=True)
+    path.write_bytes(bytes(content[:-8]))
+    with pytest.raises(ValueError):
+        check_arrays(str(tmp_path), arrays)
+
+
+def test_load_release_reads_self_contained_pickle(tmp_path, data):
+    X, y, X_test = data
+    model = DecisionTreeClassifier(random_state=0).fit(X, y)
+    joblib.dump(model, tmp_path / "model.pkl")
+    assert not is_shared(str(tmp_path))
+    assert load_release(str(tmp_path)).predict(X_test).tolist() == model.predict(X_test).tolist()
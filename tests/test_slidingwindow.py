@@ -0,0 +1,76 @@
+import random
+
+import pytest
+
+metrics = pytest.importorskip("metrics")  # Needs scapy and the detector's dependencies
+from slidingwindow import SlidingWindowEngine
+
+BINS, WIDTH = 10, 0.1
+
+
+def make_packets(seconds=3.0, seed=1):
+    rng = random.Random(seed)
+    packets, now = [], 1000.0
+    while now < 1000.0 + seconds:
+        now += rng.expovariate(300)
+        port = 80 if rng.random() < 0.7 else rng.choice([22, 443, 8080])
+        packets.append((now, port, rng.randint(40, 1500), rng.choice([0x02, 0x10, 0x18, 0x01, 0x20, 0x04, 0])))
+    return packets
+
+
+def tumbling_metrics(packets):
+    """
+    Features of get_metrics for a window holding `packets`, all forward traffic.
+    """
+    extractor = metrics.MetricsExtractor.__new__(metrics.MetricsExtractor)
+    extractor.flows = {}
+    extractor.reset_metrics_for_ip("src")
+    flow = extractor.flows["src"]
+    flow['start_time'], flow['end_time'] = packets[0][0], packets[-1][0]
+    for pkt_time, port, length, flags in packets:
+        flow['dest_ports'].append(port)
+        for bit, key in ((0x01, 'fin_flag_count'), (0x02, 'syn_flag_count'), (0x04, 'rst_flag_count'),
+                         (0x08, 'psh_flag_count'), (0x10, 'ack_flag_count'), (0x08, 'fwd_psh_flags'),
+                         (0x20, 'fwd_urg_flags')):
+            if flags & bit:
+                flow[key] += 1
+        flow['fwd_packet_lengths'].append(length)
+        if flow['fwd_times']:
+            flow['fwd_iat_list'].append(pkt_time - flow['fwd_times'][-1])
+        flow['fwd_times'].append(pkt_time)
+    return extractor.get_metrics(flow)
+
+
+def test_windows_match_get_metrics():
+    packets = make_packets()
+    engine = SlidingWindowEngine(bins=BINS, bin_width=WIDTH)
+    compared = 0
+    for position, (pkt_time, port, length, flags) in enumerate(packets):
+        current = engine.sources["src"]['current'] if "src" in engine.sources else None
+        window = engine.add("src", pkt_time, port, length, flags)
+        if window is None:
+            continue
+        # The window ending with the bin before this packet's
+        inside = [pkt for pkt in packets[:position] if current - BINS < int(pkt[0] // WIDTH) <= current]
+        expected = tumbling_metrics(inside)
+        assert window.keys() == expected.keys()
+        for feature, value in expected.items():
+            assert window[feature] == pytest.approx(value, rel=1e-9, abs=1e-12), feature
+        compared += 1
+    # One window per bin once the first full window is available
+    assert compared >= int(3.0 / WIDTH) - BINS - 1
+
+
+def test_first_window_needs_full_ring():
+    engine = SlidingWindowEngine(bins=BINS, bin_width=WIDTH)
+    results = [engine.add("src", 1000.01 + i * 0.05, 80, 60, 0x02) for i in range(20)]
+    assert all(result is None for result in results)  # Bins of the first second, none scored yet
+    assert engine.add("src", 1001.02, 80, 60, 0x02)['Total Fwd Packets'] == 20
+
+
+def test_idle_sources_are_swept():
+    engine = SlidingWindowEngine(bins=BINS, bin_width=WIDTH)
+    engine.add("idle", 1000.0, 80, 60, 0)
+    engine.add("busy", 1000.5, 80, 60, 0)
+    engine.add("busy", 1002.0, 80, 60, 0)
+    assert set(engine.sources) == {"busy"}
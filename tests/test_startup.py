@@ -0,0 +1,21 @@
+from startup import StartupTimer, import_profile
+
+
+def test_import_profile_groups_nested_imports_by_package(tmp_path):
+    (tmp_path / "sensor.py").write_text("import json\nimport xml.dom.minidom\n")
+    total, imports = import_profile("sensor", cwd=str(tmp_path), top=50)
+    packages = {package: (cumulative, own) for cumulative, own, package in imports}
+    assert "sensor" not in packages  # The profiled module itself is the total
+    assert {"json", "xml"} <= set(packages)
+    for cumulative, own in packages.values():
+        assert 0 <= own <= cumulative + 1e-6
+    assert total >= packages["json"][0] + packages["xml"][0]
+
+
+def test_phases_are_reported_once():
+    timer = StartupTimer()
+    timer.mark("imports")
+    timer.mark("model")
+    assert [phase for phase, _ in timer.phases][-2:] == ["imports", "model"]
+    timer.report()
+    assert timer.reported